@@ -25,12 +25,18 @@ UEBD = (efectivo / (total - m_correctiva - m_programada)) × 100
 UEBA = (efectivo / total) × 100
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta  # ✅ AGREGADO PARA OPTIMIZACIÓN
+from datetime import datetime
 import sqlite3
 from pathlib import Path
 
+from services.hexagon_partitions import DETAIL_DUMPS, EQUIPMENT_TIMES
+from services.date_ranges import day_range, year_range
+from services import data_catalog, rollups, time_dimension
+from services.async_db import get_async_db
+from services.result_cache import cached_response, get_result_cache
+
 router = APIRouter()
 
 
@@ -38,109 +44,88 @@ router = APIRouter()
 # ENDPOINTS DE DASHBOARD
 # ═══════════════════════════════════════════════════════════════
 
-@router.get("/api/dashboard")
-async def get_dashboard(
-    area: str = Query("todas", description="Área operacional"),
-    year: int = Query(2024, description="Año de datos")
-):
-    """
-    Endpoint principal del dashboard
-    Retorna KPIs, equipos y métricas operacionales CON DATOS REALES
-    """
+def _dashboard_data(conn: sqlite3.Connection, area: str, year: int) -> Dict:
+    """Consultas de get_dashboard (corre en el pool de services/async_db)"""
     try:
-        conn = sqlite3.connect("minedash.db")
         cursor = conn.cursor()
         
-        # ======== KPIs PRINCIPALES ========
+        # Rango del año: solo se consultan las particiones que lo cubren
+        year_start, year_end = year_range(year)
         
-        # Producción total desde hexagon_by_detail_dumps_*
-        cursor.execute("""
-            SELECT 
-                SUM(material_tonnage) as total_toneladas,
-                COUNT(DISTINCT truck_equipment_type) as tipos_equipos,
-                COUNT(*) as total_dumps
-            FROM (
-                SELECT material_tonnage, truck_equipment_type, timestamp
-                FROM hexagon_by_detail_dumps_2023
-                WHERE strftime('%Y', timestamp) = ?
-                UNION ALL
-                SELECT material_tonnage, truck_equipment_type, timestamp
-                FROM hexagon_by_detail_dumps_2024
-                WHERE strftime('%Y', timestamp) = ?
-                UNION ALL
-                SELECT material_tonnage, truck_equipment_type, timestamp
-                FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%Y', timestamp) = ?
-            )
-        """, (str(year), str(year), str(year)))
-        
-        prod_data = cursor.fetchone()
-        total_toneladas = prod_data[0] or 0
-        tipos_equipos = prod_data[1] or 0
-        total_dumps = prod_data[2] or 0
+        # ======== KPIs PRINCIPALES ========
         
-        # Días operativos
-        cursor.execute("""
-            SELECT 
-                COUNT(DISTINCT DATE(timestamp)) as dias_operativos
-            FROM (
-                SELECT timestamp FROM hexagon_by_detail_dumps_2023 WHERE strftime('%Y', timestamp) = ?
-                UNION
-                SELECT timestamp FROM hexagon_by_detail_dumps_2024 WHERE strftime('%Y', timestamp) = ?
-                UNION
-                SELECT timestamp FROM hexagon_by_detail_dumps_2025 WHERE strftime('%Y', timestamp) = ?
+        # Producción total desde hexagon_by_detail_dumps_* (rollup diario si está al día)
+        resumen = rollups.resumen_dumps(conn, year_start, year_end)
+        if resumen is not None:
+            total_toneladas = resumen["tonelaje"]
+            tipos_equipos = resumen["tipos_equipo"]
+            total_dumps = resumen["viajes"]
+            dias_operativos = resumen["dias"] or 1
+        else:
+            dumps_sql, dumps_params = DETAIL_DUMPS.union_sql(
+                "material_tonnage, truck_equipment_type, timestamp", year_start, year_end
             )
-        """, (str(year), str(year), str(year)))
-        
-        dias_operativos = cursor.fetchone()[0] or 1
+            cursor.execute(f"""
+                SELECT 
+                    SUM(material_tonnage) as total_toneladas,
+                    COUNT(DISTINCT truck_equipment_type) as tipos_equipos,
+                    COUNT(*) as total_dumps,
+                    COUNT(DISTINCT DATE(timestamp)) as dias_operativos
+                FROM ({dumps_sql})
+            """, dumps_params)
+            
+            prod_data = cursor.fetchone()
+            total_toneladas = prod_data[0] or 0
+            tipos_equipos = prod_data[1] or 0
+            total_dumps = prod_data[2] or 0
+            dias_operativos = prod_data[3] or 1
         
         # ✅ DM y UEBD CALCULADOS desde horas reales
-        cursor.execute("""
-            WITH equipment_times_all AS (
-                SELECT timestamp, equipment_type, total, efectivo, m_correctiva, m_programada
-                FROM hexagon_by_equipment_times_2023
-                WHERE strftime('%Y', timestamp) = ?
-                UNION ALL
-                SELECT timestamp, equipment_type, total, efectivo, m_correctiva, m_programada
-                FROM hexagon_by_equipment_times_2024_p1
-                WHERE strftime('%Y', timestamp) = ?
-                UNION ALL
-                SELECT timestamp, equipment_type, total, efectivo, m_correctiva, m_programada
-                FROM hexagon_by_equipment_times_2024_p2
-                WHERE strftime('%Y', timestamp) = ?
-                UNION ALL
-                SELECT timestamp, equipment_type, total, efectivo, m_correctiva, m_programada
-                FROM hexagon_by_equipment_times_2025
-                WHERE strftime('%Y', timestamp) = ?
+        indicadores = rollups.indicadores_tiempos(conn, year_start, year_end)
+        if indicadores is not None:
+            dm_data = (
+                indicadores["dm_promedio"],
+                indicadores["uebd_promedio"],
+                indicadores["ueba_promedio"],
+                indicadores["equipos_evaluados"],
             )
-            SELECT 
-                -- DM: (Total - M.Correctiva) / Total × 100
-                ROUND(AVG(
-                    CASE WHEN total > 0 
-                    THEN ((total - COALESCE(m_correctiva, 0)) / total) * 100 
-                    ELSE NULL END
-                ), 1) as dm_promedio,
+        else:
+            times_sql, times_params = EQUIPMENT_TIMES.union_sql(
+                "timestamp, equipment_type, total, efectivo, m_correctiva, m_programada",
+                year_start, year_end
+            )
+            cursor.execute(f"""
+                WITH equipment_times_all AS (
+                    {times_sql}
+                )
+                SELECT 
+                    -- DM: (Total - M.Correctiva) / Total × 100
+                    ROUND(AVG(
+                        CASE WHEN total > 0 
+                        THEN ((total - COALESCE(m_correctiva, 0)) / total) * 100 
+                        ELSE NULL END
+                    ), 1) as dm_promedio,
                 
-                -- UEBD: Efectivo / (Total - M.Correctiva - M.Programada) × 100
-                ROUND(AVG(
-                    CASE WHEN (total - COALESCE(m_correctiva, 0) - COALESCE(m_programada, 0)) > 0
-                    THEN (efectivo / (total - COALESCE(m_correctiva, 0) - COALESCE(m_programada, 0))) * 100
-                    ELSE NULL END
-                ), 1) as uebd_promedio,
+                    -- UEBD: Efectivo / (Total - M.Correctiva - M.Programada) × 100
+                    ROUND(AVG(
+                        CASE WHEN (total - COALESCE(m_correctiva, 0) - COALESCE(m_programada, 0)) > 0
+                        THEN (efectivo / (total - COALESCE(m_correctiva, 0) - COALESCE(m_programada, 0))) * 100
+                        ELSE NULL END
+                    ), 1) as uebd_promedio,
                 
-                -- UEBA: Efectivo / Total × 100
-                ROUND(AVG(
-                    CASE WHEN total > 0
-                    THEN (efectivo / total) * 100
-                    ELSE NULL END
-                ), 1) as ueba_promedio,
+                    -- UEBA: Efectivo / Total × 100
+                    ROUND(AVG(
+                        CASE WHEN total > 0
+                        THEN (efectivo / total) * 100
+                        ELSE NULL END
+                    ), 1) as ueba_promedio,
                 
-                COUNT(DISTINCT equipment_type) as equipos_evaluados
-            FROM equipment_times_all
-            WHERE total > 0
-        """, (str(year), str(year), str(year), str(year)))
+                    COUNT(DISTINCT equipment_type) as equipos_evaluados
+                FROM equipment_times_all
+                WHERE total > 0
+            """, times_params)
         
-        dm_data = cursor.fetchone()
+            dm_data = cursor.fetchone()
         
         # Si hay datos reales, usarlos
         if dm_data and dm_data[0]:
@@ -159,44 +144,29 @@ async def get_dashboard(
             dm_contexto = "⚠️ Sin datos de horas para este período"
         
         # Operadores activos
-        cursor.execute("""
+        dumps_sql, dumps_params = DETAIL_DUMPS.union_sql(
+            "truck_operator_first_name, truck_operator_last_name", year_start, year_end,
+            where="truck_operator_first_name IS NOT NULL AND truck_operator_last_name IS NOT NULL"
+        )
+        cursor.execute(f"""
             SELECT COUNT(DISTINCT truck_operator_first_name || ' ' || truck_operator_last_name)
-            FROM (
-                SELECT truck_operator_first_name, truck_operator_last_name, timestamp
-                FROM hexagon_by_detail_dumps_2023
-                WHERE strftime('%Y', timestamp) = ?
-                UNION
-                SELECT truck_operator_first_name, truck_operator_last_name, timestamp
-                FROM hexagon_by_detail_dumps_2024
-                WHERE strftime('%Y', timestamp) = ?
-                UNION
-                SELECT truck_operator_first_name, truck_operator_last_name, timestamp
-                FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%Y', timestamp) = ?
-            )
-            WHERE truck_operator_first_name IS NOT NULL
-            AND truck_operator_last_name IS NOT NULL
-        """, (str(year), str(year), str(year)))
+            FROM ({dumps_sql})
+        """, dumps_params)
         
         operadores_activos = cursor.fetchone()[0] or 0
         
         # ======== TENDENCIAS (comparar con mes anterior) ========
         
-        cursor.execute("""
+        dumps_sql, dumps_params = DETAIL_DUMPS.union_sql("material_tonnage, timestamp")
+        cursor.execute(f"""
             SELECT 
                 strftime('%Y-%m', timestamp) as mes,
                 SUM(material_tonnage) as toneladas
-            FROM (
-                SELECT material_tonnage, timestamp FROM hexagon_by_detail_dumps_2023
-                UNION ALL
-                SELECT material_tonnage, timestamp FROM hexagon_by_detail_dumps_2024
-                UNION ALL
-                SELECT material_tonnage, timestamp FROM hexagon_by_detail_dumps_2025
-            )
+            FROM ({dumps_sql})
             GROUP BY mes
             ORDER BY mes DESC
             LIMIT 2
-        """)
+        """, dumps_params)
         
         meses_data = cursor.fetchall()
         cambio_produccion = 0
@@ -207,28 +177,23 @@ async def get_dashboard(
         
         # ======== TOP EQUIPOS POR TIPO ========
         
-        cursor.execute("""
+        dumps_sql, dumps_params = DETAIL_DUMPS.union_sql(
+            "truck_equipment_type, material_tonnage, truck_operator_first_name, truck_operator_last_name",
+            year_start, year_end,
+            where="truck_equipment_type IS NOT NULL"
+        )
+        cursor.execute(f"""
             SELECT
                 truck_equipment_type,
                 SUM(material_tonnage) as toneladas,
                 COUNT(*) as dumps,
                 ROUND(AVG(material_tonnage), 2) as ton_por_dump,
                 COUNT(DISTINCT truck_operator_first_name || ' ' || truck_operator_last_name) as operadores
-            FROM (
-                SELECT truck_equipment_type, material_tonnage, truck_operator_first_name, truck_operator_last_name
-                FROM hexagon_by_detail_dumps_2023 WHERE strftime('%Y', timestamp) = ?
-                UNION ALL
-                SELECT truck_equipment_type, material_tonnage, truck_operator_first_name, truck_operator_last_name
-                FROM hexagon_by_detail_dumps_2024 WHERE strftime('%Y', timestamp) = ?
-                UNION ALL
-                SELECT truck_equipment_type, material_tonnage, truck_operator_first_name, truck_operator_last_name
-                FROM hexagon_by_detail_dumps_2025 WHERE strftime('%Y', timestamp) = ?
-            )
-            WHERE truck_equipment_type IS NOT NULL
+            FROM ({dumps_sql})
             GROUP BY truck_equipment_type
             ORDER BY toneladas DESC
             LIMIT 10
-        """, (str(year), str(year), str(year)))
+        """, dumps_params)
         
         equipos = []
         for row in cursor.fetchall():
@@ -277,8 +242,6 @@ async def get_dashboard(
                 "fecha": datetime.now().isoformat()
             })
         
-        conn.close()
-        
         # ======== CONSTRUIR RESPUESTA ========
         
         response = {
@@ -350,53 +313,74 @@ async def get_dashboard(
         raise HTTPException(status_code=500, detail=f"Error obteniendo datos de dashboard: {str(e)}")
 
 
+@router.get("/api/dashboard")
+async def get_dashboard(
+    request: Request,
+    area: str = Query("todas", description="Área operacional"),
+    year: int = Query(2024, description="Año de datos")
+):
+    """
+    Endpoint principal del dashboard
+    Retorna KPIs, equipos y métricas operacionales CON DATOS REALES
+    """
+    return await cached_response(
+        request, "dashboard", {"area": area, "year": year},
+        lambda: get_async_db().run(_dashboard_data, area, year, request=request)
+    )
+
+
 @router.get("/api/dashboard/kpis")
-async def get_dashboard_kpis(year: int = 2024):
+async def get_dashboard_kpis(request: Request, year: int = 2024):
     """Solo KPIs sin equipos (más rápido)"""
-    full_data = await get_dashboard(area="todas", year=year)
-    return {
-        "kpis": full_data["kpis"],
-        "timestamp": full_data["timestamp"],
-        "alertas": full_data.get("alertas", [])
-    }
+    async def _kpis():
+        # Comparte la entrada de /api/dashboard (area="todas") con ese endpoint
+        entry = await get_result_cache().get_or_compute(
+            "dashboard", {"area": "todas", "year": year},
+            lambda: get_async_db().run(_dashboard_data, "todas", year, request=request)
+        )
+        full_data = entry["value"]
+        return {
+            "kpis": full_data["kpis"],
+            "timestamp": full_data["timestamp"],
+            "alertas": full_data.get("alertas", [])
+        }
+
+    return await cached_response(request, "dashboard_kpis", {"year": year}, _kpis)
 
 
 # ═══════════════════════════════════════════════════════════════
 # ✅ ENDPOINT METADATA - ÚLTIMO MES/AÑO CON DATOS
 # ═══════════════════════════════════════════════════════════════
 
-@router.get("/api/data/metadata")
-async def get_data_metadata():
-    """
-    Retorna información sobre los datos cargados:
-    - Último mes/año con datos de producción
-    - Lista de meses disponibles por año
-    - Timestamp de última actualización
-
-    Usado por Dashboard e Insights para auto-detectar el período actual.
-    """
-    conn = None
+def _data_metadata(conn: sqlite3.Connection) -> Dict:
+    """Consultas de get_data_metadata (corre en el pool de services/async_db)"""
     try:
-        conn = sqlite3.connect("minedash.db")
+        # Catálogo mantenido en la ingesta (services/data_catalog): sin escanear dumps
+        available_periods = data_catalog.available_periods(conn, "dumps")
+        last_loaded = data_catalog.last_period(conn, "dumps") if available_periods else None
+        if last_loaded is not None:
+            return {
+                "success": True,
+                "last_loaded": last_loaded,
+                "available_periods": available_periods,
+                "available_years": sorted(available_periods.keys(), reverse=True),
+                "sources": data_catalog.summary(conn)
+            }
+
         cursor = conn.cursor()
 
         # Buscar último mes/año con datos en production
-        cursor.execute("""
+        dumps_sql, dumps_params = DETAIL_DUMPS.union_sql("timestamp", where="timestamp IS NOT NULL")
+        cursor.execute(f"""
             SELECT
                 strftime('%Y', timestamp) as year,
                 strftime('%m', timestamp) as month,
                 MAX(timestamp) as last_timestamp
-            FROM (
-                SELECT timestamp FROM hexagon_by_detail_dumps_2023 WHERE timestamp IS NOT NULL
-                UNION ALL
-                SELECT timestamp FROM hexagon_by_detail_dumps_2024 WHERE timestamp IS NOT NULL
-                UNION ALL
-                SELECT timestamp FROM hexagon_by_detail_dumps_2025 WHERE timestamp IS NOT NULL
-            )
+            FROM ({dumps_sql})
             GROUP BY year, month
             ORDER BY year DESC, month DESC
             LIMIT 1
-        """)
+        """, dumps_params)
 
         row = cursor.fetchone()
 
@@ -411,19 +395,13 @@ async def get_data_metadata():
             last_timestamp = datetime.now().isoformat()
 
         # Obtener lista de meses disponibles por año
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT DISTINCT
                 strftime('%Y', timestamp) as year,
                 strftime('%m', timestamp) as month
-            FROM (
-                SELECT timestamp FROM hexagon_by_detail_dumps_2023 WHERE timestamp IS NOT NULL
-                UNION ALL
-                SELECT timestamp FROM hexagon_by_detail_dumps_2024 WHERE timestamp IS NOT NULL
-                UNION ALL
-                SELECT timestamp FROM hexagon_by_detail_dumps_2025 WHERE timestamp IS NOT NULL
-            )
+            FROM ({dumps_sql})
             ORDER BY year DESC, month DESC
-        """)
+        """, dumps_params)
 
         available_periods = {}
         for yr, mo in cursor.fetchall():
@@ -437,8 +415,6 @@ async def get_data_metadata():
         for yr in available_periods:
             available_periods[yr] = sorted(available_periods[yr])
 
-        conn.close()
-
         return {
             "success": True,
             "last_loaded": {
@@ -451,42 +427,53 @@ async def get_data_metadata():
         }
 
     except Exception as e:
-        if conn:
-            conn.close()
         import traceback
         traceback.print_exc()
-        # Fallback en caso de error
-        return {
-            "success": False,
-            "error": str(e),
-            "last_loaded": {
-                "year": 2025,
-                "month": 1,
-                "timestamp": None
-            },
-            "available_periods": {2025: [1]},
-            "available_years": [2025]
-        }
+        return _metadata_fallback(e)
+
+
+def _metadata_fallback(error: Exception) -> Dict:
+    """Fallback en caso de error"""
+    return {
+        "success": False,
+        "error": str(error),
+        "last_loaded": {
+            "year": 2025,
+            "month": 1,
+            "timestamp": None
+        },
+        "available_periods": {2025: [1]},
+        "available_years": [2025]
+    }
+
+
+@router.get("/api/data/metadata")
+async def get_data_metadata(request: Request):
+    """
+    Retorna información sobre los datos cargados:
+    - Último mes/año con datos de producción
+    - Lista de meses disponibles por año
+    - Timestamp de última actualización
+
+    Usado por Dashboard e Insights para auto-detectar el período actual.
+    """
+    try:
+        return await cached_response(
+            request, "data_metadata", None,
+            lambda: get_async_db().run(_data_metadata, request=request)
+        )
+    except sqlite3.Error as e:
+        # Base no disponible (el pool no pudo abrir la conexión)
+        return _metadata_fallback(e)
 
 
 # ═══════════════════════════════════════════════════════════════
 # ✅ ENDPOINT GAVIOTA - VERSIÓN OPTIMIZADA
 # ═══════════════════════════════════════════════════════════════
 
-@router.get("/api/dashboard/gaviota")
-async def get_gaviota(
-    fecha: Optional[str] = Query(None, description="Fecha específica YYYY-MM-DD"),
-    turno: Optional[str] = Query(None, description="Turno A, B o C")
-):
-    """
-    Análisis de Gaviota: Producción hora por hora
-    ✅ Optimizado para usar índice en timestamp
-    ✅ Rellena horas faltantes (0-11)
-    ✅ Detecta y corrige outliers usando IQR
-    """
-    conn = None
+def _gaviota_data(conn: sqlite3.Connection, fecha: Optional[str], turno: Optional[str]) -> Dict:
+    """Consultas de get_gaviota (corre en el pool de services/async_db)"""
     try:
-        conn = sqlite3.connect("minedash.db")
         cursor = conn.cursor()
 
         # 1) fecha por defecto = última con datos
@@ -502,9 +489,7 @@ async def get_gaviota(
             fecha = row[0] if row else "2024-07-15"
 
         # 2) rangos de timestamp
-        fecha_obj = datetime.strptime(fecha, "%Y-%m-%d")
-        fecha_inicio = fecha_obj.strftime("%Y-%m-%d 00:00:00")
-        fecha_fin = (fecha_obj + timedelta(days=1)).strftime("%Y-%m-%d 00:00:00")
+        fecha_inicio, fecha_fin = day_range(fecha)
 
         # normalizar y validar turno
         if turno:
@@ -515,25 +500,25 @@ async def get_gaviota(
             turno_norm = None
 
         # 3) query optimizada
-        # NOTA: hora en DB es relativa al turno (0-11)
+        # NOTA: hora en DB es relativa al turno (0-11); dim_tiempo solo acota el día por tiempo_id
         #   - Turno A: hora 0 = 08:00, hora 11 = 19:00
         #   - Turno C: hora 0 = 20:00, hora 11 = 07:00
-        query = """
+        tiempo = time_dimension.tiempo_sql(conn, "hexagon_by_kpi_hora", "k", (fecha_inicio, fecha_fin))
+        query = f"""
             SELECT 
-                hora,
-                SUM(material_tonnage) AS tonelaje,
+                k.hora,
+                SUM(k.material_tonnage) AS tonelaje,
                 COUNT(*) AS registros
-            FROM hexagon_by_kpi_hora
-            WHERE timestamp >= ?
-              AND timestamp < ?
+            FROM hexagon_by_kpi_hora k
+            WHERE {tiempo.where}
         """
-        params = [fecha_inicio, fecha_fin]
+        params = list(tiempo.params)
 
         if turno_norm:
-            query += " AND turno = ?"
+            query += " AND k.turno = ?"
             params.append(turno_norm)
 
-        query += " GROUP BY hora ORDER BY hora"
+        query += " GROUP BY k.hora ORDER BY k.hora"
 
         cursor.execute(query, params)
         rows = cursor.fetchall()
@@ -671,8 +656,21 @@ async def get_gaviota(
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error generando gaviota: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 
+@router.get("/api/dashboard/gaviota")
+async def get_gaviota(
+    request: Request,
+    fecha: Optional[str] = Query(None, description="Fecha específica YYYY-MM-DD"),
+    turno: Optional[str] = Query(None, description="Turno A, B o C")
+):
+    """
+    Análisis de Gaviota: Producción hora por hora
+    ✅ Optimizado para usar índice en timestamp
+    ✅ Rellena horas faltantes (0-11)
+    ✅ Detecta y corrige outliers usando IQR
+    """
+    return await cached_response(
+        request, "gaviota", {"fecha": fecha, "turno": turno.upper() if turno else None},
+        lambda: get_async_db().run(_gaviota_data, fecha, turno, request=request)
+    )
@@ -38,6 +38,119 @@ class Config:
     ENVIRONMENT = os.getenv("ENVIRONMENT", "production")
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     
+    # ============================================
+    # AGENTE - EJECUCIÓN DE HERRAMIENTAS
+    # ============================================
+    # Ejecutar en paralelo las tool_calls independientes de un mismo turno
+    PARALLEL_TOOL_CALLS = os.getenv("PARALLEL_TOOL_CALLS", "true").lower() == "true"
+    # Timeout por herramienta (segundos) en el modo paralelo
+    TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT", "180"))
+    # Workers de los pools de herramientas (ver core/tool_scheduler.py)
+    TOOL_IO_WORKERS = int(os.getenv("TOOL_IO_WORKERS", "8"))
+    TOOL_CPU_WORKERS = int(os.getenv("TOOL_CPU_WORKERS", "0")) or None  # None = núcleos - 1
+    # Hilos extra por carril: una herramienta que vence TOOL_CALL_TIMEOUT no se puede
+    # interrumpir y sigue ocupando su worker hasta terminar
+    TOOL_SPARE_WORKERS = int(os.getenv("TOOL_SPARE_WORKERS", "2"))
+    
+    # ============================================
+    # SANDBOX DE CÓDIGO (services/sandbox_pool.py)
+    # ============================================
+    # Procesos precalentados que ejecutan execute_python / CodeExecutor
+    SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))
+    # Reciclar un worker tras N ejecuciones o si su RSS supera este umbral
+    SANDBOX_MAX_RUNS = int(os.getenv("SANDBOX_MAX_RUNS", "50"))
+    SANDBOX_MAX_RSS_MB = int(os.getenv("SANDBOX_MAX_RSS_MB", "1024"))
+    # Límites por ejecución del agente: memoria sobre la base del worker (RLIMIT_AS)
+    # y CPU (RLIMIT_CPU, 0 = SANDBOX_CPU_TIMEOUT_RATIO × timeout de la ejecución).
+    # El límite de CPU debe quedar bajo el timeout: si no, el timeout mata al worker
+    # antes y un bucle infinito se reporta como timeout y no como limit_exceeded='cpu'
+    SANDBOX_MAX_MEMORY_MB = int(os.getenv("SANDBOX_MAX_MEMORY_MB", "2048"))
+    SANDBOX_MAX_CPU_SECONDS = float(os.getenv("SANDBOX_MAX_CPU_SECONDS", "0"))
+    SANDBOX_CPU_TIMEOUT_RATIO = float(os.getenv("SANDBOX_CPU_TIMEOUT_RATIO", "0.8"))
+    # Módulos que cada worker importa al arrancar
+    SANDBOX_PRELOAD = os.getenv("SANDBOX_PRELOAD", "pandas,numpy,matplotlib.pyplot")
+    
+    # ============================================
+    # CACHE DE DATAFRAMES (services/dataframe_cache.py)
+    # ============================================
+    DATAFRAME_CACHE_MAX_MB = int(os.getenv("DATAFRAME_CACHE_MAX_MB", "2048"))
+    # Tipos compactos al cargar (services/frame_schema.py)
+    DATAFRAME_COMPACT = os.getenv("DATAFRAME_COMPACT", "true").lower() == "true"
+    # Texto → category si valores únicos <= esta fracción de las filas
+    DATAFRAME_CATEGORY_MAX_RATIO = float(os.getenv("DATAFRAME_CATEGORY_MAX_RATIO", "0.05"))
+
+    # ============================================
+    # ROLLUPS DIARIOS (services/rollups.py)
+    # ============================================
+    # Responder consultas de día/mes desde las tablas rollup_* cuando estén al día
+    ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "true").lower() == "true"
+    # Cada cuántos segundos se vuelve a comparar la marca de agua con las tablas fuente
+    ROLLUP_FRESHNESS_TTL = float(os.getenv("ROLLUP_FRESHNESS_TTL", "300"))
+
+    # ============================================
+    # INGESTA INCREMENTAL (services/ingestion.py)
+    # ============================================
+    # Filas por lote (un lote = una transacción)
+    INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+
+    # ============================================
+    # POOL SQLITE (services/db_pool.py)
+    # ============================================
+    # Conexiones de lectura ociosas que se conservan por base de datos
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+    DB_MMAP_SIZE_MB = int(os.getenv("DB_MMAP_SIZE_MB", "256"))
+    DB_CACHE_SIZE_MB = int(os.getenv("DB_CACHE_SIZE_MB", "64"))
+    # Hilos dedicados a las consultas de los endpoints (services/async_db.py)
+    DB_ASYNC_WORKERS = int(os.getenv("DB_ASYNC_WORKERS", "4"))
+    # Cada cuántos segundos se revisa si el cliente HTTP se desconectó
+    DB_DISCONNECT_POLL = float(os.getenv("DB_DISCONNECT_POLL", "0.5"))
+
+    # ============================================
+    # CACHE DE RESULTADOS DE ENDPOINTS (services/result_cache.py)
+    # ============================================
+    RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "64"))
+
+    # ============================================
+    # CATÁLOGO DE PERÍODOS (services/data_catalog.py)
+    # ============================================
+    # Cada cuántos segundos se vuelve a comparar el catálogo con MAX(timestamp) de las tablas
+    CATALOG_FRESHNESS_TTL = float(os.getenv("CATALOG_FRESHNESS_TTL", "300"))
+
+    # ============================================
+    # DIMENSIONES OPERADOR / EQUIPO (services/dimensions.py)
+    # ============================================
+    # Cada cuántos segundos se vuelve a verificar que una tabla tenga todos sus ids resueltos
+    DIMENSIONS_FRESHNESS_TTL = float(os.getenv("DIMENSIONS_FRESHNESS_TTL", "300"))
+
+    # ============================================
+    # DIMENSIÓN DE TIEMPO (services/time_dimension.py)
+    # ============================================
+    # Mes en que parte el año fiscal (1 = año calendario)
+    TIME_DIMENSION_FISCAL_START_MONTH = int(os.getenv("TIME_DIMENSION_FISCAL_START_MONTH", "1"))
+
+    # ============================================
+    # IGM PDF (services/igm_reader.py)
+    # ============================================
+    # Al primer uso, extraer en segundo plano los IGM de data/Control de Gestion que no estén en cache
+    IGM_BACKGROUND_SCAN = os.getenv("IGM_BACKGROUND_SCAN", "true").lower() == "true"
+
+    # ============================================
+    # RESULTADOS TABULARES (tools/result_envelope.py)
+    # ============================================
+    # Decimales de las columnas float en los resultados de execute_sql / execute_python (-1 = sin redondeo)
+    RESULT_FLOAT_DECIMALS = int(os.getenv("RESULT_FLOAT_DECIMALS", "4"))
+
+    # ============================================
+    # EXECUTE_SQL DEL AGENTE (tools/sql_tool.py)
+    # ============================================
+    # Segundos máximos por consulta; al vencer se cancela con un progress handler
+    SQL_QUERY_TIMEOUT = float(os.getenv("SQL_QUERY_TIMEOUT", "30"))
+    # Tamaño aproximado máximo del resultado (se corta la lectura en streaming)
+    SQL_MAX_RESULT_KB = int(os.getenv("SQL_MAX_RESULT_KB", "2048"))
+    # Tablas grandes donde se rechaza agregar/ordenar sobre un full scan (regex, vacío = sin guardia)
+    SQL_GUARDED_TABLES = os.getenv("SQL_GUARDED_TABLES", r"hexagon_by_(detail_dumps|kpi)")
+    SQL_GUARD_MIN_ROWS = int(os.getenv("SQL_GUARD_MIN_ROWS", "200000"))
+
     @classmethod
     def validate(cls):
         """Valida que las configuraciones críticas estén presentes"""
@@ -34,7 +34,7 @@ from pathlib import Path
 
 from typing import Dict, List, Any, Optional, Tuple
 
-from openai import OpenAI  # OpenAI API
+from openai import OpenAI, AsyncOpenAI  # OpenAI API
 
 import asyncio
 
@@ -72,6 +72,14 @@ from services.igm_reader import leer_igm_mes, obtener_real_por_fase_con_fallback
 
 from services.plan_reader import PlanReader
 
+from services.hexagon_partitions import DETAIL_DUMPS, EXTRACCION_MINA_WHERE
+
+from services.date_ranges import day_range, days_range, month_range, months_range
+
+from services import data_catalog, dimensions, rollups, time_dimension
+
+from services.db_pool import get_db_pool
+
 
 
 # Importar conocimiento experto de minería
@@ -109,6 +117,8 @@ from services.hipporag_service import search_knowledge as hipporag_search
 
 from .economic_manager import EconomicParametersManager
 
+from .tool_scheduler import RENDER_LOCK, get_tool_scheduler
+
 
 
 # Importar diccionario de códigos ASARCO (si existe)
@@ -143,29 +153,23 @@ except ImportError:
 # =============================================================================
 # CACHE GLOBAL PARA DATAFRAMES PESADOS (OPTIMIZACIÓN DE RENDIMIENTO)
 # =============================================================================
-_DATAFRAME_CACHE = {}
-
 def get_cached_dataframe(file_path: str, sheet_name: str = None) -> 'pd.DataFrame':
     """
     Carga un DataFrame desde Excel con cache en memoria.
     La primera carga es lenta, las siguientes son instantáneas.
-    """
-    import pandas as pd
-    from pathlib import Path
-
-    cache_key = f"{file_path}:{sheet_name}"
 
-    if cache_key not in _DATAFRAME_CACHE:
-        print(f"   [CACHE] Cargando {Path(file_path).name}...")
-        if sheet_name:
-            _DATAFRAME_CACHE[cache_key] = pd.read_excel(file_path, sheet_name=sheet_name)
-        else:
-            _DATAFRAME_CACHE[cache_key] = pd.read_excel(file_path)
-        print(f"   [CACHE] {Path(file_path).name} cargado ({len(_DATAFRAME_CACHE[cache_key]):,} filas)")
-    else:
-        print(f"   [CACHE] Usando cache para {Path(file_path).name}")
+    Usa el DataFrameCache compartido (presupuesto de memoria + LRU +
+    invalidación por mtime) sobre el sidecar Parquet del workbook. Retorna una vista superficial: se pueden
+    agregar/reemplazar columnas pero no modificar valores in-place.
+    """
+    from services.dataframe_cache import get_dataframe_cache
+    from services.excel_sidecar import read_excel_columnar
 
-    return _DATAFRAME_CACHE[cache_key].copy()
+    return get_dataframe_cache().get(
+        file_path,
+        sheet_name,
+        loader=lambda: read_excel_columnar(file_path, sheet_name)
+    )
 
 
 
@@ -381,6 +385,14 @@ class MineDashAgent:
 
         )
 
+        # Cliente async para streaming: los chunks se leen con `async for`
+        # sin bloquear el event loop de uvicorn (ver chat_stream)
+        self.async_client = AsyncOpenAI(
+            api_key=openai_api_key,
+            max_retries=3,
+            timeout=300.0
+        )
+
 
 
         # Límite de tokens para contexto (250K para GPT-5.1 - OpenAI enforces 272K server-side)
@@ -425,6 +437,13 @@ class MineDashAgent:
 
         self.last_tool_results = {}
 
+        # Ejecución concurrente de tool_calls independientes (ver _execute_tool_calls)
+        from config import Config
+        self.parallel_tool_calls = Config.PARALLEL_TOOL_CALLS
+        self.tool_call_timeout = Config.TOOL_CALL_TIMEOUT
+        # Pools IO/CPU compartidos para sacar las herramientas del event loop
+        self.tool_scheduler = get_tool_scheduler()
+
 
 
         # User-specific configuration
@@ -477,9 +496,37 @@ class MineDashAgent:
 
         # Inicializar herramientas
 
-        self.sql_tool = SQLTool(db_path)
+        float_decimals = Config.RESULT_FLOAT_DECIMALS if Config.RESULT_FLOAT_DECIMALS >= 0 else None
+
+        self.sql_tool = SQLTool(
+
+            db_path,
+
+            float_decimals=float_decimals,
+
+            timeout=Config.SQL_QUERY_TIMEOUT,
+
+            max_bytes=Config.SQL_MAX_RESULT_KB * 1024,
+
+            guarded_tables=Config.SQL_GUARDED_TABLES or None,
 
-        self.code_executor = CodeExecutor(self.code_dir)
+            guard_min_rows=Config.SQL_GUARD_MIN_ROWS
+
+        )
+
+        self.code_executor = CodeExecutor(
+
+            self.code_dir,
+
+            max_memory_mb=Config.SANDBOX_MAX_MEMORY_MB,
+
+            max_cpu_seconds=Config.SANDBOX_MAX_CPU_SECONDS or None,
+
+            float_decimals=float_decimals,
+
+            cpu_timeout_ratio=Config.SANDBOX_CPU_TIMEOUT_RATIO
+
+        )
 
         self.chart_generator = ChartGenerator(self.charts_dir)
 
@@ -720,6 +767,16 @@ class MineDashAgent:
 
                    ORDER BY concepto
 
+                FORMATO DEL RESULTADO (columnar): columns, dtypes, data {columna: [valores]},
+
+                row_count, truncated y preview (primeras filas como registros).
+
+                LÍMITES: cada consulta se cancela a los 30 s por defecto. Agregar (SUM/COUNT/GROUP BY)
+
+                u ordenar sobre hexagon_by_detail_dumps_* o hexagon_by_kpi_hora completas se rechaza:
+
+                filtrar siempre por rango de timestamp o equipment_id.
+
                 """,
 
                 "input_schema": {
@@ -2473,7 +2530,7 @@ RETORNA:
 
                             "type": "integer",
 
-                            "description": "Mes 1-12 (default: mes actual)"
+                            "description": "Mes 1-12 (default: último mes con datos cargados)"
 
                         },
 
@@ -2481,7 +2538,7 @@ RETORNA:
 
                             "type": "string",
 
-                            "description": "Fecha corte YYYY-MM-DD (default: hoy)"
+                            "description": "Fecha corte YYYY-MM-DD (default: último día con datos del mes, o hoy)"
 
                         }
 
@@ -2629,7 +2686,7 @@ RETORNA: 10 filas de ejemplo, opcionalmente filtradas.""",
                         },
                         "where_clause": {
                             "type": "string",
-                            "description": "Filtro SQL opcional (ej: \"DATE(timestamp) = '2025-02-28'\")"
+                            "description": "Filtro SQL opcional (ej: \"timestamp >= '2025-02-28' AND timestamp < '2025-03-01'\")"
                         },
                         "limit": {
                             "type": "integer",
@@ -3324,11 +3381,18 @@ NUNCA:
 
 
 
-                    for tool_call in message.tool_calls:
-
-                        tool_name = tool_call.function.name
+                    # Ejecutar todas las tool_calls del turno (concurrentes cuando son
+                    # independientes); los resultados vuelven en el orden original
+                    parsed_calls = [
+                        (tc.function.name, json.loads(tc.function.arguments))
+                        for tc in message.tool_calls
+                    ]
+                    print(f"   >> Ejecutando {len(parsed_calls)} herramienta(s)...")
+                    batch_results = await self._execute_tool_calls(parsed_calls)
 
-                        tool_input = json.loads(tool_call.function.arguments)
+                    for tool_call, (tool_name, tool_input), tool_result in zip(
+                        message.tool_calls, parsed_calls, batch_results
+                    ):
 
                         tool_id = tool_call.id
 
@@ -3346,13 +3410,6 @@ NUNCA:
 
 
 
-                        # Ejecutar herramienta
-
-                        print(f"   >> Ejecutando herramienta...")
-
-                        tool_result = await self._execute_tool(tool_name, tool_input)
-
-
                         # Guardar herramienta usada CON su resultado para fallback
                         tools_used.append({"name": tool_name, "result": tool_result})
 
@@ -3915,7 +3972,7 @@ NUNCA:
 
             try:
 
-                conn = sqlite3.connect(self.db_path)
+                conn = get_db_pool(self.db_path).connect()
 
                 cursor = conn.cursor()
 
@@ -4053,6 +4110,151 @@ NUNCA:
 
 
 
+    # =========================================================================
+    # EJECUCIÓN CONCURRENTE DE TOOL_CALLS
+    # =========================================================================
+
+    # Herramientas que leen resultados previos del mismo turno (last_tool_results),
+    # escriben estado o dependen del event loop principal: corren en serie
+    # DESPUÉS del lote paralelo
+    SEQUENTIAL_TOOLS = {
+        "generate_chart",
+        "generate_report",
+        "search_knowledge",
+        "aprender_informacion",
+        "update_economic_parameters",
+    }
+
+    # Herramientas que dibujan con matplotlib.pyplot (estado global del proceso, no
+    # thread-safe): pueden correr en paralelo con las demás pero no entre ellas, en
+    # ninguna sesión (RENDER_LOCK es uno por proceso)
+    RENDER_TOOLS = {
+        "generate_chart",
+        "generate_report",
+        "get_ranking_operadores",
+        "obtener_analisis_gaviota",
+        "analizar_match_pala_camion",
+    }
+
+    # Herramientas dominadas por CPU (pandas, gráficos, parsing PDF): carril "cpu"
+    # del ToolScheduler. El resto (SQLite, lectura de archivos) usa el carril "io"
+    CPU_TOOLS = {
+        "execute_python",
+        "generate_chart",
+        "generate_report",
+        "get_ranking_operadores",
+        "analizar_relevos",
+        "obtener_cumplimiento_tonelaje",
+        "obtener_analisis_gaviota",
+        "analisis_causalidad_waterfall",
+        "obtener_comparacion_gaviotas",
+        "obtener_analisis_causal_operador",
+        "analizar_match_pala_camion",
+        "analizar_tendencia_mes",
+    }
+
+    # Herramientas que hacen await de objetos ligados al event loop principal
+    LOOP_BOUND_TOOLS = {
+        "search_knowledge",
+    }
+
+    def _run_tool_in_thread(self, tool_name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Ejecuta _execute_tool en un event loop propio dentro de un hilo de trabajo"""
+        if tool_name in self.RENDER_TOOLS:
+            # Una herramienta que venció su timeout sigue dibujando con el lock tomado:
+            # no esperar indefinidamente detrás de ella
+            if not RENDER_LOCK.acquire(timeout=self.tool_call_timeout):
+                return {
+                    "success": False,
+                    "error": f"{tool_name}: otro gráfico en curso no terminó en {self.tool_call_timeout:.0f}s"
+                }
+            try:
+                return asyncio.run(self._execute_tool(tool_name, tool_input))
+            finally:
+                RENDER_LOCK.release()
+        return asyncio.run(self._execute_tool(tool_name, tool_input))
+
+    async def _dispatch_tool(self, tool_name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Ejecuta una herramienta en el carril del ToolScheduler que le corresponde"""
+        if tool_name in self.LOOP_BOUND_TOOLS:
+            return await self._execute_tool(tool_name, tool_input)
+        lane = "cpu" if tool_name in self.CPU_TOOLS else "io"
+        return await self.tool_scheduler.run(lane, self._run_tool_in_thread, tool_name, tool_input)
+
+    async def _execute_tool_calls(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Ejecuta todas las tool_calls de un turno del LLM.
+
+        Las llamadas independientes corren en paralelo, cada una con timeout
+        propio (Config.TOOL_CALL_TIMEOUT); las de SEQUENTIAL_TOOLS se ejecutan
+        después, en orden. Los resultados se retornan en el mismo orden que
+        `calls` para reensamblarlos por tool_call_id.
+
+        El timeout solo deja de esperar: el hilo de la herramienta no se puede
+        interrumpir y sigue ocupando su worker (y RENDER_LOCK) hasta terminar.
+        Los carriles reservan Config.TOOL_SPARE_WORKERS hilos para esos casos
+        (ver core/tool_scheduler.py, métrica "abandoned_running").
+
+        Args:
+            calls: Lista de (tool_name, tool_input)
+
+        Returns:
+            Lista de resultados alineada con `calls`
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+        done = set()
+
+        def _store(idx: int, result: Dict[str, Any]):
+            results[idx] = result
+            done.add(idx)
+            # Disponible para herramientas dependientes del mismo turno (generate_chart)
+            if isinstance(result, dict) and result.get("success"):
+                self.last_tool_results[calls[idx][0]] = result
+
+        parallel_idx = []
+        if self.parallel_tool_calls and len(calls) > 1:
+            parallel_idx = [
+                i for i, (name, _) in enumerate(calls)
+                if name not in self.SEQUENTIAL_TOOLS
+            ]
+            if len(parallel_idx) < 2:
+                parallel_idx = []
+
+        if parallel_idx:
+            print(f"   [PARALLEL] {len(parallel_idx)} herramientas en paralelo "
+                  f"(timeout {self.tool_call_timeout:.0f}s c/u)")
+
+            async def _run(idx: int) -> Dict[str, Any]:
+                tool_name, tool_input = calls[idx]
+                try:
+                    return await asyncio.wait_for(
+                        self._dispatch_tool(tool_name, tool_input),
+                        timeout=self.tool_call_timeout
+                    )
+                except asyncio.TimeoutError:
+                    return {
+                        "success": False,
+                        "error": f"Timeout: {tool_name} excedió {self.tool_call_timeout:.0f}s",
+                        "timeout": True
+                    }
+                except Exception as e:
+                    return {"success": False, "error": str(e)}
+
+            parallel_results = await asyncio.gather(*(_run(i) for i in parallel_idx))
+            for idx, result in zip(parallel_idx, parallel_results):
+                _store(idx, result)
+
+        for idx, (tool_name, tool_input) in enumerate(calls):
+            if idx not in done:
+                _store(idx, await self._dispatch_tool(tool_name, tool_input))
+
+        return results
+
+
+
     async def _execute_tool(
 
         self,
@@ -4071,7 +4273,21 @@ NUNCA:
 
             if tool_name == "execute_sql":
 
-                result = self.sql_tool.execute(tool_input["query"])
+                # Sobre columnar (tools/result_envelope.py): columnas una sola vez
+
+                result = self.sql_tool.execute_columnar(tool_input["query"])
+
+                if "error" in result:
+
+                    return {
+
+                        "success": False,
+
+                        "error": result["error"],
+
+                        "query": result.get("query")
+
+                    }
 
                 return {
 
@@ -4105,7 +4321,7 @@ NUNCA:
 
                 
 
-                # Ejecutar con subprocess (mas estable en Windows)
+                # Ejecutar en un worker precalentado del sandbox (equivale a `python code_file`)
 
                 print(f"[TIMEOUT] Timeout configurado: {timeout_seconds}s")
 
@@ -4115,27 +4331,27 @@ NUNCA:
 
                 try:
 
-                    import subprocess
+                    result = self.code_executor.run_script(code_file, self.code_dir, timeout_seconds)
 
-                    result = subprocess.run(
+                    
 
-                        ["python", str(code_file)],
+                    if result.get('timeout'):
 
-                        capture_output=True,
+                        print(f"[TIMEOUT] Timeout de {timeout_seconds}s excedido")
 
-                        text=True,
+                        return {
 
-                        timeout=timeout_seconds,
+                            "success": False,
 
-                        cwd=str(self.code_dir)
+                            "error": f"Timeout de {timeout_seconds}s excedido"
 
-                    )
+                        }
 
                     
 
-                    if result.returncode == 0:
+                    if result.get('returncode') == 0:
 
-                        output = result.stdout
+                        output = result['stdout']
 
                         print(f" Ejecución exitosa")
 
@@ -4189,13 +4405,17 @@ NUNCA:
 
                             "code_file": str(code_file),
 
-                            "file_path": file_path_to_return  # ← AGREGAR file_path si se generó gráfico
+                            "file_path": file_path_to_return,  # ← AGREGAR file_path si se generó gráfico
+
+                            "resources": result.get('resources')
 
                         }
 
                     else:
 
-                        error = result.stderr
+                        # 'error' solo viene si el worker cortó la ejecución (límite, caída)
+
+                        error = result.get('error') or result.get('stderr', '')
 
                         print(f" Error en ejecución: {error[:200]}")
 
@@ -4209,18 +4429,6 @@ NUNCA:
 
                         
 
-                except subprocess.TimeoutExpired:
-
-                    print(f"[TIMEOUT] Timeout de {timeout_seconds}s excedido")
-
-                    return {
-
-                        "success": False,
-
-                        "error": f"Timeout de {timeout_seconds}s excedido"
-
-                    }
-
                 except Exception as e:
 
                     print(f" Error inesperado: {e}")
@@ -4320,7 +4528,7 @@ NUNCA:
                                         db_file = Path(__file__).parent.parent / "minedash.db"
 
                                     if db_file.exists():
-                                        conn = sqlite3.connect(str(db_file))
+                                        conn = get_db_pool(str(db_file)).connect()
                                         cursor = conn.cursor()
 
                                         # Query para obtener producción real del mes desde dumps
@@ -4337,9 +4545,9 @@ NUNCA:
                                             query_real = f"""
                                                 SELECT SUM(material_tonnage) as real_ton
                                                 FROM {dumps_table}
-                                                WHERE strftime('%Y', timestamp) = ? AND strftime('%m', timestamp) = ?
+                                                WHERE timestamp >= ? AND timestamp < ?
                                             """
-                                            cursor.execute(query_real, (str(year), f"{mes:02d}"))
+                                            cursor.execute(query_real, month_range(year, mes))
                                             result = cursor.fetchone()
                                             real_ton = float(result[0]) if result and result[0] else 0
 
@@ -4805,7 +5013,7 @@ NUNCA:
 
                         # Para otros tipos de gráficos, intentar encontrar data en últimas herramientas
 
-                        for tool_name_key in ["analisis_gaviota", "obtener_ranking_operadores", "match_pala_camion"]:
+                        for tool_name_key in ["analisis_gaviota", "obtener_ranking_operadores", "match_pala_camion", "execute_sql"]:
 
                             if tool_name_key in self.last_tool_results:
 
@@ -5334,7 +5542,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                 try:
 
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
 
                     
 
@@ -5344,31 +5552,32 @@ Necesitas analisis detallado de alguna fase especifica?
 
                     if mes_completo:
 
-                        fecha_inicio = fecha_obj.replace(day=1).strftime("%Y-%m-%d")
+                        fecha_inicio, fecha_fin = month_range(fecha_obj.year, fecha_obj.month)
 
-                        if fecha_obj.month == 12:
+                    else:
 
-                            fecha_fin = fecha_obj.replace(year=fecha_obj.year + 1, month=1, day=1).strftime("%Y-%m-%d")
+                        fecha_inicio, fecha_fin = day_range(fecha_obj)
 
-                        else:
+                    # Día por clave entera desde dim_tiempo (tiempo_id de la hora de descarga)
 
-                            fecha_fin = fecha_obj.replace(month=fecha_obj.month + 1, day=1).strftime("%Y-%m-%d")
+                    tiempo = time_dimension.tiempo_sql(
 
-                    else:
+                        conn, "hexagon_by_detail_dumps_2025", "d", (fecha_inicio, fecha_fin)
 
-                        fecha_inicio = fecha
+                    )
 
-                        fecha_fin = (fecha_obj + timedelta(days=1)).strftime("%Y-%m-%d")
 
                     
 
-                    query = """
+                    query = f"""
 
                     WITH clasificacion_registros AS (
 
                         SELECT 
 
-                            DATE(dump_start_time) as fecha,
+                            {tiempo.fecha_id} as fecha_id,
+
+                            {tiempo.fecha} as fecha,
 
                             truck_equipment_name as equipo,
 
@@ -5392,7 +5601,9 @@ Necesitas analisis detallado de alguna fase especifica?
 
                             END as tipo_registro
 
-                        FROM hexagon_by_detail_dumps_2025
+                        FROM hexagon_by_detail_dumps_2025 d
+
+                        {tiempo.join}
 
                         WHERE truck_equipment_type LIKE '%KOM930E%'
 
@@ -5406,9 +5617,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         AND truck_operator_last_name != 'nan'
 
-                        AND DATE(dump_start_time) >= ?
-
-                        AND DATE(dump_start_time) < ?
+                        AND {tiempo.where}
 
                     ),
 
@@ -5418,6 +5627,8 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         SELECT 
 
+                            fecha_id,
+
                             fecha,
 
                             equipo,
@@ -5464,7 +5675,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         WHERE tipo_registro IN ('AUTOMATICO', 'MANUAL')
 
-                        GROUP BY fecha, equipo, turno, grupo, operador
+                        GROUP BY fecha_id, equipo, turno, grupo, operador
 
                     ),
 
@@ -5474,7 +5685,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         SELECT 
 
-                            fecha,
+                            fecha_id,
 
                             equipo,
 
@@ -5494,7 +5705,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         WHERE horas_operador > 0.1
 
-                        GROUP BY fecha, equipo, turno
+                        GROUP BY fecha_id, equipo, turno
 
                         HAVING COUNT(DISTINCT operador) > 1
 
@@ -5506,7 +5717,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         SELECT 
 
-                            fecha,
+                            fecha_id,
 
                             turno,
 
@@ -5524,7 +5735,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         WHERE horas_operador > 0.1
 
-                        GROUP BY fecha, turno
+                        GROUP BY fecha_id, turno
 
                     ),
 
@@ -5580,7 +5791,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                                     ' RELEVO (' || 
 
-                                    ROW_NUMBER() OVER (PARTITION BY b.fecha, b.equipo, b.turno ORDER BY b.hora_inicio) || 
+                                    ROW_NUMBER() OVER (PARTITION BY b.fecha_id, b.equipo, b.turno ORDER BY b.hora_inicio) || 
 
                                     ' de ' || r.num_operadores || ')'
 
@@ -5636,7 +5847,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         LEFT JOIN relevos_detectados r
 
-                            ON b.fecha = r.fecha
+                            ON b.fecha_id = r.fecha_id
 
                             AND b.equipo = r.equipo
 
@@ -5644,7 +5855,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         LEFT JOIN promedios_circuito p
 
-                            ON b.fecha = p.fecha
+                            ON b.fecha_id = p.fecha_id
 
                             AND b.turno = p.turno
 
@@ -5706,7 +5917,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                     
 
-                    params_query = [fecha_inicio, fecha_fin]
+                    params_query = list(tiempo.params)
 
                     
 
@@ -5992,7 +6203,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                     try:
 
-                        conn = sqlite3.connect(self.db_path)
+                        conn = get_db_pool(self.db_path).connect()
 
                         cursor = conn.cursor()
 
@@ -6032,15 +6243,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         if mes:
 
-                            fecha_inicio = f"{year}-{mes:02d}-01"
-
-                            if mes == 12:
-
-                                fecha_fin = f"{year+1}-01-01"
-
-                            else:
-
-                                fecha_fin = f"{year}-{mes+1:02d}-01"
+                            fecha_inicio, fecha_fin = month_range(year, mes)
 
                             periodo = f"{['enero','febrero','marzo','abril','mayo','junio','julio','agosto','septiembre','octubre','noviembre','diciembre'][mes-1]} {year}"
 
@@ -6054,47 +6257,19 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         
 
-                        cursor.execute("""
-
-                            SELECT SUM(material_tonnage) as tonelaje_real
-
-                            FROM (
-
-                                SELECT material_tonnage FROM hexagon_by_detail_dumps_2023
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                                    AND blast_type = 'Blast'
-
-                                    AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')
-
-                                UNION ALL
-
-                                SELECT material_tonnage FROM hexagon_by_detail_dumps_2024
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                                    AND blast_type = 'Blast'
-
-                                    AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')
-
-                                UNION ALL
-
-                                SELECT material_tonnage FROM hexagon_by_detail_dumps_2025
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                                    AND blast_type = 'Blast'
-
-                                    AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')
-
+                        desde_rollup = rollups.tonelaje_dumps(conn, fecha_inicio, fecha_fin, extraccion_mina=True)
+                        if desde_rollup is not None:
+                            volumen_real = desde_rollup[0]
+                        else:
+                            dumps_sql, dumps_params = DETAIL_DUMPS.union_sql(
+                                "material_tonnage", fecha_inicio, fecha_fin,
+                                where=EXTRACCION_MINA_WHERE
                             )
-
-                        """, [fecha_inicio, fecha_fin] * 3)
-
-                        
-
-                        volumen_real = float(cursor.fetchone()[0] or 0)
+                            cursor.execute(f"""
+                                SELECT SUM(material_tonnage) as tonelaje_real
+                                FROM ({dumps_sql})
+                            """, dumps_params)
+                            volumen_real = float(cursor.fetchone()[0] or 0)
 
                         
 
@@ -6456,7 +6631,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         from datetime import datetime
 
-                        conn = sqlite3.connect(self.db_path)
+                        conn = get_db_pool(self.db_path).connect()
 
                         cursor = conn.cursor()
 
@@ -6464,15 +6639,7 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         # Calcular rangos de fecha
 
-                        fecha_inicio = f"{year}-{mes:02d}-01"
-
-                        if mes == 12:
-
-                            fecha_fin = f"{year+1}-01-01"
-
-                        else:
-
-                            fecha_fin = f"{year}-{mes+1:02d}-01"
+                        fecha_inicio, fecha_fin = month_range(year, mes)
 
 
 
@@ -6480,55 +6647,23 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         print(f"   [SEARCH] Consultando extracción desde BD...")
 
-                        cursor.execute("""
-
-                            SELECT
-
-                                SUM(material_tonnage) as tonelaje_total,
-
-                                COUNT(*) as total_viajes
-
-                            FROM (
-
-                                SELECT material_tonnage FROM hexagon_by_detail_dumps_2023
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                                    AND blast_type = 'Blast'
-
-                                    AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')
-
-                                UNION ALL
-
-                                SELECT material_tonnage FROM hexagon_by_detail_dumps_2024
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                                    AND blast_type = 'Blast'
-
-                                    AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')
-
-                                UNION ALL
-
-                                SELECT material_tonnage FROM hexagon_by_detail_dumps_2025
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                                    AND blast_type = 'Blast'
-
-                                    AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')
-
+                        desde_rollup = rollups.tonelaje_dumps(conn, fecha_inicio, fecha_fin, extraccion_mina=True)
+                        if desde_rollup is not None:
+                            tonelaje_total, total_viajes = desde_rollup
+                        else:
+                            dumps_sql, dumps_params = DETAIL_DUMPS.union_sql(
+                                "material_tonnage", fecha_inicio, fecha_fin,
+                                where=EXTRACCION_MINA_WHERE
                             )
-
-                        """, [fecha_inicio, fecha_fin] * 3)
-
-
-
-                        result_total = cursor.fetchone()
-
-                        tonelaje_total = float(result_total[0]) if result_total and result_total[0] else 0.0
-
-                        total_viajes = result_total[1] if result_total else 0
+                            cursor.execute(f"""
+                                SELECT
+                                    SUM(material_tonnage) as tonelaje_total,
+                                    COUNT(*) as total_viajes
+                                FROM ({dumps_sql})
+                            """, dumps_params)
+                            result_total = cursor.fetchone()
+                            tonelaje_total = float(result_total[0]) if result_total and result_total[0] else 0.0
+                            total_viajes = result_total[1] if result_total else 0
 
 
 
@@ -6538,41 +6673,19 @@ Necesitas analisis detallado de alguna fase especifica?
 
                         # CONSULTA 2: DÍAS OPERATIVOS
 
-                        cursor.execute("""
-
-                            SELECT COUNT(DISTINCT DATE(timestamp)) as dias
-
-                            FROM (
-
-                                SELECT timestamp FROM hexagon_by_kpi_hora
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                                UNION
-
-                                SELECT timestamp FROM hexagon_by_detail_dumps_2023
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                                UNION
-
-                                SELECT timestamp FROM hexagon_by_detail_dumps_2024
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                                UNION
-
-                                SELECT timestamp FROM hexagon_by_detail_dumps_2025
-
-                                WHERE timestamp >= ? AND timestamp < ?
-
-                            )
-
-                        """, [fecha_inicio, fecha_fin] * 4)
-
-
-
-                        dias_operativos = cursor.fetchone()[0] or 0
+                        dias_operativos = rollups.dias_operativos(conn, fecha_inicio, fecha_fin)
+                        if dias_operativos is None:
+                            dumps_sql, dumps_params = DETAIL_DUMPS.union_sql("timestamp", fecha_inicio, fecha_fin)
+                            cursor.execute(f"""
+                                SELECT COUNT(DISTINCT DATE(timestamp)) as dias
+                                FROM (
+                                    SELECT timestamp FROM hexagon_by_kpi_hora
+                                    WHERE timestamp >= ? AND timestamp < ?
+                                    UNION ALL
+                                    {dumps_sql}
+                                )
+                            """, [fecha_inicio, fecha_fin] + dumps_params)
+                            dias_operativos = cursor.fetchone()[0] or 0
 
                         conn.close()
 
@@ -6933,21 +7046,13 @@ Necesitas analisis detallado de alguna fase especifica?
 
                 try:
 
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
 
                     cursor = conn.cursor()
 
                     
 
-                    fecha_inicio = f"{year}-{mes:02d}-01"
-
-                    if mes == 12:
-
-                        fecha_fin = f"{year+1}-01-01"
-
-                    else:
-
-                        fecha_fin = f"{year}-{mes+1:02d}-01"
+                    fecha_inicio, fecha_fin = month_range(year, mes)
 
                     
 
@@ -7623,7 +7728,7 @@ Plotly.newPlot('plotly-chart', plotlyData.data, plotlyData.layout, {{responsive:
                     # Agrupar por código ASARCO (excluyendo código 1 = producción)
                     df_demoras = df_estados_dia[df_estados_dia['code'] != 1]
 
-                    demoras_por_codigo = df_demoras.groupby(['code', 'razon']).agg({
+                    demoras_por_codigo = df_demoras.groupby(['code', 'razon'], observed=True).agg({
                         'horas': 'sum'
                     }).reset_index()
                     demoras_por_codigo = demoras_por_codigo.sort_values('horas', ascending=False)
@@ -7894,7 +7999,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                     # Obtener producción real del día desde hexagon_by_kpi_hora - SOLO CAMIONES
 
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
 
                     cursor = conn.cursor()
 
@@ -7908,11 +8013,15 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                     # 1. Solo camiones (KOM930, CAT-777)
 
-                    # 2. hora = hora dentro del turno (0-11)
+                    # 2. hora = hora dentro del turno (0-11), columnas turno/hora de la tabla
+
+                    #    (dim_tiempo solo acota el día por tiempo_id)
 
                     # 3. Usar MAX por equipo para evitar duplicación
 
-                    cursor.execute("""
+                    tiempo = time_dimension.tiempo_sql(conn, "hexagon_by_kpi_hora", "k", day_range(fecha))
+
+                    cursor.execute(f"""
 
                         SELECT
 
@@ -7926,21 +8035,21 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             SELECT
 
-                                turno,
+                                k.turno,
 
-                                hora,
+                                k.hora,
 
-                                equipment_id,
+                                k.equipment_id,
 
-                                MAX(material_tonnage) as max_tonelaje
+                                MAX(k.material_tonnage) as max_tonelaje
 
-                            FROM hexagon_by_kpi_hora
+                            FROM hexagon_by_kpi_hora k
 
-                            WHERE DATE(timestamp) = ?
+                            WHERE {tiempo.where}
 
-                              AND (equipment_type LIKE 'KOM930%' OR equipment_type LIKE 'CAT-777%')
+                              AND (k.equipment_type LIKE 'KOM930%' OR k.equipment_type LIKE 'CAT-777%')
 
-                            GROUP BY turno, hora, equipment_id
+                            GROUP BY k.turno, k.hora, k.equipment_id
 
                         )
 
@@ -7948,7 +8057,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                         ORDER BY turno, hora
 
-                    """, (fecha,))
+                    """, tiempo.params)
 
 
 
@@ -8120,13 +8229,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             # Mapear hora turno a hora del día para visualización
 
-                            if turno == 'A':
-
-                                hora_dia = 8 + hora_turno
-
-                            else:  # Turno C
-
-                                hora_dia = (20 + hora_turno) % 24
+                            hora_dia = time_dimension.hora_dia(turno, hora_turno)
 
 
 
@@ -8198,11 +8301,17 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             hora_turno = brecha['hora_turno']
 
+                            # Día por tiempo_id; turno y hora (0-11) de las columnas de la tabla
+
+                            tiempo_dia = time_dimension.tiempo_sql(conn, "hexagon_by_kpi_hora", "", day_range(fecha))
+
+                            params_hora = (*tiempo_dia.params, turno, hora_turno)
+
 
 
                             # 1. Estadisticas de DM y UEBD para esta hora especifica
 
-                            query_dm_uebd = """
+                            query_dm_uebd = f"""
 
                             SELECT
 
@@ -8218,7 +8327,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             FROM hexagon_by_kpi_hora
 
-                            WHERE DATE(timestamp) = ?
+                            WHERE {tiempo_dia.where}
 
                             AND turno = ?
 
@@ -8230,7 +8339,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
 
 
-                            cursor.execute(query_dm_uebd, (fecha, turno, hora_turno))
+                            cursor.execute(query_dm_uebd, params_hora)
 
                             dm_uebd_result = cursor.fetchone()
 
@@ -8238,27 +8347,27 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             # Estadisticas promedio del turno completo (para comparacion)
 
-                            query_turno_avg = """
+                            query_turno_avg = f"""
 
                             SELECT
 
-                                AVG(CASE WHEN nominal > 0 THEN (disponible * 100.0 / nominal) ELSE 0 END) as dm_turno,
+                                AVG(CASE WHEN k.nominal > 0 THEN (k.disponible * 100.0 / k.nominal) ELSE 0 END) as dm_turno,
 
-                                AVG(CASE WHEN disponible > 0 THEN (efectivo * 100.0 / disponible) ELSE 0 END) as uebd_turno
+                                AVG(CASE WHEN k.disponible > 0 THEN (k.efectivo * 100.0 / k.disponible) ELSE 0 END) as uebd_turno
 
-                            FROM hexagon_by_kpi_hora
+                            FROM hexagon_by_kpi_hora k
 
-                            WHERE DATE(timestamp) = ?
+                            WHERE {tiempo.where}
 
-                            AND turno = ?
+                            AND k.turno = ?
 
-                            AND (equipment_type LIKE 'KOM930%' OR equipment_type LIKE 'CAT-777%')
+                            AND (k.equipment_type LIKE 'KOM930%' OR k.equipment_type LIKE 'CAT-777%')
 
                             """
 
 
 
-                            cursor.execute(query_turno_avg, (fecha, turno))
+                            cursor.execute(query_turno_avg, (*tiempo.params, turno))
 
                             turno_avg_result = cursor.fetchone()
 
@@ -8266,7 +8375,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             # 2. Equipos por rendimiento en esta hora (tonelaje)
 
-                            query_equipos_rendimiento = """
+                            query_equipos_rendimiento = f"""
 
                             SELECT
 
@@ -8280,7 +8389,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             FROM hexagon_by_kpi_hora
 
-                            WHERE DATE(timestamp) = ?
+                            WHERE {tiempo_dia.where}
 
                             AND turno = ?
 
@@ -8298,7 +8407,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
 
 
-                            cursor.execute(query_equipos_rendimiento, (fecha, turno, hora_turno))
+                            cursor.execute(query_equipos_rendimiento, params_hora)
 
                             equipos_bajo_rendimiento = cursor.fetchall()
 
@@ -8306,7 +8415,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             # 3. Equipos problematicos (DM baja)
 
-                            query_equipos_problema = """
+                            query_equipos_problema = f"""
 
                             SELECT
 
@@ -8320,7 +8429,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             FROM hexagon_by_kpi_hora
 
-                            WHERE DATE(timestamp) = ?
+                            WHERE {tiempo_dia.where}
 
                             AND turno = ?
 
@@ -8342,7 +8451,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
 
 
-                            cursor.execute(query_equipos_problema, (fecha, turno, hora_turno))
+                            cursor.execute(query_equipos_problema, params_hora)
 
                             equipos_problema = cursor.fetchall()
 
@@ -8350,7 +8459,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             # 4. Resumen de tiempos de demora
 
-                            query_delays = """
+                            query_delays = f"""
 
                             SELECT
 
@@ -8364,7 +8473,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
                             FROM hexagon_by_kpi_hora
 
-                            WHERE DATE(timestamp) = ?
+                            WHERE {tiempo_dia.where}
 
                             AND turno = ?
 
@@ -8376,7 +8485,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
 
 
 
-                            cursor.execute(query_delays, (fecha, turno, hora_turno))
+                            cursor.execute(query_delays, params_hora)
 
                             delays_result = cursor.fetchone()
 
@@ -8807,7 +8916,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
                                 SUM(tonelaje) as total_ton,
                                 COUNT(*) as n_viajes
                             FROM hexagon_dumps
-                            WHERE DATE(fecha) = ?
+                            WHERE fecha >= ? AND fecha < ?
                               AND turno = ?
                               AND operador IS NOT NULL
                               AND operador != 'nan nan'
@@ -8815,7 +8924,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
                             GROUP BY equipo, operador
                             ORDER BY total_ton DESC
                             LIMIT 5
-                        """, (fecha, turno))
+                        """, (*day_range(fecha), turno))
                         mejores = cursor.fetchall()
 
                         # Peores operadores (con actividad pero bajo tonelaje)
@@ -8826,7 +8935,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
                                 SUM(tonelaje) as total_ton,
                                 COUNT(*) as n_viajes
                             FROM hexagon_dumps
-                            WHERE DATE(fecha) = ?
+                            WHERE fecha >= ? AND fecha < ?
                               AND turno = ?
                               AND operador IS NOT NULL
                               AND operador != 'nan nan'
@@ -8835,7 +8944,7 @@ El gráfico waterfall muestra la cascada desde el PLAN hasta el REAL, con el imp
                             HAVING n_viajes >= 4
                             ORDER BY total_ton ASC
                             LIMIT 5
-                        """, (fecha, turno))
+                        """, (*day_range(fecha), turno))
                         peores = cursor.fetchall()
 
                         analisis_operadores[turno] = {
@@ -9290,7 +9399,7 @@ Puedo profundizar en cualquiera de estos aspectos:
                 print(f"    Buscando dias con criterio: {criterio} en mes {mes}/{year}")
 
                 try:
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
                     cursor = conn.cursor()
 
                     # Obtener plan diario desde plan_reader
@@ -9312,16 +9421,20 @@ Puedo profundizar en cualquiera de estos aspectos:
                     print(f"    [PLAN] Plan mensual: {plan_mensual:,.0f} ton, Plan diario: {plan_diario:,.0f} ton")
 
                     # Buscar produccion real por dia
-                    cursor.execute("""
-                        SELECT DATE(timestamp) as fecha, SUM(material_tonnage) as real_dia
-                        FROM hexagon_by_detail_dumps_2025
-                        WHERE CAST(strftime('%m', timestamp) AS INTEGER) = ?
-                        AND CAST(strftime('%Y', timestamp) AS INTEGER) = ?
-                        GROUP BY DATE(timestamp) ORDER BY fecha
-                    """, (mes, year))
+                    filas_dia = rollups.tonelaje_dumps_por_dia(conn, *month_range(year, mes))
+                    if filas_dia is None:
+                        dumps_sql, dumps_params = DETAIL_DUMPS.union_sql(
+                            "timestamp, material_tonnage", *month_range(year, mes)
+                        )
+                        cursor.execute(f"""
+                            SELECT DATE(timestamp) as fecha, SUM(material_tonnage) as real_dia
+                            FROM ({dumps_sql})
+                            GROUP BY DATE(timestamp) ORDER BY fecha
+                        """, dumps_params)
+                        filas_dia = cursor.fetchall()
 
                     dias = []
-                    for row in cursor.fetchall():
+                    for row in filas_dia:
                         fecha = row[0]
                         real = float(row[1]) if row[1] else 0
                         cumplimiento = (real / plan_diario * 100) if plan_diario > 0 else 0
@@ -9437,7 +9550,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                 try:
                     # PRIMERO: Intentar desde BD
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
                     cursor = conn.cursor()
 
                     # Verificar si existe la tabla
@@ -9447,9 +9560,9 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
                     if tabla_existe:
                         # Construir filtro de fechas
                         if mes_inicio and mes_fin:
-                            fecha_filtro = f"AND CAST(strftime('%m', fecha) AS INTEGER) BETWEEN {mes_inicio} AND {mes_fin}"
+                            rango_fecha = months_range(year, mes_inicio, mes_fin)
                         else:
-                            fecha_filtro = ""
+                            rango_fecha = months_range(year, 1, 12)
 
                         query = f"""
                             SELECT
@@ -9460,15 +9573,14 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
                                 SUM(horas) as total_horas,
                                 COUNT(*) as eventos
                             FROM hexagon_estados
-                            WHERE CAST(strftime('%Y', fecha) AS INTEGER) = ?
+                            WHERE fecha >= ? AND fecha < ?
                             AND code NOT IN (1.0, 1, '1.0', '1')
                             AND UPPER(razon) NOT LIKE '%PRODUCCION%'
-                            {fecha_filtro}
                             GROUP BY code, estado, categoria, razon
                             ORDER BY total_horas DESC
                             LIMIT 20
                         """
-                        cursor.execute(query, [year])
+                        cursor.execute(query, list(rango_fecha))
 
                         for row in cursor.fetchall():
                             horas = float(row[4])
@@ -9662,21 +9774,13 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                 try:
 
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
 
 
 
                     # Calcular fechas
 
-                    fecha_inicio = f"{year}-{mes:02d}-01"
-
-                    if mes == 12:
-
-                        fecha_fin = f"{year+1}-01-01"
-
-                    else:
-
-                        fecha_fin = f"{year}-{mes+1:02d}-01"
+                    fecha_inicio, fecha_fin = month_range(year, mes)
 
 
 
@@ -9920,7 +10024,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                 try:
 
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
 
                     cursor = conn.cursor()
 
@@ -9930,15 +10034,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                     if mes:
 
-                        fecha_inicio = f"{year}-{mes:02d}-01"
-
-                        if mes == 12:
-
-                            fecha_fin = f"{year+1}-01-01"
-
-                        else:
-
-                            fecha_fin = f"{year}-{mes+1:02d}-01"
+                        fecha_inicio, fecha_fin = month_range(year, mes)
 
                         fecha_filtro_dumps = f"AND timestamp >= '{fecha_inicio}' AND timestamp < '{fecha_fin}'"
 
@@ -9960,13 +10056,47 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
 
 
+                    # Identidad del operador: operador_id de dim_operador (services/dimensions) si la tabla
+
+                    # ya tiene los ids resueltos; si no, apellido como antes
+
+                    usar_ids = dimensions.ids_ready(conn, "hexagon_by_detail_dumps_2025", "operador_id")
+
+                    if usar_ids:
+
+                        candidatos = dict(dimensions.buscar_operadores(conn, operador) or [])
+
+                        columna_operador = "operador_id"
+
+                        filtro_busqueda = f"operador_id IN ({', '.join('?' * len(candidatos)) or 'NULL'})"
+
+                        params_busqueda = list(candidatos)
+
+                    else:
+
+                        candidatos = {}
+
+                        columna_operador = "truck_operator_last_name"
+
+                        filtro_busqueda = "truck_operator_last_name LIKE ?"
+
+                        params_busqueda = [f"%{operador}%"]
+
+                    # Camiones en estados: flota CE por equipo_id (o prefijo si no está resuelto)
+
+                    filtro_caex, params_caex = dimensions.filtro_equipos(
+
+                        conn, "hexagon_by_estados_2024_2025", "e", flota="CE"
+
+                    )
+
                     # Query 1: Identificar al operador y su grupo
 
                     cursor.execute(f"""
 
                         SELECT
 
-                            truck_operator_last_name as operador,
+                            {columna_operador} as operador,
 
                             CASE
 
@@ -9990,17 +10120,17 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                         FROM hexagon_by_detail_dumps_2025
 
-                        WHERE truck_operator_last_name LIKE '%{operador}%'
+                        WHERE {filtro_busqueda}
 
                         {fecha_filtro_dumps}
 
-                        GROUP BY truck_operator_last_name
+                        GROUP BY {columna_operador}
 
                         ORDER BY tonelaje_total DESC
 
                         LIMIT 1
 
-                    """)
+                    """, params_busqueda)
 
 
 
@@ -10022,7 +10152,9 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
 
 
-                    nombre_completo = operador_row[0]
+                    clave_operador = operador_row[0]
+
+                    nombre_completo = candidatos.get(clave_operador, clave_operador)
 
                     grupo_operador = operador_row[1]
 
@@ -10046,11 +10178,11 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                         FROM hexagon_by_detail_dumps_2025
 
-                        WHERE truck_operator_last_name = '{nombre_completo}'
+                        WHERE {columna_operador} = ?
 
                         {fecha_filtro_dumps}
 
-                    """)
+                    """, (clave_operador,))
 
 
 
@@ -10074,11 +10206,11 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                         FROM hexagon_by_detail_dumps_2025
 
-                        WHERE truck_operator_last_name = '{nombre_completo}'
+                        WHERE {columna_operador} = ?
 
                         {fecha_filtro_dumps}
 
-                    """)
+                    """, (clave_operador,))
 
                     fechas_trabajo = [row[0] for row in cursor.fetchall()]
 
@@ -10110,7 +10242,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                             WHERE DATE(e.timestamp) IN ('{fechas_str}')
 
-                            AND e.equipment_id LIKE 'CE%'
+                            {filtro_caex}
 
                             AND (
 
@@ -10128,7 +10260,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                             LIMIT {top_delays * 2}
 
-                        """)
+                        """, params_caex)
 
 
 
@@ -10172,7 +10304,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                             SUM(e.horas) as total_horas,
 
-                            (SELECT COUNT(DISTINCT truck_operator_last_name)
+                            (SELECT COUNT(DISTINCT {columna_operador})
 
                              FROM hexagon_by_detail_dumps_2025
 
@@ -10182,7 +10314,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                         FROM hexagon_by_estados_2024_2025 e
 
-                        WHERE e.equipment_id LIKE 'CE%'
+                        WHERE 1=1{filtro_caex}
 
                         {fecha_filtro_estados}
 
@@ -10202,7 +10334,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                         LIMIT 10
 
-                    """)
+                    """, params_caex)
 
 
 
@@ -10226,7 +10358,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                         SELECT
 
-                            truck_operator_last_name as operador,
+                            {columna_operador} as operador,
 
                             SUM(material_tonnage) as ton_total
 
@@ -10246,7 +10378,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                         )
 
-                        GROUP BY truck_operator_last_name
+                        GROUP BY {columna_operador}
 
                         ORDER BY ton_total DESC
 
@@ -10262,7 +10394,7 @@ El dia con **mejor cumplimiento** fue **{destacado['fecha']}** con **{destacado[
 
                     for i, row in enumerate(ranking_grupo):
 
-                        if row[0] == nombre_completo:
+                        if row[0] == clave_operador:
 
                             posicion_ranking = i + 1
 
@@ -11040,16 +11172,22 @@ para investigacion operacional, no como evidencia concluyente.
 
 
 
+                # Sin mes/fecha de corte: último período cargado según el catálogo
+                ultimo = self._ultimo_periodo_cargado() if not (mes and fecha_corte_str) else None
                 if not mes:
-
-                    mes = datetime.now().month
-
-
+                    if ultimo:
+                        mes = ultimo["month"]
+                        if "year" not in tool_input:
+                            year = ultimo["year"]
+                    else:
+                        mes = datetime.now().month
 
                 if fecha_corte_str:
 
                     fecha_corte = datetime.strptime(fecha_corte_str, '%Y-%m-%d')
 
+                elif ultimo and (ultimo["year"], ultimo["month"]) == (year, mes):
+                    fecha_corte = datetime.strptime(ultimo["timestamp"][:10], '%Y-%m-%d')
                 else:
 
                     fecha_corte = datetime.now()
@@ -11118,7 +11256,7 @@ para investigacion operacional, no como evidencia concluyente.
 
 
 
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
 
                     cursor = conn.cursor()
 
@@ -11130,59 +11268,25 @@ para investigacion operacional, no como evidencia concluyente.
 
                     fecha_fin = f"{year}-{mes:02d}-{dia_corte:02d}"
 
+                    # Rango semiabierto [inicio, día siguiente al corte) para usar el índice de timestamp
 
+                    fecha_fin_excl = (datetime(year, mes, dia_corte) + timedelta(days=1)).strftime("%Y-%m-%d")
 
-                    cursor.execute(f"""
 
-                        SELECT
-
-                            SUM(material_tonnage) as real_acumulado,
-
-                            COUNT(*) as viajes
-
-                        FROM (
-
-                            SELECT material_tonnage, timestamp
-
-                            FROM hexagon_by_detail_dumps_2023
-
-                            WHERE DATE(timestamp) >= ? AND DATE(timestamp) <= ?
-
-                                AND blast_type = 'Blast'
-
-                                AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')
-
-                            UNION ALL
-
-                            SELECT material_tonnage, timestamp
-
-                            FROM hexagon_by_detail_dumps_2024
-
-                            WHERE DATE(timestamp) >= ? AND DATE(timestamp) <= ?
-
-                                AND blast_type = 'Blast'
-
-                                AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')
-
-                            UNION ALL
-
-                            SELECT material_tonnage, timestamp
-
-                            FROM hexagon_by_detail_dumps_2025
-
-                            WHERE DATE(timestamp) >= ? AND DATE(timestamp) <= ?
-
-                                AND blast_type = 'Blast'
-
-                                AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')
 
+                    result_real = rollups.tonelaje_dumps(conn, fecha_inicio, fecha_fin_excl, extraccion_mina=True)
+                    if result_real is None:
+                        dumps_sql, dumps_params = DETAIL_DUMPS.union_sql(
+                            "material_tonnage, timestamp", fecha_inicio, fecha_fin_excl,
+                            where=EXTRACCION_MINA_WHERE
                         )
-
-                    """, [fecha_inicio, fecha_fin] * 3)
-
-
-
-                    result_real = cursor.fetchone()
+                        cursor.execute(f"""
+                            SELECT
+                                SUM(material_tonnage) as real_acumulado,
+                                COUNT(*) as viajes
+                            FROM ({dumps_sql})
+                        """, dumps_params)
+                        result_real = cursor.fetchone()
 
                     real_acumulado = float(result_real[0]) if result_real and result_real[0] else 0
 
@@ -11192,37 +11296,27 @@ para investigacion operacional, no como evidencia concluyente.
 
                     # CAPACIDAD MÁXIMA INSTALADA
 
-                    cursor.execute(f"""
-
-                        SELECT MAX(tonelaje_dia) as mejor_dia
-
-                        FROM (
-
-                            SELECT DATE(timestamp) as fecha, SUM(material_tonnage) as tonelaje_dia
-
+                    tonelaje_por_dia = rollups.tonelaje_total_por_dia(conn, fecha_inicio, fecha_fin_excl)
+                    if tonelaje_por_dia is not None:
+                        mejor_dia = (max((t for _, t in tonelaje_por_dia if t), default=None),)
+                    else:
+                        dumps_sql, dumps_params = DETAIL_DUMPS.union_sql(
+                            "material_tonnage, timestamp", fecha_inicio, fecha_fin_excl
+                        )
+                        cursor.execute(f"""
+                            SELECT MAX(tonelaje_dia) as mejor_dia
                             FROM (
-
-                                SELECT material_tonnage, timestamp FROM hexagon_by_kpi_hora
-
-                                WHERE DATE(timestamp) >= ? AND DATE(timestamp) <= ?
-
-                                UNION ALL
-
-                                SELECT material_tonnage, timestamp FROM hexagon_by_detail_dumps_2025
-
-                                WHERE DATE(timestamp) >= ? AND DATE(timestamp) <= ?
-
+                                SELECT DATE(timestamp) as fecha, SUM(material_tonnage) as tonelaje_dia
+                                FROM (
+                                    SELECT material_tonnage, timestamp FROM hexagon_by_kpi_hora
+                                    WHERE timestamp >= ? AND timestamp < ?
+                                    UNION ALL
+                                    {dumps_sql}
+                                )
+                                GROUP BY DATE(timestamp)
                             )
-
-                            GROUP BY DATE(timestamp)
-
-                        )
-
-                    """, [fecha_inicio, fecha_fin] * 2)
-
-
-
-                    mejor_dia = cursor.fetchone()
+                        """, [fecha_inicio, fecha_fin_excl] + dumps_params)
+                        mejor_dia = cursor.fetchone()
 
                     capacidad_max_diaria = float(mejor_dia[0]) if mejor_dia and mejor_dia[0] else plan_diario * 1.15
 
@@ -11358,7 +11452,7 @@ para investigacion operacional, no como evidencia concluyente.
 
                         FROM hexagon_estados
 
-                        WHERE DATE(fecha) >= ? AND DATE(fecha) <= ?
+                        WHERE fecha >= ? AND fecha < ?
 
                         GROUP BY code, estado, categoria, razon
 
@@ -11366,7 +11460,7 @@ para investigacion operacional, no como evidencia concluyente.
 
                         LIMIT 3
 
-                    """, [fecha_inicio, fecha_fin])
+                    """, [fecha_inicio, fecha_fin_excl])
 
 
 
@@ -11396,9 +11490,9 @@ para investigacion operacional, no como evidencia concluyente.
 
                         FROM hexagon_equipment_times
 
-                        WHERE DATE(time) >= ? AND DATE(time) <= ? AND total > 0
+                        WHERE time >= ? AND time < ? AND total > 0
 
-                    """, [fecha_inicio, fecha_fin])
+                    """, [fecha_inicio, fecha_fin_excl])
 
 
 
@@ -11436,9 +11530,9 @@ para investigacion operacional, no como evidencia concluyente.
 
                         FROM hexagon_equipment_times
 
-                        WHERE DATE(time) >= ? AND DATE(time) <= ? AND total > 0
+                        WHERE time >= ? AND time < ? AND total > 0
 
-                    """, [fecha_inicio, fecha_fin])
+                    """, [fecha_inicio, fecha_fin_excl])
 
 
 
@@ -11844,7 +11938,7 @@ para investigacion operacional, no como evidencia concluyente.
 
                 try:
 
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
 
                     cursor = conn.cursor()
 
@@ -12171,7 +12265,7 @@ para investigacion operacional, no como evidencia concluyente.
             elif tool_name == "get_database_schema":
                 try:
                     table_name = tool_input["table_name"]
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
                     cursor = conn.cursor()
 
                     # Obtener esquema
@@ -12221,7 +12315,7 @@ para investigacion operacional, no como evidencia concluyente.
                     where_clause = tool_input.get("where_clause", "")
                     limit = min(tool_input.get("limit", 10), 50)
 
-                    conn = sqlite3.connect(self.db_path)
+                    conn = get_db_pool(self.db_path).connect()
                     cursor = conn.cursor()
 
                     cols_str = ", ".join(columns) if columns != ["*"] else "*"
@@ -12257,7 +12351,7 @@ para investigacion operacional, no como evidencia concluyente.
 
                     # Tablas de la base de datos
                     if category in ["all", "database"]:
-                        conn = sqlite3.connect(self.db_path)
+                        conn = get_db_pool(self.db_path).connect()
                         cursor = conn.cursor()
                         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
                         tables = [r[0] for r in cursor.fetchall()]
@@ -12672,10 +12766,11 @@ para investigacion operacional, no como evidencia concluyente.
                 # STREAMING: Procesar respuesta en tiempo real
                 yield {"type": "status", "content": "Generando respuesta..."}
 
-                # Crear el stream
-                stream = await asyncio.to_thread(
-                    self.client.chat.completions.create,
-                    **api_params
+                # Crear el stream con el cliente async: la lectura de chunks
+                # no bloquea el event loop para el resto de los usuarios
+                stream = await asyncio.wait_for(
+                    self.async_client.chat.completions.create(**api_params),
+                    timeout=120.0
                 )
 
                 # Acumuladores para el streaming
@@ -12684,34 +12779,42 @@ para investigacion operacional, no como evidencia concluyente.
                 has_tool_use = False
 
                 # Procesar cada chunk del stream
-                for chunk in stream:
-                    if not chunk.choices:
-                        continue
-                    delta = chunk.choices[0].delta
-
-                    # Procesar contenido de texto - ENVIAR EN TIEMPO REAL
-                    if delta.content:
-                        accumulated_content += delta.content
-                        yield {"type": "text", "content": delta.content}
-
-                    # Procesar tool_calls (vienen en chunks)
-                    if delta.tool_calls:
-                        has_tool_use = True
-                        for tc in delta.tool_calls:
-                            idx = tc.index
-                            if idx not in accumulated_tool_calls:
-                                accumulated_tool_calls[idx] = {
-                                    "id": tc.id or "",
-                                    "name": tc.function.name if tc.function and tc.function.name else "",
-                                    "arguments": ""
-                                }
-                            else:
-                                if tc.id:
-                                    accumulated_tool_calls[idx]["id"] = tc.id
-                                if tc.function and tc.function.name:
-                                    accumulated_tool_calls[idx]["name"] = tc.function.name
-                            if tc.function and tc.function.arguments:
-                                accumulated_tool_calls[idx]["arguments"] += tc.function.arguments
+                # BACKPRESSURE: este generador solo pide el siguiente chunk cuando
+                # el consumidor SSE pidió el evento anterior; si el navegador lee
+                # lento, el socket HTTP con OpenAI deja de drenarse (sin buffers
+                # intermedios creciendo en memoria)
+                try:
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+
+                        # Procesar contenido de texto - ENVIAR EN TIEMPO REAL
+                        if delta.content:
+                            accumulated_content += delta.content
+                            yield {"type": "text", "content": delta.content}
+
+                        # Procesar tool_calls (vienen en chunks)
+                        if delta.tool_calls:
+                            has_tool_use = True
+                            for tc in delta.tool_calls:
+                                idx = tc.index
+                                if idx not in accumulated_tool_calls:
+                                    accumulated_tool_calls[idx] = {
+                                        "id": tc.id or "",
+                                        "name": tc.function.name if tc.function and tc.function.name else "",
+                                        "arguments": ""
+                                    }
+                                else:
+                                    if tc.id:
+                                        accumulated_tool_calls[idx]["id"] = tc.id
+                                    if tc.function and tc.function.name:
+                                        accumulated_tool_calls[idx]["name"] = tc.function.name
+                                if tc.function and tc.function.arguments:
+                                    accumulated_tool_calls[idx]["arguments"] += tc.function.arguments
+                finally:
+                    # Si el cliente se desconecta (GeneratorExit) cerrar la conexión con OpenAI
+                    await stream.close()
 
                 # Crear objeto message simulado para compatibilidad
                 class StreamedMessage:
@@ -12776,36 +12879,29 @@ para investigacion operacional, no como evidencia concluyente.
 
 
 
-                    for tool_call in message.tool_calls:
-
-                        tool_name = tool_call.function.name
-
-                        tool_input = json.loads(tool_call.function.arguments)
-
-                        tool_id = tool_call.id
-
-                        # EVENTO: tool_start - Mostrar qué herramienta se está usando
-
-                        tool_description = self._get_tool_description(tool_name, tool_input)
+                    parsed_calls = [
+                        (tc.function.name, json.loads(tc.function.arguments))
+                        for tc in message.tool_calls
+                    ]
 
+                    # EVENTO: tool_start - Mostrar qué herramientas se están usando
+                    # (se anuncian todas antes porque el lote se ejecuta en paralelo)
+                    for tool_name, tool_input in parsed_calls:
                         yield {
-
                             "type": "tool_start",
-
                             "name": tool_name,
-
                             "params": tool_input,
-
-                            "description": tool_description
-
+                            "description": self._get_tool_description(tool_name, tool_input)
                         }
 
+                    # Ejecutar herramientas; resultados en el orden original de tool_call_id
+                    batch_results = await self._execute_tool_calls(parsed_calls)
 
+                    for tool_call, (tool_name, tool_input), tool_result in zip(
+                        message.tool_calls, parsed_calls, batch_results
+                    ):
 
-                        # Ejecutar herramienta
-
-                        tool_result = await self._execute_tool(tool_name, tool_input)
-
+                        tool_id = tool_call.id
 
                         # Guardar herramienta usada CON su resultado para fallback
                         tools_used.append({"name": tool_name, "result": tool_result})
@@ -13059,7 +13155,7 @@ para investigacion operacional, no como evidencia concluyente.
 
         elif tool_name == "execute_sql":
 
-            rows = len(result.get("rows", []))
+            rows = result.get("data", {}).get("row_count", 0)
 
             return f"Consulta ejecutada: {rows} registros"
 
@@ -13223,12 +13319,18 @@ para investigacion operacional, no como evidencia concluyente.
 
         try:
 
-            conn = sqlite3.connect(self.db_path)
+            conn = get_db_pool(self.db_path).connect()
 
             cursor = conn.cursor()
 
 
 
+            # Rango semiabierto [fecha_inicio, fecha_fin + 1 día)
+
+            rango = list(days_range(fecha_inicio, fecha_fin))
+
+
+
             # Disponibilidad Mecánica promedio
 
             cursor.execute("""
@@ -13239,9 +13341,9 @@ para investigacion operacional, no como evidencia concluyente.
 
                 FROM hexagon_equipment_times
 
-                WHERE DATE(time) >= ? AND DATE(time) <= ?
+                WHERE time >= ? AND time < ?
 
-            """, [fecha_inicio, fecha_fin])
+            """, rango)
 
 
 
@@ -13265,9 +13367,9 @@ para investigacion operacional, no como evidencia concluyente.
 
                 FROM hexagon_equipment_times
 
-                WHERE DATE(time) >= ? AND DATE(time) <= ? AND total > 0
+                WHERE time >= ? AND time < ? AND total > 0
 
-            """, [fecha_inicio, fecha_fin])
+            """, rango)
 
 
 
@@ -13287,11 +13389,11 @@ para investigacion operacional, no como evidencia concluyente.
 
                 FROM hexagon_equipment_times
 
-                WHERE DATE(time) >= ? AND DATE(time) <= ?
+                WHERE time >= ? AND time < ?
 
                     AND total > 0
 
-            """, [fecha_inicio, fecha_fin])
+            """, rango)
 
 
 
@@ -13359,6 +13461,19 @@ para investigacion operacional, no como evidencia concluyente.
 
 
 
+    def _ultimo_periodo_cargado(self, source: str = "dumps") -> Optional[Dict[str, Any]]:
+        """Último año/mes con datos según services/data_catalog (None si no está al día)"""
+        try:
+            conn = get_db_pool(self.db_path).connect()
+            try:
+                return data_catalog.last_period(conn, source)
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+
+
+
     def add_temporary_document(self, filename: str, content_data: dict):
 
         """
@@ -5,12 +5,13 @@ Permite 3 métodos: Chat Natural, Excel Upload, API Direct
 """
 
 import pandas as pd
-import sqlite3
 from datetime import datetime
 from typing import Dict, List, Optional, Union
 import json
 import re
 
+from services.db_pool import get_db_pool
+
 
 class EconomicParametersManager:
     """Gestor de parámetros económicos con múltiples métodos de actualización"""
@@ -21,24 +22,21 @@ class EconomicParametersManager:
     
     def _ensure_table_exists(self):
         """Crear tabla si no existe"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS economic_parameters (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                parameter_name TEXT NOT NULL UNIQUE,
-                parameter_value REAL NOT NULL,
-                unit TEXT,
-                description TEXT,
-                source TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with get_db_pool(self.db_path).write() as conn:
+            cursor = conn.cursor()
+        
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS economic_parameters (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    parameter_name TEXT NOT NULL UNIQUE,
+                    parameter_value REAL NOT NULL,
+                    unit TEXT,
+                    description TEXT,
+                    source TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
     
     # ==========================================================================
     # MÉTODO 1: ACTUALIZACIÓN VIA CHAT NATURAL
@@ -278,64 +276,61 @@ class EconomicParametersManager:
         Returns:
             Dict con resultado
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            # Verificar si existe
-            cursor.execute(
-                "SELECT id FROM economic_parameters WHERE parameter_name = ?",
-                (parameter_name,)
-            )
-            exists = cursor.fetchone() is not None
+        with get_db_pool(self.db_path).write() as conn:
+            cursor = conn.cursor()
+        
+            try:
+                # Verificar si existe
+                cursor.execute(
+                    "SELECT id FROM economic_parameters WHERE parameter_name = ?",
+                    (parameter_name,)
+                )
+                exists = cursor.fetchone() is not None
             
-            if exists:
-                # UPDATE
-                cursor.execute("""
-                    UPDATE economic_parameters
-                    SET parameter_value = ?,
-                        unit = ?,
-                        description = ?,
-                        source = ?,
-                        updated_at = ?
-                    WHERE parameter_name = ?
-                """, (value, unit, description, source, datetime.now(), parameter_name))
+                if exists:
+                    # UPDATE
+                    cursor.execute("""
+                        UPDATE economic_parameters
+                        SET parameter_value = ?,
+                            unit = ?,
+                            description = ?,
+                            source = ?,
+                            updated_at = ?
+                        WHERE parameter_name = ?
+                    """, (value, unit, description, source, datetime.now(), parameter_name))
                 
-                action = "actualizado"
-            else:
-                # INSERT
-                cursor.execute("""
-                    INSERT INTO economic_parameters 
-                    (parameter_name, parameter_value, unit, description, source, updated_at, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (parameter_name, value, unit, description, source, datetime.now(), datetime.now()))
+                    action = "actualizado"
+                else:
+                    # INSERT
+                    cursor.execute("""
+                        INSERT INTO economic_parameters 
+                        (parameter_name, parameter_value, unit, description, source, updated_at, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (parameter_name, value, unit, description, source, datetime.now(), datetime.now()))
                 
-                action = "creado"
+                    action = "creado"
             
-            conn.commit()
+                conn.commit()
             
-            return {
-                "success": True,
-                "action": action,
-                "parameter": {
-                    "name": parameter_name,
-                    "value": value,
-                    "unit": unit,
-                    "description": description,
-                    "source": source
-                },
-                "message": f" Parámetro '{parameter_name}' {action}: {value} {unit}"
-            }
-        
-        except Exception as e:
-            conn.rollback()
-            return {
-                "success": False,
-                "message": f"Error: {str(e)}"
-            }
+                return {
+                    "success": True,
+                    "action": action,
+                    "parameter": {
+                        "name": parameter_name,
+                        "value": value,
+                        "unit": unit,
+                        "description": description,
+                        "source": source
+                    },
+                    "message": f" Parámetro '{parameter_name}' {action}: {value} {unit}"
+                }
         
-        finally:
-            conn.close()
+            except Exception as e:
+                conn.rollback()
+                return {
+                    "success": False,
+                    "message": f"Error: {str(e)}"
+                }
     
     def update_batch(self, parameters: List[Dict]) -> Dict:
         """
@@ -375,7 +370,7 @@ class EconomicParametersManager:
     
     def get_parameter(self, parameter_name: str) -> Optional[Dict]:
         """Obtiene un parámetro específico"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_db_pool(self.db_path).connect()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -400,7 +395,7 @@ class EconomicParametersManager:
     
     def get_all_parameters(self) -> List[Dict]:
         """Obtiene todos los parámetros"""
-        conn = sqlite3.connect(self.db_path)
+        conn = get_db_pool(self.db_path).connect()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -426,36 +421,33 @@ class EconomicParametersManager:
     
     def delete_parameter(self, parameter_name: str) -> Dict:
         """Elimina un parámetro"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute(
-                "DELETE FROM economic_parameters WHERE parameter_name = ?",
-                (parameter_name,)
-            )
-            conn.commit()
+        with get_db_pool(self.db_path).write() as conn:
+            cursor = conn.cursor()
+        
+            try:
+                cursor.execute(
+                    "DELETE FROM economic_parameters WHERE parameter_name = ?",
+                    (parameter_name,)
+                )
+                conn.commit()
             
-            if cursor.rowcount > 0:
-                return {
-                    "success": True,
-                    "message": f" Parámetro '{parameter_name}' eliminado"
-                }
-            else:
+                if cursor.rowcount > 0:
+                    return {
+                        "success": True,
+                        "message": f" Parámetro '{parameter_name}' eliminado"
+                    }
+                else:
+                    return {
+                        "success": False,
+                        "message": f"️  Parámetro '{parameter_name}' no existe"
+                    }
+        
+            except Exception as e:
+                conn.rollback()
                 return {
                     "success": False,
-                    "message": f"️  Parámetro '{parameter_name}' no existe"
+                    "message": f"Error: {str(e)}"
                 }
-        
-        except Exception as e:
-            conn.rollback()
-            return {
-                "success": False,
-                "message": f"Error: {str(e)}"
-            }
-        
-        finally:
-            conn.close()
 
 
 # =============================================================================
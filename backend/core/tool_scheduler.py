@@ -0,0 +1,186 @@
+"""
+MineDash AI v2.0 - Tool Scheduler
+Ejecución de herramientas del agente fuera del event loop
+
+Las ramas de MineDashAgent._execute_tool son síncronas (sqlite3, pandas,
+matplotlib, pdfplumber). Si se ejecutan directamente en el event loop de
+uvicorn, una sola herramienta pesada congela los dashboards y el streaming
+del resto de usuarios. Este módulo las ejecuta en pools acotados:
+
+- Carril "io":  consultas SQLite y lectura de archivos (más workers)
+- Carril "cpu": agregaciones pandas, gráficos, parsing de PDF (≈ núcleos)
+
+Cada carril expone métricas: profundidad de cola, en ejecución,
+completadas, errores y tiempos medios de espera/ejecución.
+
+Timeouts: asyncio.wait_for sobre run() deja de esperar, pero un hilo no se
+puede interrumpir. La herramienta sigue corriendo hasta terminar y mantiene
+ocupado su worker (y RENDER_LOCK si dibuja). Esas ejecuciones se cuentan
+como "abandoned" y cada carril tiene spare_workers hilos extra para que
+unas pocas herramientas colgadas no dejen sin workers al resto.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+# matplotlib.pyplot guarda la figura actual y rcParams a nivel de proceso:
+# toda herramienta que dibuja (de cualquier sesión) debe tomar este lock
+RENDER_LOCK = threading.RLock()
+
+
+class _Lane:
+    """Pool de hilos acotado con contadores de cola y ejecución"""
+
+    def __init__(self, name: str, max_workers: int, spare_workers: int = 0):
+        self.name = name
+        self.max_workers = max_workers
+        self.spare_workers = spare_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers + spare_workers,
+            thread_name_prefix=f"tool-{name}"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.abandoned = 0
+        self.abandoned_running = 0
+        self.max_queue_depth = 0
+        self.total_wait_s = 0.0
+        self.total_run_s = 0.0
+
+    def _invoke(self, fn: Callable, args: tuple, kwargs: dict, submitted_at: float, state: dict) -> Any:
+        started_at = time.perf_counter()
+        with self._lock:
+            state["started"] = True
+            self.queued -= 1
+            self.running += 1
+            self.total_wait_s += started_at - submitted_at
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self.running -= 1
+                state["finished"] = True
+                if state["abandoned"]:
+                    self.abandoned_running -= 1
+                self.completed += 1
+                if not ok:
+                    self.failed += 1
+                self.total_run_s += time.perf_counter() - started_at
+
+    def _on_done(self, future):
+        # Cancelada antes de empezar (timeout mientras esperaba en cola)
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+                self.cancelled += 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        state = {"started": False, "finished": False, "abandoned": False}
+        future = self.executor.submit(self._invoke, fn, args, kwargs, time.perf_counter(), state)
+        future.add_done_callback(self._on_done)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Timeout/cancelación con la herramienta ya corriendo: el hilo sigue hasta terminar
+            with self._lock:
+                if state["started"] and not state["finished"]:
+                    state["abandoned"] = True
+                    self.abandoned += 1
+                    self.abandoned_running += 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = max(self.completed, 1)
+            return {
+                "max_workers": self.max_workers,
+                "spare_workers": self.spare_workers,
+                "queue_depth": self.queued,
+                "max_queue_depth": self.max_queue_depth,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "abandoned": self.abandoned,
+                "abandoned_running": self.abandoned_running,
+                "avg_wait_ms": round(self.total_wait_s / finished * 1000, 1),
+                "avg_run_ms": round(self.total_run_s / finished * 1000, 1),
+            }
+
+
+class ToolScheduler:
+    """
+    Planificador de herramientas con carriles IO y CPU separados
+
+    Uso:
+        scheduler = get_tool_scheduler()
+        result = await scheduler.run("cpu", funcion_bloqueante, arg1, arg2)
+    """
+
+    LANES = ("io", "cpu")
+
+    def __init__(self, io_workers: int = 8, cpu_workers: int = None, spare_workers: int = 2):
+        cpu_workers = cpu_workers or max(2, (os.cpu_count() or 2) - 1)
+        self.lanes = {
+            "io": _Lane("io", io_workers, spare_workers),
+            "cpu": _Lane("cpu", cpu_workers, spare_workers),
+        }
+        print(f"OK ToolScheduler inicializado (io: {io_workers}, cpu: {cpu_workers} workers, "
+              f"+{spare_workers} de reserva por carril)")
+
+    async def run(self, lane: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Ejecuta fn(*args, **kwargs) en el carril indicado sin bloquear el event loop
+
+        Args:
+            lane: "io" o "cpu"
+            fn: Función síncrona a ejecutar
+
+        Returns:
+            Resultado de fn
+        """
+        if lane not in self.lanes:
+            raise ValueError(f"Carril desconocido: {lane}. Use: {', '.join(self.LANES)}")
+        return await self.lanes[lane].run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas por carril (profundidad de cola, ejecución, tiempos)"""
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def shutdown(self, wait: bool = False):
+        for lane in self.lanes.values():
+            lane.executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_tool_scheduler = None
+_tool_scheduler_lock = threading.Lock()
+
+
+def get_tool_scheduler() -> ToolScheduler:
+    """Obtiene instancia global (compartida por todos los agentes del proceso)"""
+    global _tool_scheduler
+    if _tool_scheduler is None:
+        with _tool_scheduler_lock:
+            if _tool_scheduler is None:
+                from config import Config
+                _tool_scheduler = ToolScheduler(
+                    io_workers=Config.TOOL_IO_WORKERS,
+                    cpu_workers=Config.TOOL_CPU_WORKERS,
+                    spare_workers=Config.TOOL_SPARE_WORKERS
+                )
+    return _tool_scheduler
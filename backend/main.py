@@ -8,6 +8,7 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
+import pandas as pd
 import uvicorn
 
 # Services
@@ -20,6 +21,14 @@ from services.feedback_system import get_feedback_system
 from services.plan_comparison import get_plan_comparison_service
 from config import Config
 
+# ==================== PANDAS ====================
+# Copy-on-Write para todo el proceso de la API: DataFrameCache entrega vistas
+# superficiales de frames compartidos entre requests y solo con CoW una escritura
+# in-place del llamador no altera el cache. pandas >= 3 siempre usa CoW (la
+# opción está obsoleta); en 2.x se activa aquí, una vez, al arrancar.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # Wrappers
 def get_rag_service():
     return get_rag_instance()
@@ -107,7 +116,8 @@ async def get_info():
                 "/api/analytics/operador-causal",
                 "/api/insights",
                 "/api/debug/equipos",
-                "/api/debug/operadores"
+                "/api/debug/operadores",
+                "/api/debug/tool-scheduler"
             ],
             "data_sources": [
                 "Hexagon MineOPS (ciclos, dumps, estados)",
@@ -156,7 +166,8 @@ async def query_rag(request: QueryRequest):
 async def get_ranking_produccion(
     year: int = 2024,
     top_n: int = 10,
-    tipo: str = ""
+    tipo: str = "",
+    mes: Optional[int] = None
 ):
     """
     Ranking de operadores por producción (toneladas)
@@ -165,10 +176,11 @@ async def get_ranking_produccion(
         year: Año de análisis
         top_n: Número de operadores a retornar
         tipo: Filtro por tipo de equipo (opcional)
+        mes: Mes específico (opcional)
     """
     try:
         rankings = get_rankings_service()
-        result = rankings.ranking_operadores_produccion(year, top_n, tipo)
+        result = rankings.ranking_operadores_produccion(year, top_n, tipo, mes)
         return result
     except Exception as e:
         import traceback
@@ -183,7 +195,9 @@ async def get_ranking_produccion(
 @app.get("/api/ranking/operadores-dumps", tags=["Rankings"])
 async def get_ranking_dumps(
     year: int = 2024,
-    top_n: int = 10
+    top_n: int = 10,
+    tipo: str = "",
+    mes: Optional[int] = None
 ):
     """
     Ranking de operadores por número de dumps
@@ -191,10 +205,12 @@ async def get_ranking_dumps(
     Args:
         year: Año de análisis
         top_n: Número de operadores a retornar
+        tipo: Filtro por tipo de equipo (opcional)
+        mes: Mes específico (opcional)
     """
     try:
         rankings = get_rankings_service()
-        result = rankings.ranking_operadores_dumps(year, top_n)
+        result = rankings.ranking_operadores_dumps(year, top_n, tipo, mes)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -203,7 +219,9 @@ async def get_ranking_dumps(
 async def get_ranking_eficiencia(
     year: int = 2024,
     top_n: int = 10,
-    tipo: str = ""
+    tipo: str = "",
+    mes: Optional[int] = None,
+    min_dumps: int = 0
 ):
     """
     Ranking de operadores por eficiencia (ton/dump)
@@ -212,10 +230,12 @@ async def get_ranking_eficiencia(
         year: Año de análisis
         top_n: Número de operadores a retornar
         tipo: Filtro por tipo de equipo (opcional)
+        mes: Mes específico (opcional)
+        min_dumps: Dumps mínimos para entrar al ranking (0 = todos)
     """
     try:
         rankings = get_rankings_service()
-        result = rankings.ranking_operadores_eficiencia(year, top_n, tipo)
+        result = rankings.ranking_operadores_eficiencia(year, top_n, tipo, mes, min_dumps=min_dumps)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -331,6 +351,16 @@ async def debug_operadores(year: int = 2024):
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/debug/tool-scheduler", tags=["Debug"])
+async def debug_tool_scheduler():
+    """Debug - Métricas de los carriles de herramientas del agente (cola, ejecución, tiempos)"""
+    try:
+        # Singleton del proceso, compartido por todos los agentes
+        from core.tool_scheduler import get_tool_scheduler
+        return {"success": True, "lanes": get_tool_scheduler().stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
     
 @app.get("/api/compare/real-vs-plans", tags=["Comparaciones"])
 async def compare_real_vs_plans(
@@ -3,35 +3,26 @@ Endpoint de Análisis Pareto de Delays - MineDash AI v2.0
 Analiza hexagon_estados para identificar 20% de causas que generan 80% del impacto
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import sqlite3
 
+from services.date_ranges import months_range, year_range
+from services.hexagon_partitions import EQUIPMENT_TIMES
+from services.async_db import get_async_db
+from services.result_cache import cached_response
+
 router = APIRouter()
 
 
-@router.get("/api/analytics/pareto-delays")
-async def get_pareto_delays(
-    year: int = Query(2024, description="Año de análisis"),
-    mes_inicio: int = Query(1, description="Mes inicio (1-12)"),
-    mes_fin: int = Query(12, description="Mes fin (1-12)"),
-    top_n: int = Query(20, description="Top N causas a mostrar")
-):
-    """
-    Análisis Pareto de Delays según metodología ASARCO
-    
-    Identifica las principales causas de pérdida de tiempo productivo:
-    - M. CORRECTIVA: Mantenimiento correctivo no planificado
-    - DET.NOPRG.: Detenciones no programadas (operacionales)
-    - DET.PROG.: Detenciones programadas (no operacionales)
-    
-    Relaciona con UEBD bajo (47.5% actual vs 75% target)
-    """
+def _pareto_delays_data(conn: sqlite3.Connection, year: int, mes_inicio: int, mes_fin: int, top_n: int) -> Dict:
+    """Consultas de get_pareto_delays (corre en el pool de services/async_db)"""
     try:
-        conn = sqlite3.connect("minedash.db")
         cursor = conn.cursor()
         
+        periodo_inicio, periodo_fin = months_range(year, mes_inicio, mes_fin)
+        
         # ======== ANÁLISIS PARETO POR CATEGORIA + RAZON ========
         
         cursor.execute("""
@@ -43,14 +34,13 @@ async def get_pareto_delays(
                 SUM(horas) as horas_perdidas,
                 ROUND(AVG(horas), 2) as horas_promedio_evento
             FROM hexagon_estados
-            WHERE strftime('%Y', fecha) = ?
-              AND CAST(strftime('%m', fecha) AS INTEGER) BETWEEN ? AND ?
+            WHERE fecha >= ? AND fecha < ?
               AND categoria IN ('M. CORRECTIVA', 'DET.NOPRG.', 'DET.PROG.', 'M. PROGRAMADA')
               AND horas > 0
             GROUP BY categoria, razon, estado
             ORDER BY horas_perdidas DESC
             LIMIT ?
-        """, (str(year), mes_inicio, mes_fin, top_n))
+        """, (periodo_inicio, periodo_fin, top_n))
         
         delays_data = []
         total_horas_perdidas = 0
@@ -88,12 +78,11 @@ async def get_pareto_delays(
                 SUM(horas) as horas,
                 COUNT(DISTINCT equipo) as equipos_afectados
             FROM hexagon_estados
-            WHERE strftime('%Y', fecha) = ?
-              AND CAST(strftime('%m', fecha) AS INTEGER) BETWEEN ? AND ?
+            WHERE fecha >= ? AND fecha < ?
               AND categoria IN ('M. CORRECTIVA', 'DET.NOPRG.', 'DET.PROG.', 'M. PROGRAMADA')
             GROUP BY categoria
             ORDER BY horas DESC
-        """, (str(year), mes_inicio, mes_fin))
+        """, (periodo_inicio, periodo_fin))
         
         resumen_categorias = []
         for row in cursor.fetchall():
@@ -110,27 +99,13 @@ async def get_pareto_delays(
         # ======== RELACIÓN CON UEBD BAJO ========
         
         # Obtener UEBD actual
-        cursor.execute("""
+        times_sql, times_params = EQUIPMENT_TIMES.union_sql(
+            "timestamp, total, efectivo, m_correctiva, m_programada",
+            periodo_inicio, periodo_fin
+        )
+        cursor.execute(f"""
             WITH equipment_times_all AS (
-                SELECT timestamp, total, efectivo, m_correctiva, m_programada
-                FROM hexagon_by_equipment_times_2023
-                WHERE strftime('%Y', timestamp) = ?
-                  AND CAST(strftime('%m', timestamp) AS INTEGER) BETWEEN ? AND ?
-                UNION ALL
-                SELECT timestamp, total, efectivo, m_correctiva, m_programada
-                FROM hexagon_by_equipment_times_2024_p1
-                WHERE strftime('%Y', timestamp) = ?
-                  AND CAST(strftime('%m', timestamp) AS INTEGER) BETWEEN ? AND ?
-                UNION ALL
-                SELECT timestamp, total, efectivo, m_correctiva, m_programada
-                FROM hexagon_by_equipment_times_2024_p2
-                WHERE strftime('%Y', timestamp) = ?
-                  AND CAST(strftime('%m', timestamp) AS INTEGER) BETWEEN ? AND ?
-                UNION ALL
-                SELECT timestamp, total, efectivo, m_correctiva, m_programada
-                FROM hexagon_by_equipment_times_2025
-                WHERE strftime('%Y', timestamp) = ?
-                  AND CAST(strftime('%m', timestamp) AS INTEGER) BETWEEN ? AND ?
+                {times_sql}
             )
             SELECT 
                 ROUND(AVG(
@@ -142,10 +117,7 @@ async def get_pareto_delays(
                 SUM(efectivo) as horas_efectivas_totales
             FROM equipment_times_all
             WHERE total > 0
-        """, (str(year), mes_inicio, mes_fin,
-              str(year), mes_inicio, mes_fin,
-              str(year), mes_inicio, mes_fin,
-              str(year), mes_inicio, mes_fin))
+        """, times_params)
         
         uebd_data = cursor.fetchone()
         uebd_actual = uebd_data[0] if uebd_data and uebd_data[0] else 0
@@ -161,8 +133,6 @@ async def get_pareto_delays(
         horas_efectivas_target = (horas_disponibles * uebd_target / 100) if horas_disponibles > 0 else 0
         horas_faltantes = horas_efectivas_target - horas_efectivas
         
-        conn.close()
-        
         # ======== CONSTRUIR RESPUESTA ========
         
         return {
@@ -201,6 +171,31 @@ async def get_pareto_delays(
         raise HTTPException(status_code=500, detail=f"Error en análisis Pareto: {str(e)}")
 
 
+@router.get("/api/analytics/pareto-delays")
+async def get_pareto_delays(
+    request: Request,
+    year: int = Query(2024, description="Año de análisis"),
+    mes_inicio: int = Query(1, description="Mes inicio (1-12)"),
+    mes_fin: int = Query(12, description="Mes fin (1-12)"),
+    top_n: int = Query(20, description="Top N causas a mostrar")
+):
+    """
+    Análisis Pareto de Delays según metodología ASARCO
+    
+    Identifica las principales causas de pérdida de tiempo productivo:
+    - M. CORRECTIVA: Mantenimiento correctivo no planificado
+    - DET.NOPRG.: Detenciones no programadas (operacionales)
+    - DET.PROG.: Detenciones programadas (no operacionales)
+    
+    Relaciona con UEBD bajo (47.5% actual vs 75% target)
+    """
+    return await cached_response(
+        request, "pareto_delays",
+        {"year": year, "mes_inicio": mes_inicio, "mes_fin": mes_fin, "top_n": top_n},
+        lambda: get_async_db().run(_pareto_delays_data, year, mes_inicio, mes_fin, top_n, request=request)
+    )
+
+
 def _generar_recomendaciones(causas_criticas: List[Dict], uebd_actual: float, brecha_uebd: float) -> List[Dict]:
     """Genera recomendaciones basadas en análisis Pareto"""
     recomendaciones = []
@@ -262,17 +257,9 @@ def _generar_recomendaciones(causas_criticas: List[Dict], uebd_actual: float, br
 
 # ======== ENDPOINT ADICIONAL: TOP EQUIPOS CON MÁS DELAYS ========
 
-@router.get("/api/analytics/equipos-criticos")
-async def get_equipos_criticos(
-    year: int = Query(2024),
-    top_n: int = Query(10)
-):
-    """
-    Identifica equipos con mayor cantidad de delays
-    Para priorizar intervenciones de mantenimiento
-    """
+def _equipos_criticos_data(conn: sqlite3.Connection, year: int, top_n: int) -> Dict:
+    """Consultas de get_equipos_criticos (corre en el pool de services/async_db)"""
     try:
-        conn = sqlite3.connect("minedash.db")
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -285,12 +272,12 @@ async def get_equipos_criticos(
                 SUM(horas) as horas_perdidas_totales,
                 ROUND(AVG(horas), 2) as horas_promedio_evento
             FROM hexagon_estados
-            WHERE strftime('%Y', fecha) = ?
+            WHERE fecha >= ? AND fecha < ?
               AND categoria IN ('M. CORRECTIVA', 'DET.NOPRG.', 'DET.PROG.')
             GROUP BY equipo, flota
             ORDER BY horas_perdidas_totales DESC
             LIMIT ?
-        """, (str(year), top_n))
+        """, (*year_range(year), top_n))
         
         equipos_criticos = []
         for row in cursor.fetchall():
@@ -305,8 +292,6 @@ async def get_equipos_criticos(
                 "criticidad": "Alta" if row[3] > 50 else "Media" if row[3] > 20 else "Baja"
             })
         
-        conn.close()
-        
         return {
             "success": True,
             "year": year,
@@ -317,4 +302,20 @@ async def get_equipos_criticos(
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error identificando equipos críticos: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error identificando equipos críticos: {str(e)}")
+
+
+@router.get("/api/analytics/equipos-criticos")
+async def get_equipos_criticos(
+    request: Request,
+    year: int = Query(2024),
+    top_n: int = Query(10)
+):
+    """
+    Identifica equipos con mayor cantidad de delays
+    Para priorizar intervenciones de mantenimiento
+    """
+    return await cached_response(
+        request, "equipos_criticos", {"year": year, "top_n": top_n},
+        lambda: get_async_db().run(_equipos_criticos_data, year, top_n, request=request)
+    )
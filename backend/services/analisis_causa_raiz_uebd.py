@@ -2,12 +2,153 @@
 """
 Análisis de Causa Raíz de Baja Utilización (UEBD)
 Identifica si el problema es operacional o de mantenimiento
+
+Una sola consulta trae DM/UEBD por equipo y el desglose de estados de todos
+los equipos (CTE de métricas + JOIN agrupado sobre hexagon_estados); los
+totales por categoría/razón y la clasificación se calculan vectorizados en
+pandas en vez de una consulta por equipo.
 """
 
+import numpy as np
 import pandas as pd
-import sqlite3
 from datetime import datetime
 
+from services.db_pool import get_db_pool
+
+# Categorías y razones que se resumen por equipo: columna -> valor en hexagon_estados
+CATEGORIAS = {
+    'efectivo': 'EFECTIVO',
+    'det_noprg': 'DET.NOPRG.',
+    'det_prg': 'DET.PROG.',
+    'mnt_correctiva': 'M. CORRECTIVA',
+    'mnt_programada': 'M. PROGRAMADA',
+}
+RAZONES = {
+    'sin_operador': 'SIN OPERADOR',
+    'falta_carguio': 'FALTA EQUIPO CARGUIO',
+    'imprevisto_mecanico': 'IMPREVISTO MECANICO',
+}
+
+CLASIFICACIONES = {
+    "PROBLEMA_OPERACIONAL": "Alta DM pero baja UEBD - Equipo disponible pero no utilizado",
+    "PROBLEMA_MANTENIMIENTO": "Baja DM y baja UEBD - Fallas mecánicas recurrentes",
+    "ACEPTABLE": "Rendimiento dentro de rangos aceptables",
+    "PROBLEMA_MIXTO": "Problemas combinados de mantenimiento y operación",
+}
+
+
+def _consultar_estados_por_equipo(conn, fecha_inicio, fecha_fin, equipo=None):
+    """
+    Desglose de estados (categoria, estado, razon) de todos los equipos con
+    métricas suficientes, en un solo round trip. Cada fila lleva además
+    dm_promedio / uebd_promedio de su equipo.
+    """
+    filtro_equipo = "AND equipment_id = ?" if equipo else ""
+    query = f"""
+    WITH metricas AS (
+        SELECT
+            equipment_id as equipo,
+            AVG(CASE WHEN tponominal > 0 THEN tpodisponible * 100.0 / tponominal ELSE NULL END) as dm_promedio,
+            AVG(CASE WHEN tpodisponible > 0 THEN tpoefectivoreal * 100.0 / tpodisponible ELSE NULL END) as uebd_promedio
+        FROM hexagon_by_kpi_hora2
+        WHERE empresa = 'CODELCO'
+          AND timestamp >= ?
+          AND timestamp < ?
+          AND tipo = 'Truck'
+          AND tponominal > 0
+          {filtro_equipo}
+        GROUP BY equipment_id
+        HAVING COUNT(*) >= 100
+          AND AVG(CASE WHEN tpodisponible > 0 THEN tpoefectivoreal * 100.0 / tpodisponible ELSE NULL END) IS NOT NULL
+    )
+    SELECT
+        m.equipo,
+        m.dm_promedio,
+        m.uebd_promedio,
+        e.categoria,
+        e.estado,
+        e.razon,
+        SUM(e.horas) as horas_totales,
+        COUNT(*) as frecuencia
+    FROM metricas m
+    JOIN hexagon_estados e
+      ON e.equipo = m.equipo
+     AND e.fecha >= ?
+     AND e.fecha < ?
+    GROUP BY m.equipo, e.categoria, e.estado, e.razon
+    """
+    params = [fecha_inicio, fecha_fin] + ([equipo] if equipo else []) + [fecha_inicio, fecha_fin]
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def _resumen_por_equipo(df_estados):
+    """Una fila por equipo: DM, UEBD, % por categoría, horas por razón y clasificación"""
+    por_equipo = df_estados.groupby('equipo', sort=False)
+    resumen = por_equipo[['dm_promedio', 'uebd_promedio']].first()
+    total_horas = por_equipo['horas_totales'].sum()
+
+    horas_categoria = (
+        df_estados[df_estados['categoria'].isin(CATEGORIAS.values())]
+        .pivot_table(index='equipo', columns='categoria', values='horas_totales', aggfunc='sum')
+        .reindex(index=resumen.index, columns=list(CATEGORIAS.values()))
+        .fillna(0)
+    )
+    pct = horas_categoria.div(total_horas.where(total_horas > 0), axis=0).mul(100).fillna(0)
+    for col, categoria in CATEGORIAS.items():
+        resumen[f'pct_{col}'] = pct[categoria]
+
+    horas_razon = (
+        df_estados[df_estados['razon'].isin(RAZONES.values())]
+        .pivot_table(index='equipo', columns='razon', values='horas_totales', aggfunc='sum')
+        .reindex(index=resumen.index, columns=list(RAZONES.values()))
+        .fillna(0)
+    )
+    for col, razon in RAZONES.items():
+        resumen[col] = horas_razon[razon]
+
+    dm = resumen['dm_promedio']
+    uebd = resumen['uebd_promedio']
+    resumen['clasificacion'] = np.select(
+        [
+            (dm >= 70) & (uebd < 55),
+            (dm < 60) & (uebd < 55),
+            (dm >= 60) & (uebd >= 55),
+        ],
+        ["PROBLEMA_OPERACIONAL", "PROBLEMA_MANTENIMIENTO", "ACEPTABLE"],
+        default="PROBLEMA_MIXTO"
+    )
+
+    return resumen.sort_values('uebd_promedio', kind='stable')
+
+
+def _recomendaciones(r):
+    """Recomendaciones según clasificación y umbrales del equipo"""
+    recomendaciones = []
+
+    if r.clasificacion == "PROBLEMA_OPERACIONAL":
+        if r.pct_det_noprg > 20:
+            recomendaciones.append(f"URGENTE: {r.pct_det_noprg:.1f}% en demoras no programadas")
+        if r.sin_operador > 50:
+            recomendaciones.append(f"Asignar operador permanente ({r.sin_operador:.1f} horas sin operador)")
+        if r.falta_carguio > 20:
+            recomendaciones.append("Mejorar coordinación con equipos de carguío")
+        recomendaciones.append("Revisar asignación de frentes y planificación")
+
+    elif r.clasificacion == "PROBLEMA_MANTENIMIENTO":
+        if r.pct_mnt_correctiva > 40:
+            recomendaciones.append(f"CRÍTICO: {r.pct_mnt_correctiva:.1f}% en mantenimiento correctivo")
+        if r.imprevisto_mecanico > 200:
+            recomendaciones.append(f"Análisis RCA de fallas ({r.imprevisto_mecanico:.1f} horas fuera de servicio)")
+        recomendaciones.append("Aumentar mantenimiento preventivo")
+        recomendaciones.append("Revisar plan de repuestos críticos")
+
+    elif r.clasificacion == "PROBLEMA_MIXTO":
+        recomendaciones.append("Atacar problemas de mantenimiento primero")
+        recomendaciones.append("Luego optimizar asignación operacional")
+
+    return recomendaciones
+
+
 def analizar_causa_raiz_uebd(fecha_inicio, fecha_fin, equipo=None, db_path='minedash.db'):
     """
     Analiza causa raíz de baja UEBD por equipo
@@ -21,142 +162,42 @@ def analizar_causa_raiz_uebd(fecha_inicio, fecha_fin, equipo=None, db_path='mine
     Returns:
         dict con análisis de causa raíz
     """
-    conn = sqlite3.connect(db_path)
-
-    # PASO 1: Obtener DM y UEBD de equipos
-    query_metricas = """
-    SELECT
-        equipment_id as equipo,
-        AVG(CASE WHEN tponominal > 0 THEN tpodisponible * 100.0 / tponominal ELSE NULL END) as dm_promedio,
-        AVG(CASE WHEN tpodisponible > 0 THEN tpoefectivoreal * 100.0 / tpodisponible ELSE NULL END) as uebd_promedio
-    FROM hexagon_by_kpi_hora2
-    WHERE empresa = 'CODELCO'
-      AND timestamp >= ?
-      AND timestamp < ?
-      AND tipo = 'Truck'
-      AND tponominal > 0
-    """
-
-    if equipo:
-        query_metricas += f" AND equipment_id = '{equipo}'"
-
-    query_metricas += """
-    GROUP BY equipment_id
-    HAVING COUNT(*) >= 100
-      AND AVG(CASE WHEN tpodisponible > 0 THEN tpoefectivoreal * 100.0 / tpodisponible ELSE NULL END) IS NOT NULL
-    ORDER BY uebd_promedio ASC
-    """
-
-    df_metricas = pd.read_sql_query(query_metricas, conn, params=[fecha_inicio, fecha_fin])
+    conn = get_db_pool(db_path).connect()
+    try:
+        # PASO 1: DM/UEBD y estados de todos los equipos en una consulta
+        df_estados = _consultar_estados_por_equipo(conn, fecha_inicio, fecha_fin, equipo)
+    finally:
+        conn.close()
 
     resultados = []
 
-    for _, row in df_metricas.iterrows():
-        equipo_id = row['equipo']
-        dm = row['dm_promedio']
-        uebd = row['uebd_promedio']
-
-        # PASO 2: Obtener estados del equipo
-        query_estados = """
-        SELECT
-            categoria,
-            estado,
-            razon,
-            SUM(horas) as horas_totales,
-            COUNT(*) as frecuencia
-        FROM hexagon_estados
-        WHERE equipo = ?
-          AND fecha >= ?
-          AND fecha < ?
-        GROUP BY categoria, estado, razon
-        ORDER BY horas_totales DESC
-        """
-
-        df_estados = pd.read_sql_query(query_estados, conn, params=[equipo_id, fecha_inicio, fecha_fin])
-
-        if df_estados.empty:
-            continue
-
-        # Calcular totales por categoría
-        total_horas = df_estados['horas_totales'].sum()
-
-        cat_efectivo = df_estados[df_estados['categoria'] == 'EFECTIVO']['horas_totales'].sum()
-        cat_det_noprg = df_estados[df_estados['categoria'] == 'DET.NOPRG.']['horas_totales'].sum()
-        cat_det_prg = df_estados[df_estados['categoria'] == 'DET.PROG.']['horas_totales'].sum()
-        cat_mnt_correctiva = df_estados[df_estados['categoria'] == 'M. CORRECTIVA']['horas_totales'].sum()
-        cat_mnt_programada = df_estados[df_estados['categoria'] == 'M. PROGRAMADA']['horas_totales'].sum()
-
-        # Porcentajes
-        pct_efectivo = (cat_efectivo / total_horas * 100) if total_horas > 0 else 0
-        pct_det_noprg = (cat_det_noprg / total_horas * 100) if total_horas > 0 else 0
-        pct_det_prg = (cat_det_prg / total_horas * 100) if total_horas > 0 else 0
-        pct_mnt_correctiva = (cat_mnt_correctiva / total_horas * 100) if total_horas > 0 else 0
-        pct_mnt_programada = (cat_mnt_programada / total_horas * 100) if total_horas > 0 else 0
-
-        # CLASIFICACIÓN
-        if dm >= 70 and uebd < 55:
-            clasificacion = "PROBLEMA_OPERACIONAL"
-            problema_principal = "Alta DM pero baja UEBD - Equipo disponible pero no utilizado"
-        elif dm < 60 and uebd < 55:
-            clasificacion = "PROBLEMA_MANTENIMIENTO"
-            problema_principal = "Baja DM y baja UEBD - Fallas mecánicas recurrentes"
-        elif dm >= 60 and uebd >= 55:
-            clasificacion = "ACEPTABLE"
-            problema_principal = "Rendimiento dentro de rangos aceptables"
-        else:
-            clasificacion = "PROBLEMA_MIXTO"
-            problema_principal = "Problemas combinados de mantenimiento y operación"
-
-        # Top 5 estados críticos
-        top_estados = df_estados.head(5).to_dict('records')
-
-        # Razones específicas más frecuentes
-        sin_operador = df_estados[df_estados['razon'] == 'SIN OPERADOR']['horas_totales'].sum()
-        falta_carguio = df_estados[df_estados['razon'] == 'FALTA EQUIPO CARGUIO']['horas_totales'].sum()
-        imprevisto_mecanico = df_estados[df_estados['razon'] == 'IMPREVISTO MECANICO']['horas_totales'].sum()
-
-        # RECOMENDACIONES
-        recomendaciones = []
-
-        if clasificacion == "PROBLEMA_OPERACIONAL":
-            if pct_det_noprg > 20:
-                recomendaciones.append(f"URGENTE: {pct_det_noprg:.1f}% en demoras no programadas")
-            if sin_operador > 50:
-                recomendaciones.append(f"Asignar operador permanente ({sin_operador:.1f} horas sin operador)")
-            if falta_carguio > 20:
-                recomendaciones.append("Mejorar coordinación con equipos de carguío")
-            recomendaciones.append("Revisar asignación de frentes y planificación")
-
-        elif clasificacion == "PROBLEMA_MANTENIMIENTO":
-            if pct_mnt_correctiva > 40:
-                recomendaciones.append(f"CRÍTICO: {pct_mnt_correctiva:.1f}% en mantenimiento correctivo")
-            if imprevisto_mecanico > 200:
-                recomendaciones.append(f"Análisis RCA de fallas ({imprevisto_mecanico:.1f} horas fuera de servicio)")
-            recomendaciones.append("Aumentar mantenimiento preventivo")
-            recomendaciones.append("Revisar plan de repuestos críticos")
-
-        elif clasificacion == "PROBLEMA_MIXTO":
-            recomendaciones.append("Atacar problemas de mantenimiento primero")
-            recomendaciones.append("Luego optimizar asignación operacional")
-
-        resultados.append({
-            'equipo': equipo_id,
-            'dm': dm,
-            'uebd': uebd,
-            'clasificacion': clasificacion,
-            'problema_principal': problema_principal,
-            'distribucion': {
-                'efectivo': pct_efectivo,
-                'det_noprg': pct_det_noprg,
-                'det_prg': pct_det_prg,
-                'mnt_correctiva': pct_mnt_correctiva,
-                'mnt_programada': pct_mnt_programada
-            },
-            'top_estados': top_estados,
-            'recomendaciones': recomendaciones
-        })
-
-    conn.close()
+    if not df_estados.empty:
+        # PASO 2: Totales, porcentajes y clasificación vectorizados
+        resumen = _resumen_por_equipo(df_estados)
+
+        # Top 5 estados críticos por equipo
+        columnas_estado = ['categoria', 'estado', 'razon', 'horas_totales', 'frecuencia']
+        top_estados = {
+            equipo_id: grupo[columnas_estado].to_dict('records')
+            for equipo_id, grupo in (
+                df_estados.sort_values(['equipo', 'horas_totales'], ascending=[True, False], kind='stable')
+                .groupby('equipo', sort=False)
+                .head(5)
+                .groupby('equipo', sort=False)
+            )
+        }
+
+        for r in resumen.itertuples():
+            resultados.append({
+                'equipo': r.Index,
+                'dm': r.dm_promedio,
+                'uebd': r.uebd_promedio,
+                'clasificacion': r.clasificacion,
+                'problema_principal': CLASIFICACIONES[r.clasificacion],
+                'distribucion': {col: getattr(r, f'pct_{col}') for col in CATEGORIAS},
+                'top_estados': top_estados[r.Index],
+                'recomendaciones': _recomendaciones(r)
+            })
 
     # Resumen por clasificación
     df_result = pd.DataFrame(resultados)
@@ -5,9 +5,10 @@ Filtra vueltas manuales y calcula métricas clave
 """
 
 import pandas as pd
-import sqlite3
 from datetime import datetime
 
+from services.db_pool import get_db_pool
+
 def analizar_utilizacion_caex(fecha_inicio, fecha_fin, db_path='minedash.db'):
     """
     Analiza utilización (UEBD) de camiones CAEX en un periodo
@@ -20,7 +21,7 @@ def analizar_utilizacion_caex(fecha_inicio, fecha_fin, db_path='minedash.db'):
     Returns:
         dict con resultados del análisis
     """
-    conn = sqlite3.connect(db_path)
+    conn = get_db_pool(db_path).connect()
 
     # Query para obtener DM y UEBD por equipo
     query = """
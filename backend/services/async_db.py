@@ -0,0 +1,177 @@
+# services/async_db.py
+"""
+Acceso asíncrono a minedash.db para endpoints FastAPI - MineDash AI
+División Salvador - Codelco Chile
+
+Los endpoints de dashboard (api_routes, pareto_analytics) son async def pero
+ejecutaban consultas sqlite3 de varios segundos directamente en el event
+loop: una carga lenta del dashboard congelaba el streaming del chat de toda
+la división. Esta fachada:
+
+- Ejecuta la función de consulta en un pool de hilos dedicado a la base
+  (no compite con el tool_scheduler del agente)
+- Le entrega una conexión de lectura del pool (services/db_pool) y la
+  devuelve al terminar
+- Si el cliente HTTP se desconecta (o la tarea se cancela / vence el
+  timeout), interrumpe la consulta en curso con conn.interrupt()
+
+Uso:
+    def _consulta(conn, year):
+        return conn.execute("SELECT ...", (year,)).fetchall()
+
+    @router.get("/api/...")
+    async def endpoint(request: Request, year: int):
+        return await get_async_db().run(_consulta, year, request=request)
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from services.db_pool import get_db_pool
+
+
+class _Job:
+    """Estado compartido entre el hilo que consulta y la corrutina que espera"""
+
+    def __init__(self):
+        self.conn: Optional[sqlite3.Connection] = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def interrupt(self):
+        with self.lock:
+            self.cancelled = True
+            if self.conn is not None:
+                self.conn.interrupt()
+
+
+class AsyncDatabase:
+    """Fachada async sobre el pool de lectura de un archivo SQLite"""
+
+    def __init__(self, db_path: str = "minedash.db", max_workers: int = 4, poll_interval: float = 0.5):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="minedash-db")
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_run_s = 0.0
+
+    def _invoke(self, job: _Job, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        conn = get_db_pool(self.db_path).connect()
+        with job.lock:
+            if job.cancelled:
+                conn.close()
+                raise sqlite3.OperationalError("interrupted")
+            job.conn = conn
+        try:
+            return fn(conn, *args, **kwargs)
+        finally:
+            with job.lock:
+                job.conn = None
+            conn.close()
+
+    async def _wait_disconnect(self, request):
+        while not await request.is_disconnected():
+            await asyncio.sleep(self.poll_interval)
+
+    async def run(
+        self,
+        fn: Callable,
+        *args,
+        request=None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Ejecuta fn(conn, *args, **kwargs) fuera del event loop
+
+        Args:
+            fn: Función síncrona que recibe la conexión como primer argumento
+            request: starlette Request; si el cliente se desconecta se
+                interrumpe la consulta y se lanza asyncio.CancelledError
+            timeout: Segundos máximos; al vencer se interrumpe y se lanza
+                asyncio.TimeoutError
+
+        Returns:
+            Lo que retorne fn
+        """
+        loop = asyncio.get_running_loop()
+        job = _Job()
+        started = time.perf_counter()
+        future = loop.run_in_executor(self.executor, self._invoke, job, fn, args, kwargs)
+        watcher = asyncio.ensure_future(self._wait_disconnect(request)) if request is not None else None
+
+        try:
+            if watcher is None:
+                result = await asyncio.wait_for(asyncio.shield(future), timeout)
+            else:
+                done, _ = await asyncio.wait(
+                    {future, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if future not in done:
+                    if watcher in done:
+                        raise asyncio.CancelledError("Cliente desconectado")
+                    raise asyncio.TimeoutError()
+                result = future.result()
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            job.interrupt()
+            # La consulta interrumpida termina con error en su hilo: nadie lo va a leer
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            with self._lock:
+                self.cancelled += 1
+            raise
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+        with self._lock:
+            self.completed += 1
+            self.total_run_s += time.perf_counter() - started
+        return result
+
+    async def fetchall(self, sql: str, params: Sequence = (), request=None) -> List[tuple]:
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall(), request=request)
+
+    async def fetchone(self, sql: str, params: Sequence = (), request=None) -> Optional[tuple]:
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone(), request=request)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "avg_run_s": round(self.total_run_s / self.completed, 3) if self.completed else 0.0,
+            }
+
+
+_async_dbs: Dict[str, AsyncDatabase] = {}
+_async_dbs_lock = threading.Lock()
+
+
+def get_async_db(db_path: str = "minedash.db") -> AsyncDatabase:
+    """Fachada async compartida por proceso para un archivo de base de datos"""
+    db = _async_dbs.get(db_path)
+    if db is None:
+        with _async_dbs_lock:
+            db = _async_dbs.get(db_path)
+            if db is None:
+                from config import Config
+                db = AsyncDatabase(
+                    db_path,
+                    max_workers=Config.DB_ASYNC_WORKERS,
+                    poll_interval=Config.DB_DISCONNECT_POLL
+                )
+                _async_dbs[db_path] = db
+    return db
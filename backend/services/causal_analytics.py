@@ -12,6 +12,8 @@ from pathlib import Path
 from typing import Dict, Any, List
 import numpy as np
 
+from services.excel_sidecar import load_hexagon_excel
+
 class CausalAnalytics:
     """Análisis causal correlacionando dumps, estados y tiempos"""
     
@@ -48,7 +50,7 @@ class CausalAnalytics:
             # ===================================================================
             dumps_file = self.hexagon_dir / f"by_detail_dumps {year}.xlsx"
             print(f"   📥 Cargando dumps...")
-            df_dumps = pd.read_excel(dumps_file)
+            df_dumps = load_hexagon_excel(dumps_file)
             
             # ✅ CORRECCIÓN: Las columnas están invertidas en Hexagon
             # truck_operator_first_name = APELLIDO
@@ -85,7 +87,7 @@ class CausalAnalytics:
             print(f"   📊 {len(df_op):,} dumps encontrados")
             
             # Resumen por equipo
-            equipos_usados = df_op.groupby('truck').agg({
+            equipos_usados = df_op.groupby('truck', observed=True).agg({
                 'material_tonnage': ['sum', 'count'],
                 'fecha': 'nunique',
                 'shift': lambda x: list(x.unique())
@@ -105,7 +107,7 @@ class CausalAnalytics:
                 estados_analisis = {"info": "Archivo de estados no disponible"}
             else:
                 print(f"   📥 Cargando estados ASARCO...")
-                df_estados = pd.read_excel(estados_file)
+                df_estados = load_hexagon_excel(estados_file)
                 
                 # Filtrar por equipos y período
                 df_estados['fecha'] = pd.to_datetime(df_estados['fecha']).dt.date
@@ -126,7 +128,7 @@ class CausalAnalytics:
                 
                 # Resumen por código ASARCO
                 if len(df_estados_op) > 0:
-                    codigos_resumen = df_estados_op.groupby(['code', 'razon']).agg({
+                    codigos_resumen = df_estados_op.groupby(['code', 'razon'], observed=True).agg({
                         'horas': 'sum',
                         'equipo': 'count'
                     }).reset_index()
@@ -164,7 +166,7 @@ class CausalAnalytics:
             for f in times_files:
                 if f.exists():
                     print(f"   📥 Cargando {f.name}...")
-                    df_times_list.append(pd.read_excel(f))
+                    df_times_list.append(load_hexagon_excel(f))
             
             if df_times_list:
                 df_times = pd.concat(df_times_list, ignore_index=True)
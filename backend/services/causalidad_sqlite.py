@@ -4,13 +4,15 @@ Reemplaza la lectura de Excel por consultas directas a SQLite.
 Reduce el tiempo de 3+ minutos a <5 segundos.
 """
 
-import sqlite3
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 import plotly.graph_objects as go
 import time
 
+from services.date_ranges import day_range
+from services.db_pool import get_db_pool
+
 
 def analizar_causalidad_waterfall_sqlite(fecha: str, db_path: str = "minedash.db") -> dict:
     """
@@ -47,7 +49,7 @@ def analizar_causalidad_waterfall_sqlite(fecha: str, db_path: str = "minedash.db
         if not db_file.exists():
             return {"success": False, "error": f"Base de datos no encontrada: {db_path}"}
 
-        conn = sqlite3.connect(str(db_file))
+        conn = get_db_pool(str(db_file)).connect()
         cursor = conn.cursor()
 
         # =========================================================
@@ -77,9 +79,10 @@ def analizar_causalidad_waterfall_sqlite(fecha: str, db_path: str = "minedash.db
         query_real = f"""
             SELECT SUM(material_tonnage) as real_ton, COUNT(*) as num_dumps
             FROM {dumps_table}
-            WHERE DATE(timestamp) = ?
+            WHERE timestamp >= ? AND timestamp < ?
         """
-        cursor.execute(query_real, (fecha,))
+        rango_dia = day_range(fecha)
+        cursor.execute(query_real, rango_dia)
         result = cursor.fetchone()
         real_ton = float(result[0]) if result and result[0] else 0
         num_dumps = int(result[1]) if result and result[1] else 0
@@ -126,21 +129,21 @@ def analizar_causalidad_waterfall_sqlite(fecha: str, db_path: str = "minedash.db
         query_estados = """
             SELECT code, razon, SUM(horas) as total_horas
             FROM hexagon_by_estados_2024_2025
-            WHERE DATE(timestamp) = ?
+            WHERE timestamp >= ? AND timestamp < ?
             AND code != 1
             AND code IS NOT NULL
             GROUP BY code, razon
             ORDER BY total_horas DESC
             LIMIT 10
         """
-        cursor.execute(query_estados, (fecha,))
+        cursor.execute(query_estados, rango_dia)
         demoras_rows = cursor.fetchall()
 
         # Contar equipos únicos del día
         cursor.execute("""
             SELECT COUNT(DISTINCT equipment_id) FROM hexagon_by_estados_2024_2025
-            WHERE DATE(timestamp) = ?
-        """, (fecha,))
+            WHERE timestamp >= ? AND timestamp < ?
+        """, rango_dia)
         num_equipos = cursor.fetchone()[0] or 1
 
         total_horas_demora = sum(float(row[2]) for row in demoras_rows if row[2])
@@ -7,6 +7,7 @@ Para queries que requieren agregación/filtrado específico
 import pandas as pd
 from pathlib import Path
 from config import Config
+from services.excel_sidecar import load_hexagon_excel
 from typing import List, Dict, Any
 import json
 
@@ -33,7 +34,7 @@ class DataAnalytics:
         if filepath.suffix == '.csv':
             df = pd.read_csv(filepath)
         else:
-            df = pd.read_excel(filepath)
+            df = load_hexagon_excel(filepath)
         
         self._cache[filename] = df
         return df
@@ -66,7 +67,7 @@ class DataAnalytics:
             
             for archivo in archivos_operadores:
                 try:
-                    df = pd.read_excel(archivo)
+                    df = load_hexagon_excel(archivo)
                     
                     # Buscar columnas relevantes
                     col_operador = self._find_column(df, ['operador', 'operator', 'nombre'])
@@ -85,9 +86,9 @@ class DataAnalytics:
                     
                     # Agregar por operador
                     if col_grupo:
-                        agrupacion = df_filtered.groupby([col_operador, col_grupo])[col_utilizacion].mean().reset_index()
+                        agrupacion = df_filtered.groupby([col_operador, col_grupo], observed=True)[col_utilizacion].mean().reset_index()
                     else:
-                        agrupacion = df_filtered.groupby(col_operador)[col_utilizacion].mean().reset_index()
+                        agrupacion = df_filtered.groupby(col_operador, observed=True)[col_utilizacion].mean().reset_index()
                     
                     agrupacion.columns = ['operador', 'grupo', 'utilizacion'] if col_grupo else ['operador', 'utilizacion']
                     
@@ -110,9 +111,9 @@ class DataAnalytics:
             
             # Agregar por operador (promedio si hay múltiples fuentes)
             if 'grupo' in df_final.columns:
-                df_ranking = df_final.groupby(['operador', 'grupo'])['utilizacion'].mean().reset_index()
+                df_ranking = df_final.groupby(['operador', 'grupo'], observed=True)['utilizacion'].mean().reset_index()
             else:
-                df_ranking = df_final.groupby('operador')['utilizacion'].mean().reset_index()
+                df_ranking = df_final.groupby('operador', observed=True)['utilizacion'].mean().reset_index()
                 df_ranking['grupo'] = 'N/A'
             
             # Ordenar y tomar top N
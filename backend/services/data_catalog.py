@@ -0,0 +1,333 @@
+# services/data_catalog.py
+"""
+Catálogo de períodos disponibles en las tablas de Hexagon - MineDash AI
+División Salvador - Codelco Chile
+
+/api/data/metadata respondía "qué meses hay" con un GROUP BY strftime sobre
+todas las filas de las tres tablas de dumps (10+ s en cada montaje del
+Dashboard/Insights). Este módulo mantiene, al momento de la ingesta:
+
+    data_catalog          por tabla: fuente, columna de tiempo, min/max,
+                          filas totales, fecha de actualización
+    data_catalog_meses    por tabla × mes ('YYYY-MM'): filas, min/max
+
+Fuentes catalogadas (por prefijo de nombre, así las tablas de un año nuevo
+entran solas):
+    dumps            hexagon_by_detail_dumps*
+    kpi_hora         hexagon_by_kpi_hora
+    kpi_hora2        hexagon_by_kpi_hora2
+    estados          hexagon_estados, hexagon_by_estados_*
+    equipment_times  hexagon_by_equipment_times*
+
+Refresco incremental: se recuentan solo los meses desde el mes del máximo
+catalogado (que pudo quedar parcial). Si el máximo de la tabla retrocede
+(tabla recargada) se recataloga completa.
+
+Lectura: igual que services/rollups, las funciones retornan None si el
+catálogo no existe o no está al día; el llamador usa la consulta cruda.
+
+Uso:
+    python -m services.data_catalog            # refresco incremental
+    python -m services.data_catalog --full     # reconstrucción completa
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from services.db_pool import get_db_pool
+
+
+# =============================================================================
+# ESQUEMA
+# =============================================================================
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS data_catalog (
+        table_name TEXT PRIMARY KEY,
+        source TEXT NOT NULL,
+        time_column TEXT NOT NULL,
+        min_ts TEXT,
+        max_ts TEXT,
+        row_count INTEGER DEFAULT 0,
+        updated_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS data_catalog_meses (
+        table_name TEXT NOT NULL,
+        mes TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        min_ts TEXT,
+        max_ts TEXT,
+        PRIMARY KEY (table_name, mes)
+    )
+    """,
+]
+
+# (prefijo, fuente); el orden importa: kpi_hora2 antes que kpi_hora
+SOURCE_PREFIXES = [
+    ("hexagon_by_detail_dumps", "dumps"),
+    ("hexagon_by_kpi_hora2", "kpi_hora2"),
+    ("hexagon_by_kpi_hora", "kpi_hora"),
+    ("hexagon_estados", "estados"),
+    ("hexagon_by_estados_", "estados"),
+    ("hexagon_by_equipment_times", "equipment_times"),
+]
+
+# Columna de tiempo por orden de preferencia (hexagon_estados usa fecha)
+TIME_COLUMNS = ["timestamp", "fecha"]
+
+
+def source_for(table: str) -> Optional[str]:
+    """Fuente del catálogo a la que pertenece una tabla (None = no catalogada)"""
+    for prefix, source in SOURCE_PREFIXES:
+        if table.startswith(prefix):
+            return source
+    return None
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone() is not None
+
+
+def _time_column(conn: sqlite3.Connection, table: str) -> Optional[str]:
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    return next((c for c in TIME_COLUMNS if c in columns), None)
+
+
+def catalog_tables(conn: sqlite3.Connection) -> List[str]:
+    """Tablas existentes que pertenecen a alguna fuente del catálogo"""
+    names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    return sorted(name for name in names if source_for(name))
+
+
+# =============================================================================
+# REFRESCO
+# =============================================================================
+
+def refresh_table(conn: sqlite3.Connection, table: str, full: bool = False) -> Dict:
+    """Actualiza el catálogo de una tabla (conexión de escritura)"""
+    source = source_for(table)
+    if source is None or not _table_exists(conn, table):
+        return {"table": table, "skipped": "no catalogada"}
+    column = _time_column(conn, table)
+    if column is None:
+        return {"table": table, "skipped": "sin columna de tiempo"}
+
+    table_max = conn.execute(f"SELECT MAX({column}) FROM {table}").fetchone()[0]
+    row = conn.execute(
+        "SELECT max_ts FROM data_catalog WHERE table_name = ?", (table,)
+    ).fetchone()
+    catalog_max = row[0] if row else None
+
+    if not full and catalog_max is not None and table_max is not None:
+        if str(table_max) == catalog_max:
+            return {"table": table, "skipped": "al día", "max_ts": catalog_max}
+        if str(table_max) < catalog_max:
+            full = True  # la tabla se recargó con menos datos
+    if catalog_max is None or table_max is None:
+        full = True
+
+    # Desde el mes del máximo catalogado (pudo quedar parcial) en adelante
+    desde = None if full else catalog_max[:7]
+    where = f"{column} IS NOT NULL" if desde is None else f"{column} >= ?"
+    params = [] if desde is None else [f"{desde}-01"]
+
+    with conn:
+        if desde is None:
+            conn.execute("DELETE FROM data_catalog_meses WHERE table_name = ?", (table,))
+        else:
+            conn.execute(
+                "DELETE FROM data_catalog_meses WHERE table_name = ? AND mes >= ?", (table, desde)
+            )
+        conn.execute(f"""
+            INSERT INTO data_catalog_meses (table_name, mes, row_count, min_ts, max_ts)
+            SELECT ?, substr({column}, 1, 7), COUNT(*), MIN({column}), MAX({column})
+            FROM {table}
+            WHERE {where}
+            GROUP BY substr({column}, 1, 7)
+        """, [table] + params)
+        totals = conn.execute("""
+            SELECT MIN(min_ts), MAX(max_ts), COALESCE(SUM(row_count), 0)
+            FROM data_catalog_meses WHERE table_name = ?
+        """, (table,)).fetchone()
+        conn.execute("""
+            INSERT INTO data_catalog (table_name, source, time_column, min_ts, max_ts, row_count, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(table_name) DO UPDATE SET
+                source = excluded.source,
+                time_column = excluded.time_column,
+                min_ts = excluded.min_ts,
+                max_ts = excluded.max_ts,
+                row_count = excluded.row_count,
+                updated_at = excluded.updated_at
+        """, (table, source, column, totals[0], totals[1], totals[2],
+              datetime.now().isoformat(timespec="seconds")))
+
+    return {"table": table, "desde": desde or "inicio", "max_ts": totals[1], "filas": totals[2]}
+
+
+def refresh_catalog(db_path: str = "minedash.db", tables: Optional[List[str]] = None, full: bool = False) -> List[Dict]:
+    """
+    Refresco incremental (o completo) del catálogo
+
+    Llamar después de cada carga de datos Hexagon (ver services/ingestion).
+    """
+    resultados = []
+    with get_db_pool(db_path).write() as conn:
+        ensure_schema(conn)
+        for table in tables or catalog_tables(conn):
+            inicio = time.perf_counter()
+            resultado = refresh_table(conn, table, full=full)
+            resultado["segundos"] = round(time.perf_counter() - inicio, 2)
+            print(f"   [CATALOG] {table}: {resultado}")
+            resultados.append(resultado)
+        # Tablas eliminadas de la base
+        existentes = set(catalog_tables(conn))
+        for (table,) in conn.execute("SELECT table_name FROM data_catalog").fetchall():
+            if table not in existentes:
+                conn.execute("DELETE FROM data_catalog WHERE table_name = ?", (table,))
+                conn.execute("DELETE FROM data_catalog_meses WHERE table_name = ?", (table,))
+    invalidate_freshness(db_path)
+    return resultados
+
+
+# =============================================================================
+# FRESCURA
+# =============================================================================
+
+_freshness: Dict[Tuple[str, str], Tuple[float, bool]] = {}
+_freshness_lock = threading.Lock()
+
+
+def invalidate_freshness(db_path: Optional[str] = None):
+    with _freshness_lock:
+        if db_path is None:
+            _freshness.clear()
+        else:
+            db_path = str(Path(db_path).resolve())
+            for key in [k for k in _freshness if k[0] == db_path]:
+                _freshness.pop(key, None)
+
+
+def catalog_ready(conn: sqlite3.Connection, source: str) -> bool:
+    """
+    True si todas las tablas de la fuente están catalogadas y su máximo
+    coincide con el de la tabla (chequeo cacheado CATALOG_FRESHNESS_TTL s)
+    """
+    from config import Config
+
+    row = conn.execute("PRAGMA database_list").fetchone()
+    key = (row[2] if row else "", source)
+    now = time.monotonic()
+    with _freshness_lock:
+        cached = _freshness.get(key)
+    if cached and now - cached[0] < Config.CATALOG_FRESHNESS_TTL:
+        return cached[1]
+
+    ready = False
+    try:
+        if _table_exists(conn, "data_catalog"):
+            catalogadas = {
+                table: (column, max_ts) for table, column, max_ts in conn.execute(
+                    "SELECT table_name, time_column, max_ts FROM data_catalog WHERE source = ?", (source,)
+                )
+            }
+            tablas = [t for t in catalog_tables(conn) if source_for(t) == source]
+            ready = bool(tablas)
+            for table in tablas:
+                if table not in catalogadas:
+                    ready = False
+                    break
+                column, max_ts = catalogadas[table]
+                table_max = conn.execute(f"SELECT MAX({column}) FROM {table}").fetchone()[0]
+                if (str(table_max) if table_max is not None else None) != max_ts:
+                    ready = False
+                    break
+    except sqlite3.Error:
+        ready = False
+
+    with _freshness_lock:
+        _freshness[key] = (now, ready)
+    return ready
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+
+def available_periods(conn: sqlite3.Connection, source: str = "dumps") -> Optional[Dict[int, List[int]]]:
+    """{año: [meses]} con datos en la fuente, o None si el catálogo no está al día"""
+    if not catalog_ready(conn, source):
+        return None
+    periods: Dict[int, List[int]] = {}
+    for (mes,) in conn.execute("""
+        SELECT DISTINCT m.mes
+        FROM data_catalog_meses m
+        JOIN data_catalog c ON c.table_name = m.table_name
+        WHERE c.source = ? AND m.row_count > 0
+        ORDER BY m.mes
+    """, (source,)):
+        periods.setdefault(int(mes[:4]), []).append(int(mes[5:7]))
+    return periods
+
+
+def last_period(conn: sqlite3.Connection, source: str = "dumps") -> Optional[Dict]:
+    """Último año/mes con datos y su timestamp máximo, o None si no está al día"""
+    if not catalog_ready(conn, source):
+        return None
+    row = conn.execute(
+        "SELECT MAX(max_ts) FROM data_catalog WHERE source = ? AND row_count > 0", (source,)
+    ).fetchone()
+    if not row or row[0] is None:
+        return None
+    max_ts = row[0]
+    return {"year": int(max_ts[:4]), "month": int(max_ts[5:7]), "timestamp": max_ts}
+
+
+def summary(conn: sqlite3.Connection) -> Optional[Dict[str, Dict]]:
+    """Min/max, filas y meses por fuente (lo catalogado, sin chequeo de frescura)"""
+    if not _table_exists(conn, "data_catalog"):
+        return None
+    resumen: Dict[str, Dict] = {}
+    for source, min_ts, max_ts, filas, tablas in conn.execute("""
+        SELECT source, MIN(min_ts), MAX(max_ts), SUM(row_count), COUNT(*)
+        FROM data_catalog
+        GROUP BY source
+    """):
+        meses = conn.execute("""
+            SELECT COUNT(DISTINCT m.mes)
+            FROM data_catalog_meses m
+            JOIN data_catalog c ON c.table_name = m.table_name
+            WHERE c.source = ?
+        """, (source,)).fetchone()[0]
+        resumen[source] = {
+            "min_ts": min_ts,
+            "max_ts": max_ts,
+            "filas": int(filas or 0),
+            "tablas": tablas,
+            "meses": meses,
+        }
+    return resumen
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresca el catálogo de períodos de Hexagon")
+    parser.add_argument("--db", default="minedash.db")
+    parser.add_argument("--full", action="store_true", help="Reconstruir desde cero")
+    args = parser.parse_args()
+    refresh_catalog(args.db, full=args.full)
@@ -0,0 +1,240 @@
+# services/dataframe_cache.py
+"""
+Cache de DataFrames con presupuesto de memoria - MineDash AI
+División Salvador - Codelco Chile
+
+Reemplaza el dict global _DATAFRAME_CACHE de core/agent.py:
+- Presupuesto en bytes con expulsión LRU
+- Invalidación por mtime/tamaño del archivo fuente
+- Entrega vistas (copia superficial) en vez de copias completas
+- Estadísticas de hits/misses/expulsiones
+- Carga única por clave aunque lleguen llamadas concurrentes
+- Tipos compactos al cargar (category / datetime64 / enteros reducidos,
+  ver services/frame_schema.py) con reporte de memoria ahorrada por tabla
+
+get() retorna df.copy(deep=False) cuando pandas usa Copy-on-Write (siempre
+en pandas >= 3; en pandas 2.x lo activa main.py al arrancar la API): cualquier
+escritura del llamador (df.loc[...] = ..., fillna(inplace=True), ...) copia
+primero la columna afectada y nunca llega al frame cacheado; los arrays de
+.values / .to_numpy() de una vista son de solo lectura. Sin Copy-on-Write
+(pandas 2.x fuera de la API, ej. scripts) retorna una copia profunda.
+Este módulo no cambia opciones globales de pandas.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+
+def _copy_on_write() -> bool:
+    """True si pandas aplica Copy-on-Write (pandas >= 3, o activado en pandas 2.x)"""
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.get_option("mode.copy_on_write") is True
+
+
+class DataFrameCache:
+    """Cache LRU de DataFrames acotado por bytes e invalidado por mtime"""
+
+    def __init__(self, max_bytes: int = 2 * 1024 ** 3, compact: bool = True):
+        self.max_bytes = max_bytes
+        self.compact = compact
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple, threading.Lock] = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def get(
+        self,
+        file_path: str,
+        sheet_name: Optional[str] = None,
+        loader: Optional[Callable[[], pd.DataFrame]] = None,
+        copy: bool = False,
+        variant: str = ""
+    ) -> pd.DataFrame:
+        """
+        Obtiene un DataFrame del cache, cargándolo si falta o si el archivo cambió
+
+        Args:
+            file_path: Archivo fuente (su mtime/tamaño invalidan la entrada)
+            sheet_name: Hoja de Excel (None = primera hoja)
+            loader: Función de carga alternativa (default: pd.read_excel)
+            copy: True para recibir una copia profunda (independiente del cache)
+            variant: Discriminador extra de la clave (ej. subconjunto de columnas)
+
+        Returns:
+            DataFrame (vista superficial salvo copy=True o sin Copy-on-Write)
+        """
+        path = Path(file_path)
+        key = (str(path.resolve()), sheet_name, variant)
+        signature = self._signature(path)
+
+        df = self._lookup(key, signature)
+        if df is None:
+            lock = self._key_lock(key)
+            try:
+                with lock:
+                    # Otro hilo pudo cargarlo mientras esperábamos
+                    df = self._lookup(key, signature, count=False)
+                    if df is None:
+                        df, reporte = self._load(path, sheet_name, loader)
+                        self._store(key, signature, df, reporte)
+            finally:
+                self._release_key_lock(key, lock)
+
+        # Las vistas solo son seguras con Copy-on-Write: el código del LLM y los
+        # módulos de análisis modifican frames in-place
+        if copy or not _copy_on_write():
+            return df.copy(deep=True)
+        return df.copy(deep=False)
+
+    def invalidate(self, file_path: Optional[str] = None):
+        """Invalida todas las entradas de un archivo (o todo el cache si None)"""
+        with self._lock:
+            if file_path is None:
+                keys = list(self._entries.keys())
+            else:
+                resolved = str(Path(file_path).resolve())
+                keys = [k for k in self._entries if k[0] == resolved]
+            for key in keys:
+                self._drop(key)
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso del cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            bytes_saved = sum(e["bytes_original"] - e["bytes"] for e in self._entries.values())
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "mb": round(self.current_bytes / 1024 ** 2, 1),
+                "mb_saved": round(bytes_saved / 1024 ** 2, 1),
+                "max_mb": round(self.max_bytes / 1024 ** 2, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "tables": [
+                    {
+                        "file": Path(key[0]).name,
+                        "sheet": key[1],
+                        "variant": key[2],
+                        "mb_original": round(e["bytes_original"] / 1024 ** 2, 1),
+                        "mb": round(e["bytes"] / 1024 ** 2, 1),
+                        "ahorro_pct": round((1 - e["bytes"] / e["bytes_original"]) * 100, 1) if e["bytes_original"] else 0.0,
+                    }
+                    for key, e in self._entries.items()
+                ],
+            }
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _signature(path: Path) -> Tuple[int, int]:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _key_lock(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _release_key_lock(self, key: Tuple, lock: threading.Lock):
+        """Quita el lock de carga de la clave si nadie más lo está usando"""
+        with self._lock:
+            if self._load_locks.get(key) is lock and not lock.locked():
+                del self._load_locks[key]
+
+    def _lookup(self, key: Tuple, signature: Tuple[int, int], count: bool = True) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["signature"] != signature:
+                # El archivo cambió en disco
+                self._drop(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry["df"]
+
+    def _load(
+        self, path: Path, sheet_name: Optional[str], loader: Optional[Callable]
+    ) -> Tuple[pd.DataFrame, Optional[Dict[str, Any]]]:
+        print(f"   [CACHE] Cargando {path.name}...")
+        if loader is not None:
+            df = loader()
+        elif sheet_name:
+            df = pd.read_excel(path, sheet_name=sheet_name)
+        else:
+            df = pd.read_excel(path)
+
+        if not self.compact:
+            print(f"   [CACHE] {path.name} cargado ({len(df):,} filas)")
+            return df, None
+
+        from services.frame_schema import compactar
+
+        df, reporte = compactar(df, path.name)
+        print(f"   [CACHE] {path.name} cargado ({len(df):,} filas, "
+              f"{reporte['mb_original']:,.1f} MB → {reporte['mb']:,.1f} MB, -{reporte['ahorro_pct']}%)")
+        return df, reporte
+
+    def _store(self, key: Tuple, signature: Tuple[int, int], df: pd.DataFrame, reporte: Optional[Dict] = None):
+        nbytes = reporte["bytes"] if reporte else int(df.memory_usage(deep=True).sum())
+        bytes_original = reporte["bytes_original"] if reporte else nbytes
+        if nbytes > self.max_bytes:
+            print(f"   [CACHE] {Path(key[0]).name} ({nbytes / 1024 ** 2:,.0f} MB) excede el presupuesto; no se cachea")
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            while self._entries and self.current_bytes + nbytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+            self._entries[key] = {"df": df, "signature": signature, "bytes": nbytes, "bytes_original": bytes_original}
+            self.current_bytes += nbytes
+
+    def _drop(self, key: Tuple):
+        """Elimina una entrada (llamar con self._lock tomado)"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry["bytes"]
+
+
+_dataframe_cache = None
+_dataframe_cache_lock = threading.Lock()
+
+
+def get_dataframe_cache() -> DataFrameCache:
+    """Obtiene la instancia singleton del cache (compartida por agente y servicios)"""
+    global _dataframe_cache
+    if _dataframe_cache is None:
+        with _dataframe_cache_lock:
+            if _dataframe_cache is None:
+                from config import Config
+                _dataframe_cache = DataFrameCache(
+                    max_bytes=Config.DATAFRAME_CACHE_MAX_MB * 1024 ** 2,
+                    compact=Config.DATAFRAME_COMPACT
+                )
+    return _dataframe_cache
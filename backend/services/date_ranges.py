@@ -0,0 +1,109 @@
+# services/date_ranges.py
+"""
+Rangos de fecha sargables para consultas SQLite - MineDash AI
+División Salvador - Codelco Chile
+
+Filtrar con expresiones sobre la columna (strftime('%m', timestamp) = ?,
+DATE(timestamp) = ?, timestamp LIKE '2025-07-15%') obliga a SQLite a recorrer
+la tabla completa. Comparar la columna desnuda contra un rango semiabierto
+usa el índice de timestamp:
+
+    timestamp >= '2025-07-01' AND timestamp < '2025-08-01'
+
+La gaviota de api_routes bajó de 90s+ a 3-5s con este cambio. Este módulo
+traduce año / mes / día / turno a ese rango para que todas las herramientas
+lo usen igual.
+
+Los timestamps de Hexagon se guardan como texto 'YYYY-MM-DD HH:MM:SS',
+por lo que la comparación lexicográfica equivale a la cronológica.
+
+Uso:
+    inicio, fin = month_range(2025, 7)
+    clause, params = range_clause("timestamp", month_range(2025, 7))
+    cursor.execute(f"SELECT ... FROM hexagon_by_kpi_hora WHERE {clause}", params)
+"""
+
+from datetime import date, datetime, timedelta
+from typing import List, Tuple, Union
+
+DateLike = Union[str, date, datetime]
+Rango = Tuple[str, str]
+
+# Turnos de 12 horas (ver api_routes.get_gaviota): A = 08:00-20:00, C = 20:00-08:00 (+1 día)
+TURNOS = {
+    "A": 8,
+    "C": 20,
+}
+HORAS_TURNO = 12
+
+_DATETIME_FMT = "%Y-%m-%d %H:%M:%S"
+_DATE_FMT = "%Y-%m-%d"
+
+
+def _as_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], _DATE_FMT).date()
+
+
+def _first_of_next_month(year: int, month: int) -> date:
+    return date(year + 1, 1, 1) if month >= 12 else date(year, month + 1, 1)
+
+
+def year_range(year: int) -> Rango:
+    """Rango semiabierto [1-ene-year, 1-ene-year+1)"""
+    return f"{int(year)}-01-01", f"{int(year) + 1}-01-01"
+
+
+def month_range(year: int, month: int) -> Rango:
+    """Rango semiabierto del mes [1° del mes, 1° del mes siguiente)"""
+    return months_range(year, month, month)
+
+
+def months_range(year: int, mes_inicio: int, mes_fin: int) -> Rango:
+    """Rango semiabierto de mes_inicio a mes_fin (ambos incluidos) dentro de un año"""
+    year, mes_inicio, mes_fin = int(year), int(mes_inicio), int(mes_fin)
+    inicio = date(year, mes_inicio, 1)
+    fin = _first_of_next_month(year, mes_fin)
+    return inicio.strftime(_DATE_FMT), fin.strftime(_DATE_FMT)
+
+
+def day_range(fecha: DateLike) -> Rango:
+    """Rango semiabierto de un día calendario [fecha, fecha+1)"""
+    return days_range(fecha, fecha)
+
+
+def days_range(fecha_inicio: DateLike, fecha_fin: DateLike) -> Rango:
+    """Rango semiabierto de fecha_inicio a fecha_fin (ambas incluidas)"""
+    inicio = _as_date(fecha_inicio)
+    fin = _as_date(fecha_fin) + timedelta(days=1)
+    return inicio.strftime(_DATE_FMT), fin.strftime(_DATE_FMT)
+
+
+def shift_range(fecha: DateLike, turno: str) -> Rango:
+    """
+    Rango semiabierto de un turno de 12 horas
+
+    Args:
+        fecha: Fecha de inicio del turno (el turno C termina al día siguiente)
+        turno: 'A' (08:00-20:00) o 'C' (20:00-08:00)
+    """
+    turno_norm = str(turno).upper()
+    if turno_norm not in TURNOS:
+        raise ValueError(f"Turno inválido: {turno}. Use: {', '.join(TURNOS)}")
+    inicio = datetime.combine(_as_date(fecha), datetime.min.time()) + timedelta(hours=TURNOS[turno_norm])
+    fin = inicio + timedelta(hours=HORAS_TURNO)
+    return inicio.strftime(_DATETIME_FMT), fin.strftime(_DATETIME_FMT)
+
+
+def range_clause(column: str, rango: Rango) -> Tuple[str, List[str]]:
+    """
+    Predicado sargable para un rango semiabierto
+
+    Returns:
+        ("column >= ? AND column < ?", [inicio, fin])
+    """
+    inicio, fin = rango
+    return f"{column} >= ? AND {column} < ?", [inicio, fin]
@@ -0,0 +1,325 @@
+# services/db_migrations.py
+"""
+Migraciones versionadas de índices para minedash.db - MineDash AI
+División Salvador - Codelco Chile
+
+El único índice documentado era idx_by_timestamp, pero los filtros de las
+herramientas combinan el rango de timestamp con tipo, equipo o empresa, y
+hexagon_estados se filtra por (equipo, fecha). Este módulo:
+
+- Aplica migraciones numeradas (schema_migrations guarda cuáles corrieron)
+  con índices compuestos / cubrientes para esos patrones de acceso
+- Mantiene los índices declarados en tablas nuevas que calzan con el patrón
+  (ej. hexagon_by_detail_dumps_2026 al ingestarse el año nuevo)
+- Ejecuta ANALYZE (con analysis_limit) cuando crea índices, para que el
+  planificador los elija
+- Reporta con EXPLAIN QUERY PLAN qué consultas de herramientas siguen
+  haciendo SCAN completo
+
+Las columnas de igualdad van antes que la de rango: tipo = 'Truck' AND
+timestamp BETWEEN ... usa (tipo, timestamp) con un solo seek, mientras que
+(timestamp, tipo) recorre todo el rango.
+
+Uso:
+    python -m services.db_migrations              # aplicar pendientes + mantener
+    python -m services.db_migrations --status
+    python -m services.db_migrations --explain    # reporte de full scans
+"""
+
+import fnmatch
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from services.db_pool import get_db_pool
+
+
+class Index(NamedTuple):
+    """Índice declarado; table acepta comodines (hexagon_by_detail_dumps_*)"""
+    suffix: str
+    table: str
+    columns: Tuple[str, ...]
+
+
+class DropIndex(NamedTuple):
+    name: str
+
+
+# =============================================================================
+# MIGRACIONES
+# =============================================================================
+
+MIGRATIONS: List[Tuple[int, str, List]] = [
+    (1, "kpi_hora / kpi_hora2: tipo, equipo y gaviota", [
+        # Gaviota (api_routes, gaviota_analysis): rango + turno → SUM(tonelaje) por hora, cubriente
+        Index("ts_turno_hora", "hexagon_by_kpi_hora", ("timestamp", "turno", "hora", "material_tonnage")),
+        # smart_alerts, match_pala_camion: tipo = 'Truck' / IN ('Shovel', 'Truck') + rango
+        Index("tipo_ts", "hexagon_by_kpi_hora", ("tipo", "timestamp")),
+        # Estado / historial de un equipo
+        Index("equipo_ts", "hexagon_by_kpi_hora", ("equipment_id", "timestamp")),
+        # analisis_utilizacion_caex, analisis_causa_raiz_uebd: empresa + tipo + rango, cubriente
+        Index("empresa_tipo_ts", "hexagon_by_kpi_hora2", (
+            "empresa", "tipo", "timestamp", "equipment_id", "tponominal", "tpodisponible", "tpoefectivoreal"
+        )),
+        Index("equipo_ts", "hexagon_by_kpi_hora2", ("equipment_id", "timestamp")),
+    ]),
+    (2, "hexagon_estados: equipo y categoría", [
+        # Causa raíz por equipo, cubriente
+        Index("equipo_fecha", "hexagon_estados", ("equipo", "fecha", "categoria", "estado", "razon", "horas")),
+        # Pareto de delays: rango + categoría, cubriente
+        Index("fecha_categoria", "hexagon_estados", ("fecha", "categoria", "razon", "estado", "horas")),
+    ]),
+    (3, "particiones por año de dumps y equipment_times", [
+        Index("timestamp", "hexagon_by_detail_dumps_*", ("timestamp",)),
+        Index("equipo_ts", "hexagon_by_detail_dumps_*", ("truck_equipment_name", "timestamp")),
+        Index("timestamp", "hexagon_by_equipment_times_*", ("timestamp",)),
+        Index("tipo_ts", "hexagon_by_equipment_times_*", ("equipment_type", "timestamp")),
+    ]),
+    (4, "claves de dimensión operador_id / equipo_id", [
+        # Columnas agregadas por services/dimensions; también resuelven "id IS NULL" del refresco
+        Index("operador_id_ts", "hexagon_by_detail_dumps_*", ("operador_id", "timestamp")),
+        Index("equipo_id_ts", "hexagon_by_detail_dumps_*", ("equipo_id", "timestamp")),
+        Index("equipo_id_ts", "hexagon_by_kpi_hora", ("equipo_id", "timestamp")),
+        Index("equipo_id_ts", "hexagon_by_kpi_hora2", ("equipo_id", "timestamp")),
+        Index("equipo_id_fecha", "hexagon_estados", ("equipo_id", "fecha")),
+        Index("equipo_id_ts", "hexagon_by_estados_*", ("equipo_id", "timestamp")),
+    ]),
+    (5, "clave de tiempo tiempo_id", [
+        # Columna agregada por services/time_dimension; gaviota por hora del turno, cubriente
+        Index("tiempo_ton", "hexagon_by_kpi_hora", ("tiempo_id", "material_tonnage")),
+        # match_pala_camion: tipo IN ('Shovel', 'Truck') + rango de tiempo_id
+        Index("tipo_tiempo", "hexagon_by_kpi_hora", ("tipo", "tiempo_id")),
+        # Relevos por día
+        Index("tiempo_id", "hexagon_by_detail_dumps_*", ("tiempo_id",)),
+    ]),
+]
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TEXT,
+        seconds REAL
+    )
+"""
+
+
+def _tables(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _index_name(table: str, suffix: str) -> str:
+    return f"idx_{table}_{suffix}"
+
+
+def _create_index(conn: sqlite3.Connection, spec: Index, tables: Sequence[str]) -> List[Tuple[str, str]]:
+    """Crea el índice en cada tabla que calza con el patrón y tiene las columnas"""
+    creados = []
+    for table in tables:
+        if not fnmatch.fnmatchcase(table, spec.table):
+            continue
+        if not set(spec.columns) <= _columns(conn, table):
+            print(f"   [MIGRATE] {table}: faltan columnas para {spec.suffix} {spec.columns}; se omite")
+            continue
+        name = _index_name(table, spec.suffix)
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (name,)).fetchone():
+            continue
+        inicio = time.perf_counter()
+        conn.execute(f"CREATE INDEX {name} ON {table}({', '.join(spec.columns)})")
+        print(f"   [MIGRATE] {name} creado en {time.perf_counter() - inicio:.1f}s")
+        creados.append((name, table))
+    return creados
+
+
+def _analyze(conn: sqlite3.Connection, tables: Sequence[str]):
+    # analysis_limit acota el muestreo por índice: ANALYZE en segundos y no minutos
+    conn.execute("PRAGMA analysis_limit = 1000")
+    for table in sorted(set(tables)):
+        conn.execute(f"ANALYZE {table}")
+
+
+def applied_versions(conn: sqlite3.Connection) -> Dict[int, str]:
+    if "schema_migrations" not in _tables(conn):
+        return {}
+    return {v: applied for v, applied in conn.execute("SELECT version, applied_at FROM schema_migrations")}
+
+
+def migrate(db_path: str = "minedash.db", tables: Optional[List[str]] = None) -> Dict:
+    """
+    Aplica las migraciones pendientes y mantiene los índices ya declarados
+
+    Args:
+        db_path: Base de datos
+        tables: Limitar el mantenimiento a estas tablas (ej. la recién ingestada)
+
+    Returns:
+        Dict con versiones aplicadas e índices creados
+    """
+    aplicadas = []
+    creados: List[Tuple[str, str]] = []
+    pool = get_db_pool(db_path)
+    with pool.write() as conn:
+        conn.execute(SCHEMA)
+        existentes = _tables(conn)
+        objetivo = [t for t in existentes if tables is None or t in tables]
+        ya_aplicadas = applied_versions(conn)
+
+        for version, name, ops in MIGRATIONS:
+            inicio = time.perf_counter()
+            pendiente = version not in ya_aplicadas
+            for op in ops:
+                if isinstance(op, DropIndex):
+                    if pendiente:
+                        conn.execute(f"DROP INDEX IF EXISTS {op.name}")
+                else:
+                    # Pendiente: todas las tablas; aplicada: solo mantener (tablas nuevas)
+                    creados += _create_index(conn, op, existentes if pendiente else objetivo)
+            if pendiente:
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name, applied_at, seconds) VALUES (?, ?, ?, ?)",
+                    (version, name, datetime.now().isoformat(timespec="seconds"),
+                     round(time.perf_counter() - inicio, 2))
+                )
+                aplicadas.append(version)
+                print(f"   [MIGRATE] v{version} aplicada: {name}")
+
+        if creados:
+            _analyze(conn, [table for _, table in creados])
+
+    if creados:
+        # Los lectores del pool cargaron el esquema/estadísticas antes de los índices
+        pool.reset_readers()
+    return {"aplicadas": aplicadas, "indices_creados": [name for name, _ in creados]}
+
+
+def status(db_path: str = "minedash.db") -> List[Dict]:
+    with get_db_pool(db_path).read() as conn:
+        ya_aplicadas = applied_versions(conn)
+    return [
+        {"version": version, "name": name, "applied_at": ya_aplicadas.get(version)}
+        for version, name, _ in MIGRATIONS
+    ]
+
+
+# =============================================================================
+# REPORTE EXPLAIN QUERY PLAN
+# =============================================================================
+
+_R = ("2025-01-01", "2025-02-01")
+
+# Consultas representativas de las herramientas (mismos filtros que el código)
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("api_routes.get_gaviota", """
+        SELECT hora, SUM(material_tonnage), COUNT(*) FROM hexagon_by_kpi_hora
+        WHERE timestamp >= ? AND timestamp < ? AND turno = ? GROUP BY hora
+    """, _R + ("A",)),
+    ("gaviota por tiempo_id", """
+        SELECT dt.hora_turno, SUM(k.material_tonnage), COUNT(*) FROM hexagon_by_kpi_hora k
+        JOIN dim_tiempo dt ON dt.tiempo_id = k.tiempo_id
+        WHERE k.tiempo_id >= ? AND k.tiempo_id < ? AND dt.turno = ? GROUP BY dt.hora_turno
+    """, (2025010100, 2025020100, "A")),
+    ("smart_alerts UEBD bajo", """
+        SELECT equipment_id, AVG(efectivo * 100.0 / disponible) FROM hexagon_by_kpi_hora
+        WHERE timestamp >= ? AND disponible > 0 AND equipment_id NOT LIKE 'TE%' AND tipo = 'Truck'
+        GROUP BY equipment_id
+    """, _R[:1]),
+    ("match_pala_camion", """
+        SELECT equipment_id, tipo, SUM(nominal) FROM hexagon_by_kpi_hora
+        WHERE timestamp >= ? AND timestamp < ? AND tipo IN ('Shovel', 'Truck') AND nominal > 0
+        GROUP BY equipment_id, tipo
+    """, _R),
+    ("analisis_utilizacion_caex", """
+        SELECT equipment_id, AVG(tpodisponible * 100.0 / tponominal) FROM hexagon_by_kpi_hora2
+        WHERE empresa = 'CODELCO' AND timestamp >= ? AND timestamp < ? AND tipo = 'Truck' AND tponominal > 0
+        GROUP BY equipment_id
+    """, _R),
+    ("analisis_causa_raiz_uebd estados", """
+        SELECT e.equipo, e.categoria, e.estado, e.razon, SUM(e.horas)
+        FROM (SELECT DISTINCT equipment_id AS equipo FROM hexagon_by_kpi_hora2
+              WHERE empresa = 'CODELCO' AND tipo = 'Truck' AND timestamp >= ? AND timestamp < ?) m
+        JOIN hexagon_estados e ON e.equipo = m.equipo AND e.fecha >= ? AND e.fecha < ?
+        GROUP BY e.equipo, e.categoria, e.estado, e.razon
+    """, _R + _R),
+    ("pareto_analytics.get_pareto_delays", """
+        SELECT categoria, razon, estado, SUM(horas) FROM hexagon_estados
+        WHERE fecha >= ? AND fecha < ? AND categoria IN ('M. CORRECTIVA', 'DET.NOPRG.', 'DET.PROG.', 'M. PROGRAMADA')
+        GROUP BY categoria, razon, estado
+    """, _R),
+    ("dumps por mes (2025)", """
+        SELECT SUM(material_tonnage) FROM hexagon_by_detail_dumps_2025
+        WHERE timestamp >= ? AND timestamp < ?
+    """, _R),
+    ("equipment_times por tipo (2025)", """
+        SELECT equipment_type, SUM(total) FROM hexagon_by_equipment_times_2025
+        WHERE timestamp >= ? AND timestamp < ? GROUP BY equipment_type
+    """, _R),
+]
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> List[str]:
+    """Líneas de EXPLAIN QUERY PLAN de una consulta"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", tuple(params))]
+
+
+def is_full_scan(plan_line: str, materialized: Sequence[str] = ()) -> bool:
+    """
+    SCAN <tabla> recorre la tabla completa; SCAN ... USING INDEX recorre el
+    índice completo (p. ej. para evitar un ORDER/GROUP BY), que también crece
+    con la tabla. Solo SEARCH acota por rango.
+
+    materialized: nombres de subconsultas/CTE ya materializadas en el plan
+    (MATERIALIZE x / CO-ROUTINE x); recorrerlas no toca la tabla.
+    """
+    if not plan_line.startswith("SCAN "):
+        return False
+    if plan_line.split()[1] in materialized:
+        return False
+    return not (plan_line.startswith("SCAN CONSTANT ROW") or "SUBQUERY" in plan_line or plan_line.startswith("SCAN ("))
+
+
+def explain_report(db_path: str = "minedash.db") -> List[Dict]:
+    """
+    Plan de cada consulta de HOT_QUERIES y si hace full scan
+
+    Returns:
+        Lista de {query, plan, full_scan} (full_scan=None si la tabla no existe)
+    """
+    reporte = []
+    with get_db_pool(db_path).read() as conn:
+        for name, sql, params in HOT_QUERIES:
+            try:
+                plan = explain(conn, sql, params)
+                materialized = [line.split()[1] for line in plan
+                                if line.startswith(("MATERIALIZE ", "CO-ROUTINE "))]
+                full_scan = any(is_full_scan(line, materialized) for line in plan)
+            except sqlite3.Error as e:
+                plan, full_scan = [f"no disponible: {e}"], None
+            reporte.append({"query": name, "plan": plan, "full_scan": full_scan})
+    return reporte
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migraciones de índices de minedash.db")
+    parser.add_argument("--db", default="minedash.db")
+    parser.add_argument("--status", action="store_true", help="Ver migraciones aplicadas")
+    parser.add_argument("--explain", action="store_true", help="Reporte EXPLAIN QUERY PLAN")
+    args = parser.parse_args()
+
+    if args.status:
+        for row in status(args.db):
+            print(f"v{row['version']:<3} {row['applied_at'] or 'PENDIENTE':<20} {row['name']}")
+    elif args.explain:
+        for row in explain_report(args.db):
+            marca = {True: "FULL SCAN", False: "ok", None: "-"}[row["full_scan"]]
+            print(f"[{marca:>9}] {row['query']}")
+            for line in row["plan"]:
+                print(f"            {line}")
+    else:
+        print(migrate(args.db))
@@ -0,0 +1,242 @@
+# services/db_pool.py
+"""
+Pool de conexiones SQLite para minedash.db - MineDash AI
+División Salvador - Codelco Chile
+
+Cada rama de herramienta, endpoint y servicio abría su propio
+sqlite3.connect(...) por llamada, perdiendo el page cache en cada consulta
+(y algunas nunca cerraban la conexión en rutas de error). Este módulo
+mantiene, por archivo de base de datos:
+
+- Conexiones de LECTURA reutilizables, abiertas en modo URI read-only con
+  mmap_size, cache_size, temp_store=MEMORY y query_only
+- UNA conexión de ESCRITURA serializada con un lock (rollups, ingesta,
+  parámetros económicos). Al crearla se activa journal_mode=WAL, para que
+  los lectores no se bloqueen mientras se escribe
+
+Uso (reemplazo directo de sqlite3.connect):
+    conn = get_db_pool(self.db_path).connect()
+    ...
+    conn.close()            # devuelve la conexión al pool
+
+    with get_db_pool().read() as conn:
+        conn.execute("SELECT ...")
+
+    with get_db_pool().write() as conn:    # commit al salir, rollback si falla
+        conn.execute("INSERT ...")
+
+Las conexiones son sqlite3.Connection reales (subclase), por lo que
+pd.read_sql_query y conn.row_factory funcionan igual que antes.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+
+class PooledConnection(sqlite3.Connection):
+    """Conexión de lectura cuyo close() la devuelve al pool"""
+
+    _pool: Optional["SQLitePool"] = None
+    _generation = 0
+
+    def close(self):
+        pool = self._pool
+        if pool is None:
+            super().close()
+        else:
+            pool._release(self)
+
+    def _really_close(self):
+        self._pool = None
+        super().close()
+
+
+class SQLitePool:
+    """Pool de lectores read-only + escritor único para un archivo SQLite"""
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int = 8,
+        mmap_size_mb: int = 256,
+        cache_size_mb: int = 64
+    ):
+        self.db_path = str(Path(db_path).resolve())
+        self.size = size
+        self.mmap_size = mmap_size_mb * 1024 ** 2
+        self.cache_size_kb = cache_size_mb * 1024
+        self._idle: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.in_use = 0
+        self.writes = 0
+        self._generation = 0
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def _open_reader(self) -> PooledConnection:
+        uri = f"{Path(self.db_path).as_uri()}?mode=ro"
+        conn = sqlite3.connect(
+            uri, uri=True, factory=PooledConnection, check_same_thread=False, timeout=30
+        )
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA cache_size = -{self.cache_size_kb}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = ON")
+        with self._lock:
+            self.created += 1
+            conn._generation = self._generation
+        return conn
+
+    def connect(self) -> PooledConnection:
+        """Toma una conexión de lectura (close() la devuelve al pool)"""
+        if not os.path.exists(self.db_path):
+            raise sqlite3.OperationalError(f"Base de datos no encontrada: {self.db_path}")
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.reused += 1
+        except queue.Empty:
+            conn = self._open_reader()
+        conn._pool = self
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def _release(self, conn: PooledConnection):
+        with self._lock:
+            self.in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            conn.text_factory = str
+            conn.set_progress_handler(None, 0)
+        except sqlite3.Error:
+            with self._lock:
+                self.discarded += 1
+            conn._really_close()
+            return
+        if conn._generation == self._generation and self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn._really_close()
+
+    @contextmanager
+    def read(self) -> Iterator[PooledConnection]:
+        conn = self.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def _open_writer(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=60)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{self.cache_size_kb}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Conexión de escritura exclusiva (una a la vez por proceso)
+
+        Commit al salir del bloque, rollback si hay excepción.
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._open_writer()
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+                with self._lock:
+                    self.writes += 1
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def reset_readers(self):
+        """
+        Cierra los lectores ociosos (los que estén en uso se cierran al devolverse)
+
+        Llamar tras crear índices o ANALYZE: un lector abierto conserva el
+        esquema y las estadísticas del planificador con que se abrió.
+        """
+        with self._lock:
+            self._generation += 1
+        while True:
+            try:
+                self._idle.get_nowait()._really_close()
+            except queue.Empty:
+                break
+
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "in_use": self.in_use,
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+                "writes": self.writes,
+            }
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait()._really_close()
+            except queue.Empty:
+                break
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_pools: Dict[str, SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_db_pool(db_path: str = "minedash.db") -> SQLitePool:
+    """Pool compartido por proceso para un archivo de base de datos"""
+    key = str(Path(db_path).resolve())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                from config import Config
+                pool = SQLitePool(
+                    key,
+                    size=Config.DB_POOL_SIZE,
+                    mmap_size_mb=Config.DB_MMAP_SIZE_MB,
+                    cache_size_mb=Config.DB_CACHE_SIZE_MB
+                )
+                _pools[key] = pool
+    return pool
+
+
+def db_pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {path: pool.stats() for path, pool in _pools.items()}
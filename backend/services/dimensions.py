@@ -0,0 +1,473 @@
+# services/dimensions.py
+"""
+Dimensiones de operador y equipo con claves enteras - MineDash AI
+División Salvador - Codelco Chile
+
+La identidad del operador se reconstruía concatenando
+truck_operator_last_name/first_name en cada consulta y se buscaba con
+LIKE '%texto%'; el tipo de equipo se deducía con LIKE 'CE%' / NOT LIKE 'TE%'.
+Este módulo mantiene, al momento de la ingesta:
+
+    dim_operador        operador_id, nombre normalizado "APELLIDO NOMBRE"
+    dim_operador_alias  (apellido, nombre) crudos → operador_id
+    dim_equipo          equipo_id, código normalizado, flota (prefijo),
+                        tipo, modelo, empresa, es_tercero
+    dim_equipo_alias    código crudo → equipo_id
+
+y agrega a las tablas de hechos las columnas operador_id / equipo_id
+(indexadas vía services/db_migrations), de modo que los filtros son
+igualdad de enteros o joins contra la dimensión en vez de escaneos de texto.
+
+El id 0 es el miembro "desconocido" (nombre vacío/inválido, código nulo).
+
+Refresco incremental: solo se resuelven las filas con id NULL (las recién
+ingestadas). Lectura: como services/data_catalog, los helpers caen al
+filtro por texto si la tabla todavía no tiene los ids completos.
+
+Uso:
+    python -m services.dimensions                  # refresco incremental
+    python -m services.dimensions --tabla hexagon_by_kpi_hora
+"""
+
+import fnmatch
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from services.db_pool import get_db_pool
+
+
+# =============================================================================
+# ESQUEMA
+# =============================================================================
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS dim_operador (
+        operador_id INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL UNIQUE,
+        apellido TEXT,
+        nombres TEXT,
+        updated_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dim_operador_alias (
+        apellido_raw TEXT NOT NULL,
+        nombres_raw TEXT NOT NULL,
+        operador_id INTEGER NOT NULL,
+        PRIMARY KEY (apellido_raw, nombres_raw)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dim_equipo (
+        equipo_id INTEGER PRIMARY KEY,
+        codigo TEXT NOT NULL UNIQUE,
+        flota TEXT,
+        tipo TEXT,
+        modelo TEXT,
+        empresa TEXT,
+        es_tercero INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dim_equipo_alias (
+        codigo_raw TEXT PRIMARY KEY,
+        equipo_id INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_dim_equipo_flota ON dim_equipo(flota, equipo_id)",
+    "INSERT OR IGNORE INTO dim_operador (operador_id, nombre) VALUES (0, '(DESCONOCIDO)')",
+    "INSERT OR IGNORE INTO dim_equipo (equipo_id, codigo) VALUES (0, '(DESCONOCIDO)')",
+]
+
+# Flotas de terceros (camiones tercerizados TE)
+FLOTAS_TERCEROS = {"TE"}
+
+NOMBRES_INVALIDOS = {"NAN", "NONE"}
+
+
+class FactKey(NamedTuple):
+    """Columna id de una tabla de hechos; table acepta comodines"""
+    table: str
+    id_column: str
+    dimension: str                   # "operador" | "equipo"
+    source_columns: Tuple[str, ...]  # operador: (apellido, nombre); equipo: candidatas por preferencia
+
+
+FACT_KEYS: List[FactKey] = [
+    FactKey("hexagon_by_detail_dumps_*", "operador_id", "operador",
+            ("truck_operator_last_name", "truck_operator_first_name")),
+    FactKey("hexagon_by_detail_dumps_*", "equipo_id", "equipo", ("truck_equipment_name", "truck_id")),
+    FactKey("hexagon_by_kpi_hora", "equipo_id", "equipo", ("equipment_id",)),
+    FactKey("hexagon_by_kpi_hora2", "equipo_id", "equipo", ("equipment_id",)),
+    FactKey("hexagon_estados", "equipo_id", "equipo", ("equipo",)),
+    FactKey("hexagon_by_estados_*", "equipo_id", "equipo", ("equipment_id",)),
+]
+
+DIM_TABLES = {
+    "operador_id": "dim_operador",
+    "equipo_id": "dim_equipo",
+    "tiempo_id": "dim_tiempo",  # services/time_dimension
+}
+
+# Atributos de dim_equipo que aportan las tablas que los tienen
+ATRIBUTOS_EQUIPO = {"tipo": "tipo", "equipment_type": "modelo", "empresa": "empresa"}
+
+
+def keys_for(table: str) -> List[FactKey]:
+    """Columnas id que corresponden a una tabla (vacío = sin dimensiones)"""
+    return [k for k in FACT_KEYS if fnmatch.fnmatchcase(table, k.table)]
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+
+
+def _tables(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+# =============================================================================
+# NORMALIZACIÓN
+# =============================================================================
+
+def _limpiar(parte: pd.Series) -> pd.Series:
+    parte = parte.astype(object).where(parte.notna(), "").astype(str).str.strip().str.upper()
+    return parte.where(~parte.isin(NOMBRES_INVALIDOS), "")
+
+
+def normalizar_operador(apellido: pd.Series, nombre: pd.Series) -> pd.Series:
+    """
+    "APELLIDO NOMBRE" en mayúsculas con espacios colapsados; None si el
+    nombre completo no es válido ('NAN NAN', 'NONE NONE', vacío o de 5
+    caracteres o menos). Un apellido o nombre faltante solo no descarta la
+    fila ('PEREZ NAN' se conserva), igual que el ranking original.
+
+    Aplicar sobre valores únicos: es la misma regla que usan los rankings.
+    """
+    def _parte(serie: pd.Series) -> pd.Series:
+        # str() por valor: None → 'NONE', NaN → 'NAN' (como astype(str) en pandas 2.x)
+        return serie.astype(object).map(str).str.strip().str.upper()
+
+    nombres = (_parte(apellido) + " " + _parte(nombre)).str.replace(r"\s+", " ", regex=True)
+    validos = nombres.notna() & ~nombres.isin(["NAN NAN", "NONE NONE", " ", ""]) & (nombres.str.len() > 5)
+    return nombres.astype(object).where(validos, None)
+
+
+def normalizar_equipo(codigo: pd.Series) -> pd.Series:
+    """Código en mayúsculas sin espacios ('443.0' → '443'); None si está vacío"""
+    codigos = _limpiar(codigo).str.replace(r"\.0$", "", regex=True).str.replace(r"\s+", "", regex=True)
+    return codigos.where(codigos != "", None)
+
+
+def flota_de(codigos: pd.Series) -> pd.Series:
+    """Prefijo alfabético del código (CE101 → CE, CA-110 → CA)"""
+    return codigos.str.extract(r"^([A-Z]+)", expand=False)
+
+
+# =============================================================================
+# REFRESCO
+# =============================================================================
+
+def _ensure_id_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    """Agrega la columna id si falta (ALTER TABLE ADD COLUMN es O(1) en SQLite)"""
+    if column in _columns(conn, table):
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER")
+    return True
+
+
+def _resolver_operadores(conn: sqlite3.Connection, table: str, key: FactKey) -> int:
+    ap, no = key.source_columns
+    ahora = datetime.now().isoformat(timespec="seconds")
+    nuevos = pd.read_sql_query(f"""
+        SELECT DISTINCT f.apellido_raw, f.nombres_raw
+        FROM (
+            SELECT CAST(COALESCE({ap}, '') AS TEXT) AS apellido_raw,
+                   CAST(COALESCE({no}, '') AS TEXT) AS nombres_raw
+            FROM {table}
+            WHERE {key.id_column} IS NULL
+        ) f
+        WHERE NOT EXISTS (
+            SELECT 1 FROM dim_operador_alias a
+            WHERE a.apellido_raw = f.apellido_raw AND a.nombres_raw = f.nombres_raw
+        )
+    """, conn)
+    if nuevos.empty:
+        return 0
+
+    nuevos["nombre"] = normalizar_operador(nuevos["apellido_raw"], nuevos["nombres_raw"])
+    validos = nuevos[nuevos["nombre"].notna()].drop_duplicates("nombre")
+    conn.executemany(
+        "INSERT OR IGNORE INTO dim_operador (nombre, apellido, nombres, updated_at) VALUES (?, ?, ?, ?)",
+        [(r.nombre, r.apellido_raw.strip().upper(), r.nombres_raw.strip().upper(), ahora)
+         for r in validos.itertuples(index=False)]
+    )
+    ids = dict(conn.execute("SELECT nombre, operador_id FROM dim_operador"))
+    conn.executemany(
+        "INSERT OR IGNORE INTO dim_operador_alias (apellido_raw, nombres_raw, operador_id) VALUES (?, ?, ?)",
+        [(r.apellido_raw, r.nombres_raw, ids.get(r.nombre, 0) if r.nombre else 0)
+         for r in nuevos.itertuples(index=False)]
+    )
+    return int(validos["nombre"].isin(ids).sum())
+
+
+def _resolver_equipos(conn: sqlite3.Connection, table: str, key: FactKey, columna: str) -> int:
+    columnas = _columns(conn, table)
+    atributos = {src: dst for src, dst in ATRIBUTOS_EQUIPO.items() if src in columnas}
+    ahora = datetime.now().isoformat(timespec="seconds")
+    select_attrs = "".join(f", MAX({src}) AS {dst}" for src, dst in atributos.items())
+    vistos = pd.read_sql_query(f"""
+        SELECT CAST({columna} AS TEXT) AS codigo_raw{select_attrs}
+        FROM {table}
+        WHERE {key.id_column} IS NULL AND {columna} IS NOT NULL
+        GROUP BY CAST({columna} AS TEXT)
+    """, conn)
+    if vistos.empty:
+        return 0
+
+    vistos["codigo"] = normalizar_equipo(vistos["codigo_raw"])
+    vistos = vistos[vistos["codigo"].notna()]
+    vistos["flota"] = flota_de(vistos["codigo"])
+    for dst in ("tipo", "modelo", "empresa"):
+        if dst not in vistos.columns:
+            vistos[dst] = None
+    vistos = vistos.astype(object).where(vistos.notna(), None)
+
+    antes = conn.execute("SELECT COUNT(*) FROM dim_equipo").fetchone()[0]
+    # Atributos: se completan los que faltaban, no se pisan los conocidos
+    conn.executemany("""
+        INSERT INTO dim_equipo (codigo, flota, tipo, modelo, empresa, es_tercero, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(codigo) DO UPDATE SET
+            tipo = COALESCE(dim_equipo.tipo, excluded.tipo),
+            modelo = COALESCE(dim_equipo.modelo, excluded.modelo),
+            empresa = COALESCE(dim_equipo.empresa, excluded.empresa),
+            updated_at = excluded.updated_at
+    """, [
+        (r.codigo, r.flota, r.tipo, r.modelo, r.empresa, int(r.flota in FLOTAS_TERCEROS), ahora)
+        for r in vistos.drop_duplicates("codigo").itertuples(index=False)
+    ])
+    ids = dict(conn.execute("SELECT codigo, equipo_id FROM dim_equipo"))
+    conn.executemany(
+        "INSERT OR IGNORE INTO dim_equipo_alias (codigo_raw, equipo_id) VALUES (?, ?)",
+        [(r.codigo_raw, ids[r.codigo]) for r in vistos.itertuples(index=False)]
+    )
+    return conn.execute("SELECT COUNT(*) FROM dim_equipo").fetchone()[0] - antes
+
+
+def refresh_table(conn: sqlite3.Connection, table: str) -> Dict:
+    """Resuelve los ids de las filas nuevas de una tabla de hechos (conexión de escritura)"""
+    keys = keys_for(table)
+    if not keys or table not in _tables(conn):
+        return {"table": table, "skipped": "sin dimensiones"}
+
+    resultado = {"table": table}
+    for key in keys:
+        columnas = _columns(conn, table)
+        if key.dimension == "operador":
+            if not set(key.source_columns) <= set(columnas):
+                continue
+            columna = None
+        else:
+            columna = next((c for c in key.source_columns if c in columnas), None)
+            if columna is None:
+                continue
+
+        with conn:
+            creada = _ensure_id_column(conn, table, key.id_column)
+            if key.dimension == "operador":
+                ap, no = key.source_columns
+                nuevos = _resolver_operadores(conn, table, key)
+                match = f"""
+                    SELECT a.operador_id FROM dim_operador_alias a
+                    WHERE a.apellido_raw = CAST(COALESCE({table}.{ap}, '') AS TEXT)
+                      AND a.nombres_raw = CAST(COALESCE({table}.{no}, '') AS TEXT)
+                """
+            else:
+                nuevos = _resolver_equipos(conn, table, key, columna)
+                match = f"""
+                    SELECT a.equipo_id FROM dim_equipo_alias a
+                    WHERE a.codigo_raw = CAST({table}.{columna} AS TEXT)
+                """
+            filas = conn.execute(f"""
+                UPDATE {table} SET {key.id_column} = COALESCE(({match}), 0)
+                WHERE {key.id_column} IS NULL
+            """).rowcount
+
+        resultado[key.id_column] = {"columna_creada": creada, "nuevos": nuevos, "filas": filas}
+    return resultado
+
+
+def refresh_dimensions(db_path: str = "minedash.db", tables: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Refresco incremental de dimensiones e ids en las tablas de hechos
+
+    Llamar después de cada carga de datos Hexagon (ver services/ingestion).
+    Crea los índices por id declarados en services/db_migrations.
+    """
+    from services import db_migrations
+
+    resultados = []
+    with get_db_pool(db_path).write() as conn:
+        ensure_schema(conn)
+        conn.commit()
+        objetivo = [t for t in (tables or _tables(conn)) if keys_for(t)]
+        for table in objetivo:
+            inicio = time.perf_counter()
+            resultado = refresh_table(conn, table)
+            resultado["segundos"] = round(time.perf_counter() - inicio, 2)
+            print(f"   [DIM] {table}: {resultado}")
+            resultados.append(resultado)
+
+    if objetivo:
+        db_migrations.migrate(db_path, tables=objetivo)
+    invalidate_freshness(db_path)
+    return resultados
+
+
+# =============================================================================
+# FRESCURA
+# =============================================================================
+
+_freshness: Dict[Tuple[str, str, str], Tuple[float, bool]] = {}
+_freshness_lock = threading.Lock()
+
+
+def invalidate_freshness(db_path: Optional[str] = None):
+    with _freshness_lock:
+        if db_path is None:
+            _freshness.clear()
+        else:
+            db_path = str(Path(db_path).resolve())
+            for key in [k for k in _freshness if k[0] == db_path]:
+                _freshness.pop(key, None)
+
+
+def ids_ready(conn: sqlite3.Connection, table: str, id_column: str = "equipo_id") -> bool:
+    """
+    True si la tabla tiene la columna id y ninguna fila sin resolver
+    (chequeo por el índice de id, cacheado DIMENSIONS_FRESHNESS_TTL s)
+    """
+    from config import Config
+
+    row = conn.execute("PRAGMA database_list").fetchone()
+    key = (row[2] if row else "", table, id_column)
+    now = time.monotonic()
+    with _freshness_lock:
+        cached = _freshness.get(key)
+    if cached and now - cached[0] < Config.DIMENSIONS_FRESHNESS_TTL:
+        return cached[1]
+
+    try:
+        ready = (
+            id_column in _columns(conn, table)
+            and DIM_TABLES[id_column] in _tables(conn)
+            and conn.execute(f"SELECT 1 FROM {table} WHERE {id_column} IS NULL LIMIT 1").fetchone() is None
+        )
+    except sqlite3.Error:
+        ready = False
+
+    with _freshness_lock:
+        _freshness[key] = (now, ready)
+    return ready
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+
+def _codigo_column(table: str, columnas: Sequence[str]) -> Optional[str]:
+    for key in keys_for(table):
+        if key.dimension == "equipo":
+            return next((c for c in key.source_columns if c in columnas), None)
+    return None
+
+
+def filtro_equipos(
+    conn: sqlite3.Connection,
+    table: str,
+    alias: str = "",
+    flota: Optional[str] = None,
+    excluir_terceros: bool = False
+) -> Tuple[str, list]:
+    """
+    Fragmento "AND ..." que filtra una tabla de hechos por atributos de equipo
+
+    Con ids resueltos: equipo_id IN (SELECT ... FROM dim_equipo ...).
+    Si no: LIKE por prefijo sobre la columna de código (comportamiento anterior).
+
+    Returns:
+        (sql, params)
+    """
+    prefijo = f"{alias}." if alias else ""
+    condiciones, params = [], []
+
+    if ids_ready(conn, table, "equipo_id"):
+        if flota:
+            condiciones.append(f"{prefijo}equipo_id IN (SELECT equipo_id FROM dim_equipo WHERE flota = ?)")
+            params.append(flota)
+        if excluir_terceros:
+            condiciones.append(f"{prefijo}equipo_id NOT IN (SELECT equipo_id FROM dim_equipo WHERE es_tercero = 1)")
+    else:
+        columna = _codigo_column(table, _columns(conn, table)) or "equipment_id"
+        if flota:
+            condiciones.append(f"{prefijo}{columna} LIKE ?")
+            params.append(f"{flota}%")
+        for terceros in sorted(FLOTAS_TERCEROS) if excluir_terceros else []:
+            condiciones.append(f"{prefijo}{columna} NOT LIKE ?")
+            params.append(f"{terceros}%")
+
+    sql = "".join(f" AND {c}" for c in condiciones)
+    return sql, params
+
+
+def buscar_operadores(conn: sqlite3.Connection, texto: str, limit: int = 20) -> Optional[List[Tuple[int, str]]]:
+    """
+    Operadores cuyo nombre normalizado contiene el texto (búsqueda sobre la
+    dimensión, no sobre la tabla de hechos). None si la dimensión no existe.
+    """
+    if "dim_operador" not in _tables(conn):
+        return None
+    patron = f"%{' '.join(str(texto).upper().split())}%"
+    return [
+        (int(operador_id), nombre) for operador_id, nombre in conn.execute(
+            "SELECT operador_id, nombre FROM dim_operador WHERE operador_id > 0 AND nombre LIKE ? LIMIT ?",
+            (patron, limit)
+        )
+    ]
+
+
+def ids_operadores(db_path: str = "minedash.db") -> Dict[str, int]:
+    """Mapa nombre normalizado → operador_id (vacío si la dimensión no existe)"""
+    try:
+        with get_db_pool(db_path).read() as conn:
+            if "dim_operador" not in _tables(conn):
+                return {}
+            return dict(conn.execute("SELECT nombre, operador_id FROM dim_operador WHERE operador_id > 0"))
+    except sqlite3.Error:
+        return {}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresca dimensiones de operador y equipo")
+    parser.add_argument("--db", default="minedash.db")
+    parser.add_argument("--tabla", action="append", default=None, help="Limitar a estas tablas")
+    args = parser.parse_args()
+
+    for r in refresh_dimensions(args.db, tables=args.tabla):
+        print(r)
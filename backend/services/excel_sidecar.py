@@ -0,0 +1,204 @@
+# services/excel_sidecar.py
+"""
+Sidecar columnar (Parquet) para exportaciones Excel de Hexagon - MineDash AI
+División Salvador - Codelco Chile
+
+Parsear by_detail_dumps {year}.xlsx o by_equipment_times {year} p1/p2.xlsx
+con pd.read_excel toma decenas de segundos. La primera vez que se lee un
+workbook se escribe un Parquet tipado al lado:
+
+    data/Hexagon/.parquet/by_detail_dumps 2024.xlsx.parquet
+    data/Hexagon/.parquet/by_detail_dumps 2024.xlsx.parquet.json  (firma de la fuente)
+
+Las lecturas siguientes cargan solo las columnas pedidas desde el Parquet
+(memory-mapped). Si el Excel cambia (mtime/tamaño) el sidecar se regenera.
+Sin pyarrow instalado se degrada a pd.read_excel (mismo resultado, más lento).
+
+Columnas con tipos mezclados (ej. códigos ASARCO numéricos y texto) no caben
+en una columna Parquet: solo esas columnas se guardan como texto (123 → "123",
+nulos se mantienen) y el .json las lista en "str_columns". El resto del
+workbook conserva sus tipos y sigue usando el sidecar.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pq = None
+    PARQUET_AVAILABLE = False
+    print("[WARN] pyarrow no disponible - lectura directa de Excel (sin sidecar Parquet)")
+
+
+SIDECAR_DIRNAME = ".parquet"
+
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def _sidecar_paths(file_path: Path, sheet_name: Optional[str]):
+    suffix = f".{sheet_name}" if sheet_name else ""
+    base = file_path.parent / SIDECAR_DIRNAME / f"{file_path.name}{suffix}.parquet"
+    return base, base.with_name(base.name + ".json")
+
+
+def _source_signature(file_path: Path) -> dict:
+    st = os.stat(file_path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _read_meta(meta_path: Path) -> Optional[dict]:
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_fresh(parquet_path: Path, meta_path: Path, signature: dict) -> bool:
+    if not parquet_path.exists():
+        return False
+    meta = _read_meta(meta_path)
+    # "skipped": sidecar descartado por versiones anteriores (columnas mezcladas) → regenerar
+    return meta is not None and meta.get("source") == signature and not meta.get("skipped")
+
+
+def _mixed_columns(df: pd.DataFrame) -> List[str]:
+    """Columnas object con tipos mezclados (no representables en Parquet sin convertir)"""
+    return [
+        col for col in df.columns
+        if df[col].dtype == object
+        and pd.api.types.infer_dtype(df[col], skipna=True) in ("mixed", "mixed-integer")
+    ]
+
+
+def _as_text(serie: pd.Series) -> pd.Series:
+    """Valores → str, conservando nulos"""
+    return serie.map(lambda v: None if pd.isna(v) else str(v)).astype(object)
+
+
+def _build_lock(parquet_path: Path) -> threading.Lock:
+    with _build_locks_guard:
+        return _build_locks.setdefault(str(parquet_path), threading.Lock())
+
+
+def _build(file_path: Path, sheet_name: Optional[str], force: bool) -> Tuple[Optional[Path], Optional[pd.DataFrame]]:
+    """
+    Genera el sidecar si falta o está desactualizado
+
+    Returns:
+        (ruta del Parquet o None si no se pudo escribir,
+         frame leído del Excel si hubo que leerlo y no quedó sidecar; None si no)
+    """
+    parquet_path, meta_path = _sidecar_paths(file_path, sheet_name)
+    signature = _source_signature(file_path)
+
+    with _build_lock(parquet_path):
+        if not force and _is_fresh(parquet_path, meta_path, signature):
+            return parquet_path, None
+
+        print(f"   [PARQUET] Generando sidecar para {file_path.name}...")
+        df = pd.read_excel(file_path, sheet_name=sheet_name or 0)
+        df.columns = [str(c) for c in df.columns]
+
+        mixed = _mixed_columns(df)
+        if mixed:
+            print(f"   [PARQUET] {file_path.name}: columnas con tipos mezclados {mixed} guardadas como texto")
+
+        try:
+            parquet_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = parquet_path.with_name(parquet_path.name + ".tmp")
+            df.assign(**{col: _as_text(df[col]) for col in mixed}).to_parquet(
+                tmp_path, engine="pyarrow", index=False
+            )
+            os.replace(tmp_path, parquet_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "source": signature,
+                    "source_name": file_path.name,
+                    "sheet_name": sheet_name,
+                    "rows": len(df),
+                    "columns": list(df.columns),
+                    "str_columns": mixed
+                }, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"   [PARQUET] No se pudo escribir sidecar de {file_path.name}: {e}")
+            return None, df
+
+        print(f"   [PARQUET] {parquet_path.name} listo ({len(df):,} filas)")
+        return parquet_path, None
+
+
+def build_sidecar(file_path, sheet_name: Optional[str] = None, force: bool = False) -> Optional[Path]:
+    """
+    Genera (o regenera si la fuente cambió) el sidecar Parquet de un workbook
+
+    Returns:
+        Ruta del Parquet, o None si pyarrow no está disponible o falla la escritura
+    """
+    if not PARQUET_AVAILABLE:
+        return None
+    return _build(Path(file_path), sheet_name, force)[0]
+
+
+def read_excel_columnar(
+    file_path,
+    sheet_name: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Lee un workbook vía su sidecar Parquet (lo crea/regenera si hace falta)
+
+    Args:
+        file_path: Ruta del Excel
+        sheet_name: Hoja (None = primera)
+        columns: Columnas a cargar (None = todas). Las que no existan se ignoran.
+
+    Returns:
+        DataFrame con las columnas pedidas
+    """
+    file_path = Path(file_path)
+    if not PARQUET_AVAILABLE:
+        # Fallback sin pyarrow: Excel directo
+        usecols = (lambda c: c in set(columns)) if columns else None
+        return pd.read_excel(file_path, sheet_name=sheet_name or 0, usecols=usecols)
+
+    parquet_path, df = _build(file_path, sheet_name, force=False)
+    if parquet_path is None:
+        # No se pudo escribir el sidecar: usar el frame ya leído, sin releer el Excel
+        return df[[c for c in columns if c in df.columns]] if columns else df
+
+    if columns:
+        available = set(pq.read_schema(parquet_path).names)
+        columns = [c for c in columns if c in available]
+    return pd.read_parquet(parquet_path, columns=columns, engine="pyarrow", memory_map=True)
+
+
+def load_hexagon_excel(
+    file_path,
+    sheet_name: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Lectura recomendada para servicios: sidecar Parquet + DataFrameCache compartido
+
+    Retorna una vista superficial del frame cacheado con Copy-on-Write (o una copia
+    sin él, ver services/dataframe_cache.py): agregar/reemplazar columnas o modificar
+    valores (df.loc[...] = x) no altera el frame cacheado.
+    """
+    from services.dataframe_cache import get_dataframe_cache
+
+    variant = ",".join(columns) if columns else ""
+    return get_dataframe_cache().get(
+        str(file_path),
+        sheet_name,
+        loader=lambda: read_excel_columnar(file_path, sheet_name, columns),
+        variant=variant
+    )
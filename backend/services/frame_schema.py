@@ -0,0 +1,160 @@
+# services/frame_schema.py
+"""
+Registro de esquemas compactos para DataFrames cacheados - MineDash AI
+División Salvador - Codelco Chile
+
+Los frames de Hexagon llegaban al cache con equipos, operadores, turno,
+razón y códigos ASARCO como strings de Python (object, ~60 bytes por celda)
+y los enteros como int64. Al cargar un frame en services/dataframe_cache
+se aplica, una sola vez:
+
+- category a las columnas de texto de baja cardinalidad: las declaradas en
+  SCHEMAS para cada exportación y, en cualquier frame, las que tengan
+  valores únicos <= DATAFRAME_CATEGORY_MAX_RATIO × filas (5% por defecto:
+  con más valores únicos la categoría casi no ahorra y rompe .str y la
+  asignación de valores nuevos)
+- datetime64 a las columnas de tiempo declaradas que vengan como texto
+  (solo si todos los valores se pueden interpretar)
+- int64 → int32 si los valores caben. No se baja a int8/int16: los frames
+  llegan a código del LLM (execute_python) y a los módulos de análisis,
+  donde df.a * k, a + b o cumsum desbordarían sin aviso
+
+Los float64 no se reducen: con float32 los totales de tonelaje cambian en
+los últimos dígitos y los escalares np.float32 no se serializan a JSON.
+
+Ojo con categorías: usar groupby(..., observed=True) (en pandas 2.x el
+default agrega las combinaciones sin filas) y no asignar valores nuevos
+in-place sobre una columna category.
+
+Uso:
+    df, reporte = compactar(df, "by_detail_dumps 2025.xlsx")
+    reporte  # {'mb_original': 812.4, 'mb': 96.1, 'ahorro_pct': 88.2, ...}
+"""
+
+import fnmatch
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class FrameSchema(NamedTuple):
+    """Esquema de una exportación; pattern es un glob sobre el nombre de archivo en minúsculas"""
+    pattern: str
+    categoricals: Tuple[str, ...] = ()
+    datetimes: Tuple[str, ...] = ()
+
+
+SCHEMAS: List[FrameSchema] = [
+    FrameSchema(
+        "by_detail_dumps*",
+        categoricals=(
+            "truck", "truck_id", "truck_equipment_name", "truck_equipment_type",
+            "truck_operator_first_name", "truck_operator_last_name",
+            "shovel", "shovel_id", "shovel_equipment_name", "shovel_equipment_type",
+            "shift", "shift_group", "material", "dump", "dump_name", "load_location",
+        ),
+        datetimes=("time", "timestamp", "dump_start_time", "dump_end_time"),
+    ),
+    FrameSchema(
+        "by_estados*",
+        categoricals=("equipo", "equipment", "code", "razon", "estado", "categoria", "turno", "flota"),
+        datetimes=("fecha", "time", "timestamp"),
+    ),
+    FrameSchema(
+        "by_equipment_times*",
+        categoricals=("equipment", "equipment_id", "equipment_type", "fleet", "shift", "turno"),
+        datetimes=("time", "timestamp"),
+    ),
+    FrameSchema(
+        "by_kpi_hora*",
+        categoricals=("equipment_id", "equipment_type", "tipo", "turno", "empresa", "flota"),
+        datetimes=("fecha", "time", "timestamp"),
+    ),
+]
+
+
+def schema_for(name: str) -> Optional[FrameSchema]:
+    """Esquema declarado para un archivo (por nombre, sin ruta)"""
+    name = str(name).lower()
+    return next((s for s in SCHEMAS if fnmatch.fnmatchcase(name, s.pattern)), None)
+
+
+def _es_texto(serie: pd.Series) -> bool:
+    if isinstance(serie.dtype, pd.StringDtype):
+        return True
+    return serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) == "string"
+
+
+def _a_fecha(serie: pd.Series) -> Optional[pd.Series]:
+    """datetime64 si todos los valores no nulos se interpretan; None si no"""
+    fechas = pd.to_datetime(serie, errors="coerce")
+    if fechas.notna().sum() != serie.notna().sum():
+        return None
+    return fechas
+
+
+_INT32 = np.iinfo(np.int32)
+
+
+def _a_int32(serie: pd.Series) -> Optional[pd.Series]:
+    """int64 → int32 (Int64 → Int32) si todos los valores caben; None si no conviene"""
+    if serie.dtype.itemsize <= 4:
+        return None
+    minimo, maximo = serie.min(), serie.max()
+    if pd.isna(minimo) or minimo < _INT32.min or maximo > _INT32.max:
+        return None
+    return serie.astype("Int32" if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) else "int32")
+
+
+def compactar(df: pd.DataFrame, name: str = "") -> Tuple[pd.DataFrame, Dict]:
+    """
+    Aplica los tipos compactos a un frame recién cargado (modifica df)
+
+    Args:
+        df: Frame recién leído (no una vista de otro frame cacheado)
+        name: Nombre del archivo fuente, para buscar su esquema
+
+    Returns:
+        (df, reporte) con bytes antes/después y columnas convertidas
+    """
+    from config import Config
+
+    schema = schema_for(name) or FrameSchema(name)
+    bytes_original = int(df.memory_usage(deep=True).sum())
+    filas = len(df)
+    max_unicos = Config.DATAFRAME_CATEGORY_MAX_RATIO * filas
+    convertidas = {"category": [], "datetime": [], "downcast": []}
+
+    for col in df.columns:
+        serie = df[col]
+
+        if col in schema.datetimes and not pd.api.types.is_datetime64_any_dtype(serie):
+            if _es_texto(serie):
+                fechas = _a_fecha(serie)
+                if fechas is not None:
+                    df[col] = fechas
+                    convertidas["datetime"].append(col)
+            continue
+
+        if _es_texto(serie):
+            if col in schema.categoricals or (filas and serie.nunique(dropna=True) <= max_unicos):
+                df[col] = serie.astype("category")
+                convertidas["category"].append(col)
+        elif pd.api.types.is_integer_dtype(serie) and not isinstance(serie.dtype, pd.CategoricalDtype):
+            reducida = _a_int32(serie)
+            if reducida is not None:
+                df[col] = reducida
+                convertidas["downcast"].append(col)
+
+    bytes_compacto = int(df.memory_usage(deep=True).sum())
+    reporte = {
+        "filas": filas,
+        "bytes_original": bytes_original,
+        "bytes": bytes_compacto,
+        "mb_original": round(bytes_original / 1024 ** 2, 1),
+        "mb": round(bytes_compacto / 1024 ** 2, 1),
+        "ahorro_pct": round((1 - bytes_compacto / bytes_original) * 100, 1) if bytes_original else 0.0,
+        "columnas": {tipo: cols for tipo, cols in convertidas.items() if cols},
+    }
+    return df, reporte
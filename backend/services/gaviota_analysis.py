@@ -15,6 +15,10 @@ import sqlite3
 import pandas as pd
 from pathlib import Path
 
+from services import time_dimension
+from services.date_ranges import day_range, shift_range
+from services.db_pool import get_db_pool
+
 
 # ============================================================================
 # DISTRIBUCIÓN DE PLAN ENTRE TURNOS
@@ -114,18 +118,20 @@ def verificar_tronadura_real(fecha: str, conn: sqlite3.Connection) -> bool:
     cursor = conn.cursor()
 
     # Obtener producción en franjas horarias
-    cursor.execute("""
+    # Turno A completo (08:00-20:00), hora de reloj desde dim_tiempo
+    tiempo = time_dimension.tiempo_sql(conn, "hexagon_by_kpi_hora", "k", shift_range(fecha, "A"))
+    cursor.execute(f"""
         SELECT
-            strftime('%H', timestamp) as hora,
-            SUM(material_tonnage) as ton_hora
-        FROM hexagon_by_kpi_hora
-        WHERE DATE(timestamp) = ?
-          AND CAST(strftime('%H', timestamp) AS INTEGER) BETWEEN 8 AND 19
-        GROUP BY hora
+            {tiempo.hora_dia} as hora,
+            SUM(k.material_tonnage) as ton_hora
+        FROM hexagon_by_kpi_hora k
+        {tiempo.join}
+        WHERE {tiempo.where}
+        GROUP BY {tiempo.hora_dia}
         ORDER BY hora
-    """, (fecha,))
+    """, tiempo.params)
 
-    rows = cursor.fetchall()
+    rows = [(f"{hora:02d}", ton) for hora, ton in cursor.fetchall()]
     if not rows:
         return False
 
@@ -251,19 +257,20 @@ def obtener_datos_reales(fecha: str, conn: sqlite3.Connection) -> pd.DataFrame:
         except Exception as e:
             print(f"   [WARN] Error al leer Excel, usando BD: {e}")
 
-    # PRIORIDAD 2: Fallback a base de datos
-    query = """
+    # PRIORIDAD 2: Fallback a base de datos (día por tiempo_id; turno y hora 0-11 de la tabla)
+    tiempo = time_dimension.tiempo_sql(conn, "hexagon_by_kpi_hora", "k", day_range(fecha))
+    query = f"""
         SELECT
-            turno,
-            hora,
-            SUM(toneladas) as toneladas
-        FROM hexagon_by_kpi_hora
-        WHERE timestamp LIKE ?
-        GROUP BY turno, hora
-        ORDER BY turno, hora
+            k.turno,
+            k.hora,
+            SUM(k.toneladas) as toneladas
+        FROM hexagon_by_kpi_hora k
+        WHERE {tiempo.where}
+        GROUP BY k.turno, k.hora
+        ORDER BY k.turno, k.hora
     """
 
-    df = pd.read_sql_query(query, conn, params=(f"{fecha}%",))
+    df = pd.read_sql_query(query, conn, params=tiempo.params)
     print(f"   [DB] Datos obtenidos desde base de datos")
     return df
 
@@ -744,7 +751,7 @@ def analizar_gaviota_completo(fecha: str) -> Dict:
 
     # PASO 2: Conectar a BD
     db_path = Path(__file__).parent.parent / "minedash.db"
-    conn = sqlite3.connect(str(db_path))
+    conn = get_db_pool(str(db_path)).connect()
 
     try:
         # PASO 3: Obtener datos reales
@@ -769,10 +776,7 @@ def analizar_gaviota_completo(fecha: str) -> Dict:
             real = row['toneladas']
 
             # Convertir hora relativa (0-11) a hora absoluta ('08'-'19' o '20'-'07')
-            if turno == 'A':
-                hora_absoluta = f"{(hora_relativa + 8):02d}"  # 0 -> '08', 1 -> '09', ..., 11 -> '19'
-            else:  # Turno C
-                hora_absoluta = f"{(hora_relativa + 20) % 24:02d}"  # 0 -> '20', 1 -> '21', ..., 11 -> '07'
+            hora_absoluta = f"{time_dimension.hora_dia(turno, hora_relativa):02d}"
 
             # Obtener teórica según turno
             teorica_dict = teorica_a if turno == 'A' else teorica_c
@@ -0,0 +1,141 @@
+# services/hexagon_partitions.py
+"""
+Vista particionada sobre las tablas anuales de Hexagon en minedash.db
+División Salvador - Codelco Chile
+
+Los datos de Hexagon están repartidos en una tabla por año:
+    hexagon_by_detail_dumps_2023 / _2024 / _2025
+    hexagon_by_equipment_times_2023 / _2024_p1 / _2024_p2 / _2025
+
+En vez de repetir el mismo UNION ALL de tres ramas en cada consulta, este
+módulo registra las particiones con su rango de fechas y arma el UNION solo
+con las tablas que se solapan con el rango pedido, empujando el filtro de
+timestamp (y cualquier predicado extra) dentro de cada rama.
+
+Agregar 2026 = registrar una partición:
+    DETAIL_DUMPS.register("hexagon_by_detail_dumps_2026", "2026-01-01", "2027-01-01")
+
+Uso:
+    sql, params = DETAIL_DUMPS.union_sql(
+        "material_tonnage, timestamp",
+        start="2025-07-01", end="2025-08-01",
+        where="blast_type = 'Blast'"
+    )
+    cursor.execute(f"SELECT SUM(material_tonnage) FROM ({sql})", params)
+"""
+
+from datetime import date, datetime
+from typing import List, Optional, Sequence, Tuple, Union
+
+DateLike = Union[str, date, datetime, None]
+
+
+def _as_text(value: DateLike) -> Optional[str]:
+    """Normaliza fecha/datetime al formato texto con que SQLite guarda timestamp"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+class PartitionedTable:
+    """Familia de tablas particionadas por rango de timestamp [inicio, fin)"""
+
+    def __init__(self, name: str, timestamp_column: str = "timestamp"):
+        self.name = name
+        self.timestamp_column = timestamp_column
+        self.partitions: List[Tuple[str, str, str]] = []
+
+    def register(self, table: str, start: DateLike, end: DateLike) -> "PartitionedTable":
+        """Registra una partición que cubre [start, end)"""
+        self.partitions.append((table, _as_text(start), _as_text(end)))
+        self.partitions.sort(key=lambda p: p[1])
+        return self
+
+    @property
+    def tables(self) -> List[str]:
+        return [p[0] for p in self.partitions]
+
+    def partitions_for(self, start: DateLike = None, end: DateLike = None) -> List[str]:
+        """Tablas cuyo rango se solapa con [start, end)"""
+        start, end = _as_text(start), _as_text(end)
+        return [
+            table for table, p_start, p_end in self.partitions
+            if (end is None or p_start < end) and (start is None or p_end > start)
+        ]
+
+    def union_sql(
+        self,
+        columns: str,
+        start: DateLike = None,
+        end: DateLike = None,
+        where: str = "",
+        params: Sequence = (),
+        distinct: bool = False
+    ) -> Tuple[str, list]:
+        """
+        Arma el UNION sobre las particiones que se solapan con [start, end)
+
+        Args:
+            columns: Lista de columnas del SELECT de cada rama
+            start: Límite inferior inclusivo de timestamp (None = sin límite)
+            end: Límite superior exclusivo de timestamp (None = sin límite)
+            where: Predicado extra aplicado dentro de cada rama
+            params: Parámetros del predicado extra (se repiten por rama)
+            distinct: UNION en vez de UNION ALL
+
+        Returns:
+            (sql, params) listo para usar como subconsulta
+        """
+        start, end = _as_text(start), _as_text(end)
+        tables = self.partitions_for(start, end)
+
+        conditions = []
+        range_params = []
+        if start is not None:
+            conditions.append(f"{self.timestamp_column} >= ?")
+            range_params.append(start)
+        if end is not None:
+            conditions.append(f"{self.timestamp_column} < ?")
+            range_params.append(end)
+        if where:
+            conditions.append(f"({where})")
+        where_sql = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        if not tables:
+            # Ninguna partición cubre el rango: subconsulta vacía con las mismas columnas
+            table = self.partitions[0][0]
+            return f"SELECT {columns} FROM {table} WHERE 0", []
+
+        branch_params = range_params + list(params)
+        glue = "\nUNION\n" if distinct else "\nUNION ALL\n"
+        sql = glue.join(f"SELECT {columns} FROM {table}{where_sql}" for table in tables)
+        return sql, branch_params * len(tables)
+
+
+# =============================================================================
+# REGISTRO DE PARTICIONES
+# =============================================================================
+
+DETAIL_DUMPS = (
+    PartitionedTable("hexagon_by_detail_dumps")
+    .register("hexagon_by_detail_dumps_2023", "2023-01-01", "2024-01-01")
+    .register("hexagon_by_detail_dumps_2024", "2024-01-01", "2025-01-01")
+    .register("hexagon_by_detail_dumps_2025", "2025-01-01", "2026-01-01")
+)
+
+# 2024 viene en dos exportaciones (p1/p2); ambas se registran con el año completo
+EQUIPMENT_TIMES = (
+    PartitionedTable("hexagon_by_equipment_times")
+    .register("hexagon_by_equipment_times_2023", "2023-01-01", "2024-01-01")
+    .register("hexagon_by_equipment_times_2024_p1", "2024-01-01", "2025-01-01")
+    .register("hexagon_by_equipment_times_2024_p2", "2024-01-01", "2025-01-01")
+    .register("hexagon_by_equipment_times_2025", "2025-01-01", "2026-01-01")
+)
+
+
+# Filtro de EXTRACCIÓN MINA (tronadura en fases/mina) usado en cumplimiento y tendencias
+EXTRACCION_MINA_WHERE = "blast_type = 'Blast' AND (blast_region LIKE '%FASE%' OR blast_region = 'MINA')"
@@ -4,13 +4,204 @@ Lector de PDFs oficiales para obtener tonelaje real por fase/empresa
 
 Este módulo extrae datos validados de los IGM mensuales generados por
 División Salvador, que contienen tonelajes oficiales por fase/empresa.
+
+Las cifras extraídas se guardan en data/Control de Gestion/.igm_cache.json
+indexadas por el SHA-256 del PDF (más la firma mtime/tamaño de cada ruta
+para no re-hashear en cada consulta). Un PDF ya visto no se vuelve a abrir;
+si un archivo cambia se parsean primero solo las páginas donde estaba la
+tabla de extracción por fase, y el documento completo solo si ahí ya no
+está. Al primer uso se recorre la carpeta en segundo plano para extraer
+los IGM que todavía no estén en el cache.
 """
+import hashlib
+import json
+import os
 import re
+import threading
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import pdfplumber
 
 
+# =============================================================================
+# CACHE DE EXTRACCIONES IGM (por hash de contenido)
+# =============================================================================
+
+IGM_BASE_PATH = Path(__file__).parent.parent / 'data' / 'Control de Gestion'
+IGM_CACHE_FILENAME = '.igm_cache.json'
+IGM_CACHE_VERSION = 1  # Subir si cambia extraer_tonelajes_igm (descarta las extracciones guardadas)
+
+# Línea de la tabla de extracción por fase ("Fase 1 5.002 5.170 97%")
+_PATRON_TABLA_FASE = re.compile(r'Fase\s+[1-4]\s+[0-9.]+', re.IGNORECASE)
+
+_store: Optional[Dict] = None
+_store_lock = threading.Lock()
+_file_locks: Dict[str, threading.Lock] = {}
+_scan_started = False
+
+
+def _cache_path(base_path: Path) -> Path:
+    return base_path / IGM_CACHE_FILENAME
+
+
+def _cargar_store(base_path: Path) -> Dict:
+    """Store en memoria (se lee del JSON la primera vez)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = {'version': IGM_CACHE_VERSION, 'archivos': {}, 'extracciones': {}}
+            try:
+                with open(_cache_path(base_path), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == IGM_CACHE_VERSION:
+                    _store = data
+            except (OSError, ValueError):
+                pass
+        return _store
+
+
+def _guardar_store(base_path: Path):
+    """Escritura atómica del JSON (tmp + replace)"""
+    with _store_lock:
+        contenido = json.dumps(_store, ensure_ascii=False, indent=1)
+    try:
+        destino = _cache_path(base_path)
+        tmp = destino.with_name(destino.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(contenido)
+        os.replace(tmp, destino)
+    except OSError as e:
+        print(f"[IGM] No se pudo guardar cache de extracciones: {e}")
+
+
+def _file_lock(path: Path) -> threading.Lock:
+    with _store_lock:
+        return _file_locks.setdefault(str(path), threading.Lock())
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _paginas_con_tabla(textos: Dict[int, str]) -> List[int]:
+    return [i for i, t in textos.items() if _PATRON_TABLA_FASE.search(re.sub(r'\s+', ' ', t))]
+
+
+def _parsear_pdf(igm_file: Path, paginas_previas: List[int]) -> Tuple[Optional[Dict], List[int], int]:
+    """
+    Extrae los tonelajes de un PDF leyendo solo las páginas necesarias
+
+    Returns:
+        (tonelajes o None, páginas donde está la tabla, total de páginas)
+    """
+    with pdfplumber.open(igm_file) as pdf:
+        n_paginas = len(pdf.pages)
+
+        # 1. Páginas donde estaba la tabla en la versión anterior del archivo
+        previas = [i for i in paginas_previas if i < n_paginas]
+        if previas:
+            textos = {i: pdf.pages[i].extract_text() or "" for i in previas}
+            tonelajes = extraer_tonelajes_igm("\n".join(textos.values()))
+            if tonelajes:
+                print(f"[IGM] Tabla encontrada en páginas previas {previas} de {igm_file.name}")
+                return tonelajes, _paginas_con_tabla(textos), n_paginas
+
+        # 2. Documento completo
+        textos = {i: page.extract_text() or "" for i, page in enumerate(pdf.pages)}
+
+    texto_completo = "\n".join(textos.values())
+    if not texto_completo.strip():
+        print(f"[IGM] PDF vacío o sin texto extraíble: {igm_file.name}")
+        return None, [], n_paginas
+
+    return extraer_tonelajes_igm(texto_completo), _paginas_con_tabla(textos), n_paginas
+
+
+def _extraccion_igm(igm_file: Path, base_path: Path = IGM_BASE_PATH) -> Dict:
+    """
+    Entrada del cache para un PDF, parseándolo solo si su contenido es nuevo
+
+    Returns:
+        {'tonelajes': {...} | None, 'paginas': [...], 'paginas_total': n, 'file': nombre}
+    """
+    store = _cargar_store(base_path)
+    clave = os.path.relpath(igm_file, base_path)
+
+    with _file_lock(igm_file):
+        st = igm_file.stat()
+        firma = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+        with _store_lock:
+            previo = dict(store['archivos'].get(clave, {}))
+        if previo.get('firma') == firma and previo.get('sha256') in store['extracciones']:
+            return store['extracciones'][previo['sha256']]
+
+        sha = _sha256(igm_file)
+        guardar = False
+        if sha not in store['extracciones']:
+            paginas_previas = store['extracciones'].get(previo.get('sha256'), {}).get('paginas', [])
+            print(f"[IGM] Parseando {igm_file.name} (contenido nuevo)")
+            tonelajes, paginas, n_paginas = _parsear_pdf(igm_file, paginas_previas)
+            with _store_lock:
+                store['extracciones'][sha] = {
+                    'tonelajes': tonelajes,
+                    'paginas': paginas,
+                    'paginas_total': n_paginas,
+                    'file': igm_file.name
+                }
+            guardar = True
+
+        with _store_lock:
+            if store['archivos'].get(clave) != {'firma': firma, 'sha256': sha}:
+                store['archivos'][clave] = {'firma': firma, 'sha256': sha}
+                guardar = True
+
+    if guardar:
+        _guardar_store(base_path)
+    return store['extracciones'][sha]
+
+
+def escanear_igm(base_path: Path = IGM_BASE_PATH) -> Dict[str, int]:
+    """
+    Extrae al cache todos los IGM de la carpeta que aún no estén
+
+    Returns:
+        {'archivos': n, 'con_datos': n, 'errores': n}
+    """
+    resumen = {'archivos': 0, 'con_datos': 0, 'errores': 0}
+    if not base_path.exists():
+        return resumen
+
+    for pdf_path in sorted(base_path.rglob('*IGM*.pdf')):
+        resumen['archivos'] += 1
+        try:
+            if _extraccion_igm(pdf_path, base_path).get('tonelajes'):
+                resumen['con_datos'] += 1
+        except Exception as e:
+            resumen['errores'] += 1
+            print(f"[IGM] Error extrayendo {pdf_path.name}: {e}")
+
+    print(f"[IGM] Escaneo completo: {resumen['con_datos']}/{resumen['archivos']} IGM con datos")
+    return resumen
+
+
+def iniciar_escaneo_igm(base_path: Path = IGM_BASE_PATH):
+    """Lanza escanear_igm en un hilo de fondo (una vez por proceso)"""
+    global _scan_started
+    from config import Config
+
+    with _store_lock:
+        if _scan_started or not Config.IGM_BACKGROUND_SCAN:
+            return
+        _scan_started = True
+
+    threading.Thread(target=escanear_igm, args=(base_path,), name="igm-scan", daemon=True).start()
+
+
 def leer_igm_mes(mes: int, year: int = 2025) -> Optional[Dict]:
     """
     Busca y lee el IGM PDF del mes especificado
@@ -47,7 +238,7 @@ def leer_igm_mes(mes: int, year: int = 2025) -> Optional[Dict]:
         return None
 
     # Base path
-    base_path = Path(__file__).parent.parent / 'data' / 'Control de Gestion'
+    base_path = IGM_BASE_PATH
 
     # Patrones de búsqueda (orden de preferencia)
     patrones = [
@@ -72,29 +263,22 @@ def leer_igm_mes(mes: int, year: int = 2025) -> Optional[Dict]:
             print(f"  - {p}")
         return None
 
-    # Leer PDF con pdfplumber
-    try:
-        with pdfplumber.open(igm_file) as pdf:
-            # Extraer texto de todas las páginas
-            texto_completo = ""
-            for page in pdf.pages:
-                texto_completo += page.extract_text() + "\n"
-
-            if not texto_completo.strip():
-                print(f"[IGM] PDF vacío o sin texto extraíble: {igm_file.name}")
-                return None
-
-            # Parsear tonelajes
-            tonelajes = extraer_tonelajes_igm(texto_completo)
+    # Extraer al cache los demás IGM en segundo plano (meses siguientes ya listos)
+    iniciar_escaneo_igm(base_path)
 
-            if tonelajes:
-                tonelajes['source'] = 'IGM'
-                tonelajes['file'] = igm_file.name
-                print(f"[IGM] Datos extraídos exitosamente de {igm_file.name}")
-                return tonelajes
-            else:
-                print(f"[IGM] No se pudieron extraer tonelajes de {igm_file.name}")
-                return None
+    # Leer PDF (cache por hash de contenido, pdfplumber solo si es nuevo)
+    try:
+        entrada = _extraccion_igm(igm_file, base_path)
+
+        if entrada.get('tonelajes'):
+            tonelajes = dict(entrada['tonelajes'])
+            tonelajes['source'] = 'IGM'
+            tonelajes['file'] = igm_file.name
+            print(f"[IGM] Datos extraídos exitosamente de {igm_file.name}")
+            return tonelajes
+        else:
+            print(f"[IGM] No se pudieron extraer tonelajes de {igm_file.name}")
+            return None
 
     except Exception as e:
         print(f"[IGM] Error leyendo PDF {igm_file.name}: {e}")
@@ -226,17 +410,14 @@ def obtener_real_por_fase_con_fallback(mes: int, year: int = 2025, db_path: str
         db_path = Path(__file__).parent.parent / 'minedash.db'
 
     try:
-        import sqlite3
         from datetime import datetime
+        from services.date_ranges import month_range
+        from services.db_pool import get_db_pool
 
         # Calcular rango de fechas
-        fecha_inicio = f"{year}-{mes:02d}-01"
-        if mes == 12:
-            fecha_fin = f"{year+1}-01-01"
-        else:
-            fecha_fin = f"{year}-{mes+1:02d}-01"
+        fecha_inicio, fecha_fin = month_range(year, mes)
 
-        conn = sqlite3.connect(db_path)
+        conn = get_db_pool(db_path).connect()
         cursor = conn.cursor()
 
         # Query para obtener tonelaje por empresa
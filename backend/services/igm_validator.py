@@ -3,12 +3,14 @@ IGM Validator - Sistema de Validación Temporal
 MineDash AI v2.0 - Codelco División Salvador
 """
 
-import sqlite3
 from datetime import datetime
 from typing import Dict, Optional, List, Tuple
 from dataclasses import dataclass
 import os
 
+from services.date_ranges import month_range
+from services.db_pool import get_db_pool
+
 # Configuración
 VALIDATION_ENABLED = True  # Cambiar a False post-calibración
 ERROR_THRESHOLD = 5.0      # 5% error máximo
@@ -39,13 +41,13 @@ class IGMValidator:
         self.db_path = db_path
 
     def _get_conn(self):
-        return sqlite3.connect(self.db_path)
+        return get_db_pool(self.db_path).connect()
 
-    def _execute(self, query: str) -> Optional[float]:
+    def _execute(self, query: str, params: Tuple = ()) -> Optional[float]:
         try:
             conn = self._get_conn()
             cur = conn.cursor()
-            cur.execute(query)
+            cur.execute(query, params)
             result = cur.fetchone()
             conn.close()
             return result[0] if result and result[0] else None
@@ -67,16 +69,15 @@ class IGMValidator:
 
     def get_minedash_extraccion(self, mes: int, ano: int) -> float:
         """Query calibrado con IGM (Error: 0.19%)"""
-        query = f"""
+        query = """
         SELECT SUM(material_tonnage) / 1000.0 as kton
         FROM hexagon_by_detail_dumps_2025
-        WHERE strftime('%m', timestamp) = '{mes:02d}'
-          AND strftime('%Y', timestamp) = '{ano}'
+        WHERE timestamp >= ? AND timestamp < ?
           AND blast_type = 'Blast'
           AND dump_type != 'InpitDump'
           AND blast_region != 'STOCKS'
         """
-        return self._execute(query) or 0
+        return self._execute(query, month_range(ano, mes)) or 0
 
     def test_filtros_extraccion(self, mes: int, ano: int) -> dict:
         """Probar diferentes combinaciones de filtros"""
@@ -88,60 +89,52 @@ class IGMValidator:
         target = igm['extraccion_real_kton']
 
         filtros = {
-            "sin_filtro": f"""
+            "sin_filtro": """
                 SELECT SUM(material_tonnage) / 1000.0
                 FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%m', timestamp) = '{mes:02d}'
-                  AND strftime('%Y', timestamp) = '{ano}'
+                WHERE timestamp >= ? AND timestamp < ?
             """,
-            "excluir_stockpile": f"""
+            "excluir_stockpile": """
                 SELECT SUM(material_tonnage) / 1000.0
                 FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%m', timestamp) = '{mes:02d}'
-                  AND strftime('%Y', timestamp) = '{ano}'
+                WHERE timestamp >= ? AND timestamp < ?
                   AND dump_type != 'Stockpile'
             """,
-            "excluir_inpitdump": f"""
+            "excluir_inpitdump": """
                 SELECT SUM(material_tonnage) / 1000.0
                 FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%m', timestamp) = '{mes:02d}'
-                  AND strftime('%Y', timestamp) = '{ano}'
+                WHERE timestamp >= ? AND timestamp < ?
                   AND dump_type != 'InpitDump'
             """,
-            "excluir_stocks_region": f"""
+            "excluir_stocks_region": """
                 SELECT SUM(material_tonnage) / 1000.0
                 FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%m', timestamp) = '{mes:02d}'
-                  AND strftime('%Y', timestamp) = '{ano}'
+                WHERE timestamp >= ? AND timestamp < ?
                   AND blast_region != 'STOCKS'
             """,
-            "excluir_inpit_y_stocks": f"""
+            "excluir_inpit_y_stocks": """
                 SELECT SUM(material_tonnage) / 1000.0
                 FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%m', timestamp) = '{mes:02d}'
-                  AND strftime('%Y', timestamp) = '{ano}'
+                WHERE timestamp >= ? AND timestamp < ?
                   AND dump_type != 'InpitDump'
                   AND blast_region != 'STOCKS'
             """,
-            "solo_dump_y_crusher": f"""
+            "solo_dump_y_crusher": """
                 SELECT SUM(material_tonnage) / 1000.0
                 FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%m', timestamp) = '{mes:02d}'
-                  AND strftime('%Y', timestamp) = '{ano}'
+                WHERE timestamp >= ? AND timestamp < ?
                   AND dump_type IN ('Dump', 'Crusher')
             """,
-            "solo_fases_produccion": f"""
+            "solo_fases_produccion": """
                 SELECT SUM(material_tonnage) / 1000.0
                 FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%m', timestamp) = '{mes:02d}'
-                  AND strftime('%Y', timestamp) = '{ano}'
+                WHERE timestamp >= ? AND timestamp < ?
                   AND blast_region IN ('FASE01', 'FASE02', 'FASE03')
             """,
-            "CALIBRADO_OPTIMO": f"""
+            "CALIBRADO_OPTIMO": """
                 SELECT SUM(material_tonnage) / 1000.0
                 FROM hexagon_by_detail_dumps_2025
-                WHERE strftime('%m', timestamp) = '{mes:02d}'
-                  AND strftime('%Y', timestamp) = '{ano}'
+                WHERE timestamp >= ? AND timestamp < ?
                   AND blast_type = 'Blast'
                   AND dump_type != 'InpitDump'
                   AND blast_region != 'STOCKS'
@@ -152,8 +145,9 @@ class IGMValidator:
         mejor_error = 100
         mejor_filtro = None
 
+        rango_mes = month_range(ano, mes)
         for nombre, query in filtros.items():
-            valor = self._execute(query)
+            valor = self._execute(query, rango_mes)
             if valor:
                 error = abs(valor - target) / target * 100
                 resultados[nombre] = {
@@ -0,0 +1,450 @@
+# services/ingestion.py
+"""
+Ingesta incremental de exportaciones Hexagon (MineOPS) a minedash.db
+División Salvador - Codelco Chile
+
+Antes, cada exportación nueva se cargaba re-ejecutando la carga masiva
+completa de la tabla. Este módulo registra una marca de agua por tabla
+sobre (timestamp, equipment_id) y solo agrega las filas posteriores:
+
+    by_detail_dumps 2025.xlsx   → hexagon_by_detail_dumps_2025
+    by_equipment_times 2024 p1  → hexagon_by_equipment_times_2024_p1
+    by_equipment_times 2025 p2  → hexagon_by_equipment_times_2025
+    by_KPI_hora.xlsx            → hexagon_by_kpi_hora
+    by_estados_2024_2025.xlsx   → hexagon_by_estados_2024_2025
+
+- La exportación se lee en lotes (openpyxl read_only / csv chunksize /
+  parquet iter_batches), nunca completa en memoria
+- Cada lote se agrega en UNA transacción junto con su marca de agua
+- Al terminar se resuelven los ids de dimensión (services/dimensions) y
+  tiempo_id (services/time_dimension), se refrescan los rollups
+  dependientes y el catálogo de períodos (services/data_catalog), y se
+  invalidan caches
+
+Supuesto: MineOPS exporta en orden cronológico. Filas con el mismo
+(timestamp, equipment_id) que la marca de agua se consideran ya cargadas.
+Para re-cargar un período antiguo usar reset_watermark().
+
+Uso:
+    python -m services.ingestion "data/Hexagon/by_detail_dumps 2025.xlsx"
+    python -m services.ingestion export.csv --table hexagon_by_kpi_hora
+"""
+
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from services.db_pool import get_db_pool
+
+
+# =============================================================================
+# DESTINOS
+# =============================================================================
+
+# Columna de equipo (segunda clave de la marca de agua), por orden de preferencia
+EQUIPMENT_KEY_CANDIDATES = ["equipment_id", "truck_id", "truck_equipment_name", "equipo"]
+
+# Nombre de columna en la exportación → nombre en SQLite
+COLUMN_RENAMES = {
+    "time": "timestamp",
+}
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS ingestion_watermarks (
+        table_name TEXT PRIMARY KEY,
+        last_timestamp TEXT,
+        last_equipment_id TEXT,
+        rows_total INTEGER DEFAULT 0,
+        source_file TEXT,
+        updated_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ingestion_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        source_file TEXT,
+        rows_read INTEGER,
+        rows_appended INTEGER,
+        watermark_before TEXT,
+        watermark_after TEXT,
+        started_at TEXT,
+        seconds REAL,
+        error TEXT
+    )
+    """,
+]
+
+# Columnas agregadas después de crear la tabla (bases existentes): tabla → {columna: tipo}
+SCHEMA_COLUMNS = {
+    "ingestion_log": {"error": "TEXT"},
+}
+
+
+def resolve_target_table(file_path: Path, conn: sqlite3.Connection) -> Optional[str]:
+    """Tabla destino a partir del nombre de la exportación"""
+    name = file_path.stem.lower().strip()
+
+    m = re.match(r"by_detail_dumps[ _](\d{4})", name)
+    if m:
+        return f"hexagon_by_detail_dumps_{m.group(1)}"
+
+    m = re.match(r"by_equipment_times[ _](\d{4})(?:[ _](p\d))?", name)
+    if m:
+        year, part = m.group(1), m.group(2)
+        # 2024 viene en dos tablas (p1/p2); el resto de los años en una sola
+        if part and _table_exists(conn, f"hexagon_by_equipment_times_{year}_{part}"):
+            return f"hexagon_by_equipment_times_{year}_{part}"
+        return f"hexagon_by_equipment_times_{year}"
+
+    if name.startswith("by_kpi_hora2"):
+        return "hexagon_by_kpi_hora2"
+    if name.startswith("by_kpi_hora"):
+        return "hexagon_by_kpi_hora"
+
+    m = re.match(r"by_estados[ _](\d{4})_(\d{4})", name)
+    if m:
+        return f"hexagon_by_estados_{m.group(1)}_{m.group(2)}"
+
+    return None
+
+
+# =============================================================================
+# LECTURA EN LOTES
+# =============================================================================
+
+def _iter_chunks(file_path: Path, chunk_rows: int, sheet_name: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """Lee la exportación en DataFrames de chunk_rows filas"""
+    suffix = file_path.suffix.lower()
+
+    if suffix == ".csv":
+        yield from pd.read_csv(file_path, chunksize=chunk_rows)
+        return
+
+    if suffix == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+
+    # Excel: openpyxl en modo streaming (no carga el workbook completo)
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"col_{i}" for i, c in enumerate(header)]
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        wb.close()
+
+
+# =============================================================================
+# MARCA DE AGUA
+# =============================================================================
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone() is not None
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+    for table, columns in SCHEMA_COLUMNS.items():
+        existing = _table_columns(conn, table)
+        for column, sql_type in columns.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}")
+    conn.commit()
+
+
+def get_watermark(conn: sqlite3.Connection, table: str, equipment_col: Optional[str]) -> Tuple[Optional[str], str]:
+    """
+    Marca de agua (timestamp, equipment_id) de una tabla
+
+    Si la tabla nunca pasó por este pipeline (carga masiva previa) se toma
+    del contenido actual, para no duplicar lo ya cargado.
+    """
+    row = conn.execute(
+        "SELECT last_timestamp, last_equipment_id FROM ingestion_watermarks WHERE table_name = ?",
+        (table,)
+    ).fetchone()
+    if row and row[0]:
+        return row[0], row[1] or ""
+
+    if not _table_exists(conn, table):
+        return None, ""
+
+    last_ts = conn.execute(f"SELECT MAX(timestamp) FROM {table}").fetchone()[0]
+    if last_ts is None:
+        return None, ""
+    last_eq = ""
+    if equipment_col:
+        last_eq = conn.execute(
+            f"SELECT MAX(CAST({equipment_col} AS TEXT)) FROM {table} WHERE timestamp = ?", (last_ts,)
+        ).fetchone()[0] or ""
+    return str(last_ts), last_eq
+
+
+def reset_watermark(db_path: str, table: str):
+    """Olvida la marca de agua (la próxima ingesta la recalcula desde la tabla)"""
+    with get_db_pool(db_path).write() as conn:
+        ensure_schema(conn)
+        with conn:
+            conn.execute("DELETE FROM ingestion_watermarks WHERE table_name = ?", (table,))
+
+
+# =============================================================================
+# INGESTA
+# =============================================================================
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _normalize_chunk(df: pd.DataFrame, table_columns: Optional[List[str]]) -> pd.DataFrame:
+    """
+    Nombres de columna de la exportación → columnas de la tabla; fechas como texto
+
+    Raises:
+        ValueError: si la exportación no trae columna time/timestamp
+    """
+    df.columns = [str(c).strip() for c in df.columns]
+    renames = {
+        src: dst for src, dst in COLUMN_RENAMES.items()
+        if src in df.columns and dst not in df.columns
+        and (table_columns is None or (dst in table_columns and src not in table_columns))
+    }
+    df = df.rename(columns=renames)
+    if "timestamp" not in df.columns:
+        raise ValueError("la exportación no tiene columna 'time' ni 'timestamp'")
+    if table_columns is not None:
+        df = df[[c for c in df.columns if c in table_columns]]
+
+    # Mismo formato texto que usa to_sql y que esperan los rangos de services/date_ranges
+    ts = pd.to_datetime(df["timestamp"], errors="coerce")
+    df = df.assign(timestamp=ts.dt.strftime(TIMESTAMP_FORMAT))
+
+    # Otras columnas de fecha (ej. dump_start_time): sqlite3 no sabe enlazar pd.Timestamp
+    fechas = {}
+    for col, serie in df.items():
+        if col == "timestamp":
+            continue
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            fechas[col] = serie.dt.strftime(TIMESTAMP_FORMAT).astype(object).where(serie.notna(), None)
+        elif serie.dtype == object and serie.map(lambda v: isinstance(v, datetime)).any():
+            fechas[col] = serie.map(
+                lambda v: v.strftime(TIMESTAMP_FORMAT) if isinstance(v, datetime) and not pd.isna(v) else v
+            )
+    if fechas:
+        df = df.assign(**fechas)
+    return df[df["timestamp"].notna()]
+
+
+def ingest_export(
+    file_path,
+    db_path: str = "minedash.db",
+    table: Optional[str] = None,
+    sheet_name: Optional[str] = None,
+    chunk_rows: Optional[int] = None,
+    refresh: bool = True
+) -> Dict:
+    """
+    Agrega a SQLite solo las filas de la exportación posteriores a la marca de agua
+
+    Args:
+        file_path: Exportación .xlsx / .csv / .parquet
+        db_path: Base de datos destino
+        table: Tabla destino (None = deducir del nombre del archivo)
+        sheet_name: Hoja del Excel (None = primera)
+        chunk_rows: Filas por lote/transacción (default Config.INGEST_CHUNK_ROWS)
+        refresh: Refrescar rollups y caches dependientes al terminar
+
+    Returns:
+        Dict con success, table, rows_read, rows_appended, watermark. Si un lote
+        falla (ej. sin columna de tiempo) la corrida se corta: los lotes ya
+        confirmados quedan (con su marca de agua), ingestion_log registra la
+        corrida parcial con el error, se refresca lo dependiente y se retorna
+        success=False con error.
+    """
+    from config import Config
+
+    file_path = Path(file_path)
+    chunk_rows = chunk_rows or Config.INGEST_CHUNK_ROWS
+    started = time.perf_counter()
+    started_at = datetime.now().isoformat(timespec="seconds")
+
+    with get_db_pool(db_path).write() as conn:
+        ensure_schema(conn)
+        table = table or resolve_target_table(file_path, conn)
+        if not table:
+            return {"success": False, "error": f"No se pudo deducir la tabla destino para {file_path.name}. Use table=..."}
+
+        table_columns = _table_columns(conn, table) if _table_exists(conn, table) else None
+        equipment_col = None
+        if table_columns is not None:
+            equipment_col = next((c for c in EQUIPMENT_KEY_CANDIDATES if c in table_columns), None)
+
+        # Marca al inicio de la corrida: todo lo posterior se agrega aunque el lote venga desordenado
+        wm_ts, wm_eq = get_watermark(conn, table, equipment_col)
+        watermark_before = f"{wm_ts}|{wm_eq}" if wm_ts else None
+        max_ts, max_eq = wm_ts, wm_eq
+        rows_read = 0
+        rows_appended = 0
+        error = None
+
+        print(f"   [INGEST] {file_path.name} → {table} (marca: {watermark_before or 'vacía'})")
+
+        for chunk in _iter_chunks(file_path, chunk_rows, sheet_name):
+            rows_read += len(chunk)
+            try:
+                chunk = _normalize_chunk(chunk, table_columns)
+            except ValueError as e:
+                error = f"{file_path.name}: {e}"
+                print(f"   [INGEST] Corrida cortada: {error}")
+                break
+
+            if table_columns is None:
+                # Tabla nueva (ej. año nuevo): se crea con las columnas de la exportación
+                chunk.head(0).to_sql(table, conn, index=False)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table}(timestamp)")
+                conn.commit()
+                table_columns = _table_columns(conn, table)
+                equipment_col = next((c for c in EQUIPMENT_KEY_CANDIDATES if c in table_columns), None)
+                print(f"   [INGEST] Tabla {table} creada")
+                if table.startswith(("hexagon_by_detail_dumps_", "hexagon_by_equipment_times_")):
+                    print(f"   [INGEST] Registrar {table} en services/hexagon_partitions.py")
+
+            if wm_ts is not None:
+                eq = chunk[equipment_col].astype(str) if equipment_col else pd.Series("", index=chunk.index)
+                nuevas = (chunk["timestamp"] > wm_ts) | ((chunk["timestamp"] == wm_ts) & (eq > wm_eq))
+                chunk = chunk[nuevas]
+            if chunk.empty:
+                continue
+
+            # Nueva marca = máximo (timestamp, equipo) visto hasta ahora
+            chunk_max_ts = chunk["timestamp"].max()
+            chunk_max_eq = ""
+            if equipment_col:
+                chunk_max_eq = str(chunk.loc[chunk["timestamp"] == chunk_max_ts, equipment_col].astype(str).max())
+            if max_ts is None or (chunk_max_ts, chunk_max_eq) > (max_ts, max_eq):
+                max_ts, max_eq = chunk_max_ts, chunk_max_eq
+
+            cols = list(chunk.columns)
+            placeholders = ", ".join("?" for _ in cols)
+            values = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({placeholders})",
+                    values
+                )
+                conn.execute("""
+                    INSERT INTO ingestion_watermarks
+                        (table_name, last_timestamp, last_equipment_id, rows_total, source_file, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(table_name) DO UPDATE SET
+                        last_timestamp = excluded.last_timestamp,
+                        last_equipment_id = excluded.last_equipment_id,
+                        rows_total = ingestion_watermarks.rows_total + ?,
+                        source_file = excluded.source_file,
+                        updated_at = excluded.updated_at
+                """, (table, max_ts, max_eq, len(chunk), file_path.name,
+                      datetime.now().isoformat(timespec="seconds"), len(chunk)))
+            rows_appended += len(chunk)
+            print(f"   [INGEST] +{len(chunk):,} filas (hasta {max_ts})")
+
+        watermark_after = f"{max_ts}|{max_eq}" if max_ts else None
+        seconds = round(time.perf_counter() - started, 2)
+        with conn:
+            conn.execute("""
+                INSERT INTO ingestion_log
+                    (table_name, source_file, rows_read, rows_appended,
+                     watermark_before, watermark_after, started_at, seconds, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (table, file_path.name, rows_read, rows_appended,
+                  watermark_before, watermark_after, started_at, seconds, error))
+
+    # También tras una corrida parcial: los lotes confirmados ya están en la tabla
+    if refresh and rows_appended:
+        _after_ingest(db_path, table, file_path)
+
+    print(f"   [INGEST] {table}: {rows_appended:,} de {rows_read:,} filas nuevas en {seconds}s")
+    if error:
+        return {
+            "success": False,
+            "table": table,
+            "error": error,
+            "rows_read": rows_read,
+            "rows_appended": rows_appended,
+            "watermark": watermark_after,
+            "seconds": seconds,
+        }
+    return {
+        "success": True,
+        "table": table,
+        "rows_read": rows_read,
+        "rows_appended": rows_appended,
+        "watermark": watermark_after,
+        "seconds": seconds,
+    }
+
+
+def _after_ingest(db_path: str, table: str, file_path: Path):
+    """Refresca lo que depende de la tabla recién actualizada"""
+    from services import data_catalog, db_migrations, dimensions, rollups, time_dimension
+    from services.dataframe_cache import get_dataframe_cache
+    from services.result_cache import bump_data_version
+
+    # operador_id / equipo_id de las filas nuevas (services/dimensions)
+    if dimensions.keys_for(table):
+        dimensions.refresh_dimensions(db_path, tables=[table])
+    # tiempo_id y extensión de dim_tiempo (services/time_dimension)
+    if time_dimension.key_for(table):
+        time_dimension.refresh_time_dimension(db_path, tables=[table])
+    # Índices declarados en services/db_migrations (tablas nuevas, ej. año nuevo)
+    db_migrations.migrate(db_path, tables=[table])
+    families = rollups.families_for(table)
+    if families:
+        rollups.refresh_rollups(db_path, families=families)
+    if data_catalog.source_for(table):
+        data_catalog.refresh_catalog(db_path, tables=[table])
+    get_dataframe_cache().invalidate(str(file_path))
+    bump_data_version()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingesta incremental de exportaciones Hexagon")
+    parser.add_argument("files", nargs="+", help="Exportaciones .xlsx/.csv/.parquet")
+    parser.add_argument("--db", default="minedash.db")
+    parser.add_argument("--table", default=None, help="Tabla destino (default: deducida del nombre)")
+    parser.add_argument("--sheet", default=None)
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    for export in args.files:
+        print(ingest_export(export, args.db, table=args.table, sheet_name=args.sheet, chunk_rows=args.chunk_rows))
@@ -10,6 +10,8 @@ from typing import List, Dict, Any, Literal
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 
+from services.excel_sidecar import load_hexagon_excel
+
 @dataclass
 class Plan:
     """Definición de planes de producción"""
@@ -110,7 +112,9 @@ class InsightsSystem:
             df_times_list = []
             for f in times_files:
                 if f.exists():
-                    df_times_list.append(pd.read_excel(f))
+                    df_times_list.append(load_hexagon_excel(
+                        f, columns=['time', 'total', 'm_correctiva', 'efectivo']
+                    ))
             
             if df_times_list:
                 df_times = pd.concat(df_times_list, ignore_index=True)
@@ -139,7 +143,7 @@ class InsightsSystem:
             # Cargar dumps para producción
             dumps_file = self.hexagon_dir / f"by_detail_dumps {year}.xlsx"
             if dumps_file.exists():
-                df_dumps = pd.read_excel(dumps_file)
+                df_dumps = load_hexagon_excel(dumps_file, columns=['time', 'material_tonnage'])
                 df_dumps['fecha'] = pd.to_datetime(df_dumps['time']).dt.date
                 df_dumps['mes'] = pd.to_datetime(df_dumps['time']).dt.month
                 
@@ -166,7 +170,7 @@ class InsightsSystem:
         try:
             dumps_file = self.hexagon_dir / f"by_detail_dumps {year}.xlsx"
             if dumps_file.exists():
-                df_dumps = pd.read_excel(dumps_file)
+                df_dumps = load_hexagon_excel(dumps_file, columns=['time', 'material_tonnage'])
                 df_dumps['mes'] = pd.to_datetime(df_dumps['time']).dt.month
                 
                 # Último mes completo
@@ -199,7 +203,7 @@ class InsightsSystem:
             estados_file = self.hexagon_dir / "by_estados_2024_2025.xlsx"
             
             if estados_file.exists():
-                df_estados = pd.read_excel(estados_file)
+                df_estados = load_hexagon_excel(estados_file, columns=['fecha', 'code', 'razon', 'horas'])
                 df_estados['fecha'] = pd.to_datetime(df_estados['fecha']).dt.date
                 
                 # Últimos 30 días
@@ -207,7 +211,7 @@ class InsightsSystem:
                 df_recent = df_estados[df_estados['fecha'] >= fecha_limite]
                 
                 # Top códigos
-                codigos_top = df_recent.groupby(['code', 'razon']).agg({
+                codigos_top = df_recent.groupby(['code', 'razon'], observed=True).agg({
                     'horas': 'sum'
                 }).reset_index()
                 codigos_top = codigos_top.sort_values('horas', ascending=False).head(5)
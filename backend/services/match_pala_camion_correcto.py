@@ -6,7 +6,6 @@ Autor: AIMINE
 Fecha: 2025-01-16
 """
 
-import sqlite3
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -15,6 +14,9 @@ from pathlib import Path
 import io
 import base64
 
+from services import dimensions, time_dimension
+from services.db_pool import get_db_pool
+
 # ============================================================================
 # CONFIGURACIÓN
 # ============================================================================
@@ -52,9 +54,12 @@ def analizar_match_pala_camion(
         - responsable_principal: Cuello de botella identificado
     """
     
-    conn = sqlite3.connect(db_path)
+    conn = get_db_pool(db_path).connect()
 
     try:
+        # Excluir tercerizados (TE): por equipo_id de dim_equipo, o prefijo si no está resuelto
+        sin_terceros, params_terceros = dimensions.filtro_equipos(conn, "hexagon_by_kpi_hora", excluir_terceros=True)
+
         # =================================================================
         # FIX: Si fecha_inicio == fecha_fin, agregar 1 día al fin
         # Esto permite análisis de un solo día
@@ -70,28 +75,29 @@ def analizar_match_pala_camion(
         # =================================================================
 
         # QUERY ACTUALIZADO: Usa hexagon_by_kpi_hora (tiene datos hasta agosto 2025)
-        # Filtra equipos Codelco por prefijo (ya que no tiene columna empresa)
-        query = """
+        # Filtra equipos Codelco excluyendo tercerizados vía dim_equipo (ya que no tiene columna empresa)
+        # Rango y fecha desde dim_tiempo (claves enteras); turno y hora 0-11 de la
+        # tabla, igual que el patrón por turno de abajo (incluye el turno B)
+        tiempo = time_dimension.tiempo_sql(conn, "hexagon_by_kpi_hora", "k", (fecha_inicio, fecha_fin))
+        query = f"""
         SELECT
-            DATE(timestamp) as fecha,
-            hora,
-            turno,
-            tipo,
-            AVG(disponible * 100.0 / NULLIF(nominal, 0)) as dm_pct
-        FROM hexagon_by_kpi_hora
-        WHERE timestamp >= ?
-          AND timestamp < ?
-          AND tipo IN ('Shovel', 'Truck')
-          AND nominal > 0
-          AND (
-              -- Filtrar solo equipos Codelco (excluir tercerizados TE)
-              equipment_id NOT LIKE 'TE%'
-          )
-        GROUP BY DATE(timestamp), hora, turno, tipo
+            {tiempo.fecha} as fecha,
+            k.hora,
+            k.turno,
+            k.tipo,
+            AVG(k.disponible * 100.0 / NULLIF(k.nominal, 0)) as dm_pct
+        FROM hexagon_by_kpi_hora k
+        {tiempo.join}
+        WHERE {tiempo.where}
+          AND k.tipo IN ('Shovel', 'Truck')
+          AND k.nominal > 0
+          -- Filtrar solo equipos Codelco (excluir tercerizados TE)
+          {sin_terceros}
+        GROUP BY {tiempo.fecha_id}, k.hora, k.turno, k.tipo
         ORDER BY fecha, turno, hora, tipo
         """
         
-        df = pd.read_sql_query(query, conn, params=[fecha_inicio, fecha_fin])
+        df = pd.read_sql_query(query, conn, params=[*tiempo.params, *params_terceros])
         
         if df.empty:
             return {
@@ -266,8 +272,8 @@ def analizar_match_pala_camion(
             query_real = """
             SELECT SUM(material_tonnage) as tonelaje_real
             FROM hexagon_by_detail_dumps_2025
-            WHERE DATE(timestamp) >= ?
-              AND DATE(timestamp) < ?
+            WHERE timestamp >= ?
+              AND timestamp < ?
               AND empresa = 'CODELCO'
             """
             df_real = pd.read_sql_query(query_real, conn, params=[fecha_inicio, fecha_fin])
@@ -308,7 +314,7 @@ def analizar_match_pala_camion(
         # ANALISIS ADICIONAL 2: TOP EQUIPOS PROBLEMATICOS
         # =================================================================
         try:
-            query_equipos = """
+            query_equipos = f"""
             SELECT equipment_id as equipo,
                 tipo,
                 COUNT(*) as horas_operadas,
@@ -319,14 +325,14 @@ def analizar_match_pala_camion(
               AND timestamp < ?
               AND tipo IN ('Shovel', 'Truck')
               AND nominal > 0
-              AND equipment_id NOT LIKE 'TE%'
+              {sin_terceros}
             GROUP BY equipment_id, tipo
             HAVING COUNT(*) >= 10
             ORDER BY dm_promedio ASC
             LIMIT 15
             """
 
-            df_equipos = pd.read_sql_query(query_equipos, conn, params=[fecha_inicio, fecha_fin])
+            df_equipos = pd.read_sql_query(query_equipos, conn, params=[fecha_inicio, fecha_fin, *params_terceros])
 
             top_problematicos = []
             # LIMITAR A TOP 10 para evitar rate limits
@@ -347,7 +353,7 @@ def analizar_match_pala_camion(
         # ANALISIS ADICIONAL 3: PATRON TEMPORAL
         # =================================================================
         try:
-            query_patron = """
+            query_patron = f"""
             SELECT
                 turno,
                 AVG(disponible * 100.0 / NULLIF(nominal, 0)) as dm_promedio
@@ -356,12 +362,12 @@ def analizar_match_pala_camion(
               AND timestamp < ?
               AND tipo = 'Truck'
               AND nominal > 0
-              AND equipment_id NOT LIKE 'TE%'
+              {sin_terceros}
             GROUP BY turno
             ORDER BY turno
             """
 
-            df_patron = pd.read_sql_query(query_patron, conn, params=[fecha_inicio, fecha_fin])
+            df_patron = pd.read_sql_query(query_patron, conn, params=[fecha_inicio, fecha_fin, *params_terceros])
 
             patron_turno = {}
             for _, row in df_patron.iterrows():
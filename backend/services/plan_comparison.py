@@ -11,6 +11,8 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import calendar
 
+from services.excel_sidecar import load_hexagon_excel
+
 class PlanComparisonService:
     """
     Servicio que compara producción real vs planes
@@ -95,7 +97,7 @@ class PlanComparisonService:
                     "error": f"Archivo no encontrado: {dumps_file.name}"
                 }
             
-            df = pd.read_excel(dumps_file)
+            df = load_hexagon_excel(dumps_file, columns=['time', 'material_tonnage'])
             df['fecha'] = pd.to_datetime(df['time'])
             df['mes'] = df['fecha'].dt.month
             
@@ -132,7 +134,7 @@ class PlanComparisonService:
                     "error": f"Archivo no encontrado"
                 }
             
-            df = pd.read_excel(dumps_file)
+            df = load_hexagon_excel(dumps_file, columns=['time', 'material_tonnage'])
             df['fecha'] = pd.to_datetime(df['time'])
             df['mes'] = df['fecha'].dt.month
             
@@ -1,13 +1,113 @@
 """
 Plan Reader - Lee planes mensuales directamente de Excel
 No requiere ingesta previa a SQL
+
+Cada libro se parsea una sola vez por proceso: las hojas que usa el
+lector quedan en un índice (_PlanWorkbook) junto con su matriz de texto
+para buscar etiquetas con máscaras vectorizadas, y los resultados ya
+extraídos (plan mensual, diario, por fase, por equipo, P0) se memorizan
+en el mismo índice. Si cambia el mtime o el tamaño del archivo el
+índice se descarta y se vuelve a parsear.
 """
 
+import copy
+import threading
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, Iterable, Optional, Tuple
 import re
 
+
+# =============================================================================
+# ÍNDICE DE LIBROS DE PLAN (parseo único, invalidado por mtime)
+# =============================================================================
+
+# Hojas del plan mensual que lee PlanReader (las demás no se parsean)
+PLAN_SHEETS = ('RESUMEN MNTTO.', 'RESUMEN KPIS', 'RESUMEN DIARIO', 'EXTRACCIÓN POR FASE')
+
+
+class _PlanWorkbook:
+    """Hojas parseadas de un libro de plan y resultados derivados de ellas"""
+
+    def __init__(self, path: Path, signature: Tuple[int, int], sheet_names, sheets: Dict[str, pd.DataFrame]):
+        self.path = path
+        self.signature = signature
+        self.sheet_names = list(sheet_names)
+        self.sheets = sheets
+        self.resultados: Dict[Tuple, Any] = {}
+        self._texto: Dict[str, pd.DataFrame] = {}
+
+    def texto(self, sheet: str) -> pd.DataFrame:
+        """Matriz de la hoja como texto (str(celda).strip(), '' en celdas vacías)"""
+        if sheet not in self._texto:
+            df = self.sheets[sheet]
+            texto = df.astype(object).where(df.notna(), '').astype(str)
+            self._texto[sheet] = texto.apply(lambda col: col.str.strip())
+        return self._texto[sheet]
+
+    def columna(self, sheet: str, col: int) -> pd.Series:
+        """Columna de texto de la hoja ('' si la hoja no tiene esa columna)"""
+        texto = self.texto(sheet)
+        if col < len(texto.columns):
+            return texto.iloc[:, col]
+        return pd.Series('', index=texto.index)
+
+
+_WORKBOOKS: Dict[str, _PlanWorkbook] = {}
+_WORKBOOKS_LOCK = threading.Lock()
+
+
+def _signature(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _workbook(path: Path, sheets: Optional[Iterable[str]] = PLAN_SHEETS) -> _PlanWorkbook:
+    """
+    Índice del libro, parseándolo solo si no está o si el archivo cambió
+
+    Args:
+        path: Archivo Excel del plan
+        sheets: Hojas a parsear; None = solo la primera hoja (P0)
+    """
+    key = str(Path(path).resolve())
+    signature = _signature(Path(path))
+
+    with _WORKBOOKS_LOCK:
+        wb = _WORKBOOKS.get(key)
+    if wb is not None and wb.signature == signature:
+        return wb
+
+    with pd.ExcelFile(path) as excel_file:
+        sheet_names = excel_file.sheet_names
+        leer = [s for s in sheet_names if s in set(sheets)] if sheets is not None else sheet_names[:1]
+        frames = {s: excel_file.parse(s, header=None) for s in leer}
+
+    wb = _PlanWorkbook(Path(path), signature, sheet_names, frames)
+    with _WORKBOOKS_LOCK:
+        _WORKBOOKS[key] = wb
+    return wb
+
+
+def clear_plan_cache():
+    """Descarta los libros parseados (se vuelven a leer en el próximo acceso)"""
+    with _WORKBOOKS_LOCK:
+        _WORKBOOKS.clear()
+
+
+def _contiene(serie: pd.Series, *patrones: str) -> np.ndarray:
+    """Máscara de celdas que contienen alguno de los patrones (literal)"""
+    mask = np.zeros(len(serie), dtype=bool)
+    for patron in patrones:
+        mask |= serie.str.contains(patron, regex=False).to_numpy(dtype=bool)
+    return mask
+
+
+def _es_numero(val) -> bool:
+    return pd.notna(val) and isinstance(val, (int, float))
+
+
 class PlanReader:
     """Lee planes mensuales directamente de archivos Excel"""
 
@@ -26,40 +126,52 @@ class PlanReader:
         Returns:
             Dict con datos del plan o None si no existe
         """
+        archivo, mes_nombre = self._buscar_archivo_mensual(mes, year)
+        if not mes_nombre:
+            return None
+
+        if not archivo:
+            print(f"[WARN] No se encontro plan mensual para {mes_nombre} {year}")
+            return None
+
+        plan = self._plan_mensual_cacheado(archivo, mes, year, mes_nombre)
+        return copy.deepcopy(plan) if plan else None
+
+    def _plan_mensual_cacheado(self, archivo: Path, mes: int, year: int, mes_nombre: str) -> Optional[Dict]:
+        """Plan mensual memorizado en el índice del libro (NO modificar el dict retornado)"""
+        try:
+            wb = _workbook(archivo)
+            clave = ('mensual', mes, year)
+            if clave not in wb.resultados:
+                print(f"[PLAN] Leyendo plan: {archivo.name}")
+                wb.resultados[clave] = self._extract_plan_data(archivo, mes, year, mes_nombre)
+            return wb.resultados[clave]
+        except Exception as e:
+            print(f"[ERROR] Error leyendo plan: {e}")
+            return None
+
+    def _buscar_archivo_mensual(self, mes: int, year: int) -> Tuple[Optional[Path], str]:
+        """Archivo del plan mensual y nombre del mes ('' si el mes no es válido)"""
         # Nombre del mes en español
         meses = {
             1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril",
             5: "Mayo", 6: "Junio", 7: "Julio", 8: "Agosto",
             9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
         }
-
         mes_nombre = meses.get(mes)
         if not mes_nombre:
-            return None
-
+            return None, ''
         # Buscar archivo del plan mensual
         # Patrón: "01_Plan Mensual Enero Mina RI 2025 (7).xlsx"
         pattern = f"*Plan Mensual {mes_nombre}*{year}*.xlsx"
 
         archivos = list(self.data_dir.glob(pattern))
-
-        if not archivos:
-            print(f"[WARN] No se encontro plan mensual para {mes_nombre} {year}")
-            return None
-
-        archivo = archivos[0]  # Tomar el primero si hay múltiples
-        print(f"[PLAN] Leyendo plan: {archivo.name}")
-
-        try:
-            return self._extract_plan_data(archivo, mes, year, mes_nombre)
-        except Exception as e:
-            print(f"[ERROR] Error leyendo plan: {e}")
-            return None
+        return (archivos[0] if archivos else None), mes_nombre  # Tomar el primero si hay múltiples
 
     def _extract_plan_data(self, filepath: Path, mes: int, year: int, mes_nombre: str) -> Dict:
-        """Extrae datos clave del plan mensual"""
+        """Extrae datos clave del plan mensual (hojas desde el índice del libro)"""
 
-        excel_file = pd.ExcelFile(filepath)
+        wb = _workbook(filepath)
 
         result = {
             'mes': mes,
@@ -70,7 +182,7 @@ class PlanReader:
             'extraccion_total': None,
             'disponibilidad_palas': None,
             'disponibilidad_camiones': None,
-            'hojas_disponibles': excel_file.sheet_names,
+            'hojas_disponibles': wb.sheet_names,
             'fases_codelco': [],
             'fases_contratista': [],
             'requiere_confirmacion_usuario': False
@@ -86,13 +198,13 @@ class PlanReader:
         # - Solo queremos medir KPIs de equipos Codelco (no contratistas)
 
         # Buscar hojas con nombres variados
-        tiene_fase1 = ('CARGUIO Y TRANSPORTE FASE1' in excel_file.sheet_names or
-                       'C&T FASE1' in excel_file.sheet_names)
-        tiene_fase2 = ('CARGUIO Y TRANSPORTE FASE2' in excel_file.sheet_names or
-                       'C&T FASE2' in excel_file.sheet_names)
-        tiene_fase3 = ('CARGUIO Y TRANSPORTE FASE3' in excel_file.sheet_names or
-                       'C&T FASE3' in excel_file.sheet_names)
-        tiene_tepsac = 'TEPSAC' in excel_file.sheet_names
+        tiene_fase1 = ('CARGUIO Y TRANSPORTE FASE1' in wb.sheet_names or
+                       'C&T FASE1' in wb.sheet_names)
+        tiene_fase2 = ('CARGUIO Y TRANSPORTE FASE2' in wb.sheet_names or
+                       'C&T FASE2' in wb.sheet_names)
+        tiene_fase3 = ('CARGUIO Y TRANSPORTE FASE3' in wb.sheet_names or
+                       'C&T FASE3' in wb.sheet_names)
+        tiene_tepsac = 'TEPSAC' in wb.sheet_names
 
         if tiene_fase1:
             # Si existe FASE1, asumimos que es Codelco
@@ -117,9 +229,9 @@ class PlanReader:
         # CAMBIO: NO leer solo F01, leer desde RESUMEN DIARIO que tiene el TOTAL
         # Según IGM oficial, el plan debe incluir TODAS las fases, no solo Codelco
         sheet_name_fase1 = None
-        if 'C&T FASE1' in excel_file.sheet_names:
+        if 'C&T FASE1' in wb.sheet_names:
             sheet_name_fase1 = 'C&T FASE1'
-        elif 'CARGUIO Y TRANSPORTE FASE1' in excel_file.sheet_names:
+        elif 'CARGUIO Y TRANSPORTE FASE1' in wb.sheet_names:
             sheet_name_fase1 = 'CARGUIO Y TRANSPORTE FASE1'
 
         # DESHABILITADO: No leer solo F01, saltar directo a RESUMEN DIARIO (TOTAL)
@@ -374,25 +486,24 @@ class PlanReader:
                 traceback.print_exc()
 
         # OPCIÓN 2 FALLBACK: Si no se pudo leer de FASE1, intentar RESUMEN MNTTO.
-        if result['movimiento_total'] is None and 'RESUMEN MNTTO.' in excel_file.sheet_names:
+        if result['movimiento_total'] is None and 'RESUMEN MNTTO.' in wb.sheet_names:
             try:
-                df = pd.read_excel(filepath, sheet_name='RESUMEN MNTTO.', header=None)
-
-                # Buscar "Movimiento" o "Extracción" en la hoja
-                for idx in range(len(df)):
-                    for col_idx in range(min(5, len(df.columns))):
-                        celda = str(df.iloc[idx, col_idx]).lower() if pd.notna(df.iloc[idx, col_idx]) else ""
-
-                        if 'movimiento' in celda or 'extracción' in celda or 'extraccion' in celda:
-                            # Buscar valor total en las siguientes columnas
-                            for val_col in range(col_idx + 1, min(col_idx + 10, len(df.columns))):
-                                val = df.iloc[idx, val_col]
-                                if pd.notna(val) and isinstance(val, (int, float)) and val > 1_000_000:
-                                    result['movimiento_total'] = float(val)
-                                    print(f"   [OK] Movimiento Total: {result['movimiento_total']:,.0f} ton (desde RESUMEN MNTTO.)")
-                                    break
-                            if result['movimiento_total']:
-                                break
+                df = wb.sheets['RESUMEN MNTTO.']
+                etiquetas = wb.texto('RESUMEN MNTTO.').iloc[:, :5].apply(lambda col: col.str.lower())
+
+                # Buscar "Movimiento" o "Extracción" en la hoja (orden fila a fila, primeras 5 columnas)
+                mask = np.column_stack([
+                    _contiene(etiquetas[c], 'movimiento', 'extracción', 'extraccion') for c in etiquetas.columns
+                ]) if len(etiquetas.columns) else np.zeros((len(df), 0), dtype=bool)
+
+                for idx, col_idx in np.argwhere(mask):
+                    # Buscar valor total en las siguientes columnas
+                    for val_col in range(col_idx + 1, min(col_idx + 10, len(df.columns))):
+                        val = df.iloc[idx, val_col]
+                        if _es_numero(val) and val > 1_000_000:
+                            result['movimiento_total'] = float(val)
+                            print(f"   [OK] Movimiento Total: {result['movimiento_total']:,.0f} ton (desde RESUMEN MNTTO.)")
+                            break
                     if result['movimiento_total']:
                         break
 
@@ -402,52 +513,51 @@ class PlanReader:
         # =================================================================
         # RESUMEN KPIS - Leer extraccion_total del plan mensual
         # =================================================================
-        if 'RESUMEN KPIS' in excel_file.sheet_names:
+        if 'RESUMEN KPIS' in wb.sheet_names:
             try:
-                df = pd.read_excel(filepath, sheet_name='RESUMEN KPIS', header=None)
+                df = wb.sheets['RESUMEN KPIS']
 
                 # Buscar fila "Extracción Total" en columna 2 (índice 1)
-                for row_idx in range(len(df)):
-                    col2 = str(df.iloc[row_idx, 1]).strip() if pd.notna(df.iloc[row_idx, 1]) else ""
-
-                    if 'Extracción Total' in col2 or 'Extraccion Total' in col2:
-                        # Leer columna 5 (índice 4) = Plan Mensual
-                        col3_unidad = str(df.iloc[row_idx, 2]).strip() if pd.notna(df.iloc[row_idx, 2]) else ""
-                        val_col5 = df.iloc[row_idx, 4]  # Col 5 = Plan Mensual
-
-                        if pd.notna(val_col5) and isinstance(val_col5, (int, float)):
-                            # Si la unidad es 'kt', el valor ya está en kilotoneladas
-                            if col3_unidad.lower() == 'kt':
-                                result['extraccion_total'] = float(val_col5) * 1000  # Convertir kt a ton
-                                print(f"   [OK] Extraccion Total (RESUMEN KPIS): {float(val_col5):,.2f} Kton = {result['extraccion_total']:,.0f} ton")
-                            else:
-                                result['extraccion_total'] = float(val_col5)
-                                print(f"   [OK] Extraccion Total (RESUMEN KPIS): {result['extraccion_total']:,.0f} ton")
-                        break
+                filas = np.flatnonzero(_contiene(wb.columna('RESUMEN KPIS', 1), 'Extracción Total', 'Extraccion Total'))
+
+                if len(filas):
+                    row_idx = filas[0]
+                    # Leer columna 5 (índice 4) = Plan Mensual
+                    col3_unidad = wb.columna('RESUMEN KPIS', 2).iloc[row_idx]
+                    val_col5 = df.iloc[row_idx, 4]  # Col 5 = Plan Mensual
+
+                    if _es_numero(val_col5):
+                        # Si la unidad es 'kt', el valor ya está en kilotoneladas
+                        if col3_unidad.lower() == 'kt':
+                            result['extraccion_total'] = float(val_col5) * 1000  # Convertir kt a ton
+                            print(f"   [OK] Extraccion Total (RESUMEN KPIS): {float(val_col5):,.2f} Kton = {result['extraccion_total']:,.0f} ton")
+                        else:
+                            result['extraccion_total'] = float(val_col5)
+                            print(f"   [OK] Extraccion Total (RESUMEN KPIS): {result['extraccion_total']:,.0f} ton")
 
             except Exception as e:
                 print(f"[WARN]  Error en RESUMEN KPIS: {e}")
 
         # HOJA 2: RESUMEN DIARIO (backup) - SOLO LEER F01 (CODELCO)
-        if result['movimiento_total'] is None and 'RESUMEN DIARIO' in excel_file.sheet_names:
+        if result['movimiento_total'] is None and 'RESUMEN DIARIO' in wb.sheet_names:
             try:
-                df = pd.read_excel(filepath, sheet_name='RESUMEN DIARIO', header=None)
+                df = wb.sheets['RESUMEN DIARIO']
+                col_b = wb.columna('RESUMEN DIARIO', 1).str.upper()
+                col_c = wb.columna('RESUMEN DIARIO', 2).str.upper()
 
                 # Buscar fila con TOTAL que suma todas las fases (F01+F02+F03)
-                for idx in range(len(df)):
-                    if idx >= 2 and idx <= 10:  # Filas 2-10 (donde están los totales por fase)
-                        celda_fase_b = str(df.iloc[idx, 1]).strip().upper() if pd.notna(df.iloc[idx, 1]) else ""
-                        celda_fase_c = str(df.iloc[idx, 2]).strip().upper() if pd.notna(df.iloc[idx, 2]) else ""
-
-                        # Buscar fila que contenga "TOTAL" (suma de todas las fases)
-                        if celda_fase_b == 'TOTAL' or 'TOTAL' in celda_fase_c:
-                            # El valor total mensual está en la última columna
-                            ultima_col = len(df.columns) - 1
-                            val = df.iloc[idx, ultima_col]
-                            if pd.notna(val) and isinstance(val, (int, float)) and val > 100_000:
-                                result['movimiento_total'] = float(val)
-                                print(f"   [OK] Movimiento TOTAL (todas las fases): {result['movimiento_total']:,.0f} ton (desde RESUMEN DIARIO)")
-                                break
+                # Filas 2-10 (donde están los totales por fase)
+                es_total = (col_b == 'TOTAL').to_numpy() | _contiene(col_c, 'TOTAL')
+                es_total[:2] = False
+                es_total[11:] = False
+
+                for idx in np.flatnonzero(es_total):
+                    # El valor total mensual está en la última columna
+                    val = df.iloc[idx, len(df.columns) - 1]
+                    if _es_numero(val) and val > 100_000:
+                        result['movimiento_total'] = float(val)
+                        print(f"   [OK] Movimiento TOTAL (todas las fases): {result['movimiento_total']:,.0f} ton (desde RESUMEN DIARIO)")
+                        break
 
             except Exception as e:
                 print(f"[WARN]  Error en RESUMEN DIARIO: {e}")
@@ -458,9 +568,12 @@ class PlanReader:
         # =================================================================
         # HOJA 4: RESUMEN DIARIO - Plan día por día
         # =================================================================
-        if 'RESUMEN DIARIO' in excel_file.sheet_names:
+        if 'RESUMEN DIARIO' in wb.sheet_names:
             try:
-                df = pd.read_excel(filepath, sheet_name='RESUMEN DIARIO', header=None)
+                df = wb.sheets['RESUMEN DIARIO']
+                col_b_texto = wb.columna('RESUMEN DIARIO', 1)
+                col_c_texto = wb.columna('RESUMEN DIARIO', 2)
+                col_d_texto = wb.columna('RESUMEN DIARIO', 3).str.lower()
 
                 # PASO 1: Buscar fila con Fase="Total" de EXTRACCIÓN
                 # Estructura esperada:
@@ -468,30 +581,23 @@ class PlanReader:
                 # Fila 4: (vacío) [F02]
                 # Fila 5: (vacío) [F03]
                 # Fila 7: (vacío) [Total] <- ESTA ES LA QUE QUEREMOS
+                #
+                # Buscar fila donde:
+                # - col3 (índice 2) = "Total"
+                # - col4 (índice 3) = "tmh" (toneladas, no metros de perforación)
+                # - Cerca de una fila con "Extracción total" en col2 (5 filas antes a 1 después)
                 fila_total_idx = None
 
-                for row_idx in range(len(df)):
-                    col2 = str(df.iloc[row_idx, 1]).strip() if pd.notna(df.iloc[row_idx, 1]) else ""
-                    col3_fase = str(df.iloc[row_idx, 2]).strip() if pd.notna(df.iloc[row_idx, 2]) else ""
-                    col4_unidad = str(df.iloc[row_idx, 3]).strip().lower() if pd.notna(df.iloc[row_idx, 3]) else ""
-
-                    # Buscar fila donde:
-                    # - col3 (índice 2) = "Total"
-                    # - col4 (índice 3) = "tmh" (toneladas, no metros de perforación)
-                    # - Cerca de una fila con "Extracción total" en col2
-                    if col3_fase.lower() == 'total' and col4_unidad == 'tmh':
-                        # Verificar que está cerca de "Extracción total"
-                        es_extraccion = False
-                        for check_row in range(max(0, row_idx - 5), min(row_idx + 2, len(df))):
-                            check_col2 = str(df.iloc[check_row, 1]).strip().lower() if pd.notna(df.iloc[check_row, 1]) else ""
-                            if 'extracción total' in check_col2 or 'extraccion total' in check_col2:
-                                es_extraccion = True
-                                break
-
-                        if es_extraccion:
-                            fila_total_idx = row_idx
-                            print(f"   [OK] Fila Total de Extracción encontrada en fila {row_idx}")
-                            break
+                es_total_tmh = (col_c_texto.str.lower() == 'total').to_numpy() & (col_d_texto == 'tmh').to_numpy()
+                es_extraccion = _contiene(col_b_texto.str.lower(), 'extracción total', 'extraccion total')
+                acumulado = np.concatenate([[0], np.cumsum(es_extraccion)])
+                filas = np.arange(len(df))
+                cerca = (acumulado[np.minimum(filas + 2, len(df))] - acumulado[np.maximum(filas - 5, 0)]) > 0
+
+                candidatas = np.flatnonzero(es_total_tmh & cerca)
+                if len(candidatas):
+                    fila_total_idx = int(candidatas[0])
+                    print(f"   [OK] Fila Total de Extracción encontrada en fila {fila_total_idx}")
 
                 if fila_total_idx is None:
                     print(f"   [WARN]  No se encontró fila Total de Extracción en RESUMEN DIARIO")
@@ -559,23 +665,38 @@ class PlanReader:
 
                                 result['plan_diario_total_validado'] = float(total_mes_columna)
 
-                        # PASO 5: Extraer equipos por fase
+                        # PASO 5: Extraer equipos por fase (con su plan día a día y total del mes)
                         equipos_por_fase = {'F01': [], 'F02': [], 'F03': [], 'F04': []}
 
-                        for row_idx in range(len(df)):
-                            col_b = str(df.iloc[row_idx, 1]).strip().upper() if pd.notna(df.iloc[row_idx, 1]) else ""
-                            col_c = str(df.iloc[row_idx, 2]).strip() if pd.notna(df.iloc[row_idx, 2]) else ""
-                            col_d = str(df.iloc[row_idx, 3]).strip().lower() if pd.notna(df.iloc[row_idx, 3]) else ""
-
-                            # Solo equipos con unidad "tmh" (no perforación "m")
-                            if col_b in ['F01', 'F02', 'F03', 'F04'] and col_d == 'tmh':
-                                if col_c and col_c.lower() not in ['f01', 'f02', 'f03', 'f04', 'total', '']:
-                                    equipos_por_fase[col_b].append({
-                                        'nombre': col_c,
-                                        'fase': col_b,
-                                        'fila': row_idx
+                        # Solo equipos con unidad "tmh" (no perforación "m")
+                        col_b = col_b_texto.str.upper()
+                        es_equipo = (
+                            col_b.isin(list(equipos_por_fase)).to_numpy()
+                            & (col_d_texto == 'tmh').to_numpy()
+                            & ~col_c_texto.str.lower().isin(['f01', 'f02', 'f03', 'f04', 'total', '']).to_numpy()
+                        )
+
+                        for row_idx in np.flatnonzero(es_equipo):
+                            plan_equipo = []
+                            for i in range(dias_mes):
+                                fecha = df.iloc[1, primera_fecha_col + i]
+                                tonelaje = df.iloc[row_idx, primera_fecha_col + i]
+                                if _es_numero(tonelaje) and tonelaje > 0:
+                                    plan_equipo.append({
+                                        'dia': fecha.day if hasattr(fecha, 'day') else i + 1,
+                                        'tonelaje': float(tonelaje)
                                     })
 
+                            total_equipo = df.iloc[row_idx, col_total_mes] if col_total_mes < len(df.columns) else None
+
+                            equipos_por_fase[col_b.iloc[row_idx]].append({
+                                'nombre': col_c_texto.iloc[row_idx],
+                                'fase': col_b.iloc[row_idx],
+                                'fila': int(row_idx),
+                                'plan_diario': plan_equipo,
+                                'tonelaje_mes': float(total_equipo) if _es_numero(total_equipo) else sum(d['tonelaje'] for d in plan_equipo)
+                            })
+
                         result['equipos_por_fase'] = equipos_por_fase
 
                         total_equipos = sum(len(equipos) for equipos in equipos_por_fase.values())
@@ -590,20 +711,18 @@ class PlanReader:
         # =================================================================
         # HOJA EXTRACCIÓN POR FASE - Leer total mensual desde fila "Extracción total"
         # =================================================================
-        if 'EXTRACCIÓN POR FASE' in excel_file.sheet_names:
+        if 'EXTRACCIÓN POR FASE' in wb.sheet_names:
             try:
-                df = pd.read_excel(filepath, sheet_name='EXTRACCIÓN POR FASE', header=None)
+                df = wb.sheets['EXTRACCIÓN POR FASE']
 
                 # Buscar fila que contiene "Extracción total" en columna A (índice 0)
+                # Verificar que sea la fila correcta (típicamente fila 31)
+                # Buscar valor en última columna con datos (típicamente col AK)
                 fila_total_idx = None
-                for row_idx in range(len(df)):
-                    val_a = str(df.iloc[row_idx, 0]).strip().lower() if pd.notna(df.iloc[row_idx, 0]) else ""
-                    if 'extracción total' in val_a or 'extracci' in val_a:
-                        # Verificar que sea la fila correcta (típicamente fila 31)
-                        # Buscar valor en última columna con datos (típicamente col AK)
-                        fila_total_idx = row_idx
-                        print(f"   [OK] Fila 'Extracción total' encontrada en fila {row_idx}")
-                        break
+                filas = np.flatnonzero(_contiene(wb.columna('EXTRACCIÓN POR FASE', 0).str.lower(), 'extracción total', 'extracci'))
+                if len(filas):
+                    fila_total_idx = int(filas[0])
+                    print(f"   [OK] Fila 'Extracción total' encontrada en fila {fila_total_idx}")
 
                 if fila_total_idx is not None:
                     # Buscar columna TOTAL (típicamente la última con datos)
@@ -644,10 +763,14 @@ class PlanReader:
             return None
 
         archivo = archivos[0]
-        print(f"[PLAN] Leyendo P0: {archivo.name}")
 
         try:
-            df = pd.read_excel(archivo, header=None)
+            wb = _workbook(archivo, sheets=None)
+            if ('p0', year) in wb.resultados:
+                return copy.deepcopy(wb.resultados[('p0', year)])
+
+            print(f"[PLAN] Leyendo P0: {archivo.name}")
+            df = next(iter(wb.sheets.values()))
 
             result = {
                 'year': year,
@@ -656,26 +779,27 @@ class PlanReader:
             }
 
             # Buscar fila "Movimiento Total - tmh"
-            for idx in range(len(df)):
-                celda = str(df.iloc[idx, 0]).lower() if pd.notna(df.iloc[idx, 0]) else ""
-
-                if 'movimiento total' in celda and 'tmh' in celda:
-                    meses = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
-                            'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
-
-                    for mes_idx, mes_nombre in enumerate(meses, start=1):
-                        col_idx = mes_idx + 1
-                        if col_idx < len(df.columns):
-                            val = df.iloc[idx, col_idx]
-                            if pd.notna(val) and isinstance(val, (int, float)):
-                                result['planes_mensuales'][mes_idx] = {
-                                    'mes': mes_idx,
-                                    'mes_nombre': mes_nombre,
-                                    'movimiento_total': float(val)
-                                }
-                    break
-
-            return result
+            col_a = wb.columna(wb.sheet_names[0], 0).str.lower()
+            filas = np.flatnonzero(_contiene(col_a, 'movimiento total') & _contiene(col_a, 'tmh'))
+
+            if len(filas):
+                idx = filas[0]
+                meses = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+                        'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+                for mes_idx, mes_nombre in enumerate(meses, start=1):
+                    col_idx = mes_idx + 1
+                    if col_idx < len(df.columns):
+                        val = df.iloc[idx, col_idx]
+                        if _es_numero(val):
+                            result['planes_mensuales'][mes_idx] = {
+                                'mes': mes_idx,
+                                'mes_nombre': mes_nombre,
+                                'movimiento_total': float(val)
+                            }
+
+            wb.resultados[('p0', year)] = result
+            return copy.deepcopy(result)
 
         except Exception as e:
             print(f"[ERROR] Error leyendo P0: {e}")
@@ -705,7 +829,8 @@ class PlanReader:
             }
         """
         # Primero obtener el archivo del plan mensual
-        plan_mensual = self.get_plan_mensual(mes, year)
+        archivo_mensual, mes_nombre = self._buscar_archivo_mensual(mes, year)
+        plan_mensual = self._plan_mensual_cacheado(archivo_mensual, mes, year, mes_nombre) if archivo_mensual else None
         if not plan_mensual:
             print(f"[PLAN_FASE] No se encontró plan mensual para {mes}/{year}")
             return None
@@ -738,12 +863,18 @@ class PlanReader:
             return None
 
         try:
-            # Leer hoja RESUMEN DIARIO
-            if 'RESUMEN DIARIO' not in pd.ExcelFile(filepath).sheet_names:
+            # Leer hoja RESUMEN DIARIO (desde el índice del libro)
+            wb = _workbook(filepath)
+            if ('fases', mes, year) in wb.resultados:
+                return copy.deepcopy(wb.resultados[('fases', mes, year)])
+
+            if 'RESUMEN DIARIO' not in wb.sheet_names:
                 print(f"[PLAN_FASE] No se encontró hoja RESUMEN DIARIO en {filepath.name}")
                 return None
 
-            df = pd.read_excel(filepath, sheet_name='RESUMEN DIARIO', header=None)
+            df = wb.sheets['RESUMEN DIARIO']
+            texto_b = wb.columna('RESUMEN DIARIO', 1)
+            texto_c = wb.columna('RESUMEN DIARIO', 2).str.upper()
 
             # Estructura de fases
             fases = {}
@@ -752,8 +883,8 @@ class PlanReader:
             # Buscar filas con fases (F01, F02, F03, etc.) en columna C (índice 2)
             # Las fases están en las primeras filas (típicamente 2-10)
             for row_idx in range(1, min(15, len(df))):
-                col_b = str(df.iloc[row_idx, 1]).strip() if pd.notna(df.iloc[row_idx, 1]) else ""
-                col_c = str(df.iloc[row_idx, 2]).strip().upper() if pd.notna(df.iloc[row_idx, 2]) else ""
+                col_b = texto_b.iloc[row_idx]
+                col_c = texto_c.iloc[row_idx]
 
                 # Buscar patrón F\d+ (F01, F02, F03, etc.)
                 fase_match = re.match(r'^(F\d+)', col_c)
@@ -765,7 +896,7 @@ class PlanReader:
                     ultima_col = len(df.columns) - 1
                     val = df.iloc[row_idx, ultima_col]
 
-                    if pd.notna(val) and isinstance(val, (int, float)) and val > 1000:
+                    if _es_numero(val) and val > 1000:
                         fases[fase_id] = float(val)
                         plan_total += float(val)
                         print(f"[PLAN_FASE] {fase_id}: {float(val):,.0f} ton")
@@ -774,7 +905,7 @@ class PlanReader:
                 if 'TOTAL' in col_c and col_b.strip() == '':
                     ultima_col = len(df.columns) - 1
                     val_total = df.iloc[row_idx, ultima_col]
-                    if pd.notna(val_total) and isinstance(val_total, (int, float)):
+                    if _es_numero(val_total):
                         # Validar que coincida con la suma
                         if abs(val_total - plan_total) / val_total < 0.01:  # 1% tolerancia
                             print(f"[PLAN_FASE] TOTAL validado: {val_total:,.0f} ton")
@@ -794,7 +925,8 @@ class PlanReader:
             }
 
             print(f"[PLAN_FASE] Plan total: {result['plan_total']:,.0f} ton ({len(fases)} fases)")
-            return result
+            wb.resultados[('fases', mes, year)] = result
+            return copy.deepcopy(result)
 
         except Exception as e:
             print(f"[PLAN_FASE] Error leyendo fases: {e}")
@@ -823,25 +955,33 @@ class PlanReader:
         mes = fecha_obj.month
         dia = fecha_obj.day
 
-        # Obtener plan mensual (incluye plan_diario)
-        plan_mensual = self.get_plan_mensual(mes, year)
+        # Obtener plan mensual (incluye plan_diario) sin copiarlo: solo se lee
+        archivo, mes_nombre = self._buscar_archivo_mensual(mes, year)
+        plan_mensual = self._plan_mensual_cacheado(archivo, mes, year, mes_nombre) if archivo else None
         if not plan_mensual or 'plan_diario' not in plan_mensual:
             print(f"[WARN]  No hay plan diario disponible para {fecha}")
             return None
 
-        # Buscar el día específico
-        for dia_info in plan_mensual['plan_diario']:
-            if dia_info['dia'] == dia:
-                result = {
-                    'fecha': fecha,
-                    'dia': dia,
-                    'mes': mes,
-                    'year': year,
-                    'tonelaje_plan_dia': dia_info['tonelaje'],
-                    'archivo': plan_mensual['archivo']
-                }
-                print(f"   [OK] Plan del {fecha}: {dia_info['tonelaje']:,.0f} ton")
-                return result
+        # Buscar el día específico (índice día -> tonelaje, primer registro de cada día)
+        resultados = _workbook(archivo).resultados
+        if ('dias', mes, year) not in resultados:
+            por_dia = {}
+            for dia_info in plan_mensual['plan_diario']:
+                por_dia.setdefault(dia_info['dia'], dia_info['tonelaje'])
+            resultados[('dias', mes, year)] = por_dia
+        por_dia = resultados[('dias', mes, year)]
+
+        if dia in por_dia:
+            result = {
+                'fecha': fecha,
+                'dia': dia,
+                'mes': mes,
+                'year': year,
+                'tonelaje_plan_dia': por_dia[dia],
+                'archivo': plan_mensual['archivo']
+            }
+            print(f"   [OK] Plan del {fecha}: {por_dia[dia]:,.0f} ton")
+            return result
 
         print(f"   [WARN]  No se encontró plan para día {dia}")
         return None
@@ -2,189 +2,275 @@
 """
 Analytics directo sobre archivos de datos - VERSION ROBUSTA
 División Salvador - Codelco Chile
+
+Los rankings de operadores salen de un frame preparado una sola vez por
+workbook de dumps (columnas compactas: operador/grupo/equipo categóricos,
+toneladas, año y mes) que vive en el DataFrameCache compartido y se
+invalida si el Excel cambia. Cada ranking es un único groupby sobre ese
+frame con filtros por año/mes/tipo y nlargest por la métrica pedida.
 """
 
 import pandas as pd
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import numpy as np
 
+from services.dimensions import ids_operadores, normalizar_operador
+from services.excel_sidecar import read_excel_columnar
+
+# Nombres posibles de cada columna en las exportaciones de dumps
+COLUMNAS_DUMPS = {
+    "nombre": ['truck_operator_first_name', 'Nombres'],
+    "apellido": ['truck_operator_last_name', 'Apellidos'],
+    "toneladas": ['material_tonnage', 'payload', 'Tonnage'],
+    "equipo": ['truck', 'Equipment'],
+    "fecha": ['time', 'Date', 'timestamp'],
+    "turno": ['shift', 'Crew', 'Turno'],
+}
+
+# Filtro tipo → patrón en el nombre del equipo
+PATRONES_TIPO = {"CAEX": "CA-", "EMT": "EMT", "CF": "CF"}
+
+# Criterio de orden → columna de métricas
+CRITERIOS = {
+    "toneladas": ("Toneladas", "Toneladas totales"),
+    "dumps": ("Dumps", "Número de dumps (viajes)"),
+    "ton_por_dump": ("TonPorDump", "Eficiencia (toneladas por dump)"),
+    "equipos": ("Equipos", "Equipos distintos operados"),
+}
+
 class RankingAnalytics:
     """Análisis de rankings desde archivos raw"""
-    
+
     def __init__(self, data_dir: Path):
         self.data_dir = data_dir
         self.hexagon_dir = data_dir / "Hexagon"
-    
+
     def _find_column(self, df: pd.DataFrame, posibles_nombres: List[str]) -> str:
         """Encuentra una columna por diferentes nombres posibles"""
         for nombre in posibles_nombres:
             if nombre in df.columns:
                 return nombre
         return None
-    
-    def ranking_operadores_produccion(
-        self, 
-        year: int = 2024, 
+
+    def _archivo_dumps(self, year: int) -> Optional[Path]:
+        posibles_archivos = [
+            self.hexagon_dir / f"by_detail_dumps {year}.xlsx",
+            self.hexagon_dir / f"by_detail_dumps{year}.xlsx",
+            self.hexagon_dir / "by_detail_dumps.xlsx"
+        ]
+        for archivo in posibles_archivos:
+            if archivo.exists():
+                return archivo
+        return None
+
+    # ==================================================================
+    # FRAME PREPARADO (una vez por workbook)
+    # ==================================================================
+
+    def _preparar_dumps(self, archivo: Path) -> pd.DataFrame:
+        """
+        Carga solo las columnas necesarias y las deja compactas:
+
+        - operador: categórico "APELLIDO NOMBRE", normalizado sobre los pares
+          únicos (no fila a fila) con la regla de services/dimensions; filas
+          con nombre inválido se descartan
+        - operador_id: clave de dim_operador (0 si la dimensión aún no lo tiene)
+        - grupo, equipo: categóricos
+        - toneladas: float64 (NaN si no es numérico)
+        - year, mes: enteros desde la fecha (filas sin fecha se descartan)
+
+        attrs["columnas"] guarda qué columna fuente se usó para cada campo.
+        """
+        candidatas = [c for nombres in COLUMNAS_DUMPS.values() for c in nombres]
+        raw = read_excel_columnar(archivo, columns=candidatas)
+        columnas = {campo: self._find_column(raw, nombres) for campo, nombres in COLUMNAS_DUMPS.items()}
+
+        out = pd.DataFrame(index=raw.index)
+        out.attrs["columnas"] = columnas
+        out.attrs["registros_totales"] = len(raw)
+        if not all(columnas[c] for c in ("nombre", "apellido", "toneladas")):
+            return out
+
+        # Nombre de operador: normalizar cada par (apellido, nombre) distinto una sola vez
+        pares = raw.groupby([columnas["apellido"], columnas["nombre"]], dropna=False, sort=False)
+        codigos_par = pares.ngroup().to_numpy()
+        claves = pares.size().index.to_frame(index=False)
+        nombres = normalizar_operador(claves.iloc[:, 0], claves.iloc[:, 1])
+        codigos_nombre, categorias = pd.factorize(nombres)
+        codigos = np.where(codigos_par >= 0, codigos_nombre[codigos_par], -1)
+        out["operador"] = pd.Categorical.from_codes(codigos, categories=categorias)
+        ids = pd.Series(categorias).map(ids_operadores()).fillna(0).astype("int32").to_numpy()
+        out["operador_id"] = np.append(ids, 0).astype("int32")[codigos]
+
+        out["toneladas"] = pd.to_numeric(raw[columnas["toneladas"]], errors='coerce')
+        if columnas["equipo"]:
+            out["equipo"] = raw[columnas["equipo"]].astype("category")
+        if columnas["turno"]:
+            out["grupo"] = raw[columnas["turno"]].astype("category")
+
+        out = out[out["operador"].notna()]
+        out.attrs["operadores_validos"] = len(out)
+
+        if columnas["fecha"]:
+            fechas = pd.to_datetime(raw.loc[out.index, columnas["fecha"]], errors='coerce')
+            out = out[fechas.notna()]
+            fechas = fechas[fechas.notna()]
+            out["year"] = fechas.dt.year.astype("int16")
+            out["mes"] = fechas.dt.month.astype("int8")
+
+        return out.reset_index(drop=True)
+
+    def _dumps_preparados(self, archivo: Path) -> pd.DataFrame:
+        """Frame preparado desde el DataFrameCache (se regenera si el Excel cambia)"""
+        from services.dataframe_cache import get_dataframe_cache
+
+        return get_dataframe_cache().get(
+            str(archivo),
+            loader=lambda: self._preparar_dumps(archivo),
+            variant="ranking_operadores"
+        )
+
+    # ==================================================================
+    # MOTOR DE RANKING
+    # ==================================================================
+
+    def ranking_operadores(
+        self,
+        year: int = 2024,
         top_n: int = 5,
-        tipo: str = ""  # CAEX, EMT, CF, o vacío para todos
+        tipo: str = "",
+        mes: Optional[int] = None,
+        ordenar_por: str = "toneladas",
+        min_dumps: int = 0
     ) -> Dict[str, Any]:
         """
-        Ranking de operadores por producción (toneladas)
+        Ranking de operadores por cualquier métrica en una sola pasada
+
+        Args:
+            year: Año de análisis
+            top_n: Número de operadores a retornar
+            tipo: CAEX, EMT, CF, o vacío para todos
+            mes: Mes específico (1-12) o None para todo el año
+            ordenar_por: toneladas, dumps, ton_por_dump o equipos
+            min_dumps: Dumps mínimos para entrar al ranking (no afecta estadísticas)
+
+        Returns:
+            Dict con ranking, estadísticas y metadatos (o error)
         """
         try:
+            if ordenar_por not in CRITERIOS:
+                return {
+                    "error": f"Criterio de orden desconocido: {ordenar_por}",
+                    "criterios_validos": list(CRITERIOS)
+                }
+            columna_orden, descripcion_orden = CRITERIOS[ordenar_por]
+
             # 1. BUSCAR ARCHIVO
-            posibles_archivos = [
-                self.hexagon_dir / f"by_detail_dumps {year}.xlsx",
-                self.hexagon_dir / f"by_detail_dumps{year}.xlsx",
-                self.hexagon_dir / "by_detail_dumps.xlsx"
-            ]
-            
-            archivo_dumps = None
-            for archivo in posibles_archivos:
-                if archivo.exists():
-                    archivo_dumps = archivo
-                    break
-            
+            archivo_dumps = self._archivo_dumps(year)
             if not archivo_dumps:
                 return {
                     "error": f"No se encontró archivo de dumps para {year}",
                     "sugerencia": "Verifica que exista: by_detail_dumps 2024.xlsx en la carpeta Hexagon"
                 }
-            
+
             print(f"\n📊 Leyendo: {archivo_dumps.name}")
-            df = pd.read_excel(archivo_dumps)
-            print(f"   Total registros: {len(df):,}")
-            
-            # 2. IDENTIFICAR COLUMNAS
-            col_nombre = self._find_column(df, ['truck_operator_first_name', 'Nombres'])
-            col_apellido = self._find_column(df, ['truck_operator_last_name', 'Apellidos'])
-            col_toneladas = self._find_column(df, ['material_tonnage', 'payload', 'Tonnage'])
-            col_equipo = self._find_column(df, ['truck', 'Equipment'])
-            col_fecha = self._find_column(df, ['time', 'Date', 'timestamp'])
-            col_turno = self._find_column(df, ['shift', 'Crew', 'Turno'])
-            
-            if not all([col_nombre, col_apellido, col_toneladas]):
+            df = self._dumps_preparados(archivo_dumps)
+            columnas = df.attrs.get("columnas", {})
+            print(f"   Total registros: {df.attrs.get('registros_totales', len(df)):,}")
+
+            # 2. COLUMNAS
+            if "operador" not in df.columns:
                 return {
                     "error": "Faltan columnas críticas",
                     "necesarias": ["operador_nombre", "operador_apellido", "toneladas"],
                     "encontradas": {
-                        "nombre": col_nombre,
-                        "apellido": col_apellido,
-                        "toneladas": col_toneladas
+                        "nombre": columnas.get("nombre"),
+                        "apellido": columnas.get("apellido"),
+                        "toneladas": columnas.get("toneladas")
                     }
                 }
-            
-            print(f"   ✅ Columnas: {col_nombre}, {col_apellido}, {col_toneladas}")
-            
-            # 3. CREAR NOMBRE OPERADOR
-            df['Operador'] = (
-                df[col_apellido].astype(str).str.strip().str.upper() + ' ' +
-                df[col_nombre].astype(str).str.strip().str.upper()
-            )
-            df['Operador'] = df['Operador'].str.replace(r'\s+', ' ', regex=True)
-            
-            # 4. LIMPIAR DATOS
-            df = df[df['Operador'].notna()]
-            df = df[~df['Operador'].isin(['NAN NAN', 'NONE NONE', ' ', ''])]
-            df = df[df['Operador'].str.len() > 5]
-            
-            print(f"   Operadores válidos: {len(df):,}")
-            
-            if len(df) == 0:
+
+            print(f"   Operadores válidos: {df.attrs.get('operadores_validos', len(df)):,}")
+            if df.attrs.get("operadores_validos", len(df)) == 0:
                 return {"error": "No hay operadores válidos en el archivo"}
-            
-            # 5. FILTRAR POR AÑO
-            if col_fecha:
-                df[col_fecha] = pd.to_datetime(df[col_fecha], errors='coerce')
-                df = df[df[col_fecha].notna()]
-                df = df[df[col_fecha].dt.year == year]
-                print(f"   Año {year}: {len(df):,}")
-            
-            if len(df) == 0:
+
+            # 3. FILTROS (máscara única sobre columnas compactas)
+            mask = np.ones(len(df), dtype=bool)
+            if "year" in df.columns:
+                mask &= (df["year"] == year).to_numpy()
+                if mes:
+                    mask &= (df["mes"] == mes).to_numpy()
+                print(f"   Año {year}{f' mes {mes}' if mes else ''}: {int(mask.sum()):,}")
+
+            if not mask.any():
                 return {
-                    "error": f"No hay datos para el año {year}",
+                    "error": f"No hay datos para el año {year}" + (f" mes {mes}" if mes else ""),
                     "sugerencia": "Prueba con year=2023 o year=2025"
                 }
-            
-            # 6. FILTRAR POR TIPO DE EQUIPO
-            if tipo and col_equipo:
-                antes = len(df)
-                if tipo.upper() == "CAEX":
-                    df = df[df[col_equipo].astype(str).str.contains('CA-', case=False, na=False)]
-                elif tipo.upper() == "EMT":
-                    df = df[df[col_equipo].astype(str).str.contains('EMT', case=False, na=False)]
-                elif tipo.upper() == "CF":
-                    df = df[df[col_equipo].astype(str).str.contains('CF', case=False, na=False)]
-                print(f"   Tipo {tipo}: {len(df):,} (de {antes:,})")
-            
-            if len(df) == 0:
+
+            if tipo and "equipo" in df.columns and tipo.upper() in PATRONES_TIPO:
+                antes = int(mask.sum())
+                equipos = df["equipo"].cat
+                coincide = equipos.categories.astype(str).str.contains(PATRONES_TIPO[tipo.upper()], case=False, regex=False)
+                mask &= np.append(coincide, False)[equipos.codes]
+                print(f"   Tipo {tipo}: {int(mask.sum()):,} (de {antes:,})")
+
+            if not mask.any():
                 return {
                     "error": f"No hay datos tipo {tipo}",
                     "sugerencia": "Elimina el filtro de tipo o usa tipo diferente"
                 }
-            
-            # 7. CONVERTIR TONELADAS
-            df[col_toneladas] = pd.to_numeric(df[col_toneladas], errors='coerce')
-            df = df[df[col_toneladas] > 0]
-            
+
+            mask &= (df["toneladas"] > 0).to_numpy()
+            df = df[mask]
             print(f"   Con toneladas válidas: {len(df):,}")
-            
+
             if len(df) == 0:
                 return {"error": "No hay toneladas válidas"}
-            
-            # 8. AGRUPAR POR OPERADOR
-            if col_turno:
-                agrupado = df.groupby(['Operador', col_turno])
-            else:
-                agrupado = df.groupby('Operador')
-            
-            metricas = agrupado.agg({
-                col_toneladas: ['sum', 'count', 'mean']
-            }).reset_index()
-            
-            # Renombrar columnas
-            if col_turno:
-                metricas.columns = ['Operador', 'Grupo', 'Toneladas', 'Dumps', 'TonPorDump']
-            else:
-                metricas.columns = ['Operador', 'Toneladas', 'Dumps', 'TonPorDump']
+
+            # 4. MÉTRICAS POR OPERADOR (un groupby)
+            claves = ['operador', 'grupo'] if 'grupo' in df.columns else ['operador']
+            metricas = df.groupby(claves, observed=True, sort=False).agg(
+                OperadorId=('operador_id', 'first'),
+                Toneladas=('toneladas', 'sum'),
+                Dumps=('toneladas', 'size'),
+                TonPorDump=('toneladas', 'mean')
+            ).reset_index()
+            metricas = metricas.rename(columns={'operador': 'Operador', 'grupo': 'Grupo'})
+            if 'Grupo' not in metricas.columns:
                 metricas['Grupo'] = 'N/A'
-            
-            # Equipos usados
-            if col_equipo:
-                equipos_count = df.groupby('Operador')[col_equipo].nunique()
-                metricas = metricas.merge(
-                    equipos_count.rename('Equipos'),
-                    left_on='Operador',
-                    right_index=True,
-                    how='left'
-                )
-                metricas['Equipos'] = metricas['Equipos'].fillna(0).astype(int)
+
+            if 'equipo' in df.columns:
+                equipos_count = df.groupby('operador', observed=True)['equipo'].nunique()
+                metricas['Equipos'] = metricas['Operador'].map(equipos_count).fillna(0).astype(int)
             else:
                 metricas['Equipos'] = 0
-            
-            # 9. ORDENAR Y TOP N
-            metricas = metricas.sort_values('Toneladas', ascending=False)
-            top = metricas.head(top_n)
-            
+
+            # 5. TOP N
+            candidatos = metricas[metricas['Dumps'] >= min_dumps] if min_dumps else metricas
+            top = candidatos.nlargest(top_n, columna_orden)
+
             print(f"   Total operadores: {len(metricas)}")
-            print(f"   Top {top_n} seleccionados")
-            
-            # 10. FORMATEAR RANKING
-            ranking = []
-            for i, (_, row) in enumerate(top.iterrows(), 1):
-                ranking.append({
+            print(f"   Top {top_n} por {ordenar_por} seleccionados")
+
+            # 6. FORMATEAR RANKING
+            ranking = [
+                {
                     'posicion': i,
-                    'operador': row['Operador'],
-                    'grupo': str(row['Grupo']),
-                    'toneladas_total': int(row['Toneladas']),
-                    'toneladas_total_formatted': f"{row['Toneladas']:,.0f}",
-                    'dumps': int(row['Dumps']),
-                    'ton_por_dump': round(float(row['TonPorDump']), 1),
-                    'equipos_usados': int(row['Equipos'])
-                })
-            
-            # 11. ESTADÍSTICAS
+                    'operador': str(row.Operador),
+                    'operador_id': int(row.OperadorId),
+                    'grupo': str(row.Grupo),
+                    'toneladas_total': int(row.Toneladas),
+                    'toneladas_total_formatted': f"{row.Toneladas:,.0f}",
+                    'dumps': int(row.Dumps),
+                    'ton_por_dump': round(float(row.TonPorDump), 1),
+                    'equipos_usados': int(row.Equipos)
+                }
+                for i, row in enumerate(top.itertuples(index=False), 1)
+            ]
+
+            # 7. ESTADÍSTICAS
             stats = {
                 'total_operadores': len(metricas),
                 'total_toneladas': int(metricas['Toneladas'].sum()),
@@ -194,18 +280,20 @@ class RankingAnalytics:
                 'total_dumps': int(metricas['Dumps'].sum()),
                 'promedio_dumps_por_operador': int(metricas['Dumps'].mean())
             }
-            
+
             return {
                 "success": True,
                 "year": year,
+                "mes": mes,
                 "tipo": tipo if tipo else "TODOS",
                 "top_n": top_n,
                 "ranking": ranking,
+                "criterio": descripcion_orden,
                 "estadisticas": stats,
                 "archivo_fuente": archivo_dumps.name,
                 "registros_procesados": len(df)
             }
-            
+
         except Exception as e:
             import traceback
             return {
@@ -213,29 +301,80 @@ class RankingAnalytics:
                 "tipo_error": type(e).__name__,
                 "traceback": traceback.format_exc()
             }
-    
-    def ranking_operadores_dumps(self, year: int = 2024, top_n: int = 5) -> Dict[str, Any]:
+
+    def ranking_operadores_produccion(
+        self,
+        year: int = 2024,
+        top_n: int = 5,
+        tipo: str = "",  # CAEX, EMT, CF, o vacío para todos
+        mes: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Ranking de operadores por producción (toneladas)
+        """
+        return self.ranking_operadores(year, top_n, tipo, mes, ordenar_por="toneladas")
+
+    def ranking_operadores_dumps(
+        self,
+        year: int = 2024,
+        top_n: int = 5,
+        tipo: str = "",
+        mes: Optional[int] = None
+    ) -> Dict[str, Any]:
         """Ranking por cantidad de dumps"""
-        resultado = self.ranking_operadores_produccion(year, top_n * 2, tipo="")
-        
-        if "error" in resultado:
-            return resultado
-        
-        ranking = resultado["ranking"]
-        ranking.sort(key=lambda x: x['dumps'], reverse=True)
-        
-        return {
-            "success": True,
-            "year": year,
-            "top_n": top_n,
-            "ranking": ranking[:top_n],
-            "criterio": "Número de dumps (viajes)",
-            "estadisticas": resultado["estadisticas"]
-        }
+        return self.ranking_operadores(year, top_n, tipo, mes, ordenar_por="dumps")
+
+    def ranking_operadores_eficiencia(
+        self,
+        year: int = 2024,
+        top_n: int = 5,
+        tipo: str = "",
+        mes: Optional[int] = None,
+        min_dumps: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Ranking por eficiencia (toneladas por dump)
+
+        min_dumps > 0 excluye del ranking a operadores con pocos viajes
+        (0 = todos, como el ranking original).
+        """
+        return self.ranking_operadores(year, top_n, tipo, mes, ordenar_por="ton_por_dump", min_dumps=min_dumps)
+
+    # ==================================================================
+    # DEBUG
+    # ==================================================================
+
+    def debug_equipos_unicos(self, year: int = 2024) -> Dict[str, Any]:
+        """Equipos distintos del año con su cantidad de dumps"""
+        archivo_dumps = self._archivo_dumps(year)
+        if not archivo_dumps:
+            return {"error": f"No se encontró archivo de dumps para {year}"}
+        df = self._dumps_preparados(archivo_dumps)
+        if "equipo" not in df.columns:
+            return {"error": "El archivo no tiene columna de equipo"}
+        if "year" in df.columns:
+            df = df[df["year"] == year]
+        conteo = df["equipo"].value_counts()
+        conteo = conteo[conteo > 0]
+        return {"success": True, "year": year, "total": len(conteo), "equipos": conteo.to_dict()}
+
+    def debug_operadores_unicos(self, year: int = 2024) -> Dict[str, Any]:
+        """Operadores distintos del año con su cantidad de dumps"""
+        archivo_dumps = self._archivo_dumps(year)
+        if not archivo_dumps:
+            return {"error": f"No se encontró archivo de dumps para {year}"}
+        df = self._dumps_preparados(archivo_dumps)
+        if "operador" not in df.columns:
+            return {"error": "Faltan columnas de nombre de operador"}
+        if "year" in df.columns:
+            df = df[df["year"] == year]
+        conteo = df["operador"].value_counts()
+        conteo = conteo[conteo > 0]
+        return {"success": True, "year": year, "total": len(conteo), "operadores": conteo.to_dict()}
 
 def get_ranking_analytics(data_dir: Path = None):
     """Obtiene instancia"""
     if data_dir is None:
         from config import Config
         data_dir = Config.DATA_DIR
-    return RankingAnalytics(data_dir)
\ No newline at end of file
+    return RankingAnalytics(data_dir)
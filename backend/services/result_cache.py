@@ -0,0 +1,253 @@
+# services/result_cache.py
+"""
+Cache de resultados de endpoints versionado por datos - MineDash AI
+División Salvador - Codelco Chile
+
+En cada cambio de turno ~40 pantallas de la sala de control refrescan el
+dashboard a la vez y SQLite recalcula 40 veces los mismos agregados. Este
+cache guarda la respuesta JSON ya serializada, con clave:
+
+    (endpoint, parámetros normalizados, versión de datos)
+
+- Versión de datos: firma (mtime, tamaño) de minedash.db y su -wal, más
+  un contador que services/ingestion incrementa tras cada carga. Cualquier
+  escritura (ingesta incremental, carga manual, refresco de rollups)
+  cambia la versión y deja obsoletas todas las entradas anteriores
+- Presupuesto de memoria en bytes con expulsión LRU
+- Single-flight: requests idénticos concurrentes esperan el mismo cálculo
+- ETag: si el navegador envía If-None-Match con la versión vigente se
+  responde 304 sin cuerpo
+
+Uso:
+    return await cached_response(
+        request, "dashboard", {"area": area, "year": year},
+        lambda: get_async_db().run(_dashboard_data, area, year, request=request)
+    )
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def bump_data_version():
+    """Fuerza una nueva versión de datos (llamar después de cargar datos)"""
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+def data_version(db_path: str = "minedash.db") -> str:
+    """Versión de los datos: cambia con cada escritura en la base"""
+    parts = [str(_generation)]
+    for suffix in ("", "-wal"):
+        try:
+            st = os.stat(f"{db_path}{suffix}")
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append("-")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def _normalize(params: Optional[Dict[str, Any]]) -> Tuple:
+    """Parámetros → tupla ordenada (sin None, strings sin espacios)"""
+    items = []
+    for k, v in sorted((params or {}).items()):
+        if v is None:
+            continue
+        if isinstance(v, str):
+            v = v.strip()
+        items.append((k, v))
+    return tuple(items)
+
+
+class ResultCache:
+    """Cache LRU de respuestas JSON acotado por bytes, con single-flight"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    async def get_or_compute(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]],
+        compute: Callable[[], Awaitable[Any]],
+        version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Obtiene la entrada {value, body, etag} del cache o la calcula una sola vez
+
+        Args:
+            endpoint: Nombre lógico del endpoint
+            params: Parámetros del request (se normalizan para la clave)
+            compute: Corrutina sin argumentos que calcula el resultado
+            version: Versión de datos (default: data_version())
+
+        Returns:
+            Dict con value (objeto), body (JSON en bytes) y etag
+        """
+        version = version or data_version()
+        key = (endpoint, _normalize(params), version)
+
+        while True:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            with self._lock:
+                self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # El request que calculaba se canceló (cliente desconectado): reintentar
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        with self._lock:
+            self.misses += 1
+        try:
+            value = await compute()
+            entry = self._make_entry(value, version)
+            if _cacheable(value):
+                self._store(key, entry)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Evitar "exception was never retrieved" si nadie más esperaba
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "mb": round(self.current_bytes / 1024 ** 2, 1),
+                "max_mb": round(self.max_bytes / 1024 ** 2, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+                "coalesced": self.coalesced,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+            }
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _make_entry(value: Any, version: str) -> Dict[str, Any]:
+        body = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        return {"value": value, "body": body, "etag": f'W/"{version}-{digest}"'}
+
+    def _lookup(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _store(self, key: Tuple, entry: Dict[str, Any]):
+        nbytes = len(entry["body"]) * 2  # cuerpo serializado + objeto Python
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            # Las entradas de versiones anteriores ya no se pueden pedir
+            for old in [k for k in self._entries if k[2] != key[2]]:
+                self.current_bytes -= self._entries.pop(old)["bytes"]
+            while self._entries and self.current_bytes + nbytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self.current_bytes -= oldest["bytes"]
+                self.evictions += 1
+            entry["bytes"] = nbytes
+            self._entries[key] = entry
+            self.current_bytes += nbytes
+
+
+def _cacheable(value: Any) -> bool:
+    """No cachear respuestas de fallback ({"success": False, ...})"""
+    return not (isinstance(value, dict) and value.get("success") is False)
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Obtiene la instancia singleton del cache de resultados"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                from config import Config
+                _result_cache = ResultCache(max_bytes=Config.RESULT_CACHE_MAX_MB * 1024 ** 2)
+    return _result_cache
+
+
+async def cached_response(
+    request,
+    endpoint: str,
+    params: Optional[Dict[str, Any]],
+    compute: Callable[[], Awaitable[Any]]
+):
+    """
+    Respuesta HTTP cacheada con ETag (304 si el cliente ya tiene la versión)
+
+    Args:
+        request: starlette Request (para If-None-Match)
+        endpoint, params, compute: ver ResultCache.get_or_compute
+    """
+    from starlette.responses import Response
+
+    cache = get_result_cache()
+    entry = await cache.get_or_compute(endpoint, params, compute)
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "") if request is not None else ""
+    if entry["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        with cache._lock:
+            cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
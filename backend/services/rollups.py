@@ -0,0 +1,522 @@
+# services/rollups.py
+"""
+Rollups diarios por turno sobre las tablas de Hexagon - MineDash AI
+División Salvador - Codelco Chile
+
+Cumplimiento, tendencia del mes, días por cumplimiento, /api/dashboard y
+smart_alerts re-agregaban millones de filas crudas en cada llamada. Este
+módulo mantiene tablas materializadas por fecha × turno × equipo:
+
+    rollup_dumps_turno      fecha, turno, equipo, tipo_equipo, operador, fase,
+                            extraccion_mina → tonelaje, viajes
+    rollup_kpi_hora_turno   fecha, turno, equipment_id, equipment_type, tipo
+                            → tonelaje, horas nominal/disponible/efectivo,
+                              demoras, sumas de DM/UEBD por hora
+    rollup_times_dia        fecha, equipment_type → horas total/efectivo/
+                            mantención, sumas de DM/UEBD/UEBA por registro
+    rollup_watermarks       marca de agua (MAX timestamp procesado) por tabla fuente
+
+Los promedios de razones (AVG(dm) por hora) se guardan como suma + conteo,
+así el promedio de cualquier rango de días es exacto:
+    AVG = SUM(sum_dm_pct) / SUM(n_dm)
+
+Refresco incremental: por cada tabla fuente se re-agrega desde el día de su
+marca de agua (que pudo quedar parcial) en una transacción. Las filas que
+lleguen con timestamp anterior a la marca requieren refresh(full=True).
+
+Lectura: las funciones de consulta retornan None cuando el rollup no puede
+responder (rango no alineado a días, rollups deshabilitados, sin construir
+o desactualizados); el llamador usa entonces la consulta cruda.
+
+Uso:
+    python -m services.rollups            # refresco incremental
+    python -m services.rollups --full     # reconstrucción completa
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from services.db_pool import get_db_pool
+from services.hexagon_partitions import DETAIL_DUMPS, EQUIPMENT_TIMES, EXTRACCION_MINA_WHERE
+
+
+# =============================================================================
+# ESQUEMA
+# =============================================================================
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS rollup_watermarks (
+        source_table TEXT PRIMARY KEY,
+        rollup_table TEXT NOT NULL,
+        watermark TEXT,
+        updated_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_dumps_turno (
+        source_table TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        turno TEXT,
+        equipo TEXT,
+        tipo_equipo TEXT,
+        operador TEXT,
+        fase TEXT,
+        extraccion_mina INTEGER NOT NULL,
+        tonelaje REAL NOT NULL,
+        viajes INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_rollup_dumps_fecha ON rollup_dumps_turno(fecha, extraccion_mina)",
+    "CREATE INDEX IF NOT EXISTS idx_rollup_dumps_source ON rollup_dumps_turno(source_table, fecha)",
+    """
+    CREATE TABLE IF NOT EXISTS rollup_kpi_hora_turno (
+        source_table TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        turno TEXT,
+        equipment_id TEXT,
+        equipment_type TEXT,
+        tipo TEXT,
+        registros INTEGER NOT NULL,
+        tonelaje REAL,
+        nominal REAL,
+        disponible REAL,
+        efectivo REAL,
+        demora_prog REAL,
+        demora_no_prog REAL,
+        sum_dm_pct REAL,
+        n_dm INTEGER,
+        sum_uebd_pct REAL,
+        n_uebd INTEGER,
+        horas_sin_produccion INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_rollup_kpi_fecha ON rollup_kpi_hora_turno(fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_rollup_kpi_source ON rollup_kpi_hora_turno(source_table, fecha)",
+    """
+    CREATE TABLE IF NOT EXISTS rollup_times_dia (
+        source_table TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        equipment_type TEXT,
+        registros INTEGER NOT NULL,
+        total REAL,
+        efectivo REAL,
+        m_correctiva REAL,
+        m_programada REAL,
+        sum_dm_pct REAL,
+        n_dm INTEGER,
+        sum_uebd_pct REAL,
+        n_uebd INTEGER,
+        sum_ueba_pct REAL,
+        n_ueba INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_rollup_times_fecha ON rollup_times_dia(fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_rollup_times_source ON rollup_times_dia(source_table, fecha)",
+]
+
+
+# SELECT de agregación por tabla fuente ({source} y {where} se completan al refrescar)
+_DUMPS_INSERT = f"""
+    INSERT INTO rollup_dumps_turno
+        (source_table, fecha, turno, equipo, tipo_equipo, operador, fase,
+         extraccion_mina, tonelaje, viajes)
+    SELECT
+        ?,
+        DATE(timestamp),
+        shift,
+        truck_equipment_name,
+        truck_equipment_type,
+        TRIM(COALESCE(truck_operator_first_name, '') || ' ' || COALESCE(truck_operator_last_name, '')),
+        blast_region,
+        CASE WHEN {EXTRACCION_MINA_WHERE} THEN 1 ELSE 0 END,
+        COALESCE(SUM(material_tonnage), 0),
+        COUNT(*)
+    FROM {{source}}
+    WHERE timestamp IS NOT NULL {{where}}
+    GROUP BY 2, 3, 4, 5, 6, 7, 8
+"""
+
+_KPI_INSERT = """
+    INSERT INTO rollup_kpi_hora_turno
+        (source_table, fecha, turno, equipment_id, equipment_type, tipo, registros,
+         tonelaje, nominal, disponible, efectivo, demora_prog, demora_no_prog,
+         sum_dm_pct, n_dm, sum_uebd_pct, n_uebd, horas_sin_produccion)
+    SELECT
+        ?,
+        DATE(timestamp),
+        turno,
+        equipment_id,
+        equipment_type,
+        tipo,
+        COUNT(*),
+        SUM(material_tonnage),
+        SUM(nominal),
+        SUM(disponible),
+        SUM(efectivo),
+        SUM(demora_prog),
+        SUM(demora_no_prog),
+        SUM(CASE WHEN nominal > 0 THEN disponible * 100.0 / nominal END),
+        SUM(CASE WHEN nominal > 0 AND disponible IS NOT NULL THEN 1 ELSE 0 END),
+        SUM(CASE WHEN disponible > 0 THEN efectivo * 100.0 / disponible END),
+        SUM(CASE WHEN disponible > 0 AND efectivo IS NOT NULL THEN 1 ELSE 0 END),
+        SUM(CASE WHEN disponible > 0 AND material_tonnage = 0 THEN 1 ELSE 0 END)
+    FROM {source}
+    WHERE timestamp IS NOT NULL {where}
+    GROUP BY 2, 3, 4, 5, 6
+"""
+
+_TIMES_INSERT = """
+    INSERT INTO rollup_times_dia
+        (source_table, fecha, equipment_type, registros, total, efectivo,
+         m_correctiva, m_programada, sum_dm_pct, n_dm, sum_uebd_pct, n_uebd,
+         sum_ueba_pct, n_ueba)
+    SELECT
+        ?,
+        DATE(timestamp),
+        equipment_type,
+        COUNT(*),
+        SUM(total),
+        SUM(efectivo),
+        SUM(m_correctiva),
+        SUM(m_programada),
+        SUM(CASE WHEN total > 0 THEN ((total - COALESCE(m_correctiva, 0)) / total) * 100 END),
+        SUM(CASE WHEN total > 0 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN total > 0 AND (total - COALESCE(m_correctiva, 0) - COALESCE(m_programada, 0)) > 0
+            THEN (efectivo / (total - COALESCE(m_correctiva, 0) - COALESCE(m_programada, 0))) * 100 END),
+        SUM(CASE WHEN total > 0 AND (total - COALESCE(m_correctiva, 0) - COALESCE(m_programada, 0)) > 0
+            AND efectivo IS NOT NULL THEN 1 ELSE 0 END),
+        SUM(CASE WHEN total > 0 THEN (efectivo / total) * 100 END),
+        SUM(CASE WHEN total > 0 AND efectivo IS NOT NULL THEN 1 ELSE 0 END)
+    FROM {source}
+    WHERE timestamp IS NOT NULL {where}
+    GROUP BY 2, 3
+"""
+
+# Familia → (tabla rollup, INSERT de agregación, tablas fuente)
+FAMILIES: Dict[str, Tuple[str, str, List[str]]] = {
+    "dumps": ("rollup_dumps_turno", _DUMPS_INSERT, DETAIL_DUMPS.tables),
+    "kpi_hora": ("rollup_kpi_hora_turno", _KPI_INSERT, ["hexagon_by_kpi_hora"]),
+    "times": ("rollup_times_dia", _TIMES_INSERT, EQUIPMENT_TIMES.tables),
+}
+
+
+# =============================================================================
+# REFRESCO
+# =============================================================================
+
+def families_for(table: str) -> List[str]:
+    """Familias de rollup que dependen de una tabla fuente"""
+    return [family for family, (_, _, sources) in FAMILIES.items() if table in sources]
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    for stmt in SCHEMA:
+        conn.execute(stmt)
+    conn.commit()
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()
+    return row is not None
+
+
+def _watermark(conn: sqlite3.Connection, source: str) -> Optional[str]:
+    row = conn.execute(
+        "SELECT watermark FROM rollup_watermarks WHERE source_table = ?", (source,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def refresh_source(conn: sqlite3.Connection, family: str, source: str, full: bool = False) -> Dict:
+    """
+    Refresca el rollup de una tabla fuente desde su marca de agua
+
+    Returns:
+        Dict con source, desde, watermark y filas de rollup escritas
+    """
+    rollup_table, insert_sql, _ = FAMILIES[family]
+    if not _table_exists(conn, source):
+        return {"source": source, "skipped": "tabla no existe"}
+
+    source_max = conn.execute(f"SELECT MAX(timestamp) FROM {source}").fetchone()[0]
+    watermark = None if full else _watermark(conn, source)
+    if source_max is None:
+        return {"source": source, "skipped": "sin datos"}
+    if watermark is not None and str(source_max) <= watermark:
+        return {"source": source, "skipped": "al día", "watermark": watermark}
+
+    # El día de la marca pudo quedar parcial: se re-agrega completo
+    desde = watermark[:10] if watermark else None
+    where = "AND timestamp >= ?" if desde else ""
+    params = [source] + ([desde] if desde else [])
+
+    with conn:
+        if desde:
+            conn.execute(f"DELETE FROM {rollup_table} WHERE source_table = ? AND fecha >= ?", (source, desde))
+        else:
+            conn.execute(f"DELETE FROM {rollup_table} WHERE source_table = ?", (source,))
+        cur = conn.execute(insert_sql.format(source=source, where=where), params)
+        filas = cur.rowcount
+        conn.execute("""
+            INSERT INTO rollup_watermarks (source_table, rollup_table, watermark, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(source_table) DO UPDATE SET
+                watermark = excluded.watermark,
+                updated_at = excluded.updated_at
+        """, (source, rollup_table, str(source_max), datetime.now().isoformat(timespec="seconds")))
+
+    return {"source": source, "desde": desde or "inicio", "watermark": str(source_max), "filas_rollup": filas}
+
+
+def refresh_rollups(db_path: str = "minedash.db", full: bool = False, families: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Refresco incremental (o completo) de todas las familias de rollups
+
+    Llamar después de cada carga de datos Hexagon (ver services/ingestion).
+    """
+    resultados = []
+    with get_db_pool(db_path).write() as conn:
+        ensure_schema(conn)
+        for family in families or FAMILIES:
+            for source in FAMILIES[family][2]:
+                inicio = time.perf_counter()
+                resultado = refresh_source(conn, family, source, full=full)
+                resultado["segundos"] = round(time.perf_counter() - inicio, 2)
+                print(f"   [ROLLUP] {family}/{source}: {resultado}")
+                resultados.append(resultado)
+    invalidate_freshness(db_path)
+    return resultados
+
+
+# =============================================================================
+# FRESCURA
+# =============================================================================
+
+_freshness: Dict[Tuple[str, str], Tuple[float, bool]] = {}
+_freshness_lock = threading.Lock()
+
+
+def invalidate_freshness(db_path: Optional[str] = None):
+    with _freshness_lock:
+        if db_path is None:
+            _freshness.clear()
+        else:
+            # Las claves usan la ruta absoluta que reporta PRAGMA database_list
+            db_path = str(Path(db_path).resolve())
+            for key in [k for k in _freshness if k[0] == db_path]:
+                _freshness.pop(key, None)
+
+
+def _db_path_of(conn: sqlite3.Connection) -> str:
+    row = conn.execute("PRAGMA database_list").fetchone()
+    return row[2] if row else ""
+
+
+def rollup_ready(conn: sqlite3.Connection, family: str) -> bool:
+    """
+    True si el rollup de la familia existe y su marca de agua alcanza a
+    MAX(timestamp) de todas sus tablas fuente (chequeo cacheado ROLLUP_FRESHNESS_TTL s)
+    """
+    from config import Config
+
+    if not Config.ROLLUPS_ENABLED:
+        return False
+
+    key = (_db_path_of(conn), family)
+    now = time.monotonic()
+    with _freshness_lock:
+        cached = _freshness.get(key)
+    if cached and now - cached[0] < Config.ROLLUP_FRESHNESS_TTL:
+        return cached[1]
+
+    ready = False
+    try:
+        rollup_table, _, sources = FAMILIES[family]
+        if _table_exists(conn, rollup_table) and _table_exists(conn, "rollup_watermarks"):
+            ready = True
+            for source in sources:
+                if not _table_exists(conn, source):
+                    continue
+                watermark = _watermark(conn, source)
+                source_max = conn.execute(f"SELECT MAX(timestamp) FROM {source}").fetchone()[0]
+                if source_max is not None and (watermark is None or str(source_max) > watermark):
+                    ready = False
+                    break
+    except sqlite3.Error:
+        ready = False
+
+    with _freshness_lock:
+        _freshness[key] = (now, ready)
+    return ready
+
+
+def _day_aligned(value: str) -> bool:
+    return len(value) == 10 or value[10:] in (" 00:00:00", "T00:00:00")
+
+
+def _usable(conn: sqlite3.Connection, family: str, start: str, end: str) -> bool:
+    return _day_aligned(start) and _day_aligned(end) and rollup_ready(conn, family)
+
+
+# =============================================================================
+# CONSULTAS (None = el rollup no puede responder, usar consulta cruda)
+# =============================================================================
+
+def tonelaje_dumps(conn: sqlite3.Connection, start: str, end: str,
+                   extraccion_mina: bool = False) -> Optional[Tuple[float, int]]:
+    """(tonelaje, viajes) de dumps en [start, end)"""
+    if not _usable(conn, "dumps", start, end):
+        return None
+    filtro = " AND extraccion_mina = 1" if extraccion_mina else ""
+    row = conn.execute(f"""
+        SELECT SUM(tonelaje), SUM(viajes)
+        FROM rollup_dumps_turno
+        WHERE fecha >= ? AND fecha < ?{filtro}
+    """, (start[:10], end[:10])).fetchone()
+    return float(row[0] or 0), int(row[1] or 0)
+
+
+def tonelaje_dumps_por_dia(conn: sqlite3.Connection, start: str, end: str,
+                           extraccion_mina: bool = False) -> Optional[List[Tuple[str, float]]]:
+    """[(fecha, tonelaje)] de dumps por día en [start, end)"""
+    if not _usable(conn, "dumps", start, end):
+        return None
+    filtro = " AND extraccion_mina = 1" if extraccion_mina else ""
+    return conn.execute(f"""
+        SELECT fecha, SUM(tonelaje)
+        FROM rollup_dumps_turno
+        WHERE fecha >= ? AND fecha < ?{filtro}
+        GROUP BY fecha ORDER BY fecha
+    """, (start[:10], end[:10])).fetchall()
+
+
+def resumen_dumps(conn: sqlite3.Connection, start: str, end: str) -> Optional[Dict]:
+    """Tonelaje, viajes, tipos de equipo y días con dumps en [start, end)"""
+    if not _usable(conn, "dumps", start, end):
+        return None
+    row = conn.execute("""
+        SELECT SUM(tonelaje), SUM(viajes), COUNT(DISTINCT tipo_equipo), COUNT(DISTINCT fecha)
+        FROM rollup_dumps_turno
+        WHERE fecha >= ? AND fecha < ?
+    """, (start[:10], end[:10])).fetchone()
+    return {
+        "tonelaje": float(row[0] or 0),
+        "viajes": int(row[1] or 0),
+        "tipos_equipo": int(row[2] or 0),
+        "dias": int(row[3] or 0),
+    }
+
+
+def dias_operativos(conn: sqlite3.Connection, start: str, end: str) -> Optional[int]:
+    """Días con registros en kpi_hora o en dumps dentro de [start, end)"""
+    if not (_usable(conn, "dumps", start, end) and rollup_ready(conn, "kpi_hora")):
+        return None
+    row = conn.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT fecha FROM rollup_kpi_hora_turno WHERE fecha >= ? AND fecha < ?
+            UNION
+            SELECT fecha FROM rollup_dumps_turno WHERE fecha >= ? AND fecha < ?
+        )
+    """, (start[:10], end[:10]) * 2).fetchone()
+    return int(row[0] or 0)
+
+
+def tonelaje_total_por_dia(conn: sqlite3.Connection, start: str, end: str) -> Optional[List[Tuple[str, float]]]:
+    """[(fecha, tonelaje kpi_hora + dumps)] por día en [start, end)"""
+    if not (_usable(conn, "dumps", start, end) and rollup_ready(conn, "kpi_hora")):
+        return None
+    return conn.execute("""
+        SELECT fecha, SUM(tonelaje) FROM (
+            SELECT fecha, tonelaje FROM rollup_kpi_hora_turno WHERE fecha >= ? AND fecha < ?
+            UNION ALL
+            SELECT fecha, tonelaje FROM rollup_dumps_turno WHERE fecha >= ? AND fecha < ?
+        )
+        GROUP BY fecha ORDER BY fecha
+    """, (start[:10], end[:10]) * 2).fetchall()
+
+
+def tonelaje_kpi_hora(conn: sqlite3.Connection, start: str, end: str) -> Optional[float]:
+    """SUM(material_tonnage) de hexagon_by_kpi_hora en [start, end)"""
+    if not _usable(conn, "kpi_hora", start, end):
+        return None
+    row = conn.execute("""
+        SELECT SUM(tonelaje) FROM rollup_kpi_hora_turno WHERE fecha >= ? AND fecha < ?
+    """, (start[:10], end[:10])).fetchone()
+    return float(row[0] or 0)
+
+
+def kpi_hora_por_equipo(conn: sqlite3.Connection, start: str, end: str,
+                        excluir_prefijo: str = "TE",
+                        tipo_sin_produccion: Optional[str] = None) -> Optional[List[Dict]]:
+    """
+    DM/UEBD promedio por hora y horas sin producción por equipo en [start, end)
+
+    Agrupa por equipment_id, equipment_type. Los promedios equivalen a AVG()
+    sobre las filas horarias de kpi_hora; horas_dm es el número de horas que
+    entran al promedio de DM (nominal > 0 y disponible no nulo), es decir
+    COUNT(disponible) con nominal > 0. tipo_sin_produccion limita las horas
+    sin producción a las filas de ese tipo (None = todas).
+    """
+    if not _usable(conn, "kpi_hora", start, end):
+        return None
+    rows = conn.execute("""
+        SELECT
+            equipment_id, equipment_type,
+            SUM(sum_dm_pct) / NULLIF(SUM(n_dm), 0),
+            SUM(n_dm),
+            SUM(sum_uebd_pct) / NULLIF(SUM(n_uebd), 0),
+            SUM(n_uebd),
+            SUM(CASE WHEN ? IS NULL OR tipo = ? THEN horas_sin_produccion ELSE 0 END)
+        FROM rollup_kpi_hora_turno
+        WHERE fecha >= ? AND fecha < ?
+          AND equipment_id NOT LIKE ?
+        GROUP BY equipment_id, equipment_type
+    """, (tipo_sin_produccion, tipo_sin_produccion,
+          start[:10], end[:10], f"{excluir_prefijo}%")).fetchall()
+    return [
+        {
+            "equipment_id": r[0], "equipment_type": r[1],
+            "dm_promedio": r[2], "horas_dm": int(r[3] or 0),
+            "uebd_promedio": r[4], "horas_uebd": int(r[5] or 0),
+            "horas_sin_produccion": int(r[6] or 0),
+        }
+        for r in rows
+    ]
+
+
+def indicadores_tiempos(conn: sqlite3.Connection, start: str, end: str) -> Optional[Dict]:
+    """DM / UEBD / UEBA promedio (por registro de equipment_times) en [start, end)"""
+    if not _usable(conn, "times", start, end):
+        return None
+    row = conn.execute("""
+        SELECT
+            SUM(sum_dm_pct) / NULLIF(SUM(n_dm), 0),
+            SUM(sum_uebd_pct) / NULLIF(SUM(n_uebd), 0),
+            SUM(sum_ueba_pct) / NULLIF(SUM(n_ueba), 0),
+            COUNT(DISTINCT CASE WHEN n_dm > 0 THEN equipment_type END)
+        FROM rollup_times_dia
+        WHERE fecha >= ? AND fecha < ?
+    """, (start[:10], end[:10])).fetchone()
+    return {
+        "dm_promedio": round(row[0], 1) if row[0] is not None else None,
+        "uebd_promedio": round(row[1], 1) if row[1] is not None else None,
+        "ueba_promedio": round(row[2], 1) if row[2] is not None else None,
+        "equipos_evaluados": int(row[3] or 0),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresca los rollups diarios de Hexagon")
+    parser.add_argument("--db", default="minedash.db")
+    parser.add_argument("--full", action="store_true", help="Reconstruir desde cero")
+    args = parser.parse_args()
+    refresh_rollups(args.db, full=args.full)
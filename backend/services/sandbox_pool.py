@@ -0,0 +1,807 @@
+# services/sandbox_pool.py
+"""
+Pool de workers precalentados para ejecutar código Python - MineDash AI
+División Salvador - Codelco Chile
+
+Antes cada execute_python lanzaba un proceso nuevo (multiprocessing.Process
+en CodeExecutor, `python code_N.py` en el agente): el hijo volvía a
+importar pandas/numpy y el contexto (incluidos los DataFrames) se
+serializaba con pickle. Este módulo mantiene N procesos vivos con las
+librerías ya importadas que reciben tareas por un Pipe:
+
+- exec:   código + globals (CodeExecutor.execute). Los DataFrames viajan
+          por memoria compartida (Arrow IPC en multiprocessing.shared_memory)
+          en vez de pickle
+- script: ejecuta un archivo .py como __main__ con su cwd (equivalente a
+          `python archivo.py`), capturando stdout/stderr y el código de salida
+
+Arranque: los workers se crean con forkserver (spawn donde no existe), nunca
+con fork. El pool lanza reemplazos en caliente desde el proceso de la API,
+que tiene hilos vivos (pools de herramientas, pool SQLite, RENDER_LOCK): un
+fork con un lock tomado por otro hilo deja al hijo bloqueado para siempre.
+El forkserver es un proceso de un solo hilo que ya importó este módulo
+(pandas, pyarrow), así el arranque de cada worker sigue siendo barato.
+
+Aislamiento: el worker sobrevive a muchas tareas, así que antes de cada una
+captura el estado global (opciones de pandas, rcParams de matplotlib,
+errores/impresión/semilla de numpy, random, os.environ, sys.path, cwd,
+filtros de warnings) y lo restaura al terminar. Los paquetes que la tarea
+importó se descargan de sys.modules; si alguno es nativo, si la tarea
+parcheó atributos de builtins / los módulos precargados / sus clases, o si
+dejó hilos vivos, el worker se recicla (worker['state_leak'] dice por qué).
+
+Reciclaje: un worker se reemplaza tras SANDBOX_MAX_RUNS ejecuciones, si su
+RSS supera SANDBOX_MAX_RSS_MB, si muere, si excede el timeout (se mata), si
+la tarea agotó sus límites de recursos o si dejó estado global sucio. El reemplazo se lanza de
+inmediato para que el pool siga caliente.
+
+Límites por tarea (Unix, módulo resource), aplicados en el worker solo
+mientras corre la tarea y restaurados después:
+- RLIMIT_AS: memoria virtual actual del worker + limits['memory_mb'].
+  Una asignación que lo supere levanta MemoryError en vez de hacer swap
+- RLIMIT_CPU (soft): CPU consumida + limits['cpu_seconds']. Al agotarse
+  llega SIGXCPU y la tarea se corta con LimiteCPUExcedido
+Cada respuesta trae 'resources' con peak_rss_mb (pico de la tarea, vía
+/proc/self/clear_refs + VmHWM), cpu_seconds y limit_exceeded.
+
+Uso:
+    pool = get_sandbox_pool()
+    r = pool.run_exec(code, exec_globals, timeout=60)
+    r = pool.run_script("outputs/code/code_x.py", cwd="outputs/code", timeout=30)
+"""
+
+import contextlib
+import importlib
+import importlib.machinery
+import io
+import multiprocessing
+import os
+import pickle
+import queue
+import random
+import runpy
+import signal
+import sys
+import threading
+import time
+import traceback
+import types
+import warnings
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ARROW_AVAILABLE = False
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+try:
+    import resource
+    RLIMIT_AVAILABLE = hasattr(signal, 'SIGXCPU')
+except ImportError:
+    resource = None
+    RLIMIT_AVAILABLE = False
+
+
+# =============================================================================
+# DATAFRAMES POR MEMORIA COMPARTIDA
+# =============================================================================
+
+def exportar_frame(df: pd.DataFrame) -> Tuple[Tuple, Optional[shared_memory.SharedMemory]]:
+    """
+    Escribe el frame como stream Arrow IPC en un segmento de memoria compartida
+
+    Returns:
+        (descriptor para el worker, segmento a liberar por el padre tras la tarea).
+        Sin pyarrow, o si Arrow no soporta alguna columna, el frame va por pickle.
+    """
+    if ARROW_AVAILABLE:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=True)
+            mock = pa.MockOutputStream()
+            with pa.ipc.new_stream(mock, table.schema) as writer:
+                writer.write_table(table)
+            size = mock.size()
+
+            shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            destino = pa.py_buffer(shm.buf)
+            with pa.ipc.new_stream(pa.FixedSizeBufferWriter(destino), table.schema) as writer:
+                writer.write_table(table)
+            del destino
+            return ('shm', shm.name, size), shm
+        except (pa.ArrowException, TypeError, ValueError):
+            pass
+    return ('pickle', df), None
+
+
+def _importar_frame(desc: Tuple, abiertos: List[shared_memory.SharedMemory]) -> pd.DataFrame:
+    """Reconstruye en el worker un frame exportado con exportar_frame"""
+    if desc[0] == 'pickle':
+        return desc[1]
+
+    _, nombre, size = desc
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=nombre, track=False)
+    else:
+        # forkserver/spawn heredan el resource_tracker del padre: el registro del
+        # worker es un duplicado del que el padre borra al hacer unlink
+        shm = shared_memory.SharedMemory(name=nombre)
+    abiertos.append(shm)
+    reader = pa.ipc.open_stream(pa.py_buffer(shm.buf)[:size])
+    return reader.read_all().to_pandas()
+
+
+def _cerrar_segmentos(segmentos: List[shared_memory.SharedMemory], unlink: bool):
+    for shm in segmentos:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # algún array aún apunta al segmento; se libera al reciclar el worker
+        if unlink:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def empaquetar_globals(exec_globals: Dict[str, Any]) -> Tuple[Dict[str, Tuple], List[shared_memory.SharedMemory]]:
+    """
+    Globals de CodeExecutor → forma transmisible al worker
+
+    Los módulos viajan por nombre (se reimportan en el worker, ya cargados)
+    y los DataFrames por memoria compartida.
+    """
+    paquete, segmentos = {}, []
+    for nombre, valor in exec_globals.items():
+        if isinstance(valor, types.ModuleType):
+            paquete[nombre] = ('module', valor.__name__)
+        elif isinstance(valor, pd.DataFrame):
+            desc, shm = exportar_frame(valor)
+            paquete[nombre] = ('frame', desc)
+            if shm is not None:
+                segmentos.append(shm)
+        else:
+            paquete[nombre] = ('value', valor)
+    return paquete, segmentos
+
+
+# =============================================================================
+# PROCESO WORKER
+# =============================================================================
+
+def _rss_mb() -> float:
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    return 0.0
+
+
+# =============================================================================
+# LÍMITES DE RECURSOS POR TAREA
+# =============================================================================
+
+class LimiteCPUExcedido(BaseException):
+    """Tarea cortada por SIGXCPU (BaseException: un `except Exception` del código no la atrapa)"""
+
+
+# Límite alcanzado por la tarea en curso: 'cpu' | 'memory' | None
+_excedido: Optional[str] = None
+
+
+def _on_sigxcpu(signum, frame):
+    global _excedido
+    _excedido = 'cpu'
+    # Subir el soft limit para que no se repita la señal mientras se desarma la tarea
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+    raise LimiteCPUExcedido('Límite de CPU excedido')
+
+
+def _vm_bytes() -> int:
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().vms
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[0]) * resource.getpagesize()
+
+
+def _cpu_seconds() -> float:
+    if resource is not None:
+        uso = resource.getrusage(resource.RUSAGE_SELF)
+        return uso.ru_utime + uso.ru_stime
+    return time.process_time()
+
+
+def _reset_peak_rss():
+    """Reinicia VmHWM (Linux) para medir el pico de la tarea y no el del proceso"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+    return _rss_mb()
+
+
+def _aplicar_limites(limits: Optional[Dict]) -> Dict:
+    """Fija RLIMIT_AS / RLIMIT_CPU para la tarea; retorna el estado a restaurar"""
+    global _excedido
+    _excedido = None
+    estado = {'cpu_inicio': _cpu_seconds(), 'rlimits': {}}
+    _reset_peak_rss()
+    if not RLIMIT_AVAILABLE or not limits:
+        return estado
+
+    if limits.get('memory_mb'):
+        previo = resource.getrlimit(resource.RLIMIT_AS)
+        soft = _vm_bytes() + int(limits['memory_mb']) * 1024 ** 2
+        if previo[1] != resource.RLIM_INFINITY:
+            soft = min(soft, previo[1])
+        resource.setrlimit(resource.RLIMIT_AS, (soft, previo[1]))
+        estado['rlimits'][resource.RLIMIT_AS] = previo
+
+    if limits.get('cpu_seconds'):
+        previo = resource.getrlimit(resource.RLIMIT_CPU)
+        # RLIMIT_CPU es en segundos enteros: redondear hacia abajo para no pasar el límite
+        soft = max(int(estado['cpu_inicio'] + float(limits['cpu_seconds'])), int(estado['cpu_inicio']) + 1)
+        if previo[1] != resource.RLIM_INFINITY:
+            soft = min(soft, previo[1])
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, previo[1]))
+        estado['rlimits'][resource.RLIMIT_CPU] = previo
+
+    return estado
+
+
+def _restaurar_limites(estado: Dict) -> Dict:
+    """Restaura los límites previos y retorna el consumo de la tarea"""
+    for rlimit, previo in estado['rlimits'].items():
+        resource.setrlimit(rlimit, previo)
+    return {
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'cpu_seconds': round(_cpu_seconds() - estado['cpu_inicio'], 3),
+        'limit_exceeded': _excedido
+    }
+
+
+def _marcar_excedido(e: BaseException):
+    global _excedido
+    if isinstance(e, MemoryError):
+        _excedido = 'memory'
+    elif isinstance(e, LimiteCPUExcedido):
+        _excedido = 'cpu'
+
+
+# =============================================================================
+# AISLAMIENTO ENTRE TAREAS
+# =============================================================================
+
+# Módulos precargados por el worker (SANDBOX_PRELOAD): su estado se vigila entre tareas
+_precargados: Tuple[str, ...] = ()
+
+_FALTA = object()
+_SUFIJOS_NATIVOS = tuple(importlib.machinery.EXTENSION_SUFFIXES)
+_STDLIB = frozenset(getattr(sys, 'stdlib_module_names', ()))
+
+
+def _opciones_pandas() -> Dict[str, Any]:
+    from pandas._config import config as pd_config
+    opciones = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for clave in pd_config._registered_options:
+            if clave not in pd_config._deprecated_options:
+                opciones[clave] = pd.get_option(clave)
+    return opciones
+
+
+def _espacios_vigilados():
+    """(nombre, objeto) de builtins, los módulos precargados y las clases que definen"""
+    nombres = ['builtins']
+    for modulo in _precargados:
+        raiz = modulo.split('.')[0]
+        nombres += [raiz, modulo] if raiz != modulo else [modulo]
+    for nombre in dict.fromkeys(nombres):
+        modulo = sys.modules.get(nombre)
+        if modulo is None:
+            continue
+        yield nombre, modulo
+        raiz = nombre.split('.')[0]
+        for attr, valor in list(vars(modulo).items()):
+            if isinstance(valor, type) and (valor.__module__ or '').split('.')[0] == raiz:
+                yield f'{nombre}.{attr}', valor
+
+
+def _parcheado(antes: Dict[str, Any], despues: Dict[str, Any]) -> bool:
+    """True si la tarea reemplazó, borró o agregó atributos (salvo submódulos y __slotnames__)"""
+    for attr, valor in antes.items():
+        if despues.get(attr, _FALTA) is not valor:
+            return True
+    for attr in despues.keys() - antes.keys():
+        if attr != '__slotnames__' and not isinstance(despues[attr], types.ModuleType):
+            return True
+    return False
+
+
+def _capturar_estado() -> Dict[str, Any]:
+    """Estado global del worker antes de una tarea"""
+    estado = {
+        'cwd': os.getcwd(),
+        'sys_path': list(sys.path),
+        'environ': dict(os.environ),
+        'warnings': list(warnings.filters),
+        'random': random.getstate(),
+        'modulos': set(sys.modules),
+        'hilos': threading.active_count(),
+        'pandas': _opciones_pandas(),
+        'espacios': {nombre: dict(vars(obj)) for nombre, obj in _espacios_vigilados()},
+    }
+    np = sys.modules.get('numpy')
+    if np is not None:
+        estado['numpy'] = (np.geterr(), np.get_printoptions(), np.random.get_state())
+    mpl = sys.modules.get('matplotlib')
+    if mpl is not None:
+        # Copia cruda: rcParams ya validados, sin avisos de claves deprecadas
+        estado['rcparams'] = dict.copy(mpl.rcParams)
+    return estado
+
+
+def _restaurar_estado(estado: Dict[str, Any]) -> List[str]:
+    """
+    Deshace los cambios globales de la tarea (opciones de pandas, rcParams,
+    numpy, entorno, sys.path, módulos importados por la tarea)
+
+    Returns:
+        Motivos por los que el worker no queda limpio (vacío = reutilizable):
+        atributos parcheados en módulos precargados, módulos nativos nuevos
+        (no se pueden descargar) o hilos que siguen vivos.
+    """
+    os.chdir(estado['cwd'])
+    sys.path[:] = estado['sys_path']
+    if dict(os.environ) != estado['environ']:
+        os.environ.clear()
+        os.environ.update(estado['environ'])
+    warnings.filters[:] = estado['warnings']
+    getattr(warnings, '_filters_mutated', lambda: None)()
+    random.setstate(estado['random'])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for clave, valor in estado['pandas'].items():
+            try:
+                if pd.get_option(clave) != valor:
+                    pd.set_option(clave, valor)
+            except Exception:
+                pass
+
+    np = sys.modules.get('numpy')
+    if 'numpy' in estado and np is not None:
+        errores, impresion, aleatorio = estado['numpy']
+        np.seterr(**errores)
+        np.set_printoptions(**impresion)
+        np.random.set_state(aleatorio)
+    mpl = sys.modules.get('matplotlib')
+    if 'rcparams' in estado and mpl is not None:
+        dict.update(mpl.rcParams, estado['rcparams'])
+
+    motivos = []
+    espacios = dict(_espacios_vigilados())
+    for nombre, antes in estado['espacios'].items():
+        obj = espacios.get(nombre)
+        if obj is None or _parcheado(antes, vars(obj)):
+            motivos.append(f'{nombre} modificado')
+
+    # Módulos nuevos: los de paquetes ya cargados son carga diferida de la
+    # librería y se conservan; los paquetes nuevos se descargan si son Python
+    # puro. Las extensiones nativas de la stdlib (_statistics, _decimal...) no
+    # guardan estado de la tarea y se dejan cargadas
+    previos = estado['modulos']
+    raices_previas = {m.split('.')[0] for m in previos}
+    nuevos: Dict[str, List[str]] = {}
+    for nombre in set(sys.modules) - previos:
+        raiz = nombre.split('.')[0]
+        if raiz not in raices_previas:
+            nuevos.setdefault(raiz, []).append(nombre)
+    for raiz, nombres in nuevos.items():
+        nativo = any((getattr(sys.modules.get(n), '__file__', None) or '').endswith(_SUFIJOS_NATIVOS)
+                     for n in nombres)
+        if nativo and raiz in _STDLIB:
+            continue
+        if nativo:
+            motivos.append(f'módulo nativo {raiz} importado')
+        else:
+            for nombre in nombres:
+                sys.modules.pop(nombre, None)
+    importlib.invalidate_caches()
+
+    if threading.active_count() > estado['hilos']:
+        motivos.append('hilos de la tarea siguen vivos')
+    return motivos
+
+
+def _ejecutar_codigo(tarea: Dict, segmentos: List[shared_memory.SharedMemory]) -> Dict:
+    """Tarea exec: mismo contrato que el antiguo CodeExecutor._run_code_in_process"""
+    exec_globals = {}
+    for nombre, (tipo, valor) in tarea['globals'].items():
+        if tipo == 'module':
+            exec_globals[nombre] = importlib.import_module(valor)
+        elif tipo == 'frame':
+            exec_globals[nombre] = _importar_frame(valor, segmentos)
+        else:
+            exec_globals[nombre] = valor
+
+    salida = io.StringIO()
+    try:
+        exec_locals = {}
+        with contextlib.redirect_stdout(salida):
+            exec(tarea['code'], exec_globals, exec_locals)
+
+        # Buscar resultado final
+        result = None
+        if 'result' in exec_locals:
+            result = exec_locals['result']
+        elif exec_locals:
+            # Tomar la última variable definida
+            last_var = list(exec_locals.keys())[-1]
+            result = exec_locals[last_var]
+
+        return {
+            'success': True,
+            'result': result,
+            'output': salida.getvalue(),
+            'code_file': tarea.get('code_file'),
+            'variables_created': list(exec_locals.keys())
+        }
+    except (Exception, LimiteCPUExcedido) as e:
+        _marcar_excedido(e)
+        return {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+
+
+def _ejecutar_script(tarea: Dict) -> Dict:
+    """Tarea script: `python archivo.py` dentro del worker caliente"""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    cwd_original, argv_original = os.getcwd(), sys.argv
+    returncode = 0
+    try:
+        os.chdir(tarea['cwd'])
+        sys.argv = [tarea['path']]
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                runpy.run_path(tarea['path'], run_name='__main__')
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    returncode = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    returncode = 1
+            except BaseException as e:
+                _marcar_excedido(e)
+                traceback.print_exc()
+                returncode = 1
+    finally:
+        os.chdir(cwd_original)
+        sys.argv = argv_original
+        # Figuras abiertas de matplotlib no deben pasar a la siguiente tarea
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close('all')
+
+    return {'success': returncode == 0, 'returncode': returncode,
+            'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+def _worker_main(conn, precargar: Tuple[str, ...]):
+    """Loop del proceso worker: recibe tareas hasta que el Pipe se cierra"""
+    global _precargados
+    _precargados = tuple(precargar)
+    # Sin display: los gráficos solo se guardan a archivo
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    for modulo in precargar:
+        try:
+            importlib.import_module(modulo)
+        except Exception:
+            pass
+    if ARROW_AVAILABLE:
+        # Primera conversión Arrow → pandas carga pyarrow.pandas_compat (~0.5 s)
+        pa.table({'x': [0]}).to_pandas()
+    if RLIMIT_AVAILABLE:
+        signal.signal(signal.SIGXCPU, _on_sigxcpu)
+
+    while True:
+        try:
+            tarea = conn.recv()
+        except (EOFError, OSError):
+            break
+        if tarea is None:
+            break
+
+        inicio = time.perf_counter()
+        segmentos: List[shared_memory.SharedMemory] = []
+        limits = tarea.get('limits') or {}
+        estado_global = _capturar_estado()
+        estado = _aplicar_limites(limits)
+        try:
+            if tarea['kind'] == 'script':
+                respuesta = _ejecutar_script(tarea)
+            else:
+                respuesta = _ejecutar_codigo(tarea, segmentos)
+        except (Exception, LimiteCPUExcedido) as e:
+            _marcar_excedido(e)
+            respuesta = {'success': False, 'error': str(e), 'traceback': traceback.format_exc()}
+        finally:
+            uso = _restaurar_limites(estado)
+            sucio = _restaurar_estado(estado_global)
+
+        if uso['limit_exceeded'] == 'memory':
+            respuesta['success'] = False
+            respuesta['error'] = (f"Límite de memoria excedido ({limits.get('memory_mb')} MB): "
+                                  f"filtra o agrega los datos antes de procesarlos")
+        elif uso['limit_exceeded'] == 'cpu':
+            respuesta['success'] = False
+            respuesta['error'] = (f"Límite de CPU excedido ({limits.get('cpu_seconds')} s): "
+                                  f"simplifica el cálculo o usa SQL para agregaciones grandes")
+
+        respuesta['resources'] = {**uso, 'limits': limits}
+        respuesta['worker'] = {
+            'pid': os.getpid(),
+            'rss_mb': round(_rss_mb(), 1),
+            'run_seconds': round(time.perf_counter() - inicio, 4),
+            # Tras MemoryError/SIGXCPU, o si la tarea dejó estado global que no se
+            # pudo deshacer, el intérprete no es confiable para la siguiente tarea
+            'recycle': uso['limit_exceeded'] is not None or bool(sucio),
+            'state_leak': sucio
+        }
+        try:
+            conn.send(respuesta)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            # Resultado no serializable: se envía su representación
+            respuesta['result'] = repr(respuesta.get('result'))
+            respuesta.setdefault('warnings', []).append(f'Resultado no serializable ({e}); se retorna repr()')
+            conn.send(respuesta)
+        finally:
+            respuesta = None
+            _cerrar_segmentos(segmentos, unlink=False)
+
+
+# =============================================================================
+# POOL
+# =============================================================================
+
+class _Worker:
+    """Proceso worker y su extremo del Pipe"""
+
+    def __init__(self, ctx, precargar: Tuple[str, ...]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main,
+                                   args=(child_conn, precargar),
+                                   name="sandbox-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+        self.rss_mb = 0.0
+        self.recycle = False
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=5)
+        finally:
+            self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+
+def _contexto_workers():
+    """forkserver si la plataforma lo tiene (Unix), si no spawn; nunca fork"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('forkserver')
+        # __main__ se precarga igual que por defecto (los hijos no lo reimportan);
+        # este módulo deja pandas y pyarrow importados en el servidor
+        ctx.set_forkserver_preload(['__main__', __name__])
+        return ctx
+    return multiprocessing.get_context('spawn')
+
+
+class SandboxPool:
+    """Workers precalentados con reciclaje por número de ejecuciones y memoria"""
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_runs: int = 50,
+        max_rss_mb: int = 1024,
+        precargar: Tuple[str, ...] = ('pandas', 'numpy')
+    ):
+        self.size = max(1, size)
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.precargar = tuple(precargar)
+        self._ctx = _contexto_workers()
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self.runs = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.crashes = 0
+        self.limit_kills = 0
+        self.state_recycles = 0
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida de workers
+    # ------------------------------------------------------------------
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self.precargar)
+
+    def warm(self):
+        """Lanza los workers que falten hasta completar el pool"""
+        with self._lock:
+            faltan = self.size - self._workers
+            self._workers += max(faltan, 0)
+        for _ in range(max(faltan, 0)):
+            self._idle.put(self._spawn())
+
+    def _acquire(self) -> _Worker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            crear = self._workers < self.size
+            if crear:
+                self._workers += 1
+        if crear:
+            return self._spawn()
+        return self._idle.get()
+
+    def _replace(self, worker: _Worker, killed: bool):
+        """Descarta el worker y deja uno nuevo en su lugar"""
+        if killed:
+            worker.kill()
+        else:
+            worker.stop()
+        self._idle.put(self._spawn())
+
+    def _release(self, worker: _Worker):
+        if not worker.process.is_alive():
+            self.crashes += 1
+            self._replace(worker, killed=True)
+        elif worker.recycle or worker.runs >= self.max_runs or worker.rss_mb > self.max_rss_mb:
+            self.recycled += 1
+            self._replace(worker, killed=False)
+        else:
+            self._idle.put(worker)
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+
+    def _run(self, tarea: Dict, timeout: float) -> Dict:
+        worker = self._acquire()
+        self.runs += 1
+        try:
+            worker.conn.send(tarea)
+            if not worker.conn.poll(timeout):
+                self.timeouts += 1
+                self._replace(worker, killed=True)
+                return {'success': False, 'timeout': True,
+                        'error': f'Timeout: Ejecución cancelada después de {timeout} segundos'}
+            respuesta = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            worker.process.join(timeout=1)
+            self.crashes += 1
+            exitcode = worker.process.exitcode
+            self._replace(worker, killed=True)
+            return {'success': False, 'exitcode': exitcode,
+                    'error': f'El worker terminó sin retornar resultado (exitcode={exitcode}): {e}'}
+
+        worker.runs += 1
+        worker.rss_mb = respuesta.get('worker', {}).get('rss_mb', 0.0)
+        worker.recycle = respuesta.get('worker', {}).get('recycle', False)
+        if respuesta.get('resources', {}).get('limit_exceeded'):
+            self.limit_kills += 1
+        if respuesta.get('worker', {}).get('state_leak'):
+            self.state_recycles += 1
+        self._release(worker)
+        return respuesta
+
+    def run_exec(
+        self,
+        code: str,
+        exec_globals: Dict[str, Any],
+        timeout: float,
+        code_file: str = None,
+        limits: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Ejecuta código con exec() en un worker (contrato de CodeExecutor.execute)
+
+        limits: {'memory_mb': n, 'cpu_seconds': n} (ver docstring del módulo)
+        """
+        paquete, segmentos = empaquetar_globals(exec_globals)
+        try:
+            return self._run({'kind': 'exec', 'code': code, 'globals': paquete,
+                              'code_file': code_file, 'limits': limits}, timeout)
+        finally:
+            _cerrar_segmentos(segmentos, unlink=True)
+
+    def run_script(self, path: str, cwd: str, timeout: float, limits: Optional[Dict] = None) -> Dict:
+        """Ejecuta un archivo .py como __main__ (returncode/stdout/stderr)"""
+        return self._run({'kind': 'script', 'path': str(path), 'cwd': str(cwd),
+                          'limits': limits}, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'size': self.size,
+            'workers': self._workers,
+            'idle': self._idle.qsize(),
+            'runs': self.runs,
+            'timeouts': self.timeouts,
+            'recycled': self.recycled,
+            'crashes': self.crashes,
+            'limit_kills': self.limit_kills,
+            'state_recycles': self.state_recycles,
+            'shared_memory': ARROW_AVAILABLE
+        }
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._workers = 0
+
+
+_pool: Optional[SandboxPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Singleton del pool de workers"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from config import Config
+                _pool = SandboxPool(
+                    size=Config.SANDBOX_WORKERS,
+                    max_runs=Config.SANDBOX_MAX_RUNS,
+                    max_rss_mb=Config.SANDBOX_MAX_RSS_MB,
+                    precargar=tuple(m.strip() for m in Config.SANDBOX_PRELOAD.split(',') if m.strip())
+                )
+    return _pool
@@ -3,11 +3,13 @@ Sistema de Smart Alerts - Detección Automática de Problemas Críticos
 División Salvador - Codelco Chile
 """
 
-import sqlite3
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from services import dimensions, rollups
+from services.db_pool import get_db_pool
+
 
 class SmartAlertsEngine:
     """Motor de alertas inteligentes para detección automática de problemas"""
@@ -35,30 +37,50 @@ class SmartAlertsEngine:
             "resumen": {}
         }
 
-        conn = sqlite3.connect(self.db_path)
+        conn = get_db_pool(self.db_path).connect()
         cursor = conn.cursor()
 
         try:
+            # Excluir tercerizados (TE): por equipo_id de dim_equipo, o prefijo si no está resuelto
+            sin_terceros, params_terceros = dimensions.filtro_equipos(conn, "hexagon_by_kpi_hora", excluir_terceros=True)
+
             # ALERTA 1: DM Crítica de Equipos
             fecha_limite = (datetime.now() - timedelta(days=self.DIAS_ANALISIS)).strftime('%Y-%m-%d')
+            manana = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+
+            # Rollup diario por equipo (None si no está al día → consultas crudas).
+            # Ambos caminos agrupan por equipo y cuentan como horas analizadas las
+            # filas que entran al promedio de DM (nominal > 0 y disponible no nulo)
+            por_equipo = rollups.kpi_hora_por_equipo(conn, fecha_limite, manana, tipo_sin_produccion='Truck')
+
+            if por_equipo is not None:
+                equipos_criticos = sorted(
+                    [
+                        (e["equipment_id"], e["equipment_type"], e["dm_promedio"], e["horas_dm"])
+                        for e in por_equipo
+                        if e["dm_promedio"] is not None and e["dm_promedio"] < self.UMBRAL_DM_CRITICO
+                    ],
+                    key=lambda e: e[2]
+                )[:10]
+            else:
+                cursor.execute(f"""
+                    SELECT
+                        equipment_id,
+                        equipment_type,
+                        AVG(disponible * 100.0 / NULLIF(nominal, 0)) as dm_promedio,
+                        COUNT(disponible) as horas_analizadas
+                    FROM hexagon_by_kpi_hora
+                    WHERE timestamp >= ?
+                      AND nominal > 0
+                      {sin_terceros}
+                    GROUP BY equipment_id, equipment_type
+                    HAVING dm_promedio < ?
+                    ORDER BY dm_promedio ASC
+                    LIMIT 10
+                """, (fecha_limite, *params_terceros, self.UMBRAL_DM_CRITICO))
+
+                equipos_criticos = cursor.fetchall()
 
-            cursor.execute("""
-                SELECT
-                    equipment_id,
-                    equipment_type,
-                    AVG(disponible * 100.0 / NULLIF(nominal, 0)) as dm_promedio,
-                    COUNT(*) as horas_analizadas
-                FROM hexagon_by_kpi_hora
-                WHERE timestamp >= ?
-                  AND nominal > 0
-                  AND equipment_id NOT LIKE 'TE%'
-                GROUP BY equipment_id, equipment_type
-                HAVING dm_promedio < ?
-                ORDER BY dm_promedio ASC
-                LIMIT 10
-            """, (fecha_limite, self.UMBRAL_DM_CRITICO))
-
-            equipos_criticos = cursor.fetchall()
             if equipos_criticos:
                 for equipo, tipo, dm, horas in equipos_criticos:
                     alertas["criticas"].append({
@@ -73,7 +95,7 @@ class SmartAlertsEngine:
                     })
 
             # ALERTA 2: UEBD Bajo en Producción
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT
                     equipment_id,
                     AVG((efectivo * 100.0) / NULLIF(disponible, 0)) as uebd_promedio,
@@ -81,13 +103,13 @@ class SmartAlertsEngine:
                 FROM hexagon_by_kpi_hora
                 WHERE timestamp >= ?
                   AND disponible > 0
-                  AND equipment_id NOT LIKE 'TE%'
+                  {sin_terceros}
                   AND tipo = 'Truck'
                 GROUP BY equipment_id
                 HAVING uebd_promedio < ? AND dm_promedio > 70
                 ORDER BY uebd_promedio ASC
                 LIMIT 5
-            """, (fecha_limite, self.UMBRAL_UEBD_CRITICO))
+            """, (fecha_limite, *params_terceros, self.UMBRAL_UEBD_CRITICO))
 
             uebd_bajo = cursor.fetchall()
             if uebd_bajo:
@@ -114,13 +136,14 @@ class SmartAlertsEngine:
                 # Obtener real acumulado del mes
                 fecha_inicio_mes = f"{year_actual}-{mes_actual:02d}-01"
 
-                cursor.execute("""
-                    SELECT SUM(material_tonnage)
-                    FROM hexagon_by_kpi_hora
-                    WHERE timestamp >= ?
-                """, (fecha_inicio_mes,))
-
-                real_mes = cursor.fetchone()[0] or 0
+                real_mes = rollups.tonelaje_kpi_hora(conn, fecha_inicio_mes, manana)
+                if real_mes is None:
+                    cursor.execute("""
+                        SELECT SUM(material_tonnage)
+                        FROM hexagon_by_kpi_hora
+                        WHERE timestamp >= ?
+                    """, (fecha_inicio_mes,))
+                    real_mes = cursor.fetchone()[0] or 0
 
                 if real_mes > 0:
                     cumplimiento_pct = (real_mes / plan_mensual) * 100
@@ -138,19 +161,27 @@ class SmartAlertsEngine:
                         })
 
             # ALERTA 4: Equipos Sin Producción
-            cursor.execute("""
-                SELECT DISTINCT equipment_id, equipment_type
-                FROM hexagon_by_kpi_hora
-                WHERE timestamp >= ?
-                  AND equipment_id NOT LIKE 'TE%'
-                  AND tipo = 'Truck'
-                  AND disponible > 0
-                  AND material_tonnage = 0
-                GROUP BY equipment_id, equipment_type
-                HAVING COUNT(*) > 10
-            """, (fecha_limite,))
+            if por_equipo is not None:
+                sin_produccion = [
+                    (e["equipment_id"], e["equipment_type"])
+                    for e in por_equipo
+                    if e["horas_sin_produccion"] > 10
+                ]
+            else:
+                cursor.execute(f"""
+                    SELECT DISTINCT equipment_id, equipment_type
+                    FROM hexagon_by_kpi_hora
+                    WHERE timestamp >= ?
+                      {sin_terceros}
+                      AND tipo = 'Truck'
+                      AND disponible > 0
+                      AND material_tonnage = 0
+                    GROUP BY equipment_id, equipment_type
+                    HAVING COUNT(*) > 10
+                """, (fecha_limite, *params_terceros))
+
+                sin_produccion = cursor.fetchall()
 
-            sin_produccion = cursor.fetchall()
             if sin_produccion:
                 for equipo, tipo in sin_produccion[:5]:  # Top 5
                     alertas["advertencias"].append({
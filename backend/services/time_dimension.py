@@ -0,0 +1,355 @@
+# services/time_dimension.py
+"""
+Dimensión de tiempo horaria con hora relativa al turno - MineDash AI
+División Salvador - Codelco Chile
+
+La gaviota (api_routes.get_gaviota, gaviota_analysis, herramienta
+obtener_comparacion_gaviotas), match pala-camión y relevos agrupaban con
+DATE(timestamp) / strftime('%H', timestamp) fila a fila, y cada uno
+re-derivaba qué hora de reloj corresponde a la hora 0-11 del turno A/C.
+Este módulo genera una sola vez:
+
+    dim_tiempo   tiempo_id = YYYYMMDDHH (entero), con
+                 fecha / fecha_id, hora_dia, turno, hora_turno,
+                 dia_operacional / dia_operacional_id, semana / semana_id,
+                 mes / mes_id / year, anio_fiscal / periodo_fiscal /
+                 trimestre_fiscal
+
+y agrega tiempo_id a las tablas de hechos que la usan (indexado vía
+services/db_migrations). Las consultas filtran por rango de enteros sobre
+tiempo_id y agrupan por las columnas de la dimensión con un JOIN por clave.
+
+Turnos (services/date_ranges.TURNOS): A = 08:00-20:00, C = 20:00-08:00.
+El día operacional empieza con el turno A: las horas 00-07 pertenecen al
+turno C que partió el día anterior. mes / semana son de calendario (como
+month_range); el período fiscal es el del día operacional, con el año fiscal
+iniciando en Config.TIME_DIMENSION_FISCAL_START_MONTH.
+
+Refresco incremental: se extiende la dimensión al rango de las filas con
+tiempo_id NULL y solo se resuelven esas filas. Lectura: como
+services/dimensions, tiempo_sql cae a expresiones sobre la columna de tiempo
+si la tabla todavía no tiene tiempo_id completo.
+
+Uso:
+    python -m services.time_dimension                  # refresco incremental
+    python -m services.time_dimension --regenerar      # recalcula dim_tiempo
+"""
+
+import fnmatch
+import sqlite3
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services import dimensions
+from services.date_ranges import HORAS_TURNO, TURNOS, Rango, range_clause
+from services.db_pool import get_db_pool
+
+
+# =============================================================================
+# ESQUEMA
+# =============================================================================
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS dim_tiempo (
+        tiempo_id INTEGER PRIMARY KEY,
+        fecha TEXT,
+        fecha_id INTEGER,
+        hora_dia INTEGER,
+        turno TEXT,
+        hora_turno INTEGER,
+        dia_operacional TEXT,
+        dia_operacional_id INTEGER,
+        semana INTEGER,
+        semana_id INTEGER,
+        mes INTEGER,
+        mes_id INTEGER,
+        year INTEGER,
+        anio_fiscal INTEGER,
+        periodo_fiscal INTEGER,
+        trimestre_fiscal INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_dim_tiempo_dia_operacional ON dim_tiempo(dia_operacional_id, turno, hora_turno)",
+    "INSERT OR IGNORE INTO dim_tiempo (tiempo_id) VALUES (0)",
+]
+
+COLUMNAS = [
+    "tiempo_id", "fecha", "fecha_id", "hora_dia", "turno", "hora_turno",
+    "dia_operacional", "dia_operacional_id", "semana", "semana_id", "mes", "mes_id", "year",
+    "anio_fiscal", "periodo_fiscal", "trimestre_fiscal",
+]
+
+# El día operacional parte con el primer turno del día (A, 08:00)
+INICIO_DIA_OPERACIONAL = min(TURNOS.values())
+
+
+class TimeKey(NamedTuple):
+    """Tabla de hechos con tiempo_id; table acepta comodines"""
+    table: str
+    source_columns: Tuple[str, ...]  # columna de tiempo, candidatas por preferencia
+
+
+TIME_KEYS: List[TimeKey] = [
+    # Gaviota y match pala-camión
+    TimeKey("hexagon_by_kpi_hora", ("timestamp",)),
+    # Relevos: hora de inicio de la descarga
+    TimeKey("hexagon_by_detail_dumps_*", ("dump_start_time", "timestamp")),
+]
+
+
+def key_for(table: str) -> Optional[TimeKey]:
+    return next((k for k in TIME_KEYS if fnmatch.fnmatchcase(table, k.table)), None)
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+
+
+def _tables(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+
+
+def _source_column(conn: sqlite3.Connection, table: str) -> Optional[str]:
+    key = key_for(table)
+    if key is None:
+        return None
+    columnas = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    return next((c for c in key.source_columns if c in columnas), None)
+
+
+# =============================================================================
+# CALENDARIO
+# =============================================================================
+
+def hora_dia(turno: str, hora_turno: int) -> int:
+    """
+    Hora de reloj (0-23) de la hora 0-11 de un turno: A 0 → 8, C 0 → 20, C 11 → 7
+
+    Un turno fuera de TURNOS (ej. B en la columna turno de hexagon_by_kpi_hora)
+    se trata como C, igual que el cálculo previo (if turno == 'A' ... else ...).
+    """
+    inicio = TURNOS.get(str(turno).upper(), TURNOS["C"])
+    return (inicio + int(hora_turno)) % 24
+
+
+def tiempo_id(ts) -> int:
+    """Clave YYYYMMDDHH de un timestamp"""
+    return int(pd.Timestamp(ts).strftime("%Y%m%d%H"))
+
+
+def rango_ids(rango: Rango) -> Tuple[int, int]:
+    """
+    Rango semiabierto de timestamps (services/date_ranges) → rango semiabierto
+    de tiempo_id. Resolución horaria: el inicio se redondea hacia abajo y el
+    fin hacia arriba a la hora.
+    """
+    inicio, fin = rango
+    return tiempo_id(pd.Timestamp(inicio).floor("h")), tiempo_id(pd.Timestamp(fin).ceil("h"))
+
+
+def generar(desde, hasta) -> pd.DataFrame:
+    """Filas de dim_tiempo para todas las horas de los días desde..hasta (ambos incluidos)"""
+    from config import Config
+
+    horas = pd.date_range(
+        pd.Timestamp(desde).normalize(),
+        pd.Timestamp(hasta).normalize() + pd.Timedelta(days=1),
+        freq="h", inclusive="left"
+    )
+    h = horas.hour.to_numpy()
+
+    inicios = list(TURNOS.items())
+    en_turno = [(h - inicio) % 24 < HORAS_TURNO for _, inicio in inicios]
+    turno = np.select(en_turno, [t for t, _ in inicios], default="")
+    hora_turno = np.select(en_turno, [(h - inicio) % 24 for _, inicio in inicios], default=0)
+
+    operacional = (horas - pd.Timedelta(hours=INICIO_DIA_OPERACIONAL)).normalize()
+    iso = horas.isocalendar()
+    inicio_fiscal = Config.TIME_DIMENSION_FISCAL_START_MONTH
+    periodo_fiscal = (operacional.month - inicio_fiscal) % 12 + 1
+    # Año fiscal = año en que termina
+    anio_fiscal = operacional.year + (inicio_fiscal > 1) * (operacional.month >= inicio_fiscal)
+
+    return pd.DataFrame({
+        "tiempo_id": horas.strftime("%Y%m%d%H").astype(np.int64),
+        "fecha": horas.strftime("%Y-%m-%d"),
+        "fecha_id": horas.strftime("%Y%m%d").astype(np.int64),
+        "hora_dia": h,
+        "turno": turno,
+        "hora_turno": hora_turno,
+        "dia_operacional": operacional.strftime("%Y-%m-%d"),
+        "dia_operacional_id": operacional.strftime("%Y%m%d").astype(np.int64),
+        "semana": iso["week"].to_numpy(),
+        "semana_id": (iso["year"] * 100 + iso["week"]).to_numpy(),
+        "mes": horas.month,
+        "mes_id": horas.year * 100 + horas.month,
+        "year": horas.year,
+        "anio_fiscal": anio_fiscal,
+        "periodo_fiscal": periodo_fiscal,
+        "trimestre_fiscal": (periodo_fiscal - 1) // 3 + 1,
+    })[COLUMNAS]
+
+
+# =============================================================================
+# REFRESCO
+# =============================================================================
+
+def _extender(conn: sqlite3.Connection, desde, hasta, reemplazar: bool = False) -> int:
+    """Inserta los días desde..hasta que falten en dim_tiempo"""
+    desde, hasta = pd.to_datetime(desde, errors="coerce"), pd.to_datetime(hasta, errors="coerce")
+    if pd.isna(desde) or pd.isna(hasta):
+        return 0
+    filas = generar(desde, hasta)
+    verbo = "INSERT OR REPLACE" if reemplazar else "INSERT OR IGNORE"
+    antes = conn.total_changes
+    conn.executemany(
+        f"{verbo} INTO dim_tiempo ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' * len(COLUMNAS))})",
+        filas.astype(object).itertuples(index=False, name=None)
+    )
+    return conn.total_changes - antes
+
+
+def refresh_table(conn: sqlite3.Connection, table: str) -> Dict:
+    """Extiende dim_tiempo y resuelve tiempo_id de las filas nuevas (conexión de escritura)"""
+    columna = _source_column(conn, table)
+    if columna is None:
+        return {"table": table, "skipped": "sin columna de tiempo"}
+
+    with conn:
+        columnas = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        creada = "tiempo_id" not in columnas
+        if creada:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN tiempo_id INTEGER")
+        desde, hasta = conn.execute(
+            f"SELECT MIN({columna}), MAX({columna}) FROM {table} WHERE tiempo_id IS NULL AND {columna} IS NOT NULL"
+        ).fetchone()
+        horas = _extender(conn, desde, hasta) if desde else 0
+        # Timestamp nulo o inválido → 0 (miembro desconocido)
+        filas = conn.execute(f"""
+            UPDATE {table} SET tiempo_id = COALESCE(CAST(strftime('%Y%m%d%H', {columna}) AS INTEGER), 0)
+            WHERE tiempo_id IS NULL
+        """).rowcount
+
+    return {"table": table, "columna": columna, "columna_creada": creada, "horas_nuevas": horas, "filas": filas}
+
+
+def refresh_time_dimension(
+    db_path: str = "minedash.db",
+    tables: Optional[List[str]] = None,
+    regenerar: bool = False
+) -> List[Dict]:
+    """
+    Refresco incremental de dim_tiempo y de tiempo_id en las tablas de hechos
+
+    Llamar después de cada carga de datos Hexagon (ver services/ingestion).
+    regenerar=True recalcula los atributos de todas las horas ya generadas
+    (p. ej. al cambiar TIME_DIMENSION_FISCAL_START_MONTH).
+    """
+    from services import db_migrations
+
+    resultados = []
+    with get_db_pool(db_path).write() as conn:
+        ensure_schema(conn)
+        conn.commit()
+        if regenerar:
+            with conn:
+                desde, hasta = conn.execute("SELECT MIN(fecha), MAX(fecha) FROM dim_tiempo WHERE tiempo_id > 0").fetchone()
+                if desde:
+                    _extender(conn, desde, hasta, reemplazar=True)
+        objetivo = [t for t in (tables or _tables(conn)) if key_for(t)]
+        for table in objetivo:
+            inicio = time.perf_counter()
+            resultado = refresh_table(conn, table)
+            resultado["segundos"] = round(time.perf_counter() - inicio, 2)
+            print(f"   [TIEMPO] {table}: {resultado}")
+            resultados.append(resultado)
+
+    if objetivo:
+        db_migrations.migrate(db_path, tables=objetivo)
+    dimensions.invalidate_freshness(db_path)
+    return resultados
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+
+class TiempoSQL(NamedTuple):
+    """Fragmentos para filtrar y agrupar una tabla de hechos por tiempo"""
+    join: str        # "" o JOIN a dim_tiempo
+    where: str       # predicado de rango (sin AND inicial)
+    params: list
+    fecha: str       # expresiones de columna
+    fecha_id: str
+    turno: str
+    hora_turno: str
+    hora_dia: str
+
+
+def tiempo_ready(conn: sqlite3.Connection, table: str) -> bool:
+    """True si la tabla tiene tiempo_id resuelto en todas sus filas (cacheado como dimensions.ids_ready)"""
+    return dimensions.ids_ready(conn, table, "tiempo_id")
+
+
+def tiempo_sql(conn: sqlite3.Connection, table: str, alias: str, rango: Rango) -> TiempoSQL:
+    """
+    Filtro de rango y columnas de tiempo para una tabla de hechos
+
+    Con tiempo_id resuelto: rango de enteros sobre tiempo_id y columnas de
+    dim_tiempo (alias dt). Si no: rango de texto sobre la columna de tiempo y
+    las mismas columnas calculadas con strftime (comportamiento anterior).
+
+    Uso:
+        tiempo = time_dimension.tiempo_sql(conn, "hexagon_by_kpi_hora", "k", day_range(fecha))
+        f"SELECT {tiempo.hora_turno} AS hora, SUM(k.material_tonnage) "
+        f"FROM hexagon_by_kpi_hora k {tiempo.join} WHERE {tiempo.where} GROUP BY {tiempo.hora_turno}"
+    """
+    prefijo = f"{alias}." if alias else ""
+
+    if tiempo_ready(conn, table):
+        inicio, fin = rango_ids(rango)
+        return TiempoSQL(
+            join=f"JOIN dim_tiempo dt ON dt.tiempo_id = {prefijo}tiempo_id",
+            where=f"{prefijo}tiempo_id >= ? AND {prefijo}tiempo_id < ?",
+            params=[inicio, fin],
+            fecha="dt.fecha",
+            fecha_id="dt.fecha_id",
+            turno="dt.turno",
+            hora_turno="dt.hora_turno",
+            hora_dia="dt.hora_dia",
+        )
+
+    columna = f"{prefijo}{_source_column(conn, table) or 'timestamp'}"
+    hora = f"CAST(strftime('%H', {columna}) AS INTEGER)"
+    turno = "CASE " + " ".join(
+        f"WHEN ({hora} + 24 - {inicio}) % 24 < {HORAS_TURNO} THEN '{t}'" for t, inicio in TURNOS.items()
+    ) + " END"
+    where, params = range_clause(columna, rango)
+    return TiempoSQL(
+        join="",
+        where=where,
+        params=params,
+        fecha=f"DATE({columna})",
+        fecha_id=f"CAST(strftime('%Y%m%d', {columna}) AS INTEGER)",
+        turno=turno,
+        hora_turno=f"(({hora} + 24 - {INICIO_DIA_OPERACIONAL}) % {HORAS_TURNO})",
+        hora_dia=hora,
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresca la dimensión de tiempo")
+    parser.add_argument("--db", default="minedash.db")
+    parser.add_argument("--tabla", action="append", default=None, help="Limitar a estas tablas")
+    parser.add_argument("--regenerar", action="store_true", help="Recalcular atributos de dim_tiempo")
+    args = parser.parse_args()
+
+    for r in refresh_time_dimension(args.db, tables=args.tabla, regenerar=args.regenerar):
+        print(r)
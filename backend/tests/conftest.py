@@ -0,0 +1,7 @@
+# tests/conftest.py
+"""Permite importar services/ y tools/ como en la app (cwd = backend/)"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
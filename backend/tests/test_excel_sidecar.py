@@ -0,0 +1,45 @@
+# tests/test_excel_sidecar.py
+"""Regresiones de services/excel_sidecar.py"""
+
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from services.excel_sidecar import read_excel_columnar
+
+
+def test_columna_mixta_se_guarda_como_texto(tmp_path, monkeypatch):
+    export = tmp_path / "by_estados_2024_2025.xlsx"
+    pd.DataFrame({
+        "equipo": ["CE-01", "CE-02", "CE-03", "CE-04"],
+        "asarco": [123, "A1", 456, None],
+        "horas": [1.5, 2.0, 0.5, 3.0],
+    }).to_excel(export, index=False)
+    esperado = pd.read_excel(export)
+
+    lecturas = []
+    read_excel = pd.read_excel
+    monkeypatch.setattr(pd, "read_excel", lambda *a, **k: lecturas.append(a) or read_excel(*a, **k))
+
+    for _ in range(2):  # primera lectura (genera el sidecar) y siguiente
+        leido = read_excel_columnar(export)
+        assert leido["asarco"].tolist()[:3] == ["123", "A1", "456"]
+        assert pd.isna(leido["asarco"].iloc[3])
+        pd.testing.assert_frame_equal(leido.drop(columns="asarco"), esperado.drop(columns="asarco"))
+
+    assert len(lecturas) == 1
+    meta = json.loads((tmp_path / ".parquet" / "by_estados_2024_2025.xlsx.parquet.json").read_text())
+    assert meta["str_columns"] == ["asarco"]
+
+
+def test_columnas_homogeneas_usan_sidecar(tmp_path):
+    export = tmp_path / "by_detail_dumps 2025.xlsx"
+    pd.DataFrame({"truck": ["CE-01", "CE-02"], "material_tonnage": [220.5, 231.0]}).to_excel(export, index=False)
+
+    leido = read_excel_columnar(export, columns=["material_tonnage"])
+
+    assert (tmp_path / ".parquet" / "by_detail_dumps 2025.xlsx.parquet").exists()
+    pd.testing.assert_frame_equal(leido, pd.read_excel(export, usecols=["material_tonnage"]))
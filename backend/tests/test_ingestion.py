@@ -0,0 +1,75 @@
+# tests/test_ingestion.py
+"""Regresiones de services/ingestion.py"""
+
+import sqlite3
+
+import pandas as pd
+
+from services.ingestion import ingest_export
+
+
+def _export_dumps(path):
+    pd.DataFrame({
+        "time": pd.to_datetime(["2025-01-01 08:00:00", "2025-01-01 09:00:00"]),
+        "truck_equipment_name": ["CE-01", "CE-02"],
+        "dump_start_time": pd.to_datetime(["2025-01-01 07:55:30", None]),
+        "material_tonnage": [220.5, 231.0],
+    }).to_excel(path, index=False)
+
+
+def test_columnas_fecha_adicionales_se_guardan_como_texto(tmp_path):
+    export = tmp_path / "by_detail_dumps 2025.xlsx"
+    db = str(tmp_path / "minedash.db")
+    _export_dumps(export)
+
+    result = ingest_export(export, db_path=db, refresh=False)
+
+    assert result["success"], result
+    assert result["rows_appended"] == 2
+    with sqlite3.connect(db) as conn:
+        filas = conn.execute(
+            "SELECT timestamp, dump_start_time FROM hexagon_by_detail_dumps_2025 ORDER BY timestamp"
+        ).fetchall()
+    assert filas == [
+        ("2025-01-01 08:00:00", "2025-01-01 07:55:30"),
+        ("2025-01-01 09:00:00", None),
+    ]
+
+
+def test_exportacion_sin_columna_de_tiempo_retorna_error(tmp_path):
+    export = tmp_path / "by_detail_dumps 2025.xlsx"
+    db = str(tmp_path / "minedash.db")
+    pd.DataFrame({"truck_equipment_name": ["CE-01"], "material_tonnage": [220.5]}).to_excel(export, index=False)
+
+    result = ingest_export(export, db_path=db, refresh=False)
+
+    assert result["success"] is False
+    assert "by_detail_dumps 2025.xlsx" in result["error"]
+    assert "timestamp" in result["error"]
+
+
+def test_lote_con_error_registra_corrida_parcial(tmp_path, monkeypatch):
+    from services import ingestion
+
+    export = tmp_path / "by_detail_dumps 2025.xlsx"
+    db = str(tmp_path / "minedash.db")
+    _export_dumps(export)
+
+    normalizar = ingestion._normalize_chunk
+    llamadas = []
+
+    def falla_segundo_lote(df, table_columns):
+        llamadas.append(1)
+        if len(llamadas) == 2:
+            raise ValueError("lote inválido")
+        return normalizar(df, table_columns)
+
+    monkeypatch.setattr(ingestion, "_normalize_chunk", falla_segundo_lote)
+    result = ingest_export(export, db_path=db, chunk_rows=1, refresh=False)
+
+    assert result["success"] is False
+    assert result["rows_appended"] == 1
+    assert result["watermark"] == "2025-01-01 08:00:00|CE-01"
+    with sqlite3.connect(db) as conn:
+        log = conn.execute("SELECT rows_appended, watermark_after, error FROM ingestion_log").fetchall()
+    assert log == [(1, "2025-01-01 08:00:00|CE-01", "by_detail_dumps 2025.xlsx: lote inválido")]
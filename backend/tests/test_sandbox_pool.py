@@ -0,0 +1,45 @@
+# tests/test_sandbox_pool.py
+"""Regresiones de services/sandbox_pool.py: estado que una tarea deja en el worker"""
+
+import pytest
+
+from services.sandbox_pool import SandboxPool
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(size=1, precargar=("pandas", "numpy"))
+    yield pool
+    pool.shutdown()
+
+
+def _exec(pool, code):
+    r = pool.run_exec(code, {}, timeout=120)
+    assert r["success"], r.get("error")
+    return r
+
+
+def test_opciones_de_pandas_no_pasan_a_la_siguiente_tarea(pool):
+    primera = _exec(pool, "import pandas as pd\npd.set_option('display.max_rows', 3)\nresult = 1")
+    segunda = _exec(pool, "import pandas as pd\nresult = pd.get_option('display.max_rows')")
+
+    assert segunda["worker"]["pid"] == primera["worker"]["pid"]
+    assert segunda["result"] == 60
+    assert not primera["worker"]["recycle"]
+
+
+def test_modulos_importados_por_la_tarea_se_descargan(pool):
+    _exec(pool, "import colorsys\ncolorsys.ONE_THIRD = 0.5\nresult = 1")
+    r = _exec(pool, "import sys\nresult = 'colorsys' in sys.modules")
+
+    assert r["result"] is False
+
+
+def test_parche_a_pandas_recicla_el_worker(pool):
+    primera = _exec(pool, "import pandas as pd\npd.DataFrame.total = lambda self: 0\nresult = 1")
+    segunda = _exec(pool, "import pandas as pd\nresult = hasattr(pd.DataFrame, 'total')")
+
+    assert primera["worker"]["recycle"]
+    assert primera["worker"]["state_leak"] == ["pandas.DataFrame modificado"]
+    assert segunda["worker"]["pid"] != primera["worker"]["pid"]
+    assert segunda["result"] is False
@@ -14,6 +14,8 @@ from datetime import datetime
 import pandas as pd
 import numpy as np
 
+from tools.result_envelope import is_envelope, to_chart_data
+
 # Configurar estilo
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 6)
@@ -70,6 +72,10 @@ class ChartGenerator:
         Returns:
             Path al archivo del gráfico generado
         """
+        # Sobre columnar de SQLTool / CodeExecutor → dict del tipo de gráfico
+        if is_envelope(data):
+            data = to_chart_data(data, chart_type)
+        
         # Crear figura
         fig, ax = plt.subplots(figsize=figsize)
         
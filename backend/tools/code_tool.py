@@ -7,22 +7,22 @@ VERSIÓN PROTEGIDA:
 - Límite de memoria
 - Protección contra archivos grandes
 - Logs detallados para debugging
+- Ejecución en workers precalentados (services/sandbox_pool.py): sin
+  re-importar pandas/numpy por llamada y DataFrames por memoria compartida
 """
 
-import sys
-import io
 import traceback
 from pathlib import Path
 from typing import Dict, Any, Optional
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import multiprocessing
-from multiprocessing import Process, Queue
-import queue
 import psutil
 import os
 
+from services.sandbox_pool import get_sandbox_pool
+from tools.result_envelope import from_dataframe
+
 
 class CodeExecutor:
     """
@@ -30,7 +30,7 @@ class CodeExecutor:
     
     Características:
     - Timeout de 60 segundos (configurable)
-    - Límite de memoria
+    - Límite de memoria (RLIMIT_AS) y de CPU (RLIMIT_CPU) por ejecución
     - Protección contra lectura de archivos grandes
     - Sandbox básico para ejecución
     - Acceso a pandas, numpy
@@ -38,19 +38,33 @@ class CodeExecutor:
     - Guardado automático de código
     """
     
-    def __init__(self, code_dir: Path, timeout: int = 60, max_memory_mb: int = 512):
+    def __init__(
+        self,
+        code_dir: Path,
+        timeout: int = 60,
+        max_memory_mb: int = 512,
+        max_cpu_seconds: Optional[float] = None,
+        float_decimals: Optional[int] = None,
+        cpu_timeout_ratio: float = 0.8
+    ):
         """
         Inicializar Code Executor
         
         Args:
             code_dir: Directorio donde guardar código ejecutado
             timeout: Timeout de ejecución en segundos (default: 60)
-            max_memory_mb: Límite de memoria en MB (default: 512)
+            max_memory_mb: Límite de memoria en MB sobre la base del worker (default: 512)
+            max_cpu_seconds: Límite de CPU en segundos (default: cpu_timeout_ratio × timeout)
+            float_decimals: Decimales de los DataFrames retornados como sobre columnar (None = sin redondeo)
+            cpu_timeout_ratio: Fracción del timeout usada como límite de CPU si no hay max_cpu_seconds
         """
         self.code_dir = Path(code_dir)
         self.code_dir.mkdir(parents=True, exist_ok=True)
         self.timeout = timeout
         self.max_memory_mb = max_memory_mb
+        self.max_cpu_seconds = max_cpu_seconds
+        self.float_decimals = float_decimals
+        self.cpu_timeout_ratio = cpu_timeout_ratio
         
         # Librerías permitidas en el contexto
         self.safe_globals = {
@@ -73,14 +87,26 @@ class CodeExecutor:
             'abs': abs,
         }
         
+        # Workers del sandbox listos antes de la primera ejecución
+        self.pool = get_sandbox_pool()
+        self.pool.warm()
+        
         print(f"OK CodeExecutor inicializado (timeout: {timeout}s, max_memory: {max_memory_mb}MB)")
     
+    def _limits(self, timeout: float) -> Dict[str, float]:
+        """Límites de recursos que aplica el worker durante la ejecución"""
+        return {
+            'memory_mb': self.max_memory_mb,
+            # Bajo el timeout, para que un bucle de CPU se reporte como límite y no como timeout
+            'cpu_seconds': self.max_cpu_seconds or max(1.0, timeout * self.cpu_timeout_ratio)
+        }
+    
     def _sanitize_result(self, obj):
         """Convierte pandas objects a tipos nativos Python"""
         if isinstance(obj, pd.Series):
             return obj.to_list()
         elif isinstance(obj, pd.DataFrame):
-            return obj.to_dict('records')
+            return from_dataframe(obj, float_decimals=self.float_decimals)
         elif isinstance(obj, np.ndarray):
             return obj.tolist()
         elif isinstance(obj, (np.int64, np.int32, np.float64, np.float32)):
@@ -97,58 +123,6 @@ class CodeExecutor:
             except:
                 return f"<{type(obj).__name__}>"
 
-    def _run_code_in_process(
-        self,
-        code: str,
-        exec_globals: dict,
-        result_queue: Queue,
-        code_file: Path
-    ):
-        """
-        Ejecutar código en un proceso separado
-        Esta función corre en el proceso hijo
-        """
-        try:
-            # Capturar stdout
-            old_stdout = sys.stdout
-            sys.stdout = io.StringIO()
-            
-            # Ejecutar código
-            exec_locals = {}
-            exec(code, exec_globals, exec_locals)
-            
-            # Obtener output
-            output = sys.stdout.getvalue()
-            sys.stdout = old_stdout
-            
-            # Buscar resultado final
-            result = None
-            if 'result' in exec_locals:
-                result = exec_locals['result']
-            elif exec_locals:
-                # Tomar la última variable definida
-                last_var = list(exec_locals.keys())[-1]
-                result = exec_locals[last_var]
-            
-            # Enviar resultado al proceso principal
-            result_queue.put({
-                'success': True,
-                'result': result,
-                'output': output,
-                'code_file': str(code_file),
-                'variables_created': list(exec_locals.keys())
-            })
-            
-        except Exception as e:
-            # Restaurar stdout si hubo error
-            sys.stdout = old_stdout
-            
-            result_queue.put({
-                'success': False,
-                'error': str(e),
-                'traceback': traceback.format_exc()
-            })
-
     def execute(
         self,
         code: str,
@@ -212,35 +186,21 @@ class CodeExecutor:
                 exec_globals.update(data_context)
             
             # ===================================================================
-            # EJECUTAR CON TIMEOUT (usando multiprocessing)
+            # EJECUTAR CON TIMEOUT (worker del sandbox pool)
             # ===================================================================
             
             print(f"🚀 Iniciando ejecución...")
             
-            result_queue = Queue()
-            process = Process(
-                target=self._run_code_in_process,
-                args=(code, exec_globals, result_queue, code_file)
+            result_data = self.pool.run_exec(
+                code, exec_globals, self.timeout, str(code_file), limits=self._limits(self.timeout)
             )
             
-            process.start()
-            process.join(timeout=self.timeout)
-            
             # ===================================================================
             # VERIFICAR RESULTADO
             # ===================================================================
             
-            if process.is_alive():
-                # TIMEOUT - Matar el proceso
-                print(f"⚠️  TIMEOUT después de {self.timeout}s - Terminando proceso...")
-                process.terminate()
-                process.join(timeout=5)  # Esperar 5s más para terminar limpiamente
-                
-                if process.is_alive():
-                    # Si todavía está vivo, forzar
-                    print(f"🔴 Proceso no respondió - Forzando terminación...")
-                    process.kill()
-                    process.join()
+            if result_data.get('timeout'):
+                print(f"⚠️  TIMEOUT después de {self.timeout}s - Worker terminado y reemplazado")
                 
                 execution_time = (datetime.now() - start_time).total_seconds()
                 
@@ -253,10 +213,7 @@ class CodeExecutor:
                     'suggestion': 'Simplifica el código o usa SQL para consultas grandes'
                 }
             
-            # Obtener resultado de la cola
-            try:
-                result_data = result_queue.get_nowait()
-            except queue.Empty:
+            if 'exitcode' in result_data:
                 execution_time = (datetime.now() - start_time).total_seconds()
                 return {
                     'success': False,
@@ -271,6 +228,9 @@ class CodeExecutor:
             
             execution_time = (datetime.now() - start_time).total_seconds()
             
+            # Consumo medido en el worker (pico de RSS de la ejecución y CPU)
+            resources = result_data.get('resources', {})
+            
             if result_data['success']:
                 print(f"✅ Ejecución exitosa en {execution_time:.2f}s")
                 
@@ -281,7 +241,9 @@ class CodeExecutor:
                     'code_file': str(code_file),
                     'variables_created': result_data['variables_created'],
                     'timestamp': timestamp,
-                    'execution_time': execution_time
+                    'execution_time': execution_time,
+                    'peak_rss_mb': resources.get('peak_rss_mb'),
+                    'cpu_time': resources.get('cpu_seconds')
                 }
             else:
                 print(f"❌ Error en ejecución: {result_data['error']}")
@@ -289,9 +251,12 @@ class CodeExecutor:
                 return {
                     'success': False,
                     'error': result_data['error'],
-                    'traceback': result_data['traceback'],
+                    'traceback': result_data.get('traceback'),
                     'code_file': str(code_file),
-                    'execution_time': execution_time
+                    'execution_time': execution_time,
+                    'peak_rss_mb': resources.get('peak_rss_mb'),
+                    'cpu_time': resources.get('cpu_seconds'),
+                    'limit_exceeded': resources.get('limit_exceeded')
                 }
             
         except Exception as e:
@@ -332,6 +297,21 @@ class CodeExecutor:
         data_context = {df_name: df}
         return self.execute(code, data_context)
     
+    def run_script(self, code_file: Path, cwd: Path, timeout: int) -> Dict[str, Any]:
+        """
+        Ejecutar un archivo .py como `python code_file` en un worker precalentado
+        
+        Args:
+            code_file: Archivo con el código
+            cwd: Directorio de trabajo durante la ejecución
+            timeout: Timeout en segundos
+            
+        Returns:
+            Dict con success, returncode, stdout, stderr y resources (peak_rss_mb,
+            cpu_seconds, limit_exceeded); timeout=True si se excedió
+        """
+        return self.pool.run_script(code_file, cwd, timeout, limits=self._limits(timeout))
+    
     def validate_code(self, code: str) -> Dict[str, Any]:
         """
         Validar código sin ejecutarlo
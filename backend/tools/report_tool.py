@@ -10,6 +10,8 @@ from pathlib import Path
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from tools.result_envelope import is_envelope, to_table
+
 
 class ReportGenerator:
     """
@@ -142,7 +144,9 @@ class ReportGenerator:
         p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
     
     def _add_table(self, doc: Document, table_data: Dict[str, Any]):
-        """Agregar tabla"""
+        """Agregar tabla (dict headers/rows o sobre columnar)"""
+        if is_envelope(table_data):
+            table_data = to_table(table_data)
         headers = table_data.get('headers', [])
         rows = table_data.get('rows', [])
         
@@ -0,0 +1,222 @@
+"""
+MineDash AI - Result Envelope
+Formato columnar compacto para resultados tabulares de herramientas
+
+SQLTool y CodeExecutor retornaban listas de diccionarios (una clave por
+celda): con 1.000 filas el JSON que se envía al LLM repite los nombres de
+columna 1.000 veces y armar cada dict(row) cuesta más que la consulta.
+El sobre columnar guarda cada columna una sola vez:
+
+    {
+        'format': 'columnar',
+        'columns': ['equipo', 'tonelaje'],
+        'dtypes': ['str', 'float'],
+        'data': {'equipo': ['CAEX-01', ...], 'tonelaje': [1234.5, ...]},
+        'row_count': 1000,          # filas incluidas en data
+        'total_rows': 1000,         # filas del resultado original (None si se desconoce)
+        'truncated': False,
+        'preview': [{'equipo': 'CAEX-01', 'tonelaje': 1234.5}, ...]  # primeras filas
+    }
+
+Consumidores (ChartGenerator, ReportGenerator) aceptan el sobre directo;
+to_records / to_dataframe lo convierten de vuelta cuando hace falta.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+ENVELOPE_FORMAT = 'columnar'
+PREVIEW_ROWS = 5
+
+
+def is_envelope(obj: Any) -> bool:
+    """True si obj es un sobre columnar"""
+    return isinstance(obj, dict) and obj.get('format') == ENVELOPE_FORMAT and 'data' in obj
+
+
+def _envelope(columns: List[str], dtypes: List[str], data: Dict[str, list],
+              row_count: int, total_rows: Optional[int], truncated: bool,
+              preview_rows: int) -> Dict[str, Any]:
+    n_preview = min(preview_rows, row_count)
+    preview = [
+        {col: data[col][i] for col in columns}
+        for i in range(n_preview)
+    ]
+    return {
+        'format': ENVELOPE_FORMAT,
+        'columns': columns,
+        'dtypes': dtypes,
+        'data': data,
+        'row_count': row_count,
+        # None = truncado sin conteo total conocido
+        'total_rows': row_count if total_rows is None and not truncated else total_rows,
+        'truncated': truncated,
+        'preview': preview
+    }
+
+
+# =============================================================================
+# CONSTRUCCIÓN
+# =============================================================================
+
+def _columna_json(serie: pd.Series, float_decimals: Optional[int] = None) -> list:
+    """Columna → lista de valores nativos JSON (NaN/NaT → None)"""
+    nulos = serie.isna()
+    hay_nulos = bool(nulos.any())
+
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Decodificar por códigos: una búsqueda por fila en vez de astype(object)
+        categorias = _columna_json(pd.Series(serie.cat.categories), float_decimals)
+        return [categorias[c] if c >= 0 else None for c in serie.cat.codes.tolist()]
+
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        if getattr(serie.dt, 'tz', None) is not None:
+            serie = serie.dt.tz_convert(None)
+        valores = np.datetime_as_string(serie.to_numpy(dtype='datetime64[s]'), unit='s').tolist()
+    elif pd.api.types.is_float_dtype(serie):
+        if float_decimals is not None:
+            serie = serie.round(float_decimals)
+        valores = serie.tolist()
+    elif pd.api.types.is_bool_dtype(serie) or pd.api.types.is_integer_dtype(serie):
+        valores = serie.astype(object).tolist() if hay_nulos else serie.tolist()
+    elif pd.api.types.is_string_dtype(serie) and not pd.api.types.is_object_dtype(serie):
+        valores = serie.tolist()
+    else:
+        # object: normalizar escalares numpy, fechas y bytes
+        valores = serie.tolist()
+        for i, v in enumerate(valores):
+            if isinstance(v, np.generic):
+                valores[i] = v.item()
+            elif isinstance(v, (pd.Timestamp, np.datetime64)):
+                valores[i] = pd.Timestamp(v).isoformat()
+            elif isinstance(v, bytes):
+                valores[i] = v.hex()
+
+    if hay_nulos:
+        for i in np.flatnonzero(nulos.to_numpy()).tolist():
+            valores[i] = None
+    return valores
+
+
+def _dtype_nombre(serie: pd.Series) -> str:
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return 'category'
+    if pd.api.types.is_bool_dtype(serie):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(serie):
+        return 'int'
+    if pd.api.types.is_float_dtype(serie):
+        return 'float'
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return 'datetime'
+    return 'str'
+
+
+def from_dataframe(df: pd.DataFrame, max_rows: Optional[int] = None,
+                   preview_rows: int = PREVIEW_ROWS,
+                   float_decimals: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Sobre columnar de un DataFrame
+
+    Un índice con nombre (ej. resultado de groupby) se incluye como columna.
+    float_decimals redondea las columnas float (None = sin redondeo): el
+    repr completo de un float (17 dígitos) es la mayor parte del JSON.
+    """
+    total = len(df)
+    if any(name is not None for name in df.index.names):
+        df = df.reset_index()
+    truncated = max_rows is not None and total > max_rows
+    if truncated:
+        df = df.head(max_rows)
+
+    columns = [str(c) for c in df.columns]
+    data, dtypes = {}, []
+    for nombre, (_, serie) in zip(columns, df.items()):
+        data[nombre] = _columna_json(serie, float_decimals)
+        dtypes.append(_dtype_nombre(serie))
+
+    return _envelope(columns, dtypes, data, len(df), total, truncated, preview_rows)
+
+
+_SQLITE_TIPOS = {int: 'int', float: 'float', str: 'str', bytes: 'bytes', bool: 'bool'}
+
+
+def from_rows(columns: Sequence[str], rows: Sequence[Sequence[Any]],
+              total_rows: Optional[int] = None, truncated: bool = False,
+              preview_rows: int = PREVIEW_ROWS,
+              float_decimals: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Sobre columnar desde filas de un cursor (tuplas en el orden de columns)
+
+    El dtype de cada columna es el tipo Python del primer valor no nulo
+    ('null' si la columna viene vacía). float_decimals como en from_dataframe.
+    """
+    columns = [str(c) for c in columns]
+    arrays = list(zip(*rows)) if rows else [()] * len(columns)
+
+    data, dtypes = {}, []
+    for nombre, valores in zip(columns, arrays):
+        tipo = next((type(v) for v in valores if v is not None), None)
+        if tipo is bytes:
+            valores = [v.hex() if isinstance(v, bytes) else v for v in valores]
+        elif tipo is float and float_decimals is not None:
+            valores = [round(v, float_decimals) if type(v) is float else v for v in valores]
+        data[nombre] = list(valores)
+        dtypes.append(_SQLITE_TIPOS.get(tipo, 'null' if tipo is None else 'str'))
+
+    return _envelope(columns, dtypes, data, len(rows), total_rows, truncated, preview_rows)
+
+
+# =============================================================================
+# CONVERSIONES PARA CONSUMIDORES
+# =============================================================================
+
+def to_records(env: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Sobre → lista de diccionarios (formato anterior)"""
+    columns = env['columns']
+    arrays = [env['data'][c] for c in columns]
+    return [dict(zip(columns, fila)) for fila in zip(*arrays)]
+
+
+def to_dataframe(env: Dict[str, Any]) -> pd.DataFrame:
+    """Sobre → DataFrame (fechas quedan como texto ISO)"""
+    return pd.DataFrame(env['data'], columns=env['columns'])
+
+
+def to_table(env: Dict[str, Any]) -> Dict[str, Any]:
+    """Sobre → {'headers', 'rows'} de ReportGenerator._add_table"""
+    columns = env['columns']
+    arrays = [env['data'][c] for c in columns]
+    return {'headers': list(columns), 'rows': [list(fila) for fila in zip(*arrays)]}
+
+
+def to_chart_data(env: Dict[str, Any], chart_type: str) -> Dict[str, Any]:
+    """
+    Sobre → dict de datos de ChartGenerator
+
+    Eje X / etiquetas: primera columna no numérica (o la primera columna).
+    Series: columnas numéricas restantes; con más de una, y es un dict
+    {columna: valores} (líneas o barras agrupadas).
+    """
+    columns, dtypes, data = env['columns'], env['dtypes'], env['data']
+    numericas = [c for c, t in zip(columns, dtypes) if t in ('int', 'float')]
+    etiqueta = next((c for c, t in zip(columns, dtypes) if t not in ('int', 'float')), None)
+
+    if chart_type == 'scatter' and len(numericas) >= 2:
+        return {'x': data[numericas[0]], 'y': data[numericas[1]]}
+
+    if etiqueta is None:
+        etiqueta = columns[0] if columns else None
+        numericas = [c for c in numericas if c != etiqueta]
+
+    x = data[etiqueta] if etiqueta else []
+    if chart_type == 'pie':
+        return {'labels': x, 'values': data[numericas[0]] if numericas else []}
+
+    if len(numericas) == 1:
+        y = data[numericas[0]]
+    else:
+        y = {c: data[c] for c in numericas}
+    return {'x': x, 'y': y}
@@ -4,11 +4,65 @@ MineDash AI - SQL Tool
 Herramienta para ejecutar consultas SQL de forma segura
 """
 
+import re
 import sqlite3
+import time
 import pandas as pd
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
+from services.db_pool import get_db_pool
+from services.db_migrations import explain, is_full_scan
+from tools.result_envelope import from_rows
+
+
+# Instrucciones de la VM de SQLite entre revisiones del deadline
+PROGRESS_STEPS = 10000
+
+# Tablas grandes protegidas por la guardia de costo (dumps por año y KPI horarios)
+GUARDED_TABLES = r"hexagon_by_(detail_dumps|kpi)"
+
+# Opcodes de EXPLAIN que consumen toda la entrada antes de entregar la primera
+# fila: agregados (incluye ventanas), COUNT(*) optimizado y ordenamiento (sorter).
+# Se leen del programa compilado y no del texto SQL, así 'MAX(' dentro de un
+# literal o un nombre de columna no dispara la guardia
+_OPCODES_RECORRIDO = {
+    'AggStep', 'AggStep1', 'AggFinal', 'AggValue', 'AggInverse',
+    'Count', 'SorterOpen', 'SorterSort'
+}
+_FUENTES = re.compile(
+    r'\b(?:FROM|JOIN)\s+["`\[]?(\w+)["`\]]?(?:\s+(?:AS\s+)?(\w+))?',
+    re.IGNORECASE
+)
+_NO_ALIAS = {
+    'WHERE', 'JOIN', 'INNER', 'LEFT', 'RIGHT', 'CROSS', 'FULL', 'NATURAL', 'OUTER',
+    'ON', 'USING', 'GROUP', 'ORDER', 'LIMIT', 'HAVING', 'WINDOW',
+    'UNION', 'EXCEPT', 'INTERSECT'
+}
+
+
+def _alias_tablas(sql: str) -> Dict[str, str]:
+    """alias (en minúsculas) → tabla, para traducir las líneas SCAN del plan"""
+    alias = {}
+    for tabla, nombre in _FUENTES.findall(sql):
+        alias[tabla.lower()] = tabla
+        if nombre and nombre.upper() not in _NO_ALIAS:
+            alias[nombre.lower()] = tabla
+    return alias
+
+
+def _filas_estimadas(conn: sqlite3.Connection, tabla: str) -> Optional[int]:
+    """MAX(rowid) como estimación O(log n) del tamaño (None si no aplica)"""
+    try:
+        return conn.execute(f'SELECT MAX(rowid) FROM "{tabla}"').fetchone()[0] or 0
+    except sqlite3.Error:
+        return None
+
+
+def _bytes_fila(fila: tuple) -> int:
+    """Tamaño aproximado de una fila en el resultado (texto/blob por largo, resto 8 bytes)"""
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in fila)
+
 
 class SQLTool:
     """
@@ -18,19 +72,38 @@ class SQLTool:
     - Ejecución segura (solo SELECT)
     - Conversión automática a formato legible
     - Manejo de errores robusto
-    - Límite de resultados
+    - Límite de resultados por filas y bytes (lectura en streaming)
+    - Cancelación por tiempo y guardia de costo sobre tablas grandes
     """
     
-    def __init__(self, db_path: str, max_results: int = 1000):
+    def __init__(self, db_path: str, max_results: int = 1000,
+                 float_decimals: Optional[int] = None,
+                 timeout: float = 30.0,
+                 max_bytes: int = 2 * 1024 ** 2,
+                 fetch_batch: int = 256,
+                 guarded_tables: Optional[str] = GUARDED_TABLES,
+                 guard_min_rows: int = 200000):
         """
         Inicializar SQL Tool
         
         Args:
             db_path: Ruta a la base de datos SQLite
             max_results: Número máximo de filas a retornar
+            float_decimals: Decimales de los valores REAL en execute_columnar (None = sin redondeo)
+            timeout: Segundos máximos por consulta (se cancela con un progress handler)
+            max_bytes: Tamaño aproximado máximo del resultado
+            fetch_batch: Filas por llamada a fetchmany
+            guarded_tables: Regex de tablas grandes que revisa la guardia de costo (None = sin guardia)
+            guard_min_rows: Tamaño desde el que una tabla protegida cuenta como grande
         """
         self.db_path = db_path
         self.max_results = max_results
+        self.float_decimals = float_decimals
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.fetch_batch = fetch_batch
+        self.guarded_tables = re.compile(guarded_tables, re.IGNORECASE) if guarded_tables else None
+        self.guard_min_rows = guard_min_rows
         
         # Verificar que DB existe
         if not Path(db_path).exists():
@@ -46,58 +119,201 @@ class SQLTool:
         Returns:
             Lista de diccionarios con resultados
         """
+        resultado = self._ejecutar(query)
+        if 'error' in resultado:
+            return [resultado]
+        
+        columns = resultado['columns']
+        results = [dict(zip(columns, fila)) for fila in resultado['rows']]
+        
+        if not results:
+            return [{'message': 'Consulta ejecutada correctamente pero sin resultados'}]
+        
+        return results
+    
+    def execute_columnar(self, query: str) -> Dict[str, Any]:
+        """
+        Ejecutar consulta SQL y retornar un sobre columnar (tools/result_envelope.py)
+        
+        Mismas validaciones y límites que execute(), pero las filas se
+        transponen a columnas: sin dict por fila ni nombres repetidos en el
+        JSON que recibe el LLM.
+        
+        Args:
+            query: Consulta SQL (solo SELECT permitido)
+            
+        Returns:
+            Sobre columnar, o {'error', 'query'} si falla
+        """
+        resultado = self._ejecutar(query)
+        if 'error' in resultado:
+            return resultado
+        
+        rows = resultado['rows']
+        truncated = resultado['truncated']
+        envelope = from_rows(resultado['columns'], rows,
+                             total_rows=None if truncated else len(rows),
+                             truncated=truncated, float_decimals=self.float_decimals)
+        if resultado['truncated_by'] == 'bytes':
+            envelope['message'] = (
+                f'Resultado truncado en {len(rows)} filas (límite de {self.max_bytes // 1024} KB); '
+                'agregar filtros o agregaciones'
+            )
+        elif not rows:
+            envelope['message'] = 'Consulta ejecutada correctamente pero sin resultados'
+        return envelope
+    
+    def _validar(self, query: str) -> Optional[str]:
+        """Mensaje de error si la consulta no es un SELECT permitido"""
+        # Validar que sea solo SELECT
+        query_upper = query.strip().upper()
+        if not query_upper.startswith('SELECT'):
+            return 'Solo se permiten consultas SELECT'
+        
+        # Palabras prohibidas (para seguridad)
+        prohibited_words = ['DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE', 'TRUNCATE']
+        for word in prohibited_words:
+            if word in query_upper:
+                return f'Palabra prohibida detectada: {word}'
+        return None
+    
+    # =========================================================================
+    # EJECUCIÓN EN STREAMING
+    # =========================================================================
+    
+    def _ejecutar(self, query: str) -> Dict[str, Any]:
+        """
+        Validar, revisar el plan y leer la consulta por lotes
+        
+        - fetchmany en lotes de fetch_batch hasta max_results filas o
+          max_bytes de datos: SQLite deja de avanzar el cursor al cortar,
+          sin necesidad de agregar LIMIT al texto de la consulta
+        - Un progress handler cancela la consulta al pasar timeout segundos
+          (incluye el tiempo de los lotes, no solo el primer paso)
+        - Antes de ejecutar, EXPLAIN QUERY PLAN rechaza agregaciones/ordenamientos
+          sobre un full scan de las tablas grandes (ver _revisar_plan)
+        
+        Returns:
+            {'columns', 'rows' (tuplas), 'truncated', 'truncated_by'} o {'error', 'query'}
+        """
+        error = self._validar(query)
+        if error:
+            return {'error': error, 'query': query}
+        
+        sql = query.strip().rstrip(';')
+        deadline = time.monotonic() + self.timeout
+        cancelada = []
+        
+        def _vencida():
+            if time.monotonic() > deadline:
+                cancelada.append(True)
+                return 1
+            return 0
+        
         try:
-            # Validar que sea solo SELECT
-            query_upper = query.strip().upper()
-            if not query_upper.startswith('SELECT'):
-                return [{
-                    'error': 'Solo se permiten consultas SELECT',
+            conn = get_db_pool(self.db_path).connect()
+            try:
+                conn.set_progress_handler(_vencida, PROGRESS_STEPS)
+                
+                error = self._revisar_plan(conn, sql)
+                if error:
+                    return {'error': error, 'query': query}
+                
+                cursor = conn.cursor()
+                cursor.row_factory = None  # tuplas, aunque la conexión use sqlite3.Row
+                cursor.execute(sql)
+                columns = [d[0] for d in cursor.description or []]
+                
+                rows, n_bytes, truncated_by = [], 0, None
+                while truncated_by is None:
+                    lote = cursor.fetchmany(self.fetch_batch)
+                    if not lote:
+                        break
+                    for fila in lote:
+                        if len(rows) >= self.max_results:
+                            truncated_by = 'rows'
+                            break
+                        if n_bytes >= self.max_bytes:
+                            truncated_by = 'bytes'
+                            break
+                        rows.append(fila)
+                        n_bytes += _bytes_fila(fila)
+                cursor.close()
+            finally:
+                conn.set_progress_handler(None, 0)
+                conn.close()
+        except sqlite3.OperationalError as e:
+            if cancelada:
+                return {
+                    'error': (
+                        f'Consulta cancelada: superó el límite de {self.timeout:g} s. '
+                        'Filtrar por timestamp / equipo o usar una herramienta especializada'
+                    ),
                     'query': query
-                }]
-            
-            # Palabras prohibidas (para seguridad)
-            prohibited_words = ['DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE', 'TRUNCATE']
-            for word in prohibited_words:
-                if word in query_upper:
-                    return [{
-                        'error': f'Palabra prohibida detectada: {word}',
-                        'query': query
-                    }]
-            
-            # Ejecutar consulta
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Para tener nombres de columnas
-            cursor = conn.cursor()
-            
-            # Agregar LIMIT si no existe
-            if 'LIMIT' not in query_upper:
-                query += f' LIMIT {self.max_results}'
-            
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            
-            # Convertir a lista de diccionarios
-            results = []
-            for row in rows:
-                results.append(dict(row))
-            
-            conn.close()
-            
-            if not results:
-                return [{'message': 'Consulta ejecutada correctamente pero sin resultados'}]
-            
-            return results
-            
+                }
+            return {'error': f'Error SQL: {str(e)}', 'query': query}
         except sqlite3.Error as e:
-            return [{
-                'error': f'Error SQL: {str(e)}',
-                'query': query
-            }]
+            return {'error': f'Error SQL: {str(e)}', 'query': query}
         except Exception as e:
-            return [{
-                'error': f'Error inesperado: {str(e)}',
-                'query': query
-            }]
+            return {'error': f'Error inesperado: {str(e)}', 'query': query}
+        
+        return {
+            'columns': columns,
+            'rows': rows,
+            'truncated': truncated_by is not None,
+            'truncated_by': truncated_by
+        }
+    
+    def _revisar_plan(self, conn: sqlite3.Connection, sql: str) -> Optional[str]:
+        """
+        Guardia de costo con EXPLAIN QUERY PLAN
+        
+        Un SCAN completo de una tabla grande (guarded_tables con más de
+        guard_min_rows filas) solo se permite si se puede leer en streaming:
+        el corte por filas/bytes de _ejecutar lo detiene a las pocas páginas.
+        Si además el programa compilado (EXPLAIN) agrega (COUNT/SUM/...,
+        GROUP BY, ventanas) u ordena con un B-tree temporal, SQLite tendría
+        que recorrer la tabla entera antes de entregar la primera fila: se
+        rechaza con una indicación para el LLM.
+        
+        Returns:
+            Mensaje de error o None si la consulta puede ejecutarse
+        """
+        if self.guarded_tables is None:
+            return None
+        
+        plan = explain(conn, sql)
+        materialized = [line.split()[1] for line in plan
+                        if line.startswith(("MATERIALIZE ", "CO-ROUTINE "))]
+        escaneadas = [
+            line.split()[1] for line in plan
+            if is_full_scan(line, materialized) and "COVERING INDEX" not in line
+        ]
+        if not escaneadas:
+            return None
+        
+        recorre_todo = (
+            any(line.startswith("USE TEMP B-TREE") for line in plan)
+            or any(row[1] in _OPCODES_RECORRIDO for row in conn.execute(f"EXPLAIN {sql}"))
+        )
+        if not recorre_todo:
+            return None
+        
+        alias = _alias_tablas(sql)
+        for nombre in escaneadas:
+            tabla = alias.get(nombre.lower(), nombre)
+            if not self.guarded_tables.match(tabla):
+                continue
+            filas = _filas_estimadas(conn, tabla)
+            if filas is not None and filas < self.guard_min_rows:
+                continue
+            return (
+                f'Consulta rechazada: recorre completa la tabla {tabla} '
+                f'(~{filas or 0:,} filas) para agregar u ordenar. '
+                'Agregar un filtro por timestamp (rango de fechas) o equipment_id, '
+                'o usar la herramienta especializada correspondiente'
+            )
+        return None
     
     def execute_to_dataframe(self, query: str) -> Optional[pd.DataFrame]:
         """
@@ -130,7 +346,7 @@ class SQLTool:
             Dict con información de la tabla
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_db_pool(self.db_path).connect()
             cursor = conn.cursor()
             
             # Obtener esquema
@@ -171,7 +387,7 @@ class SQLTool:
             Lista de nombres de tablas
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = get_db_pool(self.db_path).connect()
             cursor = conn.cursor()
             
             cursor.execute("""